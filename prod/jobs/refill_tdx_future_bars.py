@@ -1,13 +1,12 @@
 # flake8: noqa
 """
-下载通达信指数合约1分钟bar => vnpy项目目录/bar_data/tdx/
+下载通达信指数合约1分钟bar => vnpy项目目录/bar_data/tdx/future/ (按合约、月份分区)
+再导出为单一csv => vnpy项目目录/bar_data/tdx/
+多个连接并发下载，中断后重新运行，跳过当日已完成的合约
 """
 import os
 import sys
-import json
-import csv
-from collections import OrderedDict
-import pandas as pd
+from datetime import datetime
 
 vnpy_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 if vnpy_root not in sys.path:
@@ -15,8 +14,9 @@ if vnpy_root not in sys.path:
 
 os.environ["VNPY_TESTING"] = "1"
 
-from vnpy.data.tdx.tdx_future_data import *
-from vnpy.trader.utility import get_csv_last_dt
+from vnpy.data.tdx.tdx_future_data import TdxFutureData
+from vnpy.data.tdx.tdx_bar_store import TdxBarStore, DownloadCheckpoint
+from vnpy.data.tdx.tdx_downloader import TdxFutureDownloader
 
 # 保存的1分钟指数 bar目录
 bar_data_folder = os.path.abspath(os.path.join(vnpy_root, 'bar_data'))
@@ -24,75 +24,44 @@ bar_data_folder = os.path.abspath(os.path.join(vnpy_root, 'bar_data'))
 # 开始日期（每年大概需要几分钟）
 start_date = '20160101'
 
+# 并发连接数
+pool_size = 4
+
 # 创建API对象
 api_01 = TdxFutureData()
 
 # 更新本地合约缓存信息
 api_01.update_mi_contracts()
 
-# 逐一指数合约下载并更新
-for underlying_symbol in api_01.future_contracts.keys():
-    index_symbol = underlying_symbol + '99'
-    print(f'开始更新:{index_symbol}')
-    # csv数据文件名
-    bar_file_path = os.path.abspath(os.path.join(bar_data_folder, 'tdx', f'{underlying_symbol}99_{start_date}_1m.csv'))
-
-    # 如果文件存在，
-    if os.path.exists(bar_file_path):
-
-        #df_old = pd.read_csv(bar_file_path, index_col=0)
-        #df_old = df_old.rename(lambda x: pd.to_datetime(x, format="%Y-%m-%d %H:%M:%S"))
-        # 取最后一条时间
-        last_dt = get_csv_last_dt(bar_file_path)
-        start_dt = last_dt - timedelta(days=1)
-        print(f'文件{bar_file_path}存在，最后时间:{start_date}')
-    else:
-        last_dt = None
-        start_dt = datetime.strptime(start_date, '%Y%m%d')
-        print(f'文件{bar_file_path}不存在，开始时间:{start_date}')
-
-    result, bars = api_01.get_bars(symbol=index_symbol,
-                           period='1min',
-                           callback=None,
-                           start_dt=start_dt,
-                           return_bar=False)
-    # [dict] => dataframe
-    if not result or len(bars) == 0:
-        continue
-
-    if last_dt is None:
-        data_df = pd.DataFrame(bars)
-        data_df.set_index('datetime', inplace=True)
-        data_df = data_df.sort_index()
-        # print(data_df.head())
-        print(data_df.tail())
-        data_df.to_csv(bar_file_path, index=True)
-        print(f'首次更新{index_symbol} 数据 => 文件{bar_file_path}')
-        continue
-
-
-    # 获取标题
-    headers = []
-    with open(bar_file_path, "r", encoding='utf8') as f:
-        reader = csv.reader(f)
-        for header in reader:
-            headers = header
-            break
-
-    bar_count = 0
-    # 写入所有大于最后bar时间的数据
-    with open(bar_file_path, 'a', encoding='utf8', newline='\n') as csvWriteFile:
-
-        writer = csv.DictWriter(f=csvWriteFile, fieldnames=headers, dialect='excel',
-                                extrasaction='ignore')
-        for bar in bars:
-            if bar['datetime'] <= last_dt:
-                continue
-            bar_count += 1
-            writer.writerow(bar)
-
-        print(f'更新{index_symbol} 数据 => 文件{bar_file_path}, 最后记录:{bars[-1]}')
+index_symbols = [underlying_symbol + '99' for underlying_symbol in api_01.future_contracts.keys()]
+
+store = TdxBarStore(os.path.join(bar_data_folder, 'tdx', 'future'))
+checkpoint = DownloadCheckpoint(os.path.join(store.root, 'checkpoint.json'),
+                                task='1min_{}'.format(datetime.now().strftime('%Y%m%d')))
+downloader = TdxFutureDownloader(store=store, pool_size=pool_size)
+
+
+def get_bar_file_path(index_symbol):
+    """回测使用的csv文件"""
+    return os.path.abspath(os.path.join(bar_data_folder, 'tdx', f'{index_symbol}_{start_date}_1m.csv'))
+
+
+# 首次使用分区存储时，导入原有的csv文件
+for index_symbol in index_symbols:
+    if store.get_last_dt(index_symbol) is None:
+        store.import_csv(index_symbol, get_bar_file_path(index_symbol))
+
+# 并发下载，只追加新数据
+results = downloader.download(index_symbols, datetime.strptime(start_date, '%Y%m%d'), checkpoint)
+downloader.close()
 
+# 导出为回测使用的csv文件(只追加新数据)
+for index_symbol in index_symbols:
+    bar_file_path = get_bar_file_path(index_symbol)
+    count = store.export_csv(index_symbol, bar_file_path)
+    print(f'更新{index_symbol}数据{count}条 => 文件{bar_file_path}')
 
+if checkpoint.errors:
+    print(f'下载失败的合约:{checkpoint.errors}，重新运行可继续下载')
 print('更新完毕')
 os._exit(0)
@@ -1 +1,2 @@
 from .test_csv_loader import *
+from .test_optimize_testing import *
@@ -0,0 +1,206 @@
+"""
+Test if optimize testing engine expands, resumes and ranks parameter sets
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from vnpy.app.cta_strategy_pro.optimize_testing import (
+    OptimizeSetting,
+    OptimizeTestingEngine,
+    apply_params,
+    get_params_key
+)
+from vnpy.trader.tick_cache import TICK_CACHE_SUFFIX, load_tick_cache
+
+
+class FakeTestingEngine(object):
+    """回测引擎替身：目标值由S1的参数x、y计算，x=3,y=2时最优"""
+
+    run_count = 0
+
+    def __init__(self):
+        self.strategy_setting = None
+        self.bar_df_dict = {}
+
+    def prepare_env(self, test_setting):
+        pass
+
+    def run_portfolio_test(self, strategy_setting):
+        FakeTestingEngine.run_count += 1
+        self.strategy_setting = strategy_setting
+
+    def show_backtesting_result(self):
+        setting = self.strategy_setting['S1']['setting']
+        if setting['x'] < 0:
+            raise ValueError('x < 0')
+        return {
+            'Sharpe Ratio': -(setting['x'] - 3) ** 2 - (setting['y'] - 2) ** 2,
+            'total_days': 10,
+            'start_date': '2020-01-01'
+        }
+
+    def load_bar_cache_to_df(self, symbol, bar_file):
+        pass
+
+    def load_bar_csv_to_df(self, symbol, bar_file):
+        self.bar_df_dict[symbol] = pd.read_csv(bar_file, parse_dates=['datetime']).set_index('datetime')
+        return True
+
+
+class FakePool(object):
+    """进程池替身：在当前进程中按顺序执行"""
+
+    def imap_unordered(self, func, tasks):
+        return map(func, tasks)
+
+    def terminate(self):
+        pass
+
+    def join(self):
+        pass
+
+
+class TestOptimizeTesting(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        FakeTestingEngine.run_count = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def create_engine(self, optimize_setting, test_setting=None):
+        test_setting = test_setting or {'name': 'opt', 'data_path': self.path, 'mode': 'tick'}
+        strategy_setting = {
+            'S1': {'class_name': 'Strategy', 'setting': {'x': 0, 'y': 0}},
+            'S2': {'class_name': 'Strategy', 'setting': {'x': 0}},
+        }
+        engine = OptimizeTestingEngine(test_setting=test_setting,
+                                       strategy_setting=strategy_setting,
+                                       optimize_setting=optimize_setting,
+                                       engine_class=FakeTestingEngine,
+                                       processes=1)
+        engine.create_pool = FakePool
+        engine.output = lambda content: None
+        return engine
+
+    def test_generate_settings(self):
+        optimize_setting = OptimizeSetting()
+        optimize_setting.add_parameter('S1.x', 1, 5, 2)
+        optimize_setting.add_parameter('y', [2, 4])
+        optimize_setting.add_parameter('z', 7)
+        settings = optimize_setting.generate_settings()
+        self.assertEqual(len(settings), 6)
+        self.assertEqual(settings[0], {'S1.x': 1, 'y': 2, 'z': 7})
+        self.assertEqual(sorted(set(s['S1.x'] for s in settings)), [1, 3, 5])
+
+        # 起始点大于终止点，不添加
+        optimize_setting.add_parameter('w', 5, 1, 1)
+        self.assertNotIn('w', optimize_setting.params)
+
+    def test_apply_params(self):
+        strategy_setting = {
+            'S1': {'setting': {'x': 0}},
+            'S2': {}
+        }
+        result = apply_params(strategy_setting, {'S1.x': 3, 'y': 2})
+        self.assertEqual(result['S1']['setting'], {'x': 3, 'y': 2})
+        self.assertEqual(result['S2']['setting'], {'y': 2})
+        # 不修改原配置
+        self.assertEqual(strategy_setting, {'S1': {'setting': {'x': 0}}, 'S2': {}})
+        self.assertRaises(KeyError, apply_params, strategy_setting, {'S3.x': 1})
+
+    def test_grid_resume(self):
+        optimize_setting = OptimizeSetting()
+        optimize_setting.add_parameter('S1.x', [-1, 2, 3, 4])
+        optimize_setting.add_parameter('y', [1, 2])
+
+        engine = self.create_engine(optimize_setting)
+        ranked = engine.run_optimization()
+        self.assertEqual(FakeTestingEngine.run_count, 8)
+        self.assertEqual(ranked[0]['params'], {'S1.x': 3, 'y': 2})
+        self.assertEqual(ranked[0]['target'], 0)
+        # 回测异常的参数组合排在最后
+        self.assertTrue(all(r['error'] for r in ranked[-2:]))
+        with open(engine.result_file, encoding='utf8') as f:
+            self.assertEqual(len(f.readlines()), 8)
+
+        # 模拟中断时未写完整的记录
+        with open(engine.result_file, 'a', encoding='utf8') as f:
+            f.write('{"key": ')
+
+        # 断点续跑：已完成的参数组合不再回测，异常的重新回测
+        engine = self.create_engine(optimize_setting)
+        self.assertEqual(len(engine.results), 6)
+        engine.run_optimization()
+        self.assertEqual(FakeTestingEngine.run_count, 10)
+
+    def test_ga_optimization(self):
+        optimize_setting = OptimizeSetting()
+        optimize_setting.add_parameter('S1.x', 0, 5, 1)
+        optimize_setting.add_parameter('S1.y', 0, 4, 1)
+
+        engine = self.create_engine(optimize_setting)
+        ranked = engine.run_ga_optimization(population_size=6, ngen_size=30, seed=1)
+        self.assertEqual(FakeTestingEngine.run_count, len(engine.results))
+        self.assertLessEqual(len(engine.results), 30)
+        self.assertEqual(ranked[0]['params'], {'S1.x': 3, 'S1.y': 2})
+
+        # 相同的种子，已回测的个体直接使用结果
+        engine = self.create_engine(optimize_setting)
+        engine.run_ga_optimization(population_size=6, ngen_size=30, seed=1)
+        self.assertEqual(FakeTestingEngine.run_count, len(engine.results))
+
+    def test_save_ranked_results(self):
+        optimize_setting = OptimizeSetting()
+        optimize_setting.add_parameter('S1.x', [-1, 2, 3])
+        optimize_setting.add_parameter('y', [2])
+
+        engine = self.create_engine(optimize_setting)
+        engine.run_optimization()
+
+        df = pd.read_csv(engine.ranked_file)
+        self.assertEqual(list(df.columns[:5]), ['rank', 'name', 'S1.x', 'y', 'Sharpe Ratio'])
+        self.assertEqual(list(df['rank']), [1, 2, 3])
+        self.assertEqual(list(df['S1.x']), [3, 2, -1])
+        self.assertEqual(df['error'].iloc[-1], 'x < 0')
+        self.assertTrue(df['name'].iloc[0].startswith('opt_'))
+
+    def test_prepare_data(self):
+        # 不同目录下的同名csv，转换为不同的缓存文件
+        bar_files = []
+        for folder, price in [('a', 1.0), ('b', 2.0)]:
+            os.makedirs(os.path.join(self.path, folder))
+            bar_file = os.path.join(self.path, folder, 'RB99.csv')
+            pd.DataFrame({'datetime': pd.date_range('2020-01-02 09:00', periods=3, freq='min'),
+                          'close': [price] * 3}).to_csv(bar_file, index=False)
+            bar_files.append(bar_file)
+
+        test_setting = {
+            'name': 'opt',
+            'data_path': self.path,
+            'mode': 'bar',
+            'symbol_datas': {
+                'RB99': {'bar_file': bar_files[0]},
+                'RB88': {'bar_file': bar_files[1]}
+            }
+        }
+        engine = self.create_engine(OptimizeSetting(), test_setting)
+        engine.prepare_data()
+
+        cache_files = [engine.test_setting['symbol_datas'][s]['bar_file'] for s in ['RB99', 'RB88']]
+        self.assertNotEqual(cache_files[0], cache_files[1])
+        for cache_file, price in zip(cache_files, [1.0, 2.0]):
+            self.assertTrue(cache_file.endswith(TICK_CACHE_SUFFIX))
+            self.assertEqual(list(load_tick_cache(cache_file)['close']), [price] * 3)
+
+    def test_params_key(self):
+        self.assertEqual(get_params_key({'b': 1, 'a': 2}), get_params_key({'a': 2, 'b': 1}))
+
+
+if __name__ == '__main__':
+    unittest.main()
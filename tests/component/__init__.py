@@ -0,0 +1,6 @@
+from .test_cta_series import *
+from .test_cta_kernel import *
+from .test_cta_indicator import *
+from .test_cta_line_bar import *
+from .test_cta_kline_store import *
+from .test_cta_renko_bar import *
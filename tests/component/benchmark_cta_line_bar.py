@@ -0,0 +1,62 @@
+"""
+Benchmark of CtaLineBar warm-up: add_bar per bar vs add_bars
+
+python benchmark_cta_line_bar.py [bar数量]
+"""
+import sys
+import time
+
+from vnpy.component.cta_line_bar import CtaLineBar
+from vnpy.trader.constant import Interval
+
+from test_cta_kernel import FakeStrategy, make_bars
+
+
+# 同 test_cta_line_bar.TestCtaLineBar.setting
+SETTING = {
+    'name': 'M1',
+    'interval': Interval.SECOND,
+    'bar_interval': 60,
+    'price_tick': 0.5,
+    'para_pre_len': 20,
+    'para_ma1_len': 5,
+    'para_ma2_len': 10,
+    'para_ma3_len': 60,
+    'para_ema1_len': 7,
+    'para_ema2_len': 21,
+    'para_atr1_len': 10,
+    'para_rsi1_len': 7,
+    'para_rsi2_len': 14,
+    'para_boll_len': 20,
+    'para_boll2_tb_len': 26,
+    'para_kdj_len': 9,
+    'para_cci_len': 14,
+    'para_macd_fast_len': 12,
+    'para_macd_slow_len': 26,
+    'para_macd_signal_len': 9,
+    'para_golden_n': 60,
+    'para_bias_len': 6,
+    'para_active_area': True
+}
+
+
+def main(n: int = 5000):
+    bars = make_bars(n)
+    print(f'{n}根bar')
+
+    kline = CtaLineBar(FakeStrategy(), None, dict(SETTING))
+    start = time.perf_counter()
+    for bar in bars:
+        kline.add_bar(bar, bar_is_completed=True)
+    seconds = time.perf_counter() - start
+    print(f'{"add_bar逐根":<10}: {seconds:.2f} 秒, {seconds / n * 1e3:.3f} 毫秒/bar')
+
+    kline = CtaLineBar(FakeStrategy(), None, dict(SETTING))
+    start = time.perf_counter()
+    kline.add_bars(bars)
+    seconds = time.perf_counter() - start
+    print(f'{"add_bars批量":<10}: {seconds:.2f} 秒, {seconds / n * 1e3:.3f} 毫秒/bar')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
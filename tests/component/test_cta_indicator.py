@@ -0,0 +1,94 @@
+"""
+Test if indicator pipeline only compiles enabled stages in dependency order
+"""
+import pickle
+import unittest
+
+from vnpy.component.cta_indicator import IndicatorStage, compile_indicator_stages
+from vnpy.component.cta_line_bar import CtaLineBar
+from vnpy.component.cta_renko_bar import CtaRenkoBar
+from vnpy.trader.constant import Interval
+
+from .test_cta_kernel import FakeStrategy, make_bars
+
+
+class TestCtaIndicator(unittest.TestCase):
+
+    def test_compile_stages(self):
+        stages = [
+            IndicatorStage('a', lambda k: True, depends=('c',)),
+            IndicatorStage('b', lambda k: False),
+            IndicatorStage('c', lambda k: True),
+            IndicatorStage('d', lambda k: True, requires=('b',)),
+            IndicatorStage('e', lambda k: True, requires=(('b', 'c'),)),
+        ]
+        names = [stage.name for stage in compile_indicator_stages(None, stages)]
+        self.assertEqual(names, ['c', 'a', 'e'])
+
+        stages = [
+            IndicatorStage('a', lambda k: True, depends=('b',)),
+            IndicatorStage('b', lambda k: True, depends=('a',)),
+        ]
+        self.assertRaises(ValueError, compile_indicator_stages, None, stages)
+
+    def test_line_bar_pipeline(self):
+        setting = {
+            'name': 'M1',
+            'interval': Interval.SECOND,
+            'bar_interval': 60,
+            'price_tick': 0.5,
+            'para_ma1_len': 5,
+            'para_rsi1_len': 7,
+            'para_kdj_len': 9,
+            'para_active_area': True,
+        }
+        kline = CtaLineBar(FakeStrategy(), None, setting)
+        for bar in make_bars(100):
+            kline.add_bar(bar, bar_is_completed=True)
+
+        # 区域依赖布林，未启用布林时不计算
+        names = [func.__name__ for func, _ in kline.indicator_pipeline]
+        self.assertEqual(names, ['__count_ma', '__count_rsi', '__count_kdj'])
+        self.assertTrue(len(kline.line_k) > 0)
+        self.assertEqual(len(kline.line_boll_middle), 0)
+
+        # 修改参数后重新编译
+        kline.set_params({'para_boll_len': 20})
+        kline.add_bar(make_bars(101)[-1], bar_is_completed=True)
+        names = [func.__name__ for func, _ in kline.indicator_pipeline]
+        self.assertEqual(names, ['__count_ma', '__count_rsi', '__count_kdj', '__count_boll',
+                                 '__count_period', '__count_area'])
+
+        # 直接修改参数属性后，使流水线失效，同样重新编译
+        kline.para_kdj_len = 0
+        self.assertIsNotNone(kline.indicator_pipeline)
+        kline.invalidate_pipeline()
+        kline.add_bar(make_bars(102)[-1], bar_is_completed=True)
+        names = [func.__name__ for func, _ in kline.indicator_pipeline]
+        self.assertNotIn('__count_kdj', names)
+
+        # 流水线不参与pickle，恢复后重新编译
+        kline2 = pickle.loads(pickle.dumps(kline))
+        self.assertIsNone(kline2.indicator_pipeline)
+
+    def test_renko_bar_pipeline(self):
+        setting = {
+            'name': 'R1',
+            'para_ma2_len': 10,
+            'para_rsi1_len': 7
+        }
+        renko = CtaRenkoBar(FakeStrategy(), None, setting)
+        renko.para_active_period = True
+        renko.compile_indicators()
+        names = [func.__name__ for func, _ in renko.indicator_pipeline]
+        self.assertEqual(names, ['__count_ma', '__count_rsi', '__count_period'])
+
+        renko.setParam({'para_rsi1_len': 0})
+        self.assertIsNone(renko.indicator_pipeline)
+        renko.compile_indicators()
+        names = [func.__name__ for func, _ in renko.indicator_pipeline]
+        self.assertEqual(names, ['__count_ma', '__count_period'])
+
+
+if __name__ == '__main__':
+    unittest.main()
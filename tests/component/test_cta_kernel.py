@@ -0,0 +1,204 @@
+"""
+Test if incremental indicator kernels produce the same result as talib
+"""
+import random
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import talib as ta
+
+from vnpy.component.cta_kernel import (
+    MeanKernel,
+    StdKernel,
+    MaxKernel,
+    MinKernel,
+    EmaKernel,
+    AtrKernel,
+    RsiKernel,
+    MacdKernel,
+    CciKernel,
+    ema_weights)
+from vnpy.component.cta_line_bar import CtaLineBar
+from vnpy.trader.constant import Exchange, Interval
+from vnpy.trader.object import BarData
+
+
+def make_prices(n: int, seed: int = 7):
+    """生成随机游走的高低收价格"""
+    rng = np.random.default_rng(seed)
+    close = np.round((3500 + np.cumsum(rng.normal(0, 5, n))) * 5) / 5
+    high = close + np.abs(rng.normal(0, 3, n))
+    low = close - np.abs(rng.normal(0, 3, n))
+    return high, low, close
+
+
+def make_bars(n: int, seed: int = 7):
+    """生成随机的1分钟bar"""
+    rnd = random.Random(seed)
+    price = 3500.0
+    dt = datetime(2020, 1, 2, 9, 0)
+    bars = []
+    for _ in range(n):
+        open_price = price
+        close_price = round((price + rnd.gauss(0, 6)) * 2) / 2
+        bars.append(BarData(
+            gateway_name='',
+            symbol='RB99',
+            exchange=Exchange.SHFE,
+            datetime=dt,
+            trading_day=dt.strftime('%Y-%m-%d'),
+            interval=Interval.MINUTE,
+            open_price=open_price,
+            high_price=max(open_price, close_price) + round(abs(rnd.gauss(0, 3)) * 2) / 2,
+            low_price=min(open_price, close_price) - round(abs(rnd.gauss(0, 3)) * 2) / 2,
+            close_price=close_price,
+            volume=rnd.randint(10, 500),
+            open_interest=1000))
+        price = close_price
+        dt += timedelta(minutes=1)
+    return bars
+
+
+class FakeStrategy(object):
+
+    def write_log(self, *args, **kwargs):
+        pass
+
+    def write_error(self, *args, **kwargs):
+        pass
+
+
+class TestCtaKernel(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.high, self.low, self.close = make_prices(1500)
+
+    def check(self, kernel, ref, feed):
+        """逐个输入数据，与talib窗口计算结果比较"""
+        for t in range(len(self.close)):
+            value = feed(kernel, t)
+            if kernel.ready:
+                self.assertAlmostEqual(value, ref(t), delta=1e-8)
+
+    def test_mean(self):
+        self.check(MeanKernel(20),
+                   lambda t: ta.MA(self.close[t - 19:t + 1], 20)[-1],
+                   lambda k, t: k.update(self.close[t]))
+
+    def test_ema(self):
+        n, window = 21, 61
+        self.check(EmaKernel(n, window=window),
+                   lambda t: ta.EMA(self.close[t - window + 1:t + 1], n)[-1],
+                   lambda k, t: k.update(self.close[t]))
+
+    def test_std(self):
+        self.check(StdKernel(20),
+                   lambda t: ta.STDDEV(self.close[t - 19:t + 1], 20)[-1],
+                   lambda k, t: k.update(self.close[t]))
+        self.check(StdKernel(40, ddof=1),
+                   lambda t: np.std(self.close[t - 39:t + 1], ddof=1),
+                   lambda k, t: k.update(self.close[t]))
+
+    def test_max_min(self):
+        self.check(MaxKernel(20),
+                   lambda t: max(self.high[t - 19:t + 1]),
+                   lambda k, t: k.update(self.high[t]))
+        self.check(MinKernel(20),
+                   lambda t: min(self.low[t - 19:t + 1]),
+                   lambda k, t: k.update(self.low[t]))
+
+    def test_atr(self):
+        n = 14
+        self.check(AtrKernel(n),
+                   lambda t: ta.ATR(self.high[t - 2 * n + 1:t + 1], self.low[t - 2 * n + 1:t + 1],
+                                    self.close[t - 2 * n + 1:t + 1], n)[-1],
+                   lambda k, t: k.update(self.high[t], self.low[t], self.close[t]))
+
+    def test_rsi(self):
+        n = 14
+        self.check(RsiKernel(n),
+                   lambda t: ta.RSI(self.close[t - 2 * n + 1:t + 1], n)[-1],
+                   lambda k, t: k.update(self.close[t]))
+
+    def test_macd(self):
+        window = 210
+        self.check(MacdKernel(12, 26, 9, window),
+                   lambda t: ta.MACD(self.close[t - window + 1:t + 1], 12, 26, 9)[1][-1],
+                   lambda k, t: (k.update(self.close[t]), k.dea)[1])
+
+    def test_cci(self):
+        n = 14
+        tp = (self.high + self.low + self.close) / 3
+
+        def ref(t):
+            data = tp[t - n + 1:t + 1]
+            return (data[-1] - np.mean(data)) / (0.015 * np.mean(np.abs(data - np.mean(data))))
+
+        self.check(CciKernel(n), ref, lambda k, t: k.update(tp[t]))
+        values = CciKernel(n).batch(tp)['value']
+        self.assertTrue(np.isnan(values[n - 2]))
+        self.assertEqual(values[n - 1:].tolist(), [ref(t) for t in range(n - 1, len(tp))])
+
+    def test_ema_weights(self):
+        """多次 ewm(adjust=False) 的最后一个值 = 权重点积"""
+        data = self.close[-30:]
+        expected = data
+        for span in (3, 2, 2):
+            expected = pd.Series(expected).ewm(span=span, adjust=False).mean().values
+        self.assertAlmostEqual(float(ema_weights(30, (3, 2, 2)) @ data), expected[-1], delta=1e-8)
+
+    def test_line_bar_parity(self):
+        """增量计算与talib窗口计算的CtaLineBar，指标序列一致"""
+        setting = {
+            'name': 'M1',
+            'interval': Interval.SECOND,
+            'bar_interval': 60,
+            'price_tick': 0.5,
+            'para_pre_len': 20,
+            'para_ma1_len': 5,
+            'para_ma2_len': 10,
+            'para_ma3_len': 60,
+            'para_ema1_len': 7,
+            'para_ema2_len': 21,
+            'para_ema3_len': 55,
+            'para_atr1_len': 10,
+            'para_atr2_len': 26,
+            'para_rsi1_len': 7,
+            'para_rsi2_len': 14,
+            'para_boll_len': 20,
+            'para_boll2_tb_len': 26,
+            'para_kdj_len': 9,
+            'para_macd_fast_len': 12,
+            'para_macd_slow_len': 26,
+            'para_macd_signal_len': 9,
+            'para_golden_n': 60,
+            'para_cci_len': 14
+        }
+        kline = CtaLineBar(FakeStrategy(), None, dict(setting))
+        talib_kline = CtaLineBar(FakeStrategy(), None, dict(setting))
+        talib_kline.use_kernels = False
+
+        for bar in make_bars(800):
+            kline.add_bar(bar, bar_is_completed=True)
+            talib_kline.add_bar(bar, bar_is_completed=True)
+            self.assertEqual(kline.cur_p500, talib_kline.cur_p500)
+
+        self.assertTrue(len(kline.kernels) > 0)
+        for name in ['line_pre_high', 'line_pre_low', 'line_ma1', 'line_ma2', 'line_ma3', 'line_ema1', 'line_ema2',
+                     'line_ema3', 'line_atr1', 'line_atr2', 'line_rsi1', 'line_rsi2', 'line_boll_upper',
+                     'line_boll_middle', 'line_boll_lower', 'line_boll_std', 'line_boll2_upper', 'line_boll2_middle',
+                     'line_k', 'line_d', 'line_j', 'line_dif', 'line_dea', 'line_macd', 'line_cci']:
+            values = getattr(kline, name)
+            expected = getattr(talib_kline, name)
+            self.assertTrue(len(values) > 0, name)
+            self.assertEqual(len(values), len(expected), name)
+            np.testing.assert_allclose(values.values, expected.values, atol=1e-6, err_msg=name)
+
+        for name in ['ma12_count', 'ma13_count', 'ma23_count', 'cur_kd_count', 'cur_macd_count']:
+            self.assertEqual(getattr(kline, name), getattr(talib_kline, name), name)
+
+
+if __name__ == '__main__':
+    unittest.main()
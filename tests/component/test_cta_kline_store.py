@@ -0,0 +1,83 @@
+"""
+Test if kline store restores CtaLineBar to the same state
+"""
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+from vnpy.component.cta_line_bar import CtaLineBar
+from vnpy.component.cta_kline_store import KlineStore, pack_klines_snapshot, unpack_klines_snapshot
+
+from .test_cta_kernel import FakeStrategy, make_bars
+from . import test_cta_line_bar
+
+
+class TestCtaKlineStore(unittest.TestCase):
+
+    setting = test_cta_line_bar.TestCtaLineBar.setting
+    assert_same_value = test_cta_line_bar.TestCtaLineBar.assert_same_value
+    assert_same_state = test_cta_line_bar.TestCtaLineBar.assert_same_state
+
+    def setUp(self):
+        self.save_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.save_path, ignore_errors=True)
+
+    def make_kline(self):
+        return CtaLineBar(FakeStrategy(), lambda bar: None, dict(self.setting))
+
+    def test_save_load(self):
+        bars = make_bars(3000)
+        kline = self.make_kline()
+        for bar in bars[:2500]:
+            kline.add_bar(bar)
+
+        store = KlineStore(self.save_path, 'test')
+        self.assertEqual(store.save({'M1': kline}), len(kline.line_bar) - 1)
+
+        # 第二次保存只追加新完成的bar
+        for bar in bars[2500:2800]:
+            kline.add_bar(bar)
+        log_size = os.path.getsize(store.log_file)
+        self.assertEqual(store.save({'M1': kline}), 300)
+        self.assertGreater(os.path.getsize(store.log_file), log_size)
+
+        cache_kline = self.make_kline()
+        cache_store = KlineStore(self.save_path, 'test')
+        restored = cache_store.load({'M1': cache_kline, 'M5': self.make_kline()})
+        self.assertEqual(list(restored.keys()), ['M1'])
+        self.assert_same_state(cache_kline, kline)
+        self.assertEqual(cache_kline.line_bar, kline.line_bar)
+
+        # 恢复后继续推送bar，指标与不间断运行的K线一致
+        for bar in bars[2800:]:
+            kline.add_bar(bar)
+            cache_kline.add_bar(bar)
+        self.assert_same_state(cache_kline, kline)
+
+        # 恢复后的增量保存
+        self.assertEqual(cache_store.save({'M1': cache_kline}), 200)
+        reload_kline = self.make_kline()
+        KlineStore(self.save_path, 'test').load({'M1': reload_kline})
+        self.assertEqual(reload_kline.line_bar, kline.line_bar)
+
+    def test_snapshot(self):
+        kline = self.make_kline()
+        for bar in make_bars(1000):
+            kline.add_bar(bar)
+
+        data = kline.get_data()
+        klines = unpack_klines_snapshot(pack_klines_snapshot({'M1': kline.get_data()}))
+        snapshot = klines['M1']
+        self.assertEqual(snapshot['type'], data['type'])
+        self.assertEqual(snapshot['main_indicators'], data['main_indicators'])
+        self.assertEqual(snapshot['end_time'], data['end_time'])
+        pd.testing.assert_frame_equal(snapshot['data_frame'], pd.DataFrame(data['data_list']))
+
+
+if __name__ == '__main__':
+    unittest.main()
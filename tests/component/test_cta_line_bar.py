@@ -0,0 +1,213 @@
+"""
+Test if batch warm-up leaves CtaLineBar in the same state as bar-by-bar replay
+"""
+import unittest
+from enum import Enum
+
+import numpy as np
+import pandas as pd
+import talib as ta
+
+from vnpy.component.cta_line_bar import CtaLineBar
+from vnpy.component.cta_series import CtaSeries
+from vnpy.trader.constant import Interval
+
+from .test_cta_kernel import FakeStrategy, make_bars
+
+
+class TestCtaLineBar(unittest.TestCase):
+
+    setting = {
+        'name': 'M1',
+        'interval': Interval.SECOND,
+        'bar_interval': 60,
+        'price_tick': 0.5,
+        'para_pre_len': 20,
+        'para_ma1_len': 5,
+        'para_ma2_len': 10,
+        'para_ma3_len': 60,
+        'para_ema1_len': 7,
+        'para_ema2_len': 21,
+        'para_atr1_len': 10,
+        'para_rsi1_len': 7,
+        'para_rsi2_len': 14,
+        'para_boll_len': 20,
+        'para_boll2_tb_len': 26,
+        'para_kdj_len': 9,
+        'para_cci_len': 14,
+        'para_macd_fast_len': 12,
+        'para_macd_slow_len': 26,
+        'para_macd_signal_len': 9,
+        'para_golden_n': 60,
+        'para_bias_len': 6,
+        'para_active_area': True
+    }
+
+    def assert_same_value(self, name, value, expected):
+        if isinstance(value, CtaSeries):
+            self.assertEqual(len(value), len(expected), name)
+            np.testing.assert_allclose(value.values, expected.values, rtol=1e-12, atol=1e-9, err_msg=name)
+        elif isinstance(value, float):
+            if np.isnan(expected):
+                self.assertTrue(np.isnan(value), name)
+            else:
+                self.assertAlmostEqual(value, expected, delta=1e-9, msg=name)
+        elif isinstance(value, (list, tuple)):
+            self.assertEqual(len(value), len(expected), name)
+            for v, e in zip(value, expected):
+                self.assert_same_value(name, v, e)
+        elif hasattr(value, '__dict__') and not isinstance(value, Enum):
+            self.assertEqual(type(value), type(expected), name)
+            for key in value.__dict__:
+                self.assert_same_value(f'{name}.{key}', value.__dict__[key], expected.__dict__[key])
+        else:
+            self.assertEqual(value, expected, name)
+
+    def assert_same_state(self, kline, expected):
+        for key, value in expected.__dict__.items():
+            if key in ['strategy', 'kernels', 'indicator_pipeline']:
+                continue
+            self.assert_same_value(key, kline.__dict__[key], value)
+
+    def test_add_bars(self):
+        bars = make_bars(1200)
+        df = pd.DataFrame({
+            'datetime': [bar.datetime for bar in bars],
+            'open': [bar.open_price for bar in bars],
+            'high': [bar.high_price for bar in bars],
+            'low': [bar.low_price for bar in bars],
+            'close': [bar.close_price for bar in bars],
+            'volume': [bar.volume for bar in bars],
+            'open_interest': [bar.open_interest for bar in bars],
+            'trading_day': [bar.trading_day for bar in bars]
+        })
+
+        replay_kline = CtaLineBar(FakeStrategy(), None, dict(self.setting))
+        batch_kline = CtaLineBar(FakeStrategy(), None, dict(self.setting))
+        batch_kline.underly_symbol = replay_kline.underly_symbol = 'RB99'
+
+        for bar in batch_kline.df_to_bars(df[:1000]):
+            replay_kline.add_bar(bar, bar_is_completed=True)
+        batch_kline.add_bars(df[:1000])
+        self.assertIsNone(batch_kline.batch_kernels)
+        self.assertTrue(len(batch_kline.line_macd) > 0)
+        self.assert_same_state(batch_kline, replay_kline)
+
+        # 已有数据的K线，继续批量添加，再逐根添加
+        tail_bars = batch_kline.df_to_bars(df[1000:])
+        batch_kline.add_bars(tail_bars[:100])
+        for bar in tail_bars[100:]:
+            batch_kline.add_bar(bar, bar_is_completed=True)
+        for bar in tail_bars:
+            replay_kline.add_bar(bar, bar_is_completed=True)
+        self.assert_same_state(batch_kline, replay_kline)
+
+    def test_add_bars_check_open(self):
+        class OpenLineBar(CtaLineBar):
+            """只修改开盘价的子类"""
+
+            def on_bar(self, bar):
+                bar.open_price += 1
+                super().on_bar(bar)
+
+        logs = []
+        strategy = FakeStrategy()
+        strategy.write_log = logs.append
+        kline = OpenLineBar(strategy, None, dict(self.setting))
+        kline.underly_symbol = 'RB99'
+        kline.add_bars(make_bars(100))
+        self.assertTrue(any(u'批量预热数据与实际bar不一致' in log for log in logs))
+
+    def test_rt_indicators(self):
+        kline = CtaLineBar(FakeStrategy(), None, dict(self.setting))
+        kline.underly_symbol = 'RB99'
+        for bar in make_bars(300):
+            kline.add_bar(bar, bar_is_completed=True)
+
+        calls = []
+        rt_count_ma = kline.rt_count_ma
+
+        def count_ma():
+            calls.append(kline.cur_price)
+            rt_count_ma()
+        count_ma.__name__ = 'rt_count_ma'
+        kline.rt_count_ma = count_ma
+
+        closes = kline.close_array[1 - kline.para_ma1_len:]
+        ema_len = min(kline.para_ema1_len * 4, kline.para_ema1_len + 40)
+        for cur_price in [closes[-1], closes[-1] + 3, closes[-1] + 3, closes[-1] - 2.5]:
+            kline.cur_price = kline.line_bar[-1].close_price = cur_price
+            expected = np.append(closes, cur_price).mean()
+            self.assertAlmostEqual(kline.rt_ma1, expected, delta=1e-6)
+            ema = ta.EMA(np.append(kline.close_array[-ema_len:], cur_price), kline.para_ema1_len)[-1]
+            self.assertAlmostEqual(kline.rt_ema1, ema, delta=1e-6)
+
+        # 价格不变时，不重复计算
+        self.assertEqual(len(calls), 3)
+
+    def test_rt_base_indicators(self):
+        setting = dict(self.setting, para_bias2_len=12, para_bias3_len=24, para_active_yb=True,
+                       para_bd_len=9, para_active_skd=True)
+        kline = CtaLineBar(FakeStrategy(), None, setting)
+        kline.underly_symbol = 'RB99'
+        for bar in make_bars(300):
+            kline.add_bar(bar, bar_is_completed=True)
+
+        cur_bar = kline.line_bar[-1]
+        high, low = cur_bar.high_price, cur_bar.low_price
+        for cur_price in [low, high, (high + low) / 2, low + 0.5]:
+            kline.cur_price = cur_bar.close_price = cur_price
+
+            # 原有的完整窗口计算
+            tp = (np.append(kline.high_array[1 - kline.para_cci_len:], high)
+                  + np.append(kline.low_array[1 - kline.para_cci_len:], low)
+                  + np.append(kline.close_array[1 - kline.para_cci_len:], cur_price)) / 3
+            cci = (tp[-1] - tp.mean()) / (0.015 * np.abs(tp - tp.mean()).mean())
+            self.assertAlmostEqual(kline.rt_cci, cci, delta=1e-6)
+            cci_ema = pd.Series(np.append(kline.line_cci[-30:], cci))
+            for span in (3, 2, 2):
+                cci_ema = cci_ema.ewm(span=span, adjust=False).mean()
+            self.assertAlmostEqual(kline._rt_cci_ema, cci_ema.values[-1], delta=1e-6)
+
+            mid3 = (cur_price + high + low) / 3
+            yb = ta.EMA(np.append(kline.mid3_array[-kline.para_yb_len * 3:], mid3), kline.para_yb_len)[-1]
+            self.assertAlmostEqual(kline.rt_yb, round(yb, kline.round_n), delta=1e-6)
+
+            for name, para_len in [('rt_bias', 6), ('rt_bias2', 12), ('rt_bias3', 24)]:
+                m = np.append(kline.close_array[1 - para_len:], cur_price).mean()
+                self.assertAlmostEqual(getattr(kline, name), (cur_price - m) / m * 100, delta=1e-6)
+
+            mid4 = np.append(kline.mid4_array, round((cur_price * 2 + high + low) / 4, kline.round_n))
+            mid4_ema = pd.Series(mid4).ewm(span=kline.para_bd_len, adjust=False).mean().values
+            mid4_std = pd.Series(mid4).rolling(window=kline.para_bd_len).std().values
+            var5 = pd.Series(((mid4 - mid4_ema) / mid4_std * 100 + 200) / 4)
+            fast = ((var5.ewm(span=5, adjust=False).mean() - 25) * 1.56).ewm(span=2, adjust=False).mean() * 1.22
+            slow = fast.ewm(span=2, adjust=False).mean()
+            self.assertAlmostEqual(kline.rt_bd_fast, fast.values[-1], delta=1e-6)
+            self.assertAlmostEqual(kline.rt_bd_slow, slow.values[-1], delta=1e-6)
+
+            rsi_len = kline.para_skd_fast_len
+            rsi = ta.RSI(np.append(kline.close_array[1 - 2 * rsi_len:], cur_price), rsi_len)[-1]
+            rsi_list = kline.line_skd_rsi[1 - kline.para_skd_slow_len:] + [rsi]
+            sto = 100 * (rsi - min(rsi_list)) / (max(rsi_list) - min(rsi_list))
+            sk = ta.EMA(np.array(kline.line_skd_sto + [sto]), 5)[-1]
+            sd = ta.EMA(np.array(kline.line_sk + [round(sk, kline.round_n)]), 3)[-1]
+            self.assertAlmostEqual(kline.rt_sk, round(sk, kline.round_n), delta=1e-6)
+            self.assertAlmostEqual(kline.rt_sd, round(sd, kline.round_n), delta=1e-6)
+
+    def test_rt_skd_base(self):
+        # 历史STO只有4个时，以SMA为种子，不再是nan
+        kline = CtaLineBar(FakeStrategy(), None, dict(self.setting, para_active_skd=True))
+        for bar in make_bars(300):
+            kline.add_bar(bar, bar_is_completed=True)
+        kline.line_skd_sto = kline.line_skd_sto[-4:]
+        kline.line_sk = kline.line_sk[-2:]
+        base = kline._CtaLineBar__rt_skd_base()
+        pre_sto, k = base['sto_ema']
+        self.assertAlmostEqual(pre_sto + (50 - pre_sto) * k, ta.EMA(np.array(kline.line_skd_sto + [50.0]), 5)[-1])
+        pre_sk, k = base['sk_ema']
+        self.assertAlmostEqual(pre_sk + (50 - pre_sk) * k, ta.EMA(np.array(kline.line_sk + [50.0]), 3)[-1])
+
+
+if __name__ == '__main__':
+    unittest.main()
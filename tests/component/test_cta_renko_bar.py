@@ -0,0 +1,46 @@
+"""
+Test if renko bar real-time indicators match the full window calculation
+"""
+import unittest
+
+import numpy as np
+import talib as ta
+
+from vnpy.component.cta_renko_bar import CtaRenkoBar
+from vnpy.trader.object import RenkoBarData
+
+from .test_cta_kernel import FakeStrategy, make_bars
+
+
+class TestCtaRenkoBar(unittest.TestCase):
+
+    def test_rt_indicators(self):
+        setting = {'name': 'R1', 'para_cci_len': 14, 'para_active_yb': True, 'para_yb_len': 10}
+        renko = CtaRenkoBar(FakeStrategy(), lambda bar, name: None, setting)
+        for bar in make_bars(80):
+            renko.on_bar(RenkoBarData(gateway_name='', symbol=bar.symbol, exchange=bar.exchange,
+                                      datetime=bar.datetime, open_price=bar.open_price,
+                                      high_price=bar.high_price, low_price=bar.low_price,
+                                      close_price=bar.close_price, volume=bar.volume))
+
+        cur_bar = renko.cur_bar = renko.line_bar[-1]
+        for cur_price in [cur_bar.low_price, cur_bar.high_price, cur_bar.low_price + 0.5]:
+            cur_bar.close_price = cur_price
+            renko.runtime_recount()
+
+            n = renko.para_cci_len
+            cci = ta.CCI(np.append(renko.high_array[-2 * n:], cur_bar.high_price),
+                         np.append(renko.low_array[-2 * n:], cur_bar.low_price),
+                         np.append(renko.close_array[-2 * n:], cur_price), n)[-1]
+            self.assertAlmostEqual(renko.rt_cci, cci, delta=1e-6)
+
+            mid3 = (cur_price + cur_bar.high_price + cur_bar.low_price) / 3
+            yb = ta.EMA(np.append(renko.mid3_array[-renko.para_yb_len * 3:], mid3), renko.para_yb_len)[-1]
+            self.assertAlmostEqual(renko.rt_yb, round(yb, renko.round_n), delta=1e-6)
+
+        # 已完成bar的基础数据只计算一次
+        self.assertEqual({base[0] for base in renko.rt_bases.values()}, {renko.bar_num})
+
+
+if __name__ == '__main__':
+    unittest.main()
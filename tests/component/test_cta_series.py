@@ -0,0 +1,63 @@
+"""
+Test if CtaSeries ring buffer works fine
+"""
+import pickle
+import unittest
+
+import numpy as np
+
+from vnpy.component.cta_series import CtaSeries
+
+
+class TestCtaSeries(unittest.TestCase):
+
+    def test_append_and_index(self):
+        series = CtaSeries(5)
+        data = []
+        for i in range(12):
+            series.append(i)
+            data.append(float(i))
+            data = data[-5:]
+            self.assertEqual(len(series), len(data))
+            self.assertEqual(series[-1], data[-1])
+            self.assertEqual(series[0], data[0])
+            self.assertEqual(series[-3:], data[-3:])
+            self.assertEqual(series.values.tolist(), data)
+            self.assertTrue(series.values.flags['C_CONTIGUOUS'])
+
+    def test_fill(self):
+        series = CtaSeries(4, fill=np.nan)
+        self.assertEqual(len(series), 4)
+        series.append(1.5)
+        self.assertTrue(np.isnan(series.values[0]))
+        self.assertEqual(series.values[-1], 1.5)
+
+    def test_list_compatible(self):
+        series = CtaSeries(10, data=[1, 2, 3, 4])
+        series[-1] = 10
+        self.assertEqual(series[-1], 10)
+        for _ in range(10):
+            series.append(0)
+        series[0] = 7
+        self.assertEqual(series[0], 7)
+        self.assertEqual(series.values[0], 7)
+
+        series = CtaSeries(10, data=[1, 2, 3, 4])
+        del series[0]
+        self.assertEqual(series.tolist(), [2, 3, 4])
+        self.assertEqual(series.pop(0), 2)
+        self.assertEqual(series.pop(), 4)
+        self.assertEqual([0] + series, [0, 3])
+        self.assertEqual(series + [5], [3, 5])
+        self.assertEqual(list(series), [3])
+
+    def test_pickle(self):
+        series = CtaSeries(3, data=[1, 2, 3, 4])
+        other = pickle.loads(pickle.dumps(series))
+        self.assertEqual(other, series)
+        other.append(5)
+        self.assertEqual(other.tolist(), [3, 4, 5])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,3 @@
+from .test_mongo_write_buffer import *
+from .test_tdx_bar_store import *
+from .test_adjust_bar import *
@@ -0,0 +1,86 @@
+"""
+Test if stock bars are adjusted by ex-dividend date and the adjusted bar store is invalidated by its fingerprint
+"""
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from vnpy.data.stock.adjust_bar import AdjustBarStore, adjust_bar_df, calc_adjust_factor, get_adjust_records
+
+ADJ_LIST = [
+    {'dividOperateDate': '2020-03-03', 'foreAdjustFactor': 0.5, 'backAdjustFactor': 1.0},
+    {'dividOperateDate': '2020-03-05', 'foreAdjustFactor': 1.0, 'backAdjustFactor': 2.0},
+]
+
+
+def make_bars(index):
+    n = len(index)
+    return pd.DataFrame({'open': np.full(n, 10.0), 'high': np.full(n, 11.0), 'low': np.full(n, 9.0),
+                         'close': np.full(n, 10.0), 'volume': np.full(n, 100.0)},
+                        index=pd.DatetimeIndex(index, name='datetime'))
+
+
+class TestAdjustBar(unittest.TestCase):
+
+    def test_minute_bars(self):
+        adj_data = get_adjust_records(ADJ_LIST)
+        # 除权日没有 09:31 的K线，当天的K线仍使用新的因子
+        index = pd.to_datetime(['2020-03-02 14:55', '2020-03-03 09:35', '2020-03-03 09:40',
+                                '2020-03-04 09:35', '2020-03-05 09:35', '2020-03-05 15:00'])
+        fore = calc_adjust_factor(index, adj_data, 'fore')
+        self.assertTrue(np.isnan(fore[0]))
+        np.testing.assert_array_equal(fore[1:], [0.5, 0.5, 0.5, 1, 1])
+
+        back = calc_adjust_factor(index, adj_data, 'back')
+        np.testing.assert_array_equal(back[1:], [1, 1, 1, 2, 2])
+
+    def test_daily_bars(self):
+        # 日线时间为00:00，除权日当天即切换
+        adj_data = get_adjust_records(list(reversed(ADJ_LIST)))
+        index = pd.date_range('2020-03-02', '2020-03-06')
+        fore = calc_adjust_factor(index, adj_data, 'fore')
+        self.assertTrue(np.isnan(fore[0]))
+        np.testing.assert_array_equal(fore[1:], [0.5, 0.5, 1, 1])
+
+    def test_adjust_bar_df(self):
+        adj_data = get_adjust_records(ADJ_LIST)
+        df = adjust_bar_df(make_bars(pd.date_range('2020-03-03', periods=3)), adj_data, 'fore')
+        np.testing.assert_array_equal(df['adj'], [0.5, 0.5, 1])
+        np.testing.assert_array_equal(df['close'], [5, 5, 10])
+        np.testing.assert_array_equal(df['high'], [5.5, 5.5, 11])
+        np.testing.assert_array_equal(df['volume'], [200, 200, 100])
+
+    def test_store(self):
+        with tempfile.TemporaryDirectory() as folder:
+            bar_file = os.path.join(folder, '600000.csv')
+            raw = make_bars(pd.date_range('2020-03-03', periods=3))
+            raw.to_csv(bar_file)
+
+            store = AdjustBarStore(os.path.join(folder, 'adjust_bar'))
+            adj_data = get_adjust_records(ADJ_LIST[:1])
+            self.assertIsNone(store.load('600000.SSE', bar_file, adj_data, 'fore'))
+
+            df = adjust_bar_df(raw.copy(), adj_data, 'fore')
+            os.makedirs(store.cache_folder)
+            self.assertEqual(store.save('600000.SSE', bar_file, adj_data, 'fore', df), 3)
+            loaded = store.load('600000.SSE', bar_file, adj_data, 'fore')
+            self.assertEqual(list(loaded.index), list(df.index))
+            np.testing.assert_array_equal(loaded['close'], df['close'])
+
+            # 复权类型不同，使用不同的缓存
+            self.assertIsNone(store.load('600000.SSE', bar_file, adj_data, 'back'))
+
+            # 新增复权记录后失效
+            self.assertIsNone(store.load('600000.SSE', bar_file, get_adjust_records(ADJ_LIST), 'fore'))
+
+            # K线文件更新后失效
+            stat = os.stat(bar_file)
+            os.utime(bar_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+            self.assertIsNone(store.load('600000.SSE', bar_file, adj_data, 'fore'))
+
+
+if __name__ == '__main__':
+    unittest.main()
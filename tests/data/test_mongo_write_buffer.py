@@ -0,0 +1,105 @@
+"""
+Test if mongo write buffer coalesces upserts to the same result as one-by-one writes
+"""
+import random
+import unittest
+
+from vnpy.data.mongo.write_buffer import MongoWriteBuffer
+
+
+class FakeMongo(object):
+    """数据库替身：按过滤条件 upsert + $set"""
+
+    def __init__(self):
+        self.collections = {}
+        self.batches = []
+        self.fail = False
+        self.bad = set()  # 数据错误的记录(vt_orderid)
+
+    def update(self, db_name, col_name, flt, data):
+        docs = self.collections.setdefault((db_name, col_name), [])
+        for doc in docs:
+            if all(doc.get(k) == v for k, v in flt.items()):
+                doc.update(data)
+                return
+        doc = dict(flt)
+        doc.update(data)
+        docs.append(doc)
+
+    def bulk_update(self, db_name, col_name, updates):
+        if self.fail:
+            return False
+        for flt, data in updates:
+            if flt.get('vt_orderid') in self.bad:
+                raise ValueError('cannot encode object')
+        self.batches.append((db_name, col_name, len(updates)))
+        for flt, data in updates:
+            self.update(db_name, col_name, flt, data)
+        return True
+
+
+class TestMongoWriteBuffer(unittest.TestCase):
+
+    def test_coalesce(self):
+        rnd = random.Random(7)
+        direct = FakeMongo()
+        bulk = FakeMongo()
+        buffer = MongoWriteBuffer(writer=bulk.bulk_update, batch_size=50, flush_interval=3600)
+
+        for i in range(2000):
+            col_name = rnd.choice(['today_orders', 'today_trades'])
+            flt = {'account_id': 'A1', 'vt_orderid': f'O{rnd.randint(0, 40)}'}
+            data = {rnd.choice(['status', 'traded', 'price']): i}
+            direct.update('Account', col_name, flt, data)
+            buffer.put('Account', col_name, dict(reversed(list(flt.items()))), data)
+            if buffer.is_due():
+                buffer.flush()
+        buffer.flush()
+
+        self.assertEqual(bulk.collections, direct.collections)
+        self.assertLess(sum(count for _, _, count in bulk.batches), 2000)
+        self.assertTrue(all(count <= 50 for _, _, count in bulk.batches))
+
+        metrics = buffer.get_metrics()
+        self.assertEqual(metrics['pending'], 0)
+        self.assertEqual(metrics['put_count'], 2000)
+        self.assertEqual(metrics['put_count'], metrics['merge_count'] + metrics['write_count'])
+        self.assertEqual(metrics['flush']['count'], len(bulk.batches))
+
+    def test_retry(self):
+        mongo = FakeMongo()
+        buffer = MongoWriteBuffer(writer=mongo.bulk_update)
+        mongo.fail = True
+        buffer.put('Account', 'today_orders', {'vt_orderid': 'O1'}, {'status': 'submitting', 'price': 1})
+        self.assertFalse(buffer.flush()[0]['success'])
+        self.assertEqual(len(buffer), 1)
+
+        # 失败期间的新更新覆盖重试的字段
+        buffer.put('Account', 'today_orders', {'vt_orderid': 'O1'}, {'status': 'alltraded'})
+        mongo.fail = False
+        self.assertTrue(buffer.flush()[0]['success'])
+        self.assertEqual(mongo.collections[('Account', 'today_orders')],
+                         [{'vt_orderid': 'O1', 'status': 'alltraded', 'price': 1}])
+        self.assertEqual(buffer.get_metrics()['fail_count'], 1)
+
+    def test_bad_record(self):
+        mongo = FakeMongo()
+        mongo.bad = {'O3'}
+        buffer = MongoWriteBuffer(writer=mongo.bulk_update)
+        for i in range(8):
+            buffer.put('Account', 'today_orders', {'vt_orderid': f'O{i}'}, {'status': 'submitting'})
+
+        # 数据错误不重试：拆分批次，只丢弃坏记录
+        results = buffer.flush()
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(sum(r['dropped'] for r in results), 1)
+        self.assertEqual(sorted(d['vt_orderid'] for d in mongo.collections[('Account', 'today_orders')]),
+                         [f'O{i}' for i in range(8) if i != 3])
+        metrics = buffer.get_metrics()
+        self.assertEqual(metrics['drop_count'], 1)
+        self.assertEqual(metrics['write_count'], 7)
+        self.assertEqual(buffer.flush(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
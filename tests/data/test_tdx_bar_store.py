@@ -0,0 +1,89 @@
+"""
+Test if tdx bar store appends only new bars into monthly partitions and checkpoints resume a download task
+"""
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from vnpy.data.tdx.tdx_bar_store import DownloadCheckpoint, TdxBarStore
+
+
+def make_bars(start: datetime, count: int) -> pd.DataFrame:
+    index = pd.DatetimeIndex([start + timedelta(minutes=i) for i in range(count)])
+    return pd.DataFrame({'datetime': index, 'open': range(count), 'close': [float(i) for i in range(count)],
+                         'symbol': 'RB99'}, index=index)
+
+
+class TestTdxBarStore(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.root = self.folder.name
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def test_append(self):
+        store = TdxBarStore(self.root)
+        start = datetime(2020, 3, 31, 23, 0)
+        self.assertEqual(store.append('RB99', make_bars(start, 90)), 90)
+        self.assertEqual(list(store.get_partitions('RB99')), ['202003', '202004'])
+        self.assertEqual(store.get_last_dt('RB99'), start + timedelta(minutes=89))
+
+        # 重叠的数据只追加新的部分，已完成的月份不改写
+        march = store.get_partitions('RB99')['202003']
+        mtime = os.path.getmtime(march)
+        self.assertEqual(store.append('RB99', make_bars(start + timedelta(minutes=80), 20)), 10)
+        self.assertEqual(os.path.getmtime(march), mtime)
+
+        data = store.load('RB99')
+        self.assertEqual(len(data), 100)
+        self.assertTrue(data.index.is_monotonic_increasing)
+        self.assertEqual(list(data.columns), ['open', 'close', 'symbol'])
+        self.assertEqual(len(store.load('RB99', start_dt=datetime(2020, 4, 1))), 40)
+
+        # 导出为单一csv，再次导出只追加新数据
+        file_name = os.path.join(self.root, 'RB99_1m.csv')
+        self.assertEqual(store.export_csv('RB99', file_name), 100)
+        store.append('RB99', make_bars(start + timedelta(minutes=100), 5))
+        self.assertEqual(store.export_csv('RB99', file_name), 5)
+        self.assertEqual(len(pd.read_csv(file_name)), 105)
+
+        # 导入原有的csv
+        other = TdxBarStore(os.path.join(self.root, 'other'))
+        self.assertEqual(other.import_csv('RB99', file_name), 105)
+
+    def test_truncated_partition(self):
+        store = TdxBarStore(self.root)
+        start = datetime(2020, 3, 2, 9, 0)
+        store.append('RB99', make_bars(start, 10))
+        file_name = store.get_partitions('RB99')['202003']
+        # 模拟写入中断：最后一行不完整
+        with open(file_name, 'a', encoding='utf8') as f:
+            f.write('2020-03-02 09:1')
+        self.assertEqual(store.get_last_dt('RB99'), start + timedelta(minutes=9))
+
+        self.assertEqual(store.append('RB99', make_bars(start, 15)), 5)
+        self.assertEqual(len(store.load('RB99')), 15)
+
+    def test_checkpoint(self):
+        file_name = os.path.join(self.root, 'checkpoint.json')
+        checkpoint = DownloadCheckpoint(file_name, task='1min_20200302')
+        checkpoint.finish('RB99', datetime(2020, 3, 2, 15, 0))
+        checkpoint.fail('AG99', 'timeout')
+
+        # 同一任务，跳过已完成的合约
+        checkpoint = DownloadCheckpoint(file_name, task='1min_20200302')
+        self.assertEqual(checkpoint.get_pending(['RB99', 'AG99', 'CU99']), ['AG99', 'CU99'])
+        self.assertEqual(checkpoint.errors, {'AG99': 'timeout'})
+
+        # 新的任务重新开始
+        checkpoint = DownloadCheckpoint(file_name, task='1min_20200303')
+        self.assertEqual(checkpoint.get_pending(['RB99', 'AG99']), ['RB99', 'AG99'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,149 @@
+"""
+Test if sharded EventEngine keeps per-key order and coalesces stale ticks
+"""
+import contextlib
+import io
+import threading
+import time
+import unittest
+
+from vnpy.event import Event, EventEngine, EVENT_MONITOR, LatencyHistogram
+
+
+class FakeData:
+
+    def __init__(self, vt_symbol, value):
+        self.vt_symbol = vt_symbol
+        self.value = value
+
+
+class TestEventEngine(unittest.TestCase):
+
+    def run_engine(self, engine, events, wait_count):
+        received = []
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def handler(event):
+            with lock:
+                received.append((event.type, event.data.vt_symbol, event.data.value))
+                if len(received) >= wait_count:
+                    done.set()
+
+        for type_ in set(e.type for e in events):
+            engine.register(type_, handler)
+        engine.start()
+        try:
+            for event in events:
+                engine.put(event)
+            done.wait(5)
+            time.sleep(0.1)
+        finally:
+            engine.stop()
+        return received
+
+    def test_shard_order(self):
+        engine = EventEngine(interval=1, shards=4, coalesce_types=())
+        events = [Event('eOrder.', FakeData(f's{i % 10}', i)) for i in range(2000)]
+        received = self.run_engine(engine, events, len(events))
+
+        self.assertEqual(len(received), len(events))
+        for i in range(10):
+            values = [value for _, vt_symbol, value in received if vt_symbol == f's{i}']
+            self.assertEqual(values, list(range(i, 2000, 10)))
+        self.assertGreaterEqual(sum(s['put_count'] for s in engine.get_shard_stats()), 2000)
+
+    def test_coalesce_tick(self):
+        engine = EventEngine(interval=1, shards=2)
+        blocker = threading.Event()
+        engine.register('eBlock', lambda event: blocker.wait(5))
+
+        engine.start()
+        received = []
+        engine.register('eTick.', lambda event: received.append((event.data.vt_symbol, event.data.value)))
+        engine.register('eOrder.', lambda event: received.append(('order', event.data.value)))
+        try:
+            # 阻塞所有分片，tick在队列中积压
+            for i in range(8):
+                engine.put(Event('eBlock', FakeData(f'b{i}', 0)))
+            for i in range(100):
+                engine.put(Event('eTick.', FakeData('rb2010.SHFE', i)))
+            engine.put(Event('eOrder.', FakeData('rb2010.SHFE', -1)))
+            for i in range(100, 110):
+                engine.put(Event('eTick.', FakeData('rb2010.SHFE', i)))
+            blocker.set()
+            time.sleep(0.5)
+        finally:
+            engine.stop()
+
+        # 委托之前的tick合并为最新的一个，委托之后的tick不会越过委托
+        self.assertEqual(received, [('rb2010.SHFE', 99), ('order', -1), ('rb2010.SHFE', 109)])
+        self.assertEqual(sum(s['coalesced_count'] for s in engine.get_shard_stats()), 108)
+
+    def test_latency_histogram(self):
+        hist = LatencyHistogram()
+        for ns in [100] * 90 + [5000] * 9 + [1000000]:
+            hist.record(ns)
+        self.assertEqual(hist.count, 100)
+        self.assertEqual(hist.max, 1000000)
+        self.assertEqual(hist.percentile(50), 128)
+        self.assertEqual(hist.percentile(99), 8192)
+        self.assertEqual(hist.percentile(100), 1000000)
+
+    def test_monitor(self):
+        engine = EventEngine(interval=1, monitor=True, monitor_interval=1)
+        snapshots = []
+
+        def slow_handler(event):
+            time.sleep(0.002)
+
+        engine.register('eOrder.', slow_handler)
+        engine.register(EVENT_MONITOR, lambda event: snapshots.append(event.data))
+        engine.start()
+        try:
+            for i in range(20):
+                engine.put(Event('eOrder.', FakeData('s', i)))
+            time.sleep(1.5)
+        finally:
+            engine.stop()
+
+        stats = engine.get_monitor_stats(reset=True)
+        handler = [d for d in stats['handlers'] if d['type'] == 'eOrder.'][0]
+        self.assertEqual(handler['count'], 20)
+        self.assertTrue(handler['handler'].endswith('slow_handler'))
+        self.assertGreaterEqual(handler['mean_us'], 2000)
+        self.assertEqual(stats['waits']['eOrder.']['count'], 20)
+        self.assertEqual(stats['queues'][0]['name'], 'main')
+        self.assertGreater(stats['queues'][0]['max_depth'], 0)
+        self.assertTrue(len(snapshots) > 0)
+        self.assertEqual(engine.get_monitor_stats()['handlers'], [])
+
+    def test_monitor_debug(self):
+        received = []
+
+        def bad_handler(event):
+            if event.data.value % 2:
+                raise ValueError(event.data.value)
+
+        engine = EventEngine(interval=1, debug=True, monitor=True)
+        engine.register('eOrder.', bad_handler)
+        engine.register('eOrder.', lambda event: received.append(event.data.value))
+        with contextlib.redirect_stderr(io.StringIO()) as err:
+            for i in range(10):
+                engine._process_monitor(Event('eOrder.', FakeData('s', i)), engine._main_monitor, 0)
+
+        # 调试模式：打印异常，继续执行后续handler，仍记录耗时
+        self.assertEqual(received, list(range(10)))
+        self.assertEqual(err.getvalue().count('异常'), 5)
+        handler = [d for d in engine.get_monitor_stats()['handlers'] if d['handler'].endswith('bad_handler')][0]
+        self.assertEqual(handler['count'], 10)
+
+        engine = EventEngine(interval=1, monitor=True)
+        engine.register('eOrder.', bad_handler)
+        self.assertRaises(ValueError, engine._process_monitor, Event('eOrder.', FakeData('s', 1)),
+                          engine._main_monitor, 0)
+        self.assertEqual(engine.get_monitor_stats()['handlers'][0]['count'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
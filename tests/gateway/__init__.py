@@ -0,0 +1,2 @@
+from .test_ctp_tick import *
+from .test_rpc_gateway import *
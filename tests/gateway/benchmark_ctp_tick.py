@@ -0,0 +1,135 @@
+"""
+Benchmark of CtpMdApi.onRtnDepthMarketData tick construction: strptime path vs CtpTickNormalizer
+
+python benchmark_ctp_tick.py [合约数量] [每个合约的tick数量]
+"""
+import sys
+import time
+from datetime import datetime
+
+from vnpy.gateway.ctp_tick import CtpTickNormalizer, set_depth
+from vnpy.trader.constant import Exchange
+from vnpy.trader.object import TickData
+from vnpy.trader.utility import get_trading_date
+
+MAX_FLOAT = sys.float_info.max
+
+
+def adjust_price(price: float) -> float:
+    if price == MAX_FLOAT:
+        price = 0
+    return price
+
+
+def make_datas(symbol_count: int, tick_count: int) -> list:
+    """全市场行情：每500毫秒所有合约各一个tick，一半合约只有1档行情"""
+    datas = []
+    for n in range(tick_count):
+        seconds = 9 * 3600 + n // 2
+        update_time = f'{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
+        for i in range(symbol_count):
+            data = {'InstrumentID': f'rb{i}', 'UpdateTime': update_time, 'UpdateMillisec': 500 * (n % 2),
+                    'TradingDay': '20200302', 'ActionDay': '20200302', 'Volume': n, 'OpenInterest': 1000,
+                    'LastPrice': 3500.0, 'UpperLimitPrice': 3800.0, 'LowerLimitPrice': 3200.0,
+                    'OpenPrice': 3490.0, 'HighestPrice': 3510.0, 'LowestPrice': 3480.0, 'PreClosePrice': 3495.0}
+            depth = i % 2 == 0
+            for level in range(1, 6):
+                has_level = level == 1 or depth
+                data[f'BidPrice{level}'] = 3500.0 - level if has_level else MAX_FLOAT
+                data[f'AskPrice{level}'] = 3500.0 + level if has_level else MAX_FLOAT
+                data[f'BidVolume{level}'] = level if has_level else 0
+                data[f'AskVolume{level}'] = level if has_level else 0
+            datas.append(data)
+    return datas
+
+
+def old_tick(data: dict) -> TickData:
+    """原来的处理方式"""
+    symbol = data["InstrumentID"]
+    dt = datetime.now()
+    s_date = dt.strftime('%Y-%m-%d')
+    timestamp = f"{s_date} {data['UpdateTime']}.{int(data['UpdateMillisec'] / 100)}"
+    dt = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S.%f")
+    if dt.hour in [8, 20] and dt.minute < 59:
+        return None
+
+    tick = TickData(
+        symbol=symbol, exchange=Exchange.SHFE, datetime=dt, date=s_date,
+        time=dt.strftime('%H:%M:%S.%f'), trading_day=get_trading_date(dt), name=symbol,
+        volume=data["Volume"], open_interest=data["OpenInterest"], last_price=data["LastPrice"],
+        limit_up=data["UpperLimitPrice"], limit_down=data["LowerLimitPrice"],
+        open_price=adjust_price(data["OpenPrice"]), high_price=adjust_price(data["HighestPrice"]),
+        low_price=adjust_price(data["LowestPrice"]), pre_close=adjust_price(data["PreClosePrice"]),
+        bid_price_1=adjust_price(data["BidPrice1"]), ask_price_1=adjust_price(data["AskPrice1"]),
+        bid_volume_1=data["BidVolume1"], ask_volume_1=data["AskVolume1"], gateway_name='CTP'
+    )
+    if data["BidVolume2"] or data["AskVolume2"]:
+        for level in range(2, 6):
+            setattr(tick, f'bid_price_{level}', adjust_price(data[f"BidPrice{level}"]))
+            setattr(tick, f'ask_price_{level}', adjust_price(data[f"AskPrice{level}"]))
+            setattr(tick, f'bid_volume_{level}', adjust_price(data[f"BidVolume{level}"]))
+            setattr(tick, f'ask_volume_{level}', adjust_price(data[f"AskVolume{level}"]))
+    return tick
+
+
+def make_new_tick():
+    normalizer = CtpTickNormalizer()
+
+    def new_tick(data: dict) -> TickData:
+        """CtpTickNormalizer的处理方式"""
+        symbol = data["InstrumentID"]
+        dt, s_date, s_time, trading_day = normalizer.get_datetime(data)
+        if dt.hour in [8, 20] and dt.minute < 59:
+            return None
+
+        tick = TickData(
+            symbol=symbol, exchange=Exchange.SHFE, datetime=dt, date=s_date,
+            time=s_time, trading_day=trading_day, name=symbol,
+            volume=data["Volume"], open_interest=data["OpenInterest"], last_price=data["LastPrice"],
+            limit_up=data["UpperLimitPrice"], limit_down=data["LowerLimitPrice"],
+            open_price=adjust_price(data["OpenPrice"]), high_price=adjust_price(data["HighestPrice"]),
+            low_price=adjust_price(data["LowestPrice"]), pre_close=adjust_price(data["PreClosePrice"]),
+            bid_price_1=adjust_price(data["BidPrice1"]), ask_price_1=adjust_price(data["AskPrice1"]),
+            bid_volume_1=data["BidVolume1"], ask_volume_1=data["AskVolume1"], gateway_name='CTP'
+        )
+        set_depth(tick, data)
+        return tick
+
+    return new_tick
+
+
+def bench(func, datas: list) -> float:
+    """微秒/个"""
+    start = time.perf_counter()
+    for data in datas:
+        func(data)
+    return (time.perf_counter() - start) / len(datas) * 1e6
+
+
+def bench_timestamp(datas: list):
+    """只比较时间处理部分"""
+    def old(data):
+        dt = datetime.now()
+        s_date = dt.strftime('%Y-%m-%d')
+        timestamp = f"{s_date} {data['UpdateTime']}.{int(data['UpdateMillisec'] / 100)}"
+        dt = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S.%f")
+        return dt, s_date, dt.strftime('%H:%M:%S.%f'), get_trading_date(dt)
+
+    return bench(old, datas), bench(CtpTickNormalizer().get_datetime, datas)
+
+
+def main(symbol_count: int = 1000, tick_count: int = 20):
+    datas = make_datas(symbol_count, tick_count)
+    print(f'{symbol_count}个合约 x {tick_count}个tick')
+
+    old_ts, new_ts = bench_timestamp(datas)
+    print(f'时间处理: 原方式 {old_ts:.2f}us, CtpTickNormalizer {new_ts:.2f}us, {old_ts / new_ts:.1f}倍')
+
+    new_tick = make_new_tick()
+    old_us = bench(old_tick, datas)
+    new_us = bench(new_tick, datas)
+    print(f'生成tick: 原方式 {old_us:.2f}us, 新方式 {new_us:.2f}us, {old_us / new_us:.1f}倍')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
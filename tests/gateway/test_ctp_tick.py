@@ -0,0 +1,63 @@
+"""
+Test if ctp tick normalizer gives the same timestamps as the strptime path and skips empty depth levels
+"""
+import random
+import sys
+import unittest
+from datetime import datetime
+
+from vnpy.gateway.ctp_tick import CtpTickNormalizer, set_depth
+from vnpy.trader.constant import Exchange
+from vnpy.trader.object import TickData
+from vnpy.trader.utility import get_trading_date
+
+MAX_FLOAT = sys.float_info.max
+
+
+def make_data(update_time: str, millisec: int, day: str = '20200302') -> dict:
+    data = {'InstrumentID': 'rb2005', 'TradingDay': day, 'ActionDay': day,
+            'UpdateTime': update_time, 'UpdateMillisec': millisec}
+    for i in range(1, 6):
+        data[f'BidPrice{i}'] = 3500.0 - i
+        data[f'AskPrice{i}'] = 3500.0 + i
+        data[f'BidVolume{i}'] = i
+        data[f'AskVolume{i}'] = i
+    return data
+
+
+class TestCtpTick(unittest.TestCase):
+
+    def test_datetime(self):
+        random.seed(0)
+        normalizers = [CtpTickNormalizer(), CtpTickNormalizer('ActionDay'), CtpTickNormalizer('TradingDay', cache_size=50)]
+        for _ in range(2000):
+            day = random.choice(['20200228', '20200229', '20200302'])
+            update_time = f'{random.randint(0, 23):02d}:{random.randint(0, 59):02d}:{random.randint(0, 59):02d}'
+            data = make_data(update_time, random.choice([0, 99, 100, 500, 999]), day)
+            for normalizer in normalizers:
+                s_date = normalizer.get_local_date() if normalizer.date_field is None else day
+                # 原来的方式
+                timestamp = f"{s_date} {data['UpdateTime']}.{int(data['UpdateMillisec'] / 100)}"
+                dt = datetime.strptime(timestamp, "%Y%m%d %H:%M:%S.%f")
+                trading_day = dt.strftime('%Y-%m-%d') if normalizer.date_field == 'TradingDay' \
+                    else get_trading_date(dt)
+                self.assertEqual(normalizer.get_datetime(data),
+                                 (dt, dt.strftime('%Y-%m-%d'), dt.strftime('%H:%M:%S.%f'), trading_day))
+            self.assertLessEqual(len(normalizers[2].cache), 50)
+
+        self.assertEqual(CtpTickNormalizer().get_local_date(), datetime.now().strftime('%Y%m%d'))
+
+    def test_depth(self):
+        data = make_data('09:30:00', 0)
+        data['BidVolume4'] = data['BidVolume5'] = 0
+        data['BidPrice4'] = data['BidPrice5'] = MAX_FLOAT
+        data['AskPrice3'] = MAX_FLOAT
+        tick = TickData(gateway_name='CTP', symbol='rb2005', exchange=Exchange.SHFE, datetime=datetime.now())
+        set_depth(tick, data)
+        self.assertEqual((tick.bid_price_3, tick.bid_price_4, tick.bid_price_5), (3497.0, 0, 0))
+        self.assertEqual((tick.bid_volume_3, tick.bid_volume_4), (3, 0))
+        self.assertEqual((tick.ask_price_3, tick.ask_price_5, tick.ask_volume_5), (0, 3505.0, 5))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+Test if rpc gateway forwards each trade once across sequence gaps and resync queries
+"""
+import unittest
+from unittest import mock
+
+from vnpy.event import Event
+from vnpy.gateway.rpc import rpc_gateway
+from vnpy.trader.constant import Exchange
+from vnpy.trader.event import EVENT_TRADE
+from vnpy.trader.object import TradeData
+
+
+class FakeEventEngine:
+
+    def __init__(self):
+        self.events = []
+
+    def put(self, event):
+        self.events.append(event)
+
+    def register(self, type, handler):
+        pass
+
+    def unregister(self, type, handler):
+        pass
+
+
+class FakeRpcClient:
+    """rpc客户端替身：查询返回服务端的成交"""
+
+    def __init__(self):
+        self.trades = []
+        self.topics = []
+
+    def subscribe_topic(self, topic, market=False):
+        self.topics.append(topic)
+
+    def start(self, req_address, pub_address):
+        pass
+
+    def get_all_contracts(self):
+        return []
+
+    def get_all_accounts(self):
+        return []
+
+    def get_all_positions(self):
+        return []
+
+    def get_all_orders(self):
+        return []
+
+    def get_all_trades(self):
+        return list(self.trades)
+
+
+def make_trade(tradeid):
+    return TradeData(gateway_name='CTP', symbol='rb2005', exchange=Exchange.SHFE,
+                     orderid='1', tradeid=tradeid, volume=1)
+
+
+class TestRpcGateway(unittest.TestCase):
+
+    def setUp(self):
+        self.event_engine = FakeEventEngine()
+        # 不创建日志文件
+        with mock.patch.object(rpc_gateway, 'RpcClient', FakeRpcClient), \
+                mock.patch.object(rpc_gateway.RpcGateway, 'create_logger', lambda gateway: None):
+            self.gateway = rpc_gateway.RpcGateway(self.event_engine)
+        self.server_trades = self.gateway.client.trades
+
+    def push_trade(self, tradeid):
+        self.server_trades.append(make_trade(tradeid))
+        self.gateway.client_callback(EVENT_TRADE, Event(EVENT_TRADE, make_trade(tradeid)))
+
+    def test_trade_dedup(self):
+        self.push_trade('T1')
+
+        # 推送丢失：T2、T3 只在服务端，重新查询时补发
+        self.server_trades.extend([make_trade('T2'), make_trade('T3')])
+        self.gateway.client_sequence_gap(EVENT_TRADE, 2)
+        self.gateway.process_timer_event(Event('eTimer'))
+        self.assertFalse(self.gateway.resync_needed)
+
+        # 晚到的推送不再重复，新的成交正常推送
+        self.gateway.client_callback(EVENT_TRADE, Event(EVENT_TRADE, make_trade('T3')))
+        self.push_trade('T4')
+
+        trades = [event.data for event in self.event_engine.events if event.type == EVENT_TRADE]
+        self.assertEqual([trade.tradeid for trade in trades], ['T1', 'T2', 'T3', 'T4'])
+        self.assertTrue(all(trade.gateway_name == 'RPC' for trade in trades))
+
+    def test_subscribe(self):
+        # 缺省订阅全部推送，服务端的其他事件照常转发
+        setting = {"主动请求地址": "tcp://127.0.0.1:2014", "推送订阅地址": "tcp://127.0.0.1:4102"}
+        self.gateway.connect(setting)
+        self.assertEqual(self.gateway.client.topics, [""])
+
+        self.gateway.client.topics.clear()
+        self.gateway.connect(dict(setting, 订阅全部推送="否"))
+        self.assertEqual(self.gateway.client.topics, rpc_gateway.SUBSCRIBE_TOPICS)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,2 @@
+from .test_vectorized_pricing import *
+from .test_recalc_scheduler import *
@@ -0,0 +1,48 @@
+"""
+Benchmark of option chain pricing: scalar modules per option vs vectorized chain
+
+python benchmark_option_chain.py [行权价数量] [标的tick数量]
+"""
+import sys
+import time
+
+from vnpy.app.option_master.pricing import black_76, black_scholes, vectorized
+
+from test_vectorized_pricing import make_portfolio, make_tick
+
+
+def run(pricing_model, strike_count: int, tick_count: int, vector: bool) -> float:
+    """标的行情推送(期权链重新计算)的平均耗时(毫秒)"""
+    s = 3000.0
+    strikes = [2000 + 2000 * i // strike_count for i in range(strike_count)]
+    portfolio, chain, underlying = make_portfolio(strikes, pricing_model)
+    portfolio.calculate_atm_price()
+    if not vector:
+        chain.vector_model = ''
+
+    model = vectorized.get_model_name(pricing_model)
+    for option in chain.options.values():
+        vol = 0.2 + abs(option.strike_price - s) / 10000
+        args = (s, option.strike_price, 0.03, option.time_to_expiry)
+        bid = float(vectorized.calculate_price(*args, vol - 0.005, option.option_type, model))
+        ask = float(vectorized.calculate_price(*args, vol + 0.005, option.option_type, model))
+        option.update_tick(make_tick(option.vt_symbol, bid, ask))
+
+    start = time.perf_counter()
+    for i in range(tick_count):
+        price = s + (i % 10 - 5) * 0.2
+        portfolio.update_tick(make_tick(underlying.vt_symbol, price - 0.2, price + 0.2))
+    return (time.perf_counter() - start) / tick_count * 1000
+
+
+def main(strike_count: int = 40, tick_count: int = 20):
+    print(f'期权链: {strike_count}个行权价, {strike_count * 2}个期权')
+    for name, model in [('Black-76', black_76), ('Black-Scholes', black_scholes)]:
+        scalar_ms = run(model, strike_count, tick_count, vector=False)
+        vector_ms = run(model, strike_count, tick_count * 10, vector=True)
+        print(f'{name:<14}: 标量 {scalar_ms:.2f} 毫秒/次, 向量化 {vector_ms:.2f} 毫秒/次, '
+              f'{scalar_ms / vector_ms:.0f}倍')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,120 @@
+"""
+Test if deferred (throttled) portfolio recalculation gives the same results as per-tick calculation
+"""
+import unittest
+
+import numpy as np
+
+from vnpy.app.option_master.engine import RecalcScheduler
+from vnpy.app.option_master.pricing import black_76, black_scholes
+
+from .test_vectorized_pricing import make_portfolio, make_tick
+
+STRIKES = [2800, 2900, 3000, 3100, 3200]
+FIELDS = ['ask_impv', 'bid_impv', 'mid_impv', 'theo_delta', 'theo_gamma', 'theo_vega',
+          'pos_delta', 'underlying_adjustment']
+
+
+def make_ticks(rng, portfolio, underlying, count):
+    """标的、期权行情随机交替"""
+    vt_symbols = list(portfolio.options)
+    ticks = []
+    for i in range(count):
+        if i % 4 == 0:
+            price = 3000 + rng.uniform(-50, 50)
+            ticks.append(make_tick(underlying.vt_symbol, price - 0.2, price + 0.2))
+        else:
+            vt_symbol = vt_symbols[rng.integers(len(vt_symbols))]
+            option = portfolio.options[vt_symbol]
+            value = max(option.option_type * (3000 - option.strike_price), 0) + rng.uniform(20, 80)
+            ticks.append(make_tick(vt_symbol, value - 0.4, value + 0.4))
+    return ticks
+
+
+def snapshot(portfolio):
+    values = []
+    for option in portfolio.options.values():
+        values.extend(getattr(option, name) for name in FIELDS)
+    values.append(portfolio.pos_delta)
+    return values
+
+
+class TestRecalcScheduler(unittest.TestCase):
+
+    def test_deferred_matches_immediate(self):
+        """
+        批量计算的结果 = 逐个计算每个合约的最新行情(期权在前、标的在后)
+        (逐个计算时，期权行情不更新理论希腊值，结果与行情顺序有关)
+        """
+        for pricing_model in [black_76, black_scholes]:
+            immediate = make_portfolio(STRIKES, pricing_model)[0]
+            deferred, _, underlying = make_portfolio(STRIKES, pricing_model)
+            for portfolio in [immediate, deferred]:
+                for i, option in enumerate(portfolio.options.values()):
+                    option.net_pos = i % 3 - 1
+            deferred.deferred = True
+
+            latest = {}
+            ticks = make_ticks(np.random.default_rng(5), deferred, underlying, 400)
+            for i, tick in enumerate(ticks):
+                deferred.update_tick(tick)
+                latest[tick.vt_symbol] = tick
+                if i % 7 != 6:
+                    continue
+
+                tick = latest.pop(underlying.vt_symbol, None)
+                for option_tick in latest.values():
+                    immediate.update_tick(option_tick)
+                if tick:
+                    immediate.update_tick(tick)
+                latest.clear()
+
+                self.assertTrue(deferred.is_dirty())
+                deferred.recalculate()
+                if i == 6:
+                    # 平值行权价(定时计算)确定后，标的调整值不为0
+                    immediate.calculate_atm_price()
+                    deferred.calculate_atm_price()
+                self.assertFalse(deferred.is_dirty())
+                np.testing.assert_allclose(snapshot(deferred), snapshot(immediate), atol=1e-9)
+
+            self.assertTrue(all(o.underlying_adjustment for o in deferred.options.values()))
+
+    def test_scheduler_metrics(self):
+        portfolio, _, underlying = make_portfolio(STRIKES, black_76)
+        scheduler = RecalcScheduler(interval=3600)
+        scheduler.add_portfolio(portfolio)
+        self.assertTrue(portfolio.deferred)
+
+        ticks = make_ticks(np.random.default_rng(6), portfolio, underlying, 100)
+        for tick in ticks:
+            scheduler.update_tick(portfolio, tick)
+
+        # 第一个行情立即计算，间隔内的全部合并
+        metrics = scheduler.get_metrics()
+        self.assertEqual(metrics['tick_count'], 100)
+        self.assertEqual(metrics['recalc_count'], 1)
+        self.assertEqual(metrics['skip_count'], 99)
+        self.assertTrue(portfolio.is_dirty())
+
+        # 定时器同样遵守间隔
+        scheduler.flush_all()
+        self.assertEqual(scheduler.recalc_count, 1)
+        self.assertTrue(portfolio.is_dirty())
+
+        scheduler.last_times[portfolio.name] -= 3600
+        scheduler.flush_all()
+        self.assertEqual(scheduler.recalc_count, 2)
+        self.assertFalse(portfolio.is_dirty())
+        scheduler.flush(portfolio)
+        self.assertEqual(scheduler.recalc_count, 2)
+
+        # 间隔改为0：恢复逐个行情计算
+        scheduler.set_interval(0)
+        self.assertFalse(portfolio.deferred)
+        scheduler.update_tick(portfolio, ticks[0])
+        self.assertEqual((scheduler.recalc_count, scheduler.skip_count), (3, 99))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+Test if vectorized option chain pricing matches the scalar pricing modules
+"""
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from vnpy.app.option_master.base import PortfolioData
+from vnpy.app.option_master.pricing import binomial_tree, black_scholes, black_76, vectorized
+from vnpy.trader.constant import Exchange, OptionType, Product
+from vnpy.trader.object import ContractData, TickData
+
+
+def make_portfolio(strikes, pricing_model, expiry_days=60):
+    """一个期权链：标的 + 各行权价的认购、认沽"""
+    underlying = ContractData(gateway_name='TEST', symbol='IF2012', exchange=Exchange.CFFEX, name='IF2012',
+                              product=Product.FUTURES, size=300, pricetick=0.2)
+    portfolio = PortfolioData('IO')
+    expiry = datetime.now() + timedelta(days=expiry_days)
+    for strike in strikes:
+        for option_type, flag in [(OptionType.CALL, 'C'), (OptionType.PUT, 'P')]:
+            contract = ContractData(gateway_name='TEST', symbol=f'IO2012-{flag}-{strike}', exchange=Exchange.CFFEX,
+                                    name='', product=Product.OPTION, size=100, pricetick=0.2,
+                                    option_strike=strike, option_underlying='IO2012', option_type=option_type,
+                                    option_expiry=expiry)
+            contract.option_index = str(strike)
+            portfolio.add_option(contract)
+    chain_symbol = 'IO2012.CFFEX'
+    portfolio.set_chain_underlying(chain_symbol, underlying)
+    portfolio.set_interest_rate(0.03)
+    portfolio.set_pricing_model(pricing_model)
+    return portfolio, portfolio.chains[chain_symbol], underlying
+
+
+def make_tick(vt_symbol, bid, ask):
+    symbol, exchange = vt_symbol.split('.')
+    return TickData(gateway_name='TEST', symbol=symbol, exchange=Exchange(exchange), datetime=datetime.now(),
+                    bid_price_1=bid, ask_price_1=ask, last_price=(bid + ask) / 2)
+
+
+class TestVectorizedPricing(unittest.TestCase):
+
+    def test_greeks_and_impv(self):
+        rng = np.random.default_rng(1)
+        n = 200
+        s = np.full(n, 3000.0)
+        k = rng.uniform(2400, 3600, n)
+        r = np.full(n, 0.03)
+        t = rng.uniform(0.02, 1, n)
+        v = rng.uniform(0.1, 0.6, n)
+        cp = rng.choice([1.0, -1.0], n)
+
+        for model, module in [(vectorized.BLACK_SCHOLES, black_scholes), (vectorized.BLACK_76, black_76)]:
+            self.assertEqual(vectorized.get_model_name(module), model)
+            greeks = vectorized.calculate_greeks(s, k, r, t, v, cp, model)
+            for i in range(0, n, 20):
+                expected = module.calculate_greeks(s[i], k[i], r[i], t[i], v[i], int(cp[i]))
+                np.testing.assert_allclose([g[i] for g in greeks], expected, rtol=1e-9, atol=1e-9)
+
+            # 由价格反推波动率，冷启动与热启动一致
+            impv = vectorized.calculate_impv(greeks[0], s, k, r, t, cp, model)
+            np.testing.assert_allclose(impv, np.round(v, 4), atol=2e-4)
+            warm = vectorized.calculate_impv(greeks[0], s, k, r, t, cp, model, init_v=v + 0.01)
+            np.testing.assert_allclose(warm, impv, atol=1e-4)
+
+        # 无效价格：非正、低于内在价值、到期
+        impv = vectorized.calculate_impv([0, 50, 100, 200], 3000, [3000, 2800, 3000, 3000], 0.03,
+                                         [0.2, 0.2, 0, 0.2], [1, 1, 1, -1])
+        self.assertEqual(impv[:3].tolist(), [0, 0, 0])
+        self.assertGreater(impv[3], 0)
+        self.assertEqual(vectorized.get_model_name(binomial_tree), '')
+
+    def test_chain_update(self):
+        strikes = list(range(2600, 3450, 50))
+        portfolio, chain, underlying = make_portfolio(strikes, black_scholes)
+        self.assertEqual(chain.vector_model, vectorized.BLACK_SCHOLES)
+        s = 3010.0
+
+        vols = {}
+        for option in chain.options.values():
+            vol = 0.2 + abs(option.strike_price - s) / 5000
+            vols[option.vt_symbol] = vol
+            args = (s, option.strike_price, 0.03, option.time_to_expiry)
+            bid = vectorized.calculate_price(*args, vol - 0.01, option.option_type, vectorized.BLACK_SCHOLES)
+            ask = vectorized.calculate_price(*args, vol + 0.01, option.option_type, vectorized.BLACK_SCHOLES)
+            option.tick = make_tick(option.vt_symbol, float(bid), float(ask))
+            option.mid_price = float(bid + ask) / 2
+            option.net_pos = 2
+
+        portfolio.calculate_atm_price = lambda: None
+        portfolio.update_tick(make_tick(underlying.vt_symbol, s - 0.2, s + 0.2))
+
+        for option in chain.options.values():
+            vol = vols[option.vt_symbol]
+            self.assertAlmostEqual(option.bid_impv, round(vol - 0.01, 4), places=3)
+            self.assertAlmostEqual(option.ask_impv, round(vol + 0.01, 4), places=3)
+            _, delta, gamma, theta, vega = black_scholes.calculate_greeks(
+                s, option.strike_price, 0.03, option.time_to_expiry, option.mid_impv, option.option_type)
+            self.assertAlmostEqual(option.theo_delta, delta * 100, places=6)
+            self.assertAlmostEqual(option.theo_vega, vega * 100, places=6)
+            self.assertAlmostEqual(option.pos_gamma, gamma * 100 * 2, places=6)
+            self.assertAlmostEqual(option.theo_theta, theta * 100, places=6)
+        self.assertAlmostEqual(chain.pos_delta, sum(o.pos_delta for o in chain.options.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,2 @@
+from .test_rpc_codec import *
+from .test_rpc_publisher import *
@@ -0,0 +1,127 @@
+"""
+Benchmark of rpc codecs: encode/decode cost, message size, and pub/sub throughput/latency
+
+python benchmark_rpc_codec.py [tick数量]
+"""
+import socket
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+from vnpy.event import Event, LatencyHistogram
+from vnpy.rpc import RpcClient, RpcServer
+from vnpy.rpc.codec import CODECS, decode
+from vnpy.trader.constant import Exchange
+from vnpy.trader.object import TickData
+
+
+def make_events(count: int, symbol_count: int = 100) -> list:
+    start = datetime(2020, 3, 2, 9, 0, 0)
+    events = []
+    for i in range(count):
+        dt = start + timedelta(milliseconds=500 * (i // symbol_count))
+        price = 3500.0 + i % 17
+        tick = TickData(gateway_name='CTP', symbol=f'rb{2000 + i % symbol_count}', exchange=Exchange.SHFE,
+                        datetime=dt, date=dt.strftime('%Y-%m-%d'), time=dt.strftime('%H:%M:%S.%f'),
+                        trading_day='2020-03-02', volume=10 * i, open_interest=1000 + i,
+                        last_price=price, bid_price_1=price - 1, ask_price_1=price + 1,
+                        bid_volume_1=5, ask_volume_1=7)
+        events.append(Event('eTick.', tick))
+    return events
+
+
+def get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def bench_codec(codec, events: list):
+    """编码/解码耗时(微秒/个)，平均消息字节数"""
+    start = time.perf_counter()
+    messages = [codec.encode(event) for event in events]
+    encode_us = (time.perf_counter() - start) / len(events) * 1e6
+
+    start = time.perf_counter()
+    for msg in messages:
+        decode(msg)
+    decode_us = (time.perf_counter() - start) / len(events) * 1e6
+
+    size = sum(len(msg) for msg in messages) / len(messages)
+    return encode_us, decode_us, size
+
+
+def bench_pub_sub(codec_name: str, events: list, subscribe_all: bool):
+    """
+    RpcServer推送 => RpcClient接收
+    subscribe_all: True 订阅全部合约，False 只订阅其中一个合约
+    """
+    rep_address = f'tcp://127.0.0.1:{get_free_port()}'
+    pub_address = f'tcp://127.0.0.1:{get_free_port()}'
+    server = RpcServer(codec_name)
+
+    symbol = events[0].data.vt_symbol
+    expected = len(events) if subscribe_all else sum(1 for e in events if e.data.vt_symbol == symbol)
+    latency = LatencyHistogram()
+    received = [0]
+    ready = threading.Event()
+    done = threading.Event()
+
+    def callback(topic, event):
+        if topic == 'ready':
+            ready.set()
+            return
+        latency.record(time.perf_counter_ns() - event.data.open_interest)
+        received[0] += 1
+        if received[0] >= expected:
+            done.set()
+
+    client = RpcClient()
+    client.callback = callback
+    client.subscribe_topic('ready')
+    client.subscribe_topic('eTick.' if subscribe_all else 'eTick.' + symbol)
+
+    server.start(rep_address, pub_address)
+    client.start(rep_address, pub_address)
+    try:
+        while not ready.is_set():
+            server.publish('ready', None)
+            ready.wait(0.1)
+
+        start = time.perf_counter()
+        for event in events:
+            # 借用 open_interest 字段记录发送时间
+            event.data.open_interest = time.perf_counter_ns()
+            server.publish(event.type + event.data.vt_symbol, event)
+        publish_seconds = time.perf_counter() - start
+        done.wait(60)
+        seconds = time.perf_counter() - start
+    finally:
+        client.stop()
+        server.stop()
+        client.join()
+        server.join()
+
+    return publish_seconds, seconds, received[0], latency
+
+
+def main(count: int = 20000):
+    events = make_events(count)
+    print(f'{count}个tick')
+
+    for name, codec in CODECS.items():
+        encode_us, decode_us, size = bench_codec(codec, events)
+        print(f'{name:>6}: 编码 {encode_us:.1f}us, 解码 {decode_us:.1f}us, {size:.0f}字节/个')
+
+    for subscribe_all in [True, False]:
+        print('订阅全部合约' if subscribe_all else '只订阅一个合约')
+        for name in CODECS:
+            publish_seconds, seconds, received, latency = bench_pub_sub(name, events, subscribe_all)
+            # 订阅全部时接收慢于推送，延时主要为排队时间
+            print(f'{name:>6}: 放入队列 {count / publish_seconds:,.0f}个/秒, 接收{received}个 耗时{seconds:.2f}秒, '
+                  f'延时 p50 {latency.percentile(50) / 1000:.0f}us p99 {latency.percentile(99) / 1000:.0f}us')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
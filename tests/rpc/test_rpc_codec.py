@@ -0,0 +1,117 @@
+"""
+Test if rpc codecs restore trader objects and clients only receive subscribed topics
+"""
+import socket
+import threading
+import time
+import unittest
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+
+from vnpy.event import Event
+from vnpy.rpc import RpcClient, RpcServer
+from vnpy.rpc.codec import BinaryCodec, CODECS, decode, get_codec
+from vnpy.trader.constant import Direction, Exchange, Offset, OrderType, Status
+from vnpy.trader.object import OrderData, OrderRequest, TickData
+
+
+def make_tick(symbol: str, price: float) -> TickData:
+    dt = datetime(2020, 3, 2, 9, 30, 15, 500000)
+    return TickData(gateway_name='CTP', symbol=symbol, exchange=Exchange.SHFE, datetime=dt,
+                    date=dt.strftime('%Y-%m-%d'), time=dt.strftime('%H:%M:%S.%f'),
+                    volume=100, last_price=price, bid_price_1=price - 1, ask_price_1=price + 1)
+
+
+def get_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+class TestRpcCodec(unittest.TestCase):
+
+    def assert_same_object(self, obj, other):
+        self.assertIs(type(obj), type(other))
+        self.assertEqual(obj.__dict__, other.__dict__)
+
+    def test_round_trip(self):
+        tick = make_tick('rb2005', 3500.0)
+        order = OrderData(gateway_name='CTP', symbol='rb2005', exchange=Exchange.SHFE, orderid='1',
+                          direction=Direction.LONG, offset=Offset.OPEN, price=3500.0, volume=1,
+                          status=Status.ALLTRADED, datetime=datetime.now(timezone(timedelta(hours=8))))
+        req = OrderRequest(symbol='rb2005', exchange=Exchange.SHFE, direction=Direction.SHORT,
+                           type=OrderType.LIMIT, volume=2, price=3501.0)
+        for codec in CODECS.values():
+            data = decode(codec.encode(Event('eTick.', tick)))
+            self.assertEqual(data.type, 'eTick.')
+            self.assert_same_object(data.data, tick)
+            self.assertEqual(data.data.vt_symbol, 'rb2005.SHFE')
+
+            self.assert_same_object(decode(codec.encode(order)), order)
+
+            # 请求参数：元组、字典、集合、numpy数值等
+            msg = ['send_order', (req, 'CTP'), {'day': date(2020, 3, 2), 'price': np.float64(1.5),
+                                                'tag': (b'x', 1), 'exchanges': {Exchange.SHFE, Exchange.DCE}}]
+            result = decode(codec.encode(msg))
+            self.assertEqual(result, msg)
+            self.assert_same_object(result[1][0], req)
+
+        # 按结构编码远小于pickle
+        event = Event('eTick.', tick)
+        self.assertLess(len(get_codec('binary').encode(event)) * 2, len(get_codec('pickle').encode(event)))
+
+    def test_schema_mismatch(self):
+        @dataclass
+        class ExtraData:
+            value: float = 0
+
+        data = BinaryCodec().encode(make_tick('rb2005', 3500.0))
+        codec = BinaryCodec(classes=[ExtraData])
+        self.assertEqual(codec.decode(codec.encode(ExtraData(1.5))), ExtraData(1.5))
+        # 双方注册的数据类不一致
+        with self.assertRaises(ValueError):
+            codec.decode(data)
+
+    def test_topic_filter(self):
+        rep_address = f'tcp://127.0.0.1:{get_free_port()}'
+        pub_address = f'tcp://127.0.0.1:{get_free_port()}'
+        server = RpcServer()
+        server.register(make_tick)
+
+        received = []
+        subscribed = threading.Event()
+        client = RpcClient()
+        client.callback = lambda topic, event: (received.append((topic, event.data.symbol)), subscribed.set())
+        client.subscribe_topic('eTick.rb2005')
+
+        server.start(rep_address, pub_address)
+        client.start(rep_address, pub_address)
+        try:
+            # 请求/回复
+            self.assert_same_object(client.make_tick('rb2010', 3600.0), make_tick('rb2010', 3600.0))
+
+            # 等待订阅生效
+            for _ in range(50):
+                server.publish('eTick.rb2005.SHFE', Event('eTick.', make_tick('rb2005', 3500.0)))
+                if subscribed.wait(0.1):
+                    break
+            time.sleep(0.2)
+            received.clear()
+
+            for price in range(10):
+                server.publish('eTick.rb2010.SHFE', Event('eTick.', make_tick('rb2010', 3600.0 + price)))
+                server.publish('eTick.rb2005.SHFE', Event('eTick.', make_tick('rb2005', 3500.0 + price)))
+            time.sleep(0.5)
+        finally:
+            client.stop()
+            server.stop()
+            client.join()
+            server.join()
+
+        self.assertEqual(received, [('eTick.rb2005.SHFE', 'rb2005')] * 10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+"""
+Test if rpc publisher conflates market data for lagging subscribers and keeps trading data in order
+"""
+import threading
+import time
+import unittest
+from time import time_ns
+
+from vnpy.event import Event
+from vnpy.rpc import RpcClient, RpcServer
+from vnpy.rpc.codec import get_codec
+from vnpy.rpc.publisher import (
+    CONFLATE_PREFIX, HEADER, KIND_CONFLATED, KIND_MARKET, KIND_TRADE, RpcPublisher
+)
+
+from .test_rpc_codec import get_free_port, make_tick
+
+
+class FakeSocket:
+
+    def __init__(self):
+        self.sent = []
+        self.received = []
+
+    def send_multipart(self, frames):
+        self.sent.append(frames)
+
+    def recv(self, flags=0):
+        if not self.received:
+            import zmq
+            raise zmq.Again()
+        return self.received.pop(0)
+
+
+class TestRpcPublisher(unittest.TestCase):
+
+    def test_publisher_conflate(self):
+        socket = FakeSocket()
+        publisher = RpcPublisher(socket, get_codec())
+        socket.received.extend([b'\x01eTick.', b'\x01eOrder.',
+                                b'\x01' + (CONFLATE_PREFIX + 'eTick.rb2001').encode()])
+        publisher.process_subscriptions()
+
+        ticks = [make_tick(f'rb200{i % 2}', 3500.0 + i) for i in range(6)]
+        items = [(KIND_MARKET, 'eTick.' + tick.vt_symbol, Event('eTick.', tick), time_ns()) for tick in ticks]
+        items.insert(2, (KIND_TRADE, 'eOrder.', Event('eOrder.', 1), time_ns()))
+        items.insert(5, (KIND_TRADE, 'eOrder.', Event('eOrder.', 2), time_ns()))
+        items.append((KIND_TRADE, 'eLog.', Event('eLog.', 'log'), time_ns()))
+        publisher.send_items(items)
+
+        # 交易数据按顺序、序号连续；行情每个合约只发送最新一条
+        self.assertEqual([(f[0], HEADER.unpack(f[1])[:2]) for f in socket.sent[:2]],
+                         [(b'eOrder.', (KIND_TRADE, 1)), (b'eOrder.', (KIND_TRADE, 2))])
+        prices = {f[0]: get_codec().decode(f[2]).data.last_price for f in socket.sent[2:]}
+        self.assertEqual(prices, {b'eTick.rb2000.SHFE': 3504.0, b'eTick.rb2001.SHFE': 3505.0})
+        self.assertEqual(publisher.conflated_count, 4)
+        # 没有订阅的topic不发送，但序号照常递增
+        self.assertEqual(publisher.skip_count, 1)
+        self.assertEqual(publisher.seqs[b'eLog.'], 1)
+
+        # 只发送被订阅合约的合并行情
+        socket.sent.clear()
+        publisher.send_snapshots()
+        self.assertEqual([f[0] for f in socket.sent], [(CONFLATE_PREFIX + 'eTick.rb2001.SHFE').encode()])
+        self.assertEqual(HEADER.unpack(socket.sent[0][1])[0], KIND_CONFLATED)
+
+        # 期间没有更新的合约不再发送
+        socket.sent.clear()
+        publisher.send_snapshots()
+        self.assertEqual(socket.sent, [])
+
+    def test_client_messages(self):
+        codec = get_codec()
+        received = []
+        gaps = []
+        client = RpcClient()
+        client.callback = lambda topic, event: received.append((topic, event.data))
+        client.on_sequence_gap = lambda topic, count: gaps.append((topic, count))
+
+        def message(kind, topic, data, seq=0):
+            return [topic.encode(), HEADER.pack(kind, seq, time_ns()), codec.encode(Event('e', data))]
+
+        messages = [
+            message(KIND_MARKET, 'eTick.a', 1),
+            message(KIND_TRADE, 'eOrder.a', 'o1', 1),
+            message(KIND_MARKET, 'eTick.b', 2),
+            message(KIND_MARKET, 'eTick.a', 3),
+            message(KIND_CONFLATED, CONFLATE_PREFIX + 'eTick.b', 4),
+            message(KIND_TRADE, 'eOrder.a', 'o2', 2),
+            message(KIND_TRADE, 'eOrder.a', 'o5', 5)
+        ]
+        client.process_messages(messages)
+
+        # 未积压时忽略合并行情；被覆盖的行情不处理；交易数据按顺序处理
+        self.assertEqual(received, [('eOrder.a', 'o1'), ('eTick.b', 2), ('eTick.a', 3),
+                                    ('eOrder.a', 'o2'), ('eOrder.a', 'o5')])
+        self.assertEqual(gaps, [('eOrder.a', 2)])
+        self.assertEqual(client.conflated_count, 1)
+
+        # 积压时改为订阅合并行情
+        client.subscribe_topic('eTick.a', market=True)
+        client.lag_ns = int(client.lag_threshold * 2e9)
+        client.check_lagging()
+        self.assertTrue(client.lagging)
+        received.clear()
+        client.process_messages([message(KIND_CONFLATED, CONFLATE_PREFIX + 'eTick.a', 6)])
+        self.assertEqual(received, [('eTick.a', 6)])
+
+        client.lag_ns = 0
+        client.check_lagging()
+        self.assertFalse(client.lagging)
+        self.assertEqual(client.get_metrics()['switch_count'], 1)
+
+    def test_slow_subscriber(self):
+        rep_address = f'tcp://127.0.0.1:{get_free_port()}'
+        pub_address = f'tcp://127.0.0.1:{get_free_port()}'
+        server = RpcServer(conflate_interval=0.1)
+
+        ticks = {}
+        orders = []
+        ready = threading.Event()
+
+        def callback(topic, event):
+            if topic == 'ready':
+                ready.set()
+            elif topic.startswith('eTick.'):
+                ticks[event.data.symbol] = event.data.last_price
+                time.sleep(0.02)
+            else:
+                orders.append(event.data)
+
+        client = RpcClient(lag_threshold=0.05)
+        client.callback = callback
+        client.subscribe_topic('ready')
+        client.subscribe_topic('eOrder.')
+        symbols = [f'rb20{i:02d}' for i in range(10)]
+        for symbol in symbols:
+            client.subscribe_topic(f'eTick.{symbol}', market=True)
+
+        server.start(rep_address, pub_address)
+        client.start(rep_address, pub_address)
+        try:
+            while not ready.is_set():
+                server.publish('ready', None)
+                ready.wait(0.1)
+
+            for i in range(3000):
+                symbol = symbols[i % len(symbols)]
+                server.publish_market(f'eTick.{symbol}.SHFE', Event('eTick.', make_tick(symbol, float(i))))
+                if i % 30 == 0:
+                    server.publish('eOrder.', Event('eOrder.', i))
+
+            expected = {symbol: float(2990 + i) for i, symbol in enumerate(symbols)}
+            for _ in range(100):
+                if ticks == expected and len(orders) == 100:
+                    break
+                time.sleep(0.1)
+
+            self.assertTrue(client.report_metrics())
+            metrics = server.get_subscriber_metrics()[client.client_id]
+        finally:
+            client.stop()
+            server.stop()
+            client.join()
+            server.join()
+
+        # 交易数据不丢失、按顺序；每个合约最终收到最新行情；处理的行情远少于推送的
+        self.assertEqual(orders, list(range(0, 3000, 30)))
+        self.assertEqual(ticks, expected)
+        self.assertEqual(metrics['gap_count'], 0)
+        self.assertGreaterEqual(metrics['switch_count'], 1)
+        self.assertLess(metrics['dispatch_count'], 2000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,6 +2,12 @@
 import unittest
 
 import app
+import component
+import data
+import event
+import gateway
+import option_master
+import rpc
 # import your test modules
 import test_import_all
 import trader
@@ -14,6 +20,12 @@ suite = unittest.TestSuite()
 suite.addTests(loader.loadTestsFromModule(test_import_all))
 suite.addTests(loader.loadTestsFromModule(trader))
 suite.addTests(loader.loadTestsFromModule(app))
+suite.addTests(loader.loadTestsFromModule(component))
+suite.addTests(loader.loadTestsFromModule(event))
+suite.addTests(loader.loadTestsFromModule(data))
+suite.addTests(loader.loadTestsFromModule(rpc))
+suite.addTests(loader.loadTestsFromModule(gateway))
+suite.addTests(loader.loadTestsFromModule(option_master))
 
 
 # initialize a runner, pass it your suite and run it
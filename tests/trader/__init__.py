@@ -1,2 +1,8 @@
 from .test_database import *
 from .test_settings import *
+from .test_tick_cache import *
+from .test_replay import *
+from .test_order_book import *
+from .test_position_ledger import *
+from .test_tick_objects import *
+from .test_active_orders import *
@@ -0,0 +1,96 @@
+"""
+Benchmark of tick objects: plain dataclass (before) vs slotted TickData vs day columns
+
+python benchmark_tick_objects.py [tick数量]
+"""
+import gc
+import sys
+import time
+import tracemalloc
+from dataclasses import MISSING, field, fields, make_dataclass
+from datetime import datetime, timedelta
+
+from vnpy.trader.constant import Exchange
+from vnpy.trader.object import BaseData, TickData
+from vnpy.trader.tick_cache import TickDayColumns
+
+
+def legacy_post_init(self):
+    self.vt_symbol = f"{self.symbol}.{self.exchange.value}"
+
+
+# 原来的TickData：普通dataclass，每个实例一个属性字典，vt_symbol每次拼接
+LegacyTickData = make_dataclass(
+    'LegacyTickData',
+    [(f.name, f.type) if f.default is MISSING else (f.name, f.type, field(default=f.default))
+     for f in fields(TickData) if f.name != 'gateway_name'],
+    bases=(BaseData,),
+    namespace={'__post_init__': legacy_post_init}
+)
+
+
+def make_ticks(cls, n: int, datetimes: list) -> list:
+    """CTP行情的常见字段"""
+    return [cls(gateway_name='CTP', symbol='rb2005', exchange=Exchange.SHFE, datetime=datetimes[i],
+                date='2020-03-02', time='09:00:00.500000', trading_day='2020-03-02',
+                volume=10 * i, open_interest=1000.0 + i, last_price=3500.0 + i, last_volume=1,
+                limit_up=3800.0, limit_down=3200.0, open_price=3490.0, high_price=3510.0 + i,
+                low_price=3480.0, pre_close=3495.0, bid_price_1=3499.0 + i, ask_price_1=3501.0 + i,
+                bid_volume_1=5, ask_volume_1=7)
+            for i in range(n)]
+
+
+def measure(func):
+    """(结果, 耗时, 新增内存字节)"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    seconds = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, seconds, size
+
+
+def main(n: int = 100000):
+    datetimes = [datetime(2020, 3, 2, 9) + timedelta(milliseconds=500 * i) for i in range(n)]
+    print(f'{n}个tick(datetime对象预先创建，不计入)')
+
+    results = {}
+    for name, cls in [('原dataclass', LegacyTickData), ('slots', TickData)]:
+        ticks, _, size = measure(lambda: make_ticks(cls, n, datetimes))
+        # 构造耗时单独测量(不受tracemalloc影响)
+        del ticks
+        gc.collect()
+        start = time.perf_counter()
+        ticks = make_ticks(cls, n, datetimes)
+        seconds = time.perf_counter() - start
+        results[name] = ticks
+        print(f'{name:<12}: {size / n:,.0f} 字节/tick, 构造 {seconds / n * 1e6:.2f} 微秒/tick')
+
+    ticks = results['slots']
+    columns, _, size = measure(lambda: TickDayColumns.from_ticks(ticks))
+    del columns
+    start = time.perf_counter()
+    TickDayColumns.from_ticks(ticks)
+    seconds = time.perf_counter() - start
+    print(f'{"按列(批量)":<12}: {size / n:,.0f} 字节/tick, 转换 {seconds / n * 1e6:.2f} 微秒/tick')
+
+    columns = TickDayColumns('rb2005', Exchange.SHFE)
+    start = time.perf_counter()
+    for tick in ticks:
+        columns.append(tick)
+    seconds = time.perf_counter() - start
+    print(f'{"按列(逐个)":<12}: {columns.nbytes / n:,.0f} 字节/tick, 追加 {seconds / n * 1e6:.2f} 微秒/tick')
+
+    # 兼容的 obj.__dict__ 每次构造字典，热点路径(rpc编码、tick记录)已改为按属性取值
+    for name, ticks in results.items():
+        start = time.perf_counter()
+        for tick in ticks:
+            tuple(tick.__dict__.values())
+        seconds = time.perf_counter() - start
+        print(f'{name:<12}: 读取__dict__ {seconds / n * 1e6:.2f} 微秒/tick')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,109 @@
+"""
+Benchmark of tick recorder backends: csv append vs batched columnar writer
+
+python benchmark_tick_recorder.py [合约数量] [每个合约的tick数量]
+"""
+import csv
+import gc
+import os
+import sys
+import tempfile
+import time
+from copy import copy
+from datetime import datetime, timedelta
+
+from vnpy.trader.constant import Exchange
+from vnpy.trader.object import TickData
+from vnpy.trader.tick_cache import TickCacheWriter, load_tick_cache
+
+
+def make_ticks(symbol_count: int, tick_count: int) -> list:
+    """全市场订阅：各合约的tick按时间交错"""
+    start = datetime(2020, 3, 2, 9, 0, 0)
+    ticks = []
+    for i in range(tick_count):
+        dt = start + timedelta(milliseconds=500 * i)
+        for j in range(symbol_count):
+            price = 3500.0 + (i + j) % 17
+            ticks.append(TickData(gateway_name='CTP', symbol=f'rb{2000 + j}', exchange=Exchange.SHFE,
+                                  datetime=dt, date=dt.strftime('%Y-%m-%d'), time=dt.strftime('%H:%M:%S.%f'),
+                                  trading_day='2020-03-02', volume=10 * i, open_interest=1000 + i,
+                                  last_price=price, bid_price_1=price - 1, ask_price_1=price + 1,
+                                  bid_volume_1=5, ask_volume_1=7))
+    return ticks
+
+
+def write_csv(folder: str, ticks: list):
+    """原csv记录方式：按合约、分钟缓存，逐个合约打开csv追加"""
+    tick_dict = {}
+    for tick in ticks:
+        key = f'{tick.vt_symbol}_{tick.datetime.hour}-{tick.datetime.minute}'
+        tick_dict.setdefault(key, []).append(copy(tick))
+
+    for key, tick_list in tick_dict.items():
+        file_name = os.path.join(folder, f'{tick_list[0].vt_symbol}_{tick_list[0].trading_day}.csv')
+        fieldnames = sorted(tick_list[0].__dict__)
+        fieldnames.remove('datetime')
+        fieldnames.insert(0, 'datetime')
+        new_file = not os.path.exists(file_name)
+        with open(file_name, 'a', encoding='utf8', newline='') as f:
+            writer = csv.DictWriter(f=f, fieldnames=fieldnames, dialect='excel', extrasaction='ignore')
+            if new_file:
+                writer.writeheader()
+            for tick in tick_list:
+                d = tick.__dict__
+                d.update({'datetime': tick.datetime.strftime('%Y-%m-%d %H:%M:%S.%f')})
+                writer.writerow(d)
+
+
+def write_columnar(folder: str, ticks: list) -> TickCacheWriter:
+    """列缓冲 + 后台写线程"""
+    writer = TickCacheWriter(folder, flush_size=1000)
+    start = time.perf_counter()
+    for tick in ticks:
+        writer.add_tick(tick)
+    # 接收线程的耗时(不含后台写入)
+    writer.add_seconds = time.perf_counter() - start
+    writer.close()
+    return writer
+
+
+def folder_size(folder: str) -> int:
+    return sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(folder) for f in files)
+
+
+def main(symbol_count: int = 200, tick_count: int = 500):
+    ticks = make_ticks(symbol_count, tick_count)
+    print(f'{symbol_count}个合约, 共{len(ticks)}个tick')
+    # 实盘中tick是逐个到达的，测试数据不参与垃圾回收的扫描
+    gc.freeze()
+
+    with tempfile.TemporaryDirectory() as folder:
+        writer_start = time.perf_counter()
+        writer = write_columnar(folder, ticks)
+        columnar_seconds = time.perf_counter() - writer_start
+        add_seconds = writer.add_seconds
+        columnar_size = folder_size(folder)
+
+        load_start = time.perf_counter()
+        rows = sum(len(load_tick_cache(file_name)) for file_name in writer.files)
+        load_seconds = time.perf_counter() - load_start
+        assert rows == len(ticks)
+
+    # csv方式会修改tick，使用另一份数据
+    ticks = make_ticks(symbol_count, tick_count)
+    gc.freeze()
+    with tempfile.TemporaryDirectory() as folder:
+        csv_start = time.perf_counter()
+        write_csv(folder, ticks)
+        csv_seconds = time.perf_counter() - csv_start
+        csv_size = folder_size(folder)
+
+    print(f'csv:  {csv_seconds:.3f}秒, {len(ticks) / csv_seconds:,.0f} tick/秒, {csv_size / 1024 / 1024:.1f}MB')
+    print(f'列式: {columnar_seconds:.3f}秒, {len(ticks) / columnar_seconds:,.0f} tick/秒, '
+          f'{columnar_size / 1024 / 1024:.1f}MB, 加载{load_seconds:.3f}秒')
+    print(f'列式接收: {add_seconds:.3f}秒, {len(ticks) / add_seconds:,.0f} tick/秒')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,136 @@
+"""
+Test if OmsEngine active order indexes and PositionHolding frozen volumes match a full rescan
+"""
+import os
+import random
+import tempfile
+import unittest
+from types import SimpleNamespace
+
+from vnpy.event import Event, EventEngine
+from vnpy.trader.constant import Direction, Exchange, Offset, Status
+from vnpy.trader.converter import PositionHolding
+from vnpy.trader.engine import OmsEngine
+from vnpy.trader.event import EVENT_ORDER
+from vnpy.trader.object import ContractData, OrderData
+
+SYMBOLS = ['rb2005', 'hc2005', 'i2005']
+GATEWAYS = ['CTP', 'CTP2']
+STRATEGIES = ['s1', 's2', '']
+OFFSETS = [Offset.OPEN, Offset.CLOSE, Offset.CLOSETODAY, Offset.CLOSEYESTERDAY]
+
+
+def random_orders(rng, count):
+    """随机的委托回报序列：新委托、部分成交、全部成交/撤单"""
+    orders = {}
+    events = []
+    for i in range(count):
+        if orders and rng.random() < 0.5:
+            order = orders[rng.choice(list(orders))]
+            order = OrderData(**{k: v for k, v in order.__dict__.items() if not k.startswith('vt_')})
+            order.traded = min(order.volume, order.traded + rng.randint(0, 2))
+            order.status = rng.choice([Status.PARTTRADED, Status.ALLTRADED, Status.CANCELLED])
+            if order.status != Status.PARTTRADED:
+                orders.pop(order.vt_orderid)
+            else:
+                orders[order.vt_orderid] = order
+        else:
+            order = OrderData(gateway_name=rng.choice(GATEWAYS), symbol=rng.choice(SYMBOLS),
+                              exchange=Exchange.SHFE, orderid=str(i),
+                              direction=rng.choice([Direction.LONG, Direction.SHORT]),
+                              offset=rng.choice(OFFSETS), volume=rng.randint(1, 5), status=Status.NOTTRADED)
+            orders[order.vt_orderid] = order
+        events.append(order)
+    return events
+
+
+def full_frozen(holding):
+    """全部活动委托重新计算(平今、平昨在前，平仓在后)"""
+    frozen = {'long_td': 0, 'long_yd': 0, 'short_td': 0, 'short_yd': 0}
+    orders = sorted(holding.active_orders.values(), key=lambda o: o.offset == Offset.CLOSE)
+    for order in orders:
+        if order.offset == Offset.OPEN:
+            continue
+        side = 'short' if order.direction == Direction.LONG else 'long'
+        volume = order.volume - order.traded
+        if order.offset == Offset.CLOSEYESTERDAY:
+            frozen[side + '_yd'] += volume
+        else:
+            frozen[side + '_td'] += volume
+            if order.offset == Offset.CLOSE and frozen[side + '_td'] > getattr(holding, side + '_td'):
+                frozen[side + '_yd'] += frozen[side + '_td'] - getattr(holding, side + '_td')
+                frozen[side + '_td'] = getattr(holding, side + '_td')
+    return frozen
+
+
+class TestActiveOrders(unittest.TestCase):
+
+    def test_oms_indexes(self):
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as folder:
+            os.chdir(folder)
+            try:
+                main_engine = SimpleNamespace()
+                oms = OmsEngine(main_engine, EventEngine())
+                oms.save_contracts = lambda: None
+            finally:
+                os.chdir(cwd)
+
+        rng = random.Random(7)
+        for order in random_orders(rng, 1000):
+            # 策略名在发单返回后才记录，委托回报可能更早
+            strategy_name = STRATEGIES[int(order.orderid) % 3]
+            if order.vt_orderid not in oms.order_strategies and rng.random() < 0.5:
+                oms.process_order_event(Event(EVENT_ORDER, order))
+                if strategy_name:
+                    main_engine.set_order_strategy(order.vt_orderid, strategy_name)
+            else:
+                if strategy_name and order.vt_orderid not in oms.order_strategies:
+                    main_engine.set_order_strategy(order.vt_orderid, strategy_name)
+                oms.process_order_event(Event(EVENT_ORDER, order))
+
+            for vt_symbol in [''] + [f'{s}.SHFE' for s in SYMBOLS]:
+                for gateway_name in [''] + GATEWAYS:
+                    for strategy_name in STRATEGIES:
+                        expected = [o for o in oms.active_orders.values()
+                                    if (not vt_symbol or o.vt_symbol == vt_symbol)
+                                    and (not gateway_name or o.gateway_name == gateway_name)
+                                    and (not strategy_name or oms.order_strategies.get(o.vt_orderid) == strategy_name)]
+                        result = main_engine.get_all_active_orders(vt_symbol, gateway_name, strategy_name)
+                        self.assertEqual(sorted(o.vt_orderid for o in result),
+                                         sorted(o.vt_orderid for o in expected))
+
+        # 全部完成后，索引清空
+        for order in list(oms.active_orders.values()):
+            order.status = Status.CANCELLED
+            oms.process_order_event(Event(EVENT_ORDER, order))
+        self.assertEqual(oms.active_orders, {})
+        self.assertEqual(dict(oms.symbol_active_orders), {})
+        self.assertEqual(dict(oms.strategy_active_orders), {})
+        self.assertEqual(oms.order_strategies, {})
+
+        # 委托完成后才返回的策略名，不再记录
+        main_engine.set_order_strategy(order.vt_orderid, 's1')
+        self.assertEqual(oms.order_strategies, {})
+
+    def test_incremental_frozen(self):
+        contract = ContractData(gateway_name='CTP', symbol='rb2005', exchange=Exchange.SHFE, name='rb2005',
+                                product=None, size=10, pricetick=1)
+        holding = PositionHolding(contract)
+        holding.long_td, holding.long_yd = 6, 10
+        holding.short_td, holding.short_yd = 3, 8
+
+        rng = random.Random(3)
+        for order in random_orders(rng, 3000):
+            if order.symbol != 'rb2005' or order.gateway_name != 'CTP':
+                continue
+            holding.update_order(order)
+            expected = full_frozen(holding)
+            actual = {k: getattr(holding, k + '_frozen') for k in expected}
+            for key, value in expected.items():
+                self.assertAlmostEqual(actual[key], value, places=6, msg=key)
+            self.assertAlmostEqual(holding.long_pos_frozen, expected['long_td'] + expected['long_yd'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+"""
+Test if StopOrderBook / LimitOrderBook return the same orders as a full scan
+"""
+import random
+import unittest
+from dataclasses import dataclass
+
+from vnpy.trader.constant import Direction, Offset
+from vnpy.trader.order_book import StopOrderBook, LimitOrderBook
+
+
+@dataclass
+class StopOrder:
+    vt_symbol: str
+    direction: Direction
+    offset: Offset
+    price: float
+    volume: float
+    stop_orderid: str
+    strategy_name: str
+
+
+def make_order(i, vt_symbol, direction, price):
+    return StopOrder(
+        vt_symbol=vt_symbol,
+        direction=direction,
+        offset=Offset.OPEN,
+        price=price,
+        volume=1,
+        stop_orderid=f"STOP.{i}",
+        strategy_name="s"
+    )
+
+
+def scan(orders, vt_symbol, long_cross_price, short_cross_price):
+    return [o for o in orders.values() if o.vt_symbol == vt_symbol and (
+        (o.direction == Direction.LONG and o.price <= long_cross_price)
+        or (o.direction == Direction.SHORT and o.price >= short_cross_price))]
+
+
+def scan_limit(orders, vt_symbol, buy_cross_price, sell_cross_price):
+    return [o for o in orders.values() if o.vt_symbol == vt_symbol and (
+        (o.direction == Direction.LONG and o.price >= buy_cross_price)
+        or (o.direction == Direction.SHORT and o.price <= sell_cross_price))]
+
+
+class TestOrderBook(unittest.TestCase):
+
+    def make_book(self, book):
+        random.seed(1)
+        orders = {}
+        for i in range(500):
+            order = make_order(i, random.choice(["a.SHFE", "b.SHFE"]),
+                               random.choice([Direction.LONG, Direction.SHORT]),
+                               random.randint(90, 110))
+            book[order.stop_orderid] = order
+            orders[order.stop_orderid] = order
+
+        for i in range(0, 500, 3):
+            self.assertIs(book.pop(f"STOP.{i}"), orders.pop(f"STOP.{i}"))
+        del book["STOP.1"]
+        orders.pop("STOP.1")
+
+        self.assertEqual(len(book), len(orders))
+        self.assertEqual(list(book.keys()), list(orders.keys()))
+        return orders
+
+    def test_triggered(self):
+        book = StopOrderBook()
+        orders = self.make_book(book)
+        for vt_symbol in ["a.SHFE", "b.SHFE", "c.SHFE"]:
+            for price in range(85, 116):
+                self.assertEqual(book.get_triggered(vt_symbol, price, price),
+                                 scan(orders, vt_symbol, price, price))
+            self.assertEqual(book.get_triggered(vt_symbol, 99, 101),
+                             scan(orders, vt_symbol, 99, 101))
+
+    def test_crossed(self):
+        book = LimitOrderBook()
+        orders = self.make_book(book)
+        for vt_symbol in ["a.SHFE", "b.SHFE", "c.SHFE"]:
+            for price in range(85, 116):
+                self.assertEqual(book.get_crossed(vt_symbol, price, price),
+                                 scan_limit(orders, vt_symbol, price, price))
+            self.assertEqual(book.get_crossed(vt_symbol, 101, 99),
+                             scan_limit(orders, vt_symbol, 101, 99))
+        self.assertEqual(book.get_orders("a.SHFE"), [o for o in orders.values() if o.vt_symbol == "a.SHFE"])
+
+    def test_remove(self):
+        book = StopOrderBook()
+        book["STOP.1"] = make_order(1, "a.SHFE", Direction.LONG, 100)
+        book["STOP.2"] = make_order(2, "a.SHFE", Direction.LONG, 100)
+        self.assertEqual(len(book.get_triggered("a.SHFE", 100, 200)), 2)
+
+        # 替换同一编号的停止单
+        book["STOP.1"] = make_order(1, "a.SHFE", Direction.SHORT, 120)
+        self.assertEqual([o.stop_orderid for o in book.get_triggered("a.SHFE", 100, 200)], ["STOP.2"])
+        self.assertEqual([o.stop_orderid for o in book.get_triggered("a.SHFE", 0, 120)], ["STOP.1"])
+
+        self.assertIsNone(book.pop("STOP.3", None))
+        book.clear()
+        self.assertEqual(book.get_triggered("a.SHFE", 200, 0), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
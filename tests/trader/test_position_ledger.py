@@ -0,0 +1,92 @@
+"""
+Test if PositionLedger matches open trades in the same order as the position list
+"""
+import random
+import unittest
+from types import SimpleNamespace
+
+from vnpy.trader.position_ledger import PositionLedger
+
+
+def make_trade(i, vt_symbol, strategy_name, price, volume):
+    return SimpleNamespace(tradeid=i, vt_symbol=vt_symbol, symbol=vt_symbol.split('.')[0],
+                           strategy_name=strategy_name, price=price, volume=volume)
+
+
+def close_list(position_list, vt_symbol, strategy_name, volume):
+    """原来的撮合方式"""
+    matched = []
+    while volume > 0:
+        pop_indexs = [i for i, val in enumerate(position_list) if
+                      val.vt_symbol == vt_symbol and val.strategy_name == strategy_name]
+        open_trade = position_list.pop(pop_indexs[0])
+        if volume >= open_trade.volume:
+            volume -= open_trade.volume
+            matched.append((open_trade.tradeid, open_trade.volume))
+        else:
+            matched.append((open_trade.tradeid, volume))
+            open_trade.volume -= volume
+            position_list.append(open_trade)
+            volume = 0
+    return matched
+
+
+def close_ledger(ledger, vt_symbol, strategy_name, volume):
+    matched = []
+    while volume > 0:
+        open_trade = ledger.pop_first(vt_symbol, strategy_name)
+        if volume >= open_trade.volume:
+            volume -= open_trade.volume
+            matched.append((open_trade.tradeid, open_trade.volume))
+        else:
+            matched.append((open_trade.tradeid, volume))
+            open_trade.volume -= volume
+            ledger.append(open_trade)
+            volume = 0
+    return matched
+
+
+class TestPositionLedger(unittest.TestCase):
+
+    def test_match(self):
+        random.seed(3)
+        position_list = []
+        ledger = PositionLedger()
+        keys = [(s, n) for s in ['a.SHFE', 'b.SHFE'] for n in ['s1', 's2']]
+        for i in range(2000):
+            vt_symbol, strategy_name = random.choice(keys)
+            pos = sum(t.volume for t in position_list if t.vt_symbol == vt_symbol and t.strategy_name == strategy_name)
+            self.assertEqual(ledger.get_volume(vt_symbol, strategy_name), pos)
+            if pos > 0 and random.random() < 0.4:
+                volume = random.randint(1, pos)
+                self.assertEqual(close_ledger(ledger, vt_symbol, strategy_name, volume),
+                                 close_list(position_list, vt_symbol, strategy_name, volume))
+            else:
+                price = random.randint(90, 110)
+                volume = random.randint(1, 5)
+                position_list.append(make_trade(i, vt_symbol, strategy_name, price, volume))
+                ledger.append(make_trade(i, vt_symbol, strategy_name, price, volume))
+
+            self.assertEqual([(t.tradeid, t.volume) for t in ledger], [(t.tradeid, t.volume) for t in position_list])
+
+        for summary in ledger.get_positions():
+            trades = [t for t in position_list
+                      if t.vt_symbol == summary.vt_symbol and t.strategy_name == summary.strategy_name]
+            self.assertEqual(summary.volume, sum(t.volume for t in trades))
+            self.assertAlmostEqual(summary.price * summary.volume, sum(t.price * t.volume for t in trades))
+            self.assertEqual([t.tradeid for t in ledger.get_trades(summary.vt_symbol, summary.strategy_name)],
+                             [t.tradeid for t in trades])
+        self.assertAlmostEqual(ledger.cost, sum(t.price * t.volume for t in position_list))
+        self.assertEqual(ledger.get_volume('a.SHFE'),
+                         sum(t.volume for t in position_list if t.vt_symbol == 'a.SHFE'))
+        self.assertIsNone(ledger.pop_first('c.SHFE', 's1'))
+        self.assertEqual(ledger.get_trades('c.SHFE', 's1'), [])
+
+        # 全部平仓后，持仓成本归零
+        for summary in ledger.get_positions():
+            close_ledger(ledger, summary.vt_symbol, summary.strategy_name, summary.volume)
+        self.assertEqual((len(ledger), ledger.cost), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
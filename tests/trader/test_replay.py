@@ -0,0 +1,76 @@
+"""
+Test if ReplayStream replays the same rows as concat + sort_index + iterrows
+"""
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from vnpy.trader.replay import ReplayStream
+
+
+def make_frame(start, n, step, seed, renko=False):
+    rng = np.random.RandomState(seed)
+    df = pd.DataFrame({
+        'datetime': pd.date_range(start, periods=n, freq=step),
+        'open': rng.rand(n),
+        'high': rng.rand(n),
+        'low': rng.rand(n),
+        'close': rng.rand(n),
+        'volume': rng.randint(0, 100, n).astype(float),
+        'trading_day': ['20200302'] * n
+    })
+    if renko:
+        df['height'] = 5.0
+        df['low_time'] = 'x'
+    return df.set_index('datetime')
+
+
+class TestReplayStream(unittest.TestCase):
+
+    def test_merge_order(self):
+        frames = {
+            'rb2005.SHFE': make_frame('2020-03-02 09:00', 300, '1min', 1),
+            'j2005.DCE': make_frame('2020-03-02 09:00', 100, '3min', 2),
+            'future_renko_rb.SHFE': make_frame('2020-03-02 09:01:30', 50, '7min', 3, renko=True)
+        }
+        columns = ['open', 'high', 'low', 'close', 'volume', 'trading_day', 'height', 'low_time']
+        stream = ReplayStream(frames, columns, defaults={'height': 0})
+
+        expected = pd.concat(frames, axis=0).swaplevel(0, 1).sort_index()
+        rows = list(stream)
+        self.assertEqual(len(rows), len(expected))
+        self.assertEqual(len(stream), len(expected))
+
+        for row, ((dt, vt_symbol), data) in zip(rows, expected.iterrows()):
+            self.assertEqual(row[0], dt.to_pydatetime())
+            self.assertEqual(row[1], vt_symbol)
+            for value, name in zip(row[2:8], columns[:6]):
+                self.assertEqual(value, data[name])
+            if vt_symbol.startswith('future_renko'):
+                self.assertEqual(row[8:], (5.0, 'x'))
+            else:
+                self.assertEqual(row[8:], (0, None))
+
+    def test_column_alias(self):
+        df = make_frame('2020-03-02 09:00', 10, '1min', 1).rename(columns={'close': 'close_price'})
+        stream = ReplayStream({'a': df}, [('close', 'close_price')], chunk_size=3)
+        self.assertEqual([row[2] for row in stream], df['close_price'].tolist())
+        self.assertEqual(len(list(ReplayStream({}, ['close']))), 0)
+
+    def test_index_unit(self):
+        """时间索引的精度(秒、微秒)不影响合并顺序和回放的时间"""
+        seconds = make_frame('2020-03-02 09:00', 5, '1min', 1)
+        seconds.index = pd.DatetimeIndex(seconds.index.values.astype('datetime64[s]'))
+        micros = make_frame('2020-03-02 09:00:30', 5, '1min', 2)
+        micros.index = pd.DatetimeIndex(micros.index.values.astype('datetime64[us]'))
+        stream = ReplayStream({'a': seconds, 'b': micros}, ['close'])
+
+        rows = list(stream)
+        self.assertEqual([row[1] for row in rows], ['a', 'b'] * 5)
+        self.assertEqual([row[0] for row in rows[:2]], [datetime(2020, 3, 2, 9, 0), datetime(2020, 3, 2, 9, 0, 30)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+"""
+Test if columnar tick cache round-trips bz2 cached tick lists
+"""
+import bz2
+import os
+import pickle
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from vnpy.trader.constant import Exchange
+from vnpy.trader.object import TickData
+from vnpy.trader.tick_cache import (
+    TickCacheWriter,
+    append_tick_cache,
+    convert_bz2_cache,
+    export_tick_csv,
+    get_tick_cache_file,
+    load_day_tick_cache,
+    load_tick_cache,
+    read_tick_cache_header,
+    save_tick_cache
+)
+
+
+def make_ticks(n):
+    start = datetime(2020, 3, 2, 9, 0, 0)
+    ticks = []
+    for i in range(n):
+        dt = start + timedelta(milliseconds=500 * (i // 2 * 2))
+        ticks.append({
+            'symbol': 'rb2005',
+            'exchange': 'SHFE',
+            'trading_day': '2020-03-02',
+            'datetime': dt,
+            'time': dt.strftime('%H:%M:%S.%f'),
+            'price': 3500.0 + i % 7,
+            'volume': 10 * i
+        })
+    return ticks
+
+
+class TestTickCache(unittest.TestCase):
+
+    def test_convert_and_load(self):
+        ticks = make_ticks(100)
+        with tempfile.TemporaryDirectory() as folder:
+            os.makedirs(os.path.join(folder, '202003'))
+            with bz2.BZ2File(os.path.join(folder, '202003', 'rb2005_20200302.pkb2'), 'wb') as f:
+                pickle.dump(ticks, f)
+
+            self.assertEqual(convert_bz2_cache(folder, log_func=None), 1)
+            self.assertEqual(convert_bz2_cache(folder, log_func=None), 0)
+
+            df = load_tick_cache(get_tick_cache_file(folder, 'rb2005', '20200302'))
+            self.assertEqual(len(df), 50)
+            self.assertIsInstance(df['price'].values, np.ndarray)
+            self.assertEqual(df['datetime'].tolist(), [t['datetime'] for t in ticks[::2]])
+            self.assertEqual(df['price'].tolist(), [t['price'] for t in ticks[::2]])
+            self.assertEqual(df['volume'].tolist(), [t['volume'] for t in ticks[::2]])
+            self.assertEqual(df['time'].tolist(), [t['time'] for t in ticks[::2]])
+            self.assertEqual(set(df['symbol']), {'rb2005'})
+
+            self.assertIsNone(load_tick_cache(get_tick_cache_file(folder, 'rb2005', '20200303')))
+
+            # 回测引擎按合约/日期加载，异常时回调并返回None
+            errors = []
+            self.assertEqual(len(load_day_tick_cache(folder, 'rb2005', '20200302', on_error=errors.append)), 50)
+            self.assertIsNone(load_day_tick_cache(folder, 'rb2005', '20200303', on_error=errors.append))
+            with open(get_tick_cache_file(folder, 'rb2005', '20200304'), 'wb') as f:
+                f.write(b'bad')
+            self.assertIsNone(load_day_tick_cache(folder, 'rb2005', '20200304', on_error=errors.append))
+            self.assertEqual(len(errors), 1)
+
+    def test_codec(self):
+        ticks = make_ticks(10)
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, 'ticks.tkc')
+            save_tick_cache(ticks, file_name, codec='zlib', meta={'fingerprint': 'abc'})
+            self.assertEqual(read_tick_cache_header(file_name)['meta'], {'fingerprint': 'abc'})
+            df = load_tick_cache(file_name, columns=['datetime', 'price'])
+            self.assertEqual(list(df.columns), ['datetime', 'price'])
+            self.assertEqual(df['price'].tolist(), [t['price'] for t in ticks[::2]])
+
+    def test_append(self):
+        ticks = make_ticks(30)
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, 'ticks.tkc')
+            self.assertEqual(append_tick_cache(ticks[:10], file_name), 10)
+            self.assertEqual(append_tick_cache(ticks[10:20], file_name, codec='zlib'), 10)
+
+            # 中断写入的数据段，加载时忽略，下次追加时覆盖
+            with open(file_name, 'ab') as f:
+                f.write(b'VNTKC\x00\x00\x01\x00\x01')
+            self.assertEqual(len(load_tick_cache(file_name)), 20)
+            append_tick_cache(ticks[20:], file_name)
+
+            df = load_tick_cache(file_name)
+            self.assertEqual(df['datetime'].tolist(), [t['datetime'] for t in ticks])
+            self.assertEqual(df['volume'].tolist(), [t['volume'] for t in ticks])
+
+    def test_writer(self):
+        start = datetime(2020, 3, 2, 9, 0, 0)
+        ticks = [TickData(gateway_name='CTP', symbol='rb2005', exchange=Exchange.SHFE,
+                          datetime=start + timedelta(milliseconds=500 * i), trading_day='2020-03-02',
+                          last_price=3500.0 + i % 7, volume=10 * i) for i in range(250)]
+        with tempfile.TemporaryDirectory() as folder:
+            writer = TickCacheWriter(folder, flush_size=100)
+            for tick in ticks:
+                writer.add_tick(tick)
+            writer.flush()
+            writer.close()
+
+            # 不修改原来的tick
+            self.assertEqual(ticks[0].datetime, start)
+
+            file_name = writer.get_file_name('rb2005.SHFE', '2020-03-02')
+            self.assertEqual(writer.files, {file_name})
+            df = load_tick_cache(file_name)
+            self.assertEqual(df['datetime'].tolist(), [t.datetime for t in ticks])
+            self.assertEqual(df['last_price'].tolist(), [t.last_price for t in ticks])
+            self.assertEqual(set(df['exchange']), {'SHFE'})
+
+            csv_file = export_tick_csv(file_name)
+            with open(csv_file, encoding='utf8') as f:
+                self.assertTrue(f.readline().startswith('datetime,'))
+                self.assertTrue(f.readline().startswith('2020-03-02 09:00:00.000000,'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Test if slotted tick/bar objects stay compatible with code using __dict__, and the day-of-ticks columns
+"""
+import copy
+import os
+import pickle
+import tempfile
+import unittest
+from dataclasses import asdict, replace
+from datetime import datetime, timedelta
+
+from vnpy.trader.constant import Exchange, Interval
+from vnpy.trader.object import BarData, RenkoBarData, TickData
+from vnpy.trader.tick_cache import TickDayColumns
+
+
+def make_tick(i: int = 0) -> TickData:
+    dt = datetime(2020, 3, 2, 9, 0, 0) + timedelta(milliseconds=500 * i)
+    return TickData(gateway_name='CTP', symbol='rb2005', exchange=Exchange.SHFE, datetime=dt,
+                    date=dt.strftime('%Y-%m-%d'), time=dt.strftime('%H:%M:%S.%f'), trading_day='2020-03-02',
+                    volume=10.0 * i, last_price=3500.0 + i % 7, bid_price_1=3499.0, ask_price_1=3501.0)
+
+
+class TestTickObjects(unittest.TestCase):
+
+    def test_slots_compatible(self):
+        tick = make_tick(1)
+        self.assertIn('last_price', TickData.__slots__)
+        self.assertIs(tick.vt_symbol, make_tick(2).vt_symbol)
+
+        # 读写 __dict__ 同步到属性
+        d = tick.__dict__
+        self.assertEqual(d['vt_symbol'], 'rb2005.SHFE')
+        self.assertEqual(len(d), 39)
+        d.update({'last_price': 3600.0})
+        tick.__dict__['ask_price_2'] = 3602.0
+        self.assertEqual((tick.last_price, tick.ask_price_2), (3600.0, 3602.0))
+        self.assertEqual(vars(tick)['last_price'], 3600.0)
+        self.assertIs(type(copy.copy(tick.__dict__)), dict)
+
+        # 动态添加的属性
+        tick.openInterest = 5
+        self.assertEqual(tick.__dict__['openInterest'], 5)
+
+        for other in [copy.copy(tick), copy.deepcopy(tick), pickle.loads(pickle.dumps(tick))]:
+            self.assertEqual(other, tick)
+            self.assertEqual(other.__dict__, tick.__dict__)
+            self.assertEqual(other.openInterest, 5)
+
+        self.assertEqual(asdict(tick)['last_price'], 3600.0)
+        self.assertEqual(replace(tick, last_price=1.0).vt_symbol, 'rb2005.SHFE')
+        self.assertEqual(TickData.__new__(TickData).__dict__, {})
+
+        bar = BarData(gateway_name='CTP', symbol='rb2005', exchange=Exchange.SHFE,
+                      datetime=tick.datetime, interval=Interval.MINUTE, close_price=3500.0)
+        self.assertEqual(pickle.loads(pickle.dumps(bar)), bar)
+
+        renko = RenkoBarData(gateway_name='CTP', symbol='rb2005', exchange=Exchange.SHFE,
+                             datetime=tick.datetime, height=5)
+        self.assertEqual(renko.__dict__['height'], 5)
+        self.assertEqual(copy.copy(renko).height, 5)
+        self.assertEqual(pickle.loads(pickle.dumps(renko)), renko)
+
+    def test_day_columns(self):
+        ticks = [make_tick(i) for i in range(3000)]
+        columns = TickDayColumns.from_ticks(ticks[:10])
+        for tick in ticks[10:]:
+            columns.append(tick)
+
+        self.assertEqual(len(columns), 3000)
+        self.assertEqual(columns.nbytes, 3000 * 8 * (len(TickDayColumns.NUM_FIELDS) + 1))
+        self.assertEqual(columns.column('last_price').tolist(), [t.last_price for t in ticks])
+        self.assertEqual(columns[-1], ticks[-1])
+        self.assertEqual(list(columns)[:100], ticks[:100])
+
+        with tempfile.TemporaryDirectory() as folder:
+            file_name = os.path.join(folder, 'rb2005_20200302.tkc')
+            self.assertEqual(columns.save(file_name), 3000)
+            loaded = TickDayColumns.load(file_name)
+            self.assertEqual(loaded.vt_symbol, 'rb2005.SHFE')
+            self.assertEqual(loaded.trading_day, '2020-03-02')
+            self.assertEqual(loaded[1234], ticks[1234])
+
+
+if __name__ == '__main__':
+    unittest.main()
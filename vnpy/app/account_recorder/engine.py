@@ -10,18 +10,19 @@
 6. 监听股票接口的 EVENT_HISTORY_ORDER 事件， 数据 => history_trades
 7. 监听股票接口的 EVENT_FUNDS_FLOW 事件， 数据 => funds_flow
 8. 监听 EVENT_STRATEGY_POS事件，数据 =》 mongodb Account.today_strategy_pos
+写入线程合并同一条记录的多次更新，按批量/时间 bulk_write 写入(见vnpy.data.mongo.write_buffer)
 # 华富资产 李来佳
 
 '''
 
 import sys
+import logging
 import copy
 import traceback
 
 from datetime import datetime, timedelta
-from queue import Queue
+from queue import Queue, Empty
 from threading import Thread
-from time import time
 from bson import binary
 
 from vnpy.event import Event, EventEngine
@@ -44,6 +45,7 @@ from vnpy.trader.event import (
 from vnpy.trader.engine import BaseEngine, MainEngine
 from vnpy.trader.utility import get_trading_date, load_json, save_json
 from vnpy.data.mongo.mongo_data import MongoData
+from vnpy.data.mongo.write_buffer import MongoWriteBuffer
 
 # 入库
 ACCOUNT_DB_NAME = 'Account'
@@ -90,6 +92,11 @@ class AccountRecorder(BaseEngine):
         # mongo数据库
         self.mongo_db = None
 
+        # 写入合并缓冲：批量数量、最长等待秒数
+        self.write_batch_size = 500
+        self.write_flush_interval = 0.5
+        self.write_buffer = None
+
         # 账号的同步记录
         self.account_dict = {}  # gateway_name: setting
 
@@ -121,6 +128,10 @@ class AccountRecorder(BaseEngine):
         # 加载配置文件
         self.load_setting()
 
+        self.write_buffer = MongoWriteBuffer(writer=self.bulk_update,
+                                             batch_size=self.write_batch_size,
+                                             flush_interval=self.write_flush_interval)
+
         # 启动数据库写入线程
         self.start()
 
@@ -142,6 +153,8 @@ class AccountRecorder(BaseEngine):
             mongo_seetting = d.get('mongo_db', {})
             self.mongo_db = MongoData(host=mongo_seetting.get('host', 'localhost'),
                                       port=mongo_seetting.get('port', 27017))
+            self.write_batch_size = mongo_seetting.get('batch_size', self.write_batch_size)
+            self.write_flush_interval = mongo_seetting.get('flush_interval', self.write_flush_interval)
 
             # 获取需要处理处理得账号配置
             self.account_dict = d.get('accounts', {})
@@ -612,27 +625,67 @@ class AccountRecorder(BaseEngine):
         """更新或插入数据到数据库"""
         self.queue.put((db_name, col_name, fld, data))
 
+    # ----------------------------------------------------------------------
+    def bulk_update(self, db_name, col_name, updates):
+        """批量更新或插入数据到数据库"""
+        if self.mongo_db is None:
+            return False
+        return self.mongo_db.db_bulk_update(db_name=db_name,
+                                            col_name=col_name,
+                                            updates=updates,
+                                            upsert=True)
+
+    # ----------------------------------------------------------------------
+    def get_metrics(self):
+        """写入统计：队列长度、待写入记录、合并次数、批量写入耗时"""
+        metrics = self.write_buffer.get_metrics()
+        metrics.update({'queue': self.queue.qsize()})
+        return metrics
+
+    # ----------------------------------------------------------------------
+    def flush_write_buffer(self):
+        """批量写入缓冲中的数据"""
+        for result in self.write_buffer.flush():
+            if result['dropped']:
+                self.write_log(u'{}.{} 记录写入失败,已丢弃:{}'
+                               .format(result['db_name'], result['col_name'], result['error']),
+                               level=logging.ERROR)
+            elif result['error']:
+                self.write_log(u'{}.{} 批量更新{}条数据错误,拆分重写'
+                               .format(result['db_name'], result['col_name'], result['count']))
+            elif not result['success']:
+                self.write_log(u'{}.{} 批量更新{}条失败,待重试'
+                               .format(result['db_name'], result['col_name'], result['count']))
+            elif result['ms'] > 200:
+                self.write_log(u'运行 {}.{} 批量更新{}条 耗时:{}ms >200ms,队列:{}'
+                               .format(result['db_name'], result['col_name'], result['count'],
+                                       result['ms'], self.queue.qsize()))
+
     # ----------------------------------------------------------------------
     def run(self):
-        """运行插入线程"""
+        """运行插入线程：取出队列中的全部更新，合并后按批量/时间写入"""
         while self.active:
             try:
-                db_name, col_name, fld, d = self.queue.get(block=True, timeout=1)
-                t1 = time()
-                self.mongo_db.db_update(db_name=db_name,
-                                        col_name=col_name,
-                                        data_dict=d,
-                                        filter_dict=fld,
-                                        upsert=True)
-                t2 = time()
-                execute_ms = (int(round(t2 * 1000))) - (int(round(t1 * 1000)))
-                if execute_ms > 200:
-                    self.write_log(u'运行 {}.{} 更新 耗时:{}ms >200ms,数据:{}'
-                                   .format(db_name, col_name, execute_ms, d))
+                self.write_buffer.put(*self.queue.get(block=True, timeout=self.write_buffer.flush_interval))
+                while len(self.write_buffer) < self.write_buffer.batch_size:
+                    self.write_buffer.put(*self.queue.get_nowait())
+            except Empty:
+                pass
 
+            try:
+                if self.write_buffer.is_due():
+                    self.flush_write_buffer()
             except Exception as ex:  # noqa
                 pass
 
+        # 退出前写入剩余数据
+        try:
+            while not self.queue.empty():
+                self.write_buffer.put(*self.queue.get_nowait())
+            self.flush_write_buffer()
+        except Exception as ex:  # noqa
+            pass
+
     # ----------------------------------------------------------------------
     def start(self):
         """启动"""
@@ -644,9 +697,9 @@ class AccountRecorder(BaseEngine):
     def stop(self):
         """退出"""
         self.write_log(f'账号记录引擎退出')
-        if self.mongo_db:
-            self.mongo_db = None
-
         if self.active:
             self.active = False
             self.thread.join()
+
+        if self.mongo_db:
+            self.mongo_db = None
@@ -29,8 +29,13 @@ from vnpy.trader.utility import (
     extract_vt_symbol,
 )
 
+from vnpy.trader.replay import ReplayStream
+
 from .back_testing import BackTestingEngine
 
+# 砖图K线的附加字段
+RENKO_COLUMNS = ['seconds', 'high_seconds', 'low_seconds', 'height', 'up_band', 'down_band', 'low_time', 'high_time']
+
 
 class PortfolioTestingEngine(BackTestingEngine):
     """
@@ -48,7 +53,7 @@ class PortfolioTestingEngine(BackTestingEngine):
 
         self.bar_csv_file = {}
         self.bar_df_dict = {}  # 历史数据的df，回测用
-        self.bar_df = None  # 历史数据的df，时间+symbol作为组合索引
+        self.bar_stream = None  # 历史数据按时间+symbol排序的回放数据流
         self.bar_interval_seconds = 60  # bar csv文件，属于K线类型，K线的周期（秒数）,缺省是1分钟
 
         self.tick_path = None  # tick级别回测， 路径
@@ -101,12 +106,18 @@ class PortfolioTestingEngine(BackTestingEngine):
 
     def comine_bar_df(self):
         """
-        合并所有回测合约的bar DataFrame =》集中的DataFrame
-        把bar_df_dict =》bar_df
+        合并所有回测合约的bar DataFrame =》按时间排序的回放数据流
+        把bar_df_dict =》bar_stream
         :return:
         """
         self.output('comine_df')
-        self.bar_df = pd.concat(self.bar_df_dict, axis=0).swaplevel(0, 1).sort_index()
+        columns = [('open', 'open_price'), ('high', 'high_price'), ('low', 'low_price'), ('close', 'close_price'),
+                   'volume', 'trading_day']
+        defaults = {'trading_day': ''}
+        if any(vt_symbol.startswith('future_renko') for vt_symbol in self.bar_df_dict.keys()):
+            columns.extend(RENKO_COLUMNS)
+            defaults.update({name: 0 for name in RENKO_COLUMNS if not name.endswith('_time')})
+        self.bar_stream = ReplayStream(self.bar_df_dict, columns, defaults=defaults)
         self.bar_df_dict.clear()
 
     def prepare_env(self, test_setting):
@@ -203,8 +214,10 @@ class PortfolioTestingEngine(BackTestingEngine):
         gc_collect_days = 0
 
         try:
-            for (dt, vt_symbol), bar_data in self.bar_df.iterrows():
-                symbol, exchange = extract_vt_symbol(vt_symbol)
+            symbol_exchanges = {vt_symbol: extract_vt_symbol(vt_symbol) for vt_symbol in self.bar_stream.keys}
+            for dt, vt_symbol, open_price, high_price, low_price, close_price, volume, trading_day, *renko_data \
+                    in self.bar_stream:
+                symbol, exchange = symbol_exchanges[vt_symbol]
                 if symbol.startswith('future_renko'):
                     bar_datetime = dt
                     bar = RenkoBarData(
@@ -213,14 +226,15 @@ class PortfolioTestingEngine(BackTestingEngine):
                         exchange=exchange,
                         datetime=bar_datetime
                     )
-                    bar.seconds = float(bar_data.get('seconds', 0))
-                    bar.high_seconds = float(bar_data.get('high_seconds', 0))  # 当前Bar的上限秒数
-                    bar.low_seconds = float(bar_data.get('low_seconds', 0))  # 当前bar的下限秒数
-                    bar.height = float(bar_data.get('height', 0))  # 当前Bar的高度限制
-                    bar.up_band = float(bar_data.get('up_band', 0))  # 高位区域的基线
-                    bar.down_band = float(bar_data.get('down_band', 0))  # 低位区域的基线
-                    bar.low_time = bar_data.get('low_time', None)  # 最后一次进入低位区域的时间
-                    bar.high_time = bar_data.get('high_time', None)  # 最后一次进入高位区域的时间
+                    seconds, high_seconds, low_seconds, height, up_band, down_band, low_time, high_time = renko_data
+                    bar.seconds = float(seconds)
+                    bar.high_seconds = float(high_seconds)  # 当前Bar的上限秒数
+                    bar.low_seconds = float(low_seconds)  # 当前bar的下限秒数
+                    bar.height = float(height)  # 当前Bar的高度限制
+                    bar.up_band = float(up_band)  # 高位区域的基线
+                    bar.down_band = float(down_band)  # 低位区域的基线
+                    bar.low_time = low_time  # 最后一次进入低位区域的时间
+                    bar.high_time = high_time  # 最后一次进入高位区域的时间
                 else:
                     bar_datetime = dt - timedelta(seconds=self.bar_interval_seconds)
 
@@ -230,21 +244,15 @@ class PortfolioTestingEngine(BackTestingEngine):
                         exchange=exchange,
                         datetime=bar_datetime
                     )
-                if 'open' in bar_data:
-                    bar.open_price = float(bar_data['open'])
-                    bar.close_price = float(bar_data['close'])
-                    bar.high_price = float(bar_data['high'])
-                    bar.low_price = float(bar_data['low'])
-                else:
-                    bar.open_price = float(bar_data['open_price'])
-                    bar.close_price = float(bar_data['close_price'])
-                    bar.high_price = float(bar_data['high_price'])
-                    bar.low_price = float(bar_data['low_price'])
 
-                bar.volume = int(bar_data['volume'])
+                bar.open_price = float(open_price)
+                bar.close_price = float(close_price)
+                bar.high_price = float(high_price)
+                bar.low_price = float(low_price)
+                bar.volume = int(volume)
                 bar.date = dt.strftime('%Y-%m-%d')
                 bar.time = dt.strftime('%H:%M:%S')
-                str_td = str(bar_data.get('trading_day', ''))
+                str_td = str(trading_day)
                 if len(str_td) == 8:
                     bar.trading_day = str_td[0:4] + '-' + str_td[4:6] + '-' + str_td[6:8]
                 else:
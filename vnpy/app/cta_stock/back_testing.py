@@ -63,8 +63,11 @@ from vnpy.trader.utility import (
     get_stock_exchange
 )
 from vnpy.data.stock.adjust_factor import get_all_adjust_factor
+from vnpy.data.stock.adjust_bar import AdjustBarStore, adjust_bar_df
 
 from vnpy.trader.util_logger import setup_logger
+from vnpy.trader.order_book import StopOrderBook, LimitOrderBook
+from vnpy.trader.position_ledger import PositionLedger
 from vnpy.data.mongo.mongo_data import MongoData
 from uuid import uuid1
 
@@ -112,6 +115,7 @@ class BackTestingEngine(object):
 
         # 回测数据相关
         self.adjust_factors = {}  # 复权因子
+        self.adjust_bar_store = None  # 复权K线缓存
         self.slippage = {}  # 回测时假设的滑点
         self.commission_rate = {}  # 回测时假设的佣金比例（适用于百分比佣金）
         self.fix_commission = {}  # 每手固定手续费
@@ -125,11 +129,11 @@ class BackTestingEngine(object):
 
         self.stop_order_count = 0  # 本地停止单编号
         self.stop_orders = {}  # 本地停止单
-        self.active_stop_orders = {}  # 活动本地停止单
+        self.active_stop_orders = StopOrderBook()  # 活动本地停止单, 按合约、方向、价格索引
 
         self.limit_order_count = 0  # 限价单编号
         self.limit_orders = OrderedDict()  # 限价单字典
-        self.active_limit_orders = OrderedDict()  # 活动限价单字典，用于进行撮合用
+        self.active_limit_orders = LimitOrderBook()  # 活动限价单字典，用于进行撮合用，按合约、方向、价格索引
 
         self.order_strategy_dict = {}  # orderid 与 strategy的映射
 
@@ -138,7 +142,7 @@ class BackTestingEngine(object):
         self.trades = OrderedDict()  # 记录所有得成交记录
         self.trade_pnl_list = []  # 交易记录列表
 
-        self.long_position_list = []  # 多单持仓
+        self.long_position_list = PositionLedger()  # 多单持仓，按合约+策略先开先平
 
         self.positions = {}  # 账号持仓，对象为PositionData
 
@@ -480,6 +484,10 @@ class BackTestingEngine(object):
 
         print(f'数据输出目录:{self.data_path}')
 
+        # 复权K线缓存目录，多个回测可指定同一个目录共享，设置为空时不使用缓存
+        adjust_bar_path = test_setting.get('adjust_bar_path', os.path.join(self.data_path, 'adjust_bar'))
+        self.adjust_bar_store = AdjustBarStore(adjust_bar_path) if adjust_bar_path else None
+
         # 更新日志目录
         if 'logs_path' in test_setting:
             self.logs_path = os.path.abspath(os.path.join(test_setting.get('logs_path'), self.test_name))
@@ -590,31 +598,9 @@ class BackTestingEngine(object):
         :return:
         """
 
-        if adj_type == 'fore':
-            adj_factor = adj_data["foreAdjustFactor"]
-            adj_factor = adj_factor / adj_factor.iloc[-1]  # 保证最后一个复权因子是1
-        else:
-            adj_factor = adj_data["backAdjustFactor"]
-            adj_factor = adj_factor / adj_factor.iloc[0]  # 保证第一个复权因子是1
-
-        # 把raw_data的第一个日期，插入复权因子df，使用后填充
-        if adj_factor.index[0] != raw_data.index[0]:
-            adj_factor.loc[raw_data.index[0]] = np.nan
-        adj_factor.sort_index(inplace=True)
-        adj_factor = adj_factor.ffill()
-
-        adj_factor = adj_factor.reindex(index=raw_data.index)  # 按价格dataframe的日期索引来扩展索引
-        adj_factor = adj_factor.ffill()  # 向前（向未来）填充扩展后的空单元格
-
-        # 把复权因子，作为adj字段，补充到raw_data中
-        raw_data['adj'] = adj_factor
-
-        # 逐一复权高低开平和成交量
-        for col in ['open', 'high', 'low', 'close']:
-            raw_data[col] = raw_data[col] * raw_data['adj']  # 价格乘上复权系数
-        raw_data['volume'] = raw_data['volume'] / raw_data['adj']  # 成交量除以复权系数
-
-        return raw_data
+        # 复权因子对齐到K线时间，作为adj字段，补充到raw_data中
+        # 逐一复权高低开平和成交量：价格乘上复权系数，成交量除以复权系数
+        return adjust_bar_df(raw_data, adj_data, adj_type)
 
     def new_tick(self, tick):
         """新得tick"""
@@ -1042,39 +1028,35 @@ class BackTestingEngine(object):
         """
         vt_symbol = bar.vt_symbol if bar else tick.vt_symbol
 
-        for stop_orderid in list(self.active_stop_orders.keys()):
-            stop_order = self.active_stop_orders[stop_orderid]
+        # 若买入方向停止单价格高于等于该价格，则会触发
+        if bar:
+            long_cross_price = round_to(value=bar.low_price, target=self.get_price_tick(vt_symbol))
+            long_cross_price -= self.get_price_tick(vt_symbol)
+            # 若卖出方向停止单价格低于等于该价格，则会触发
+            sell_cross_price = round_to(value=bar.high_price, target=self.get_price_tick(vt_symbol))
+            sell_cross_price += self.get_price_tick(vt_symbol)
+            # 在当前时间点前发出的买入委托可能的最优成交价
+            long_best_price = round_to(value=bar.open_price,
+                                       target=self.get_price_tick(vt_symbol)) + self.get_price_tick(vt_symbol)
+
+            # 在当前时间点前发出的卖出委托可能的最优成交价
+            sell_best_price = round_to(value=bar.open_price,
+                                       target=self.get_price_tick(vt_symbol)) - self.get_price_tick(vt_symbol)
+        else:
+            long_cross_price = tick.last_price
+            sell_cross_price = tick.last_price
+            long_best_price = tick.last_price
+            sell_best_price = tick.last_price
+
+        # 只取出触发价被穿越的停止单
+        for stop_order in self.active_stop_orders.get_triggered(vt_symbol, long_cross_price, sell_cross_price):
+            stop_orderid = stop_order.stop_orderid
             strategy = self.order_strategy_dict.get(stop_orderid, None)
-            if stop_order.vt_symbol != vt_symbol or stop_order is None or strategy is None:
+            # 可能已在前面停止单的回调中被撤销
+            if stop_orderid not in self.active_stop_orders or strategy is None:
                 continue
 
-            # 若买入方向停止单价格高于等于该价格，则会触发
-            if bar:
-                long_cross_price = round_to(value=bar.low_price, target=self.get_price_tick(vt_symbol))
-                long_cross_price -= self.get_price_tick(vt_symbol)
-                # 若卖出方向停止单价格低于等于该价格，则会触发
-                sell_cross_price = round_to(value=bar.high_price, target=self.get_price_tick(vt_symbol))
-                sell_cross_price += self.get_price_tick(vt_symbol)
-                # 在当前时间点前发出的买入委托可能的最优成交价
-                long_best_price = round_to(value=bar.open_price,
-                                           target=self.get_price_tick(vt_symbol)) + self.get_price_tick(vt_symbol)
-
-                # 在当前时间点前发出的卖出委托可能的最优成交价
-                sell_best_price = round_to(value=bar.open_price,
-                                           target=self.get_price_tick(vt_symbol)) - self.get_price_tick(vt_symbol)
-            else:
-                long_cross_price = tick.last_price
-                sell_cross_price = tick.last_price
-                long_best_price = tick.last_price
-                sell_best_price = tick.last_price
-
-            # Check whether stop order can be triggered.
-            long_cross = stop_order.direction == Direction.LONG and stop_order.price <= long_cross_price
-
-            sell_cross = stop_order.direction == Direction.SHORT and stop_order.price >= sell_cross_price
-
-            if not long_cross and not sell_cross:
-                continue
+            long_cross = stop_order.direction == Direction.LONG
 
             # Create order data.
             self.limit_order_count += 1
@@ -1148,105 +1130,104 @@ class BackTestingEngine(object):
 
         vt_symbol = bar.vt_symbol if bar else tick.vt_symbol
 
-        # 遍历限价单字典中的所有限价单
-        for vt_orderid in list(self.active_limit_orders.keys()):
-            order = self.active_limit_orders.get(vt_orderid, None)
-            if order.vt_symbol != vt_symbol:
+        # 本根bar/tick的成交价格
+        if bar:
+            price_tick = self.get_price_tick(vt_symbol)
+
+            buy_cross_price = round_to(value=bar.low_price, target=price_tick) + price_tick  # 若买入方向限价单价格高于该价格，则会成交
+            sell_cross_price = round_to(value=bar.high_price,
+                                        target=price_tick) - price_tick  # 若卖出方向限价单价格低于该价格，则会成交
+            buy_best_cross_price = round_to(value=bar.open_price,
+                                            target=price_tick) + price_tick  # 在当前时间点前发出的买入委托可能的最优成交价
+            sell_best_cross_price = round_to(value=bar.open_price,
+                                             target=price_tick) - price_tick  # 在当前时间点前发出的卖出委托可能的最优成交价
+        else:
+            buy_cross_price = tick.last_price
+            sell_cross_price = tick.last_price
+            buy_best_cross_price = tick.last_price
+            sell_best_cross_price = tick.last_price
+
+        # 只取出价格被穿越、会成交的限价单
+        for order in self.active_limit_orders.get_crossed(vt_symbol, buy_cross_price, sell_cross_price):
+            vt_orderid = order.vt_orderid
+            # 可能已在前面委托的回调中被撤销
+            if vt_orderid not in self.active_limit_orders:
                 continue
 
             strategy = self.order_strategy_dict.get(order.vt_orderid, None)
             if strategy is None:
                 self.write_error(u'找不到vt_orderid:{}对应的策略'.format(order.vt_orderid))
                 continue
-            if bar:
-                price_tick = self.get_price_tick(vt_symbol)
-
-                buy_cross_price = round_to(value=bar.low_price, target=price_tick) + price_tick  # 若买入方向限价单价格高于该价格，则会成交
-                sell_cross_price = round_to(value=bar.high_price,
-                                            target=price_tick) - price_tick  # 若卖出方向限价单价格低于该价格，则会成交
-                buy_best_cross_price = round_to(value=bar.open_price,
-                                                target=price_tick) + price_tick  # 在当前时间点前发出的买入委托可能的最优成交价
-                sell_best_cross_price = round_to(value=bar.open_price,
-                                                 target=price_tick) - price_tick  # 在当前时间点前发出的卖出委托可能的最优成交价
-            else:
-                buy_cross_price = tick.last_price
-                sell_cross_price = tick.last_price
-                buy_best_cross_price = tick.last_price
-                sell_best_cross_price = tick.last_price
 
-            # 判断是否会成交
-            buy_cross = order.direction == Direction.LONG and order.price >= buy_cross_price
-            sell_cross = order.direction == Direction.SHORT and order.price <= sell_cross_price
+            buy_cross = order.direction == Direction.LONG
 
-            # 如果发生了成交
-            if buy_cross or sell_cross:
-                # 推送成交数据
-                self.trade_count += 1  # 成交编号自增1
+            # 推送成交数据
+            self.trade_count += 1  # 成交编号自增1
 
-                trade_id = str(self.trade_count)
-                symbol, exchange = extract_vt_symbol(vt_symbol)
-                trade = TradeData(
-                    gateway_name=self.gateway_name,
-                    symbol=symbol,
-                    exchange=exchange,
-                    tradeid=trade_id,
-                    orderid=order.orderid,
-                    direction=order.direction,
-                    offset=order.offset,
-                    volume=order.volume,
-                    time=self.last_dt.strftime("%Y-%m-%d %H:%M:%S"),
-                    datetime=self.last_dt
-                )
-
-                # 以买入为例：
-                # 1. 假设当根K线的OHLC分别为：100, 125, 90, 110
-                # 2. 假设在上一根K线结束(也是当前K线开始)的时刻，策略发出的委托为限价105
-                # 3. 则在实际中的成交价会是100而不是105，因为委托发出时市场的最优价格是100
-                if buy_cross:
-                    trade_price = min(order.price, buy_best_cross_price)
+            trade_id = str(self.trade_count)
+            symbol, exchange = extract_vt_symbol(vt_symbol)
+            trade = TradeData(
+                gateway_name=self.gateway_name,
+                symbol=symbol,
+                exchange=exchange,
+                tradeid=trade_id,
+                orderid=order.orderid,
+                direction=order.direction,
+                offset=order.offset,
+                volume=order.volume,
+                time=self.last_dt.strftime("%Y-%m-%d %H:%M:%S"),
+                datetime=self.last_dt
+            )
 
-                else:
-                    trade_price = max(order.price, sell_best_cross_price)
-                trade.price = trade_price
+            # 以买入为例：
+            # 1. 假设当根K线的OHLC分别为：100, 125, 90, 110
+            # 2. 假设在上一根K线结束(也是当前K线开始)的时刻，策略发出的委托为限价105
+            # 3. 则在实际中的成交价会是100而不是105，因为委托发出时市场的最优价格是100
+            if buy_cross:
+                trade_price = min(order.price, buy_best_cross_price)
 
-                # 记录该合约来自哪个策略实例
-                trade.strategy_name = strategy.strategy_name
+            else:
+                trade_price = max(order.price, sell_best_cross_price)
+            trade.price = trade_price
 
-                # 更新持仓缓存数据
-                pos = self.get_position(vt_symbol=trade.vt_symbol, direction=Direction.NET)
-                pre_volume = pos.volume
-                if trade.direction == Direction.LONG:
-                    pos.volume = round(pos.volume + trade.volume, 7)
-                else:
-                    pos.volume = round(pos.volume - trade.volume, 7)
-                self.write_log(f'{trade.vt_symbol} volume:{pre_volume} => {pos.volume}')
+            # 记录该合约来自哪个策略实例
+            trade.strategy_name = strategy.strategy_name
 
-                self.trade_dict[trade.vt_tradeid] = trade
-                self.trades[trade.vt_tradeid] = copy.copy(trade)
-                self.write_log(u'vt_trade_id:{0}'.format(trade.vt_tradeid))
+            # 更新持仓缓存数据
+            pos = self.get_position(vt_symbol=trade.vt_symbol, direction=Direction.NET)
+            pre_volume = pos.volume
+            if trade.direction == Direction.LONG:
+                pos.volume = round(pos.volume + trade.volume, 7)
+            else:
+                pos.volume = round(pos.volume - trade.volume, 7)
+            self.write_log(f'{trade.vt_symbol} volume:{pre_volume} => {pos.volume}')
+
+            self.trade_dict[trade.vt_tradeid] = trade
+            self.trades[trade.vt_tradeid] = copy.copy(trade)
+            self.write_log(u'vt_trade_id:{0}'.format(trade.vt_tradeid))
 
-                self.write_log(u'{} : crossLimitOrder: TradeId:{}'.format(trade.strategy_name,
-                                                                          trade.tradeid,
-                                                                          ))
+            self.write_log(u'{} : crossLimitOrder: TradeId:{}'.format(trade.strategy_name,
+                                                                      trade.tradeid,
+                                                                      ))
 
-                # 写入交易记录
-                self.append_trade(trade)
+            # 写入交易记录
+            self.append_trade(trade)
 
-                strategy.on_trade(trade)
+            strategy.on_trade(trade)
 
-                # 更新资金曲线
-                fund_kline = self.get_fund_kline(trade.strategy_name)
-                if fund_kline:
-                    fund_kline.update_trade(trade)
+            # 更新资金曲线
+            fund_kline = self.get_fund_kline(trade.strategy_name)
+            if fund_kline:
+                fund_kline.update_trade(trade)
 
-                # 推送委托数据
-                order.traded = order.volume
-                order.status = Status.ALLTRADED
+            # 推送委托数据
+            order.traded = order.volume
+            order.status = Status.ALLTRADED
 
-                strategy.on_order(order)
+            strategy.on_order(order)
 
-                # 从字典中删除该限价单
-                self.active_limit_orders.pop(vt_orderid, None)
+            # 从字典中删除该限价单
+            self.active_limit_orders.pop(vt_orderid, None)
 
         # 实时计算模式
         self.realtime_calculate()
@@ -1396,20 +1377,18 @@ class BackTestingEngine(object):
                         raise RuntimeError(u'realtimeCalculate2() Exception,没有开多单')
                         return
 
-                    pop_indexs = [i for i, val in enumerate(self.long_position_list) if
-                                  val.vt_symbol == trade.vt_symbol and val.strategy_name == trade.strategy_name]
-                    if len(pop_indexs) < 1:
+                    open_volume = self.long_position_list.get_volume(trade.vt_symbol, trade.strategy_name)
+                    if open_volume <= 0:
                         self.write_error(f'没有{trade.strategy_name}对应的symbol{trade.vt_symbol}多单数据,')
                         raise RuntimeError(
                             f'realtimeCalculate2() Exception,没有对应的symbol{trade.vt_symbol}多单数据,')
                         return
 
-                    cur_long_pos_list = [s_pos.volume for s_pos in self.long_position_list]
+                    cur_long_pos_volume = self.long_position_list.get_volume(trade.vt_symbol, trade.strategy_name)
 
-                    self.write_log(u'{}当前多单:{}'.format(trade.vt_symbol, cur_long_pos_list))
+                    self.write_log(u'{}当前多单:{}'.format(trade.vt_symbol, cur_long_pos_volume))
 
-                    pop_index = pop_indexs[0]
-                    open_trade = self.long_position_list.pop(pop_index)
+                    open_trade = self.long_position_list.pop_first(trade.vt_symbol, trade.strategy_name)
                     # 开多volume，不大于平仓volume
                     if sell_volume >= open_trade.volume:
                         self.write_log(f'{open_trade.vt_symbol},Sell Volume:{sell_volume} 满足:{open_trade.volume}')
@@ -1534,15 +1513,9 @@ class BackTestingEngine(object):
                     self.write_log(u'组合净盈亏:{0}'.format(g_result.pnl))
 
         # 计算仓位比例
-        holding_cost = 0.0  # 持仓成本
+        holding_cost = self.long_position_list.cost  # 持仓成本(台账累计，无需遍历每一笔开仓)
         long_pos_dict = {}
 
-        if len(self.long_position_list) > 0:
-            for t in self.long_position_list:
-                # 当前持仓的成本
-                cur_holding_cost = t.price * t.volume
-                holding_cost = holding_cost + cur_holding_cost
-
         # 可用资金 = 当前净值 - 占用保证金
         self.avaliable = self.net_capital - holding_cost
         # 当前成本占比
@@ -1612,7 +1585,8 @@ class BackTestingEngine(object):
             strategy_pnl.update({strategy: self.pnl_strategy_dict.get(strategy, 0)})
 
         positionMsg = ""
-        for longpos in self.long_position_list:
+        # 按合约+策略汇总的持仓(持仓均价、数量)，无需遍历每一笔开仓
+        for longpos in self.long_position_list.get_positions():
             symbol = longpos.vt_symbol
             # 计算持仓浮盈浮亏/占用保证金
             holding_profit = 0
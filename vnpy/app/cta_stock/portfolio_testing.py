@@ -33,8 +33,15 @@ from vnpy.trader.utility import (
     extract_vt_symbol,
 )
 
+from vnpy.trader.tick_cache import load_day_tick_cache
+from vnpy.trader.replay import ReplayStream
+from vnpy.data.stock.adjust_bar import get_adjust_records
+
 from .back_testing import BackTestingEngine
 
+# 砖图K线的附加字段
+RENKO_COLUMNS = ['seconds', 'high_seconds', 'low_seconds', 'height', 'up_band', 'down_band', 'low_time', 'high_time']
+
 
 class PortfolioTestingEngine(BackTestingEngine):
     """
@@ -52,7 +59,7 @@ class PortfolioTestingEngine(BackTestingEngine):
 
         self.bar_csv_file = {}
         self.bar_df_dict = {}  # 历史数据的df，回测用
-        self.bar_df = None  # 历史数据的df，时间+symbol作为组合索引
+        self.bar_stream = None  # 历史数据按时间+symbol排序的回放数据流
         self.bar_interval_seconds = 60  # bar csv文件，属于K线类型，K线的周期（秒数）,缺省是1分钟
 
         self.tick_path = None  # tick级别回测， 路径
@@ -93,31 +100,37 @@ class PortfolioTestingEngine(BackTestingEngine):
                 "date": str,
                 "time": str
             }
-            # 加载csv文件 =》 dateframe
-            symbol_df = pd.read_csv(bar_file, dtype=data_types)
-            # 转换时间，str =》 datetime
-            symbol_df["datetime"] = pd.to_datetime(symbol_df["datetime"], format="%Y-%m-%d %H:%M:%S")
-            # 设置时间为索引
-            symbol_df = symbol_df.set_index("datetime")
-
-            # 裁剪数据
-            symbol_df = symbol_df.loc[self.test_start_date:self.test_end_date]
-
-            # 复权转换
+            # 复权记录
             adj_list = self.adjust_factors.get(vt_symbol, [])
             # 按照结束日期，裁剪复权记录
             adj_list = [row for row in adj_list if row['dividOperateDate'].replace('-', '') <= self.test_end_date]
+            # list -> dataframe, 转换复权日期格式
+            adj_data = get_adjust_records(adj_list) if adj_list else None
+
+            # 优先从复权K线缓存加载
+            symbol_df = None
+            if self.adjust_bar_store:
+                symbol_df = self.adjust_bar_store.load(vt_symbol, bar_file, adj_data, adj_type='fore')
+
+            if symbol_df is None:
+                # 加载csv文件 =》 dateframe
+                symbol_df = pd.read_csv(bar_file, dtype=data_types)
+                # 转换时间，str =》 datetime
+                symbol_df["datetime"] = pd.to_datetime(symbol_df["datetime"], format="%Y-%m-%d %H:%M:%S")
+                # 设置时间为索引
+                symbol_df = symbol_df.set_index("datetime")
+
+                # 复权转换, 按日期对齐K线，整个文件复权后再裁剪，结果相同
+                if adj_data is not None:
+                    self.write_log(f'需要对{vt_symbol}进行前复权处理')
+                    # 调用转换方法，对open,high,low,close, volume进行复权, fore, 前复权， 其他，后复权
+                    symbol_df = self.stock_to_adj(symbol_df, adj_data, adj_type='fore')
+
+                if self.adjust_bar_store:
+                    self.adjust_bar_store.save(vt_symbol, bar_file, adj_data, adj_type='fore', df=symbol_df)
 
-            if adj_list:
-                self.write_log(f'需要对{vt_symbol}进行前复权处理')
-                for row in adj_list:
-                    row.update({'dividOperateDate': row.get('dividOperateDate') + ' 09:31:00'})
-                # list -> dataframe, 转换复权日期格式
-                adj_data = pd.DataFrame(adj_list)
-                adj_data["dividOperateDate"] = pd.to_datetime(adj_data["dividOperateDate"], format="%Y-%m-%d %H:%M:%S")
-                adj_data = adj_data.set_index("dividOperateDate")
-                # 调用转换方法，对open,high,low,close, volume进行复权, fore, 前复权， 其他，后复权
-                symbol_df = self.stock_to_adj(symbol_df, adj_data, adj_type='fore')
+            # 裁剪数据
+            symbol_df = symbol_df.loc[self.test_start_date:self.test_end_date]
 
             # 添加到待合并dataframe dict中
             self.bar_df_dict.update({vt_symbol: symbol_df})
@@ -131,12 +144,18 @@ class PortfolioTestingEngine(BackTestingEngine):
 
     def comine_bar_df(self):
         """
-        合并所有回测合约的bar DataFrame =》集中的DataFrame
-        把bar_df_dict =》bar_df
+        合并所有回测合约的bar DataFrame =》按时间排序的回放数据流
+        把bar_df_dict =》bar_stream
         :return:
         """
         self.output('comine_df')
-        self.bar_df = pd.concat(self.bar_df_dict, axis=0).swaplevel(0, 1).sort_index()
+        columns = [('open', 'open_price'), ('high', 'high_price'), ('low', 'low_price'), ('close', 'close_price'),
+                   'volume', 'trading_day']
+        defaults = {'trading_day': ''}
+        if any(vt_symbol.startswith('future_renko') for vt_symbol in self.bar_df_dict.keys()):
+            columns.extend(RENKO_COLUMNS)
+            defaults.update({name: 0 for name in RENKO_COLUMNS if not name.endswith('_time')})
+        self.bar_stream = ReplayStream(self.bar_df_dict, columns, defaults=defaults)
         self.bar_df_dict.clear()
 
     def prepare_env(self, test_setting):
@@ -239,8 +258,10 @@ class PortfolioTestingEngine(BackTestingEngine):
         gc_collect_days = 0
 
         try:
-            for (dt, vt_symbol), bar_data in self.bar_df.iterrows():
-                symbol, exchange = extract_vt_symbol(vt_symbol)
+            symbol_exchanges = {vt_symbol: extract_vt_symbol(vt_symbol) for vt_symbol in self.bar_stream.keys}
+            for dt, vt_symbol, open_price, high_price, low_price, close_price, volume, trading_day, *renko_data \
+                    in self.bar_stream:
+                symbol, exchange = symbol_exchanges[vt_symbol]
                 if symbol.startswith('future_renko'):
                     bar_datetime = dt
                     bar = RenkoBarData(
@@ -249,14 +270,15 @@ class PortfolioTestingEngine(BackTestingEngine):
                         exchange=exchange,
                         datetime=bar_datetime
                     )
-                    bar.seconds = float(bar_data.get('seconds', 0))
-                    bar.high_seconds = float(bar_data.get('high_seconds', 0))  # 当前Bar的上限秒数
-                    bar.low_seconds = float(bar_data.get('low_seconds', 0))  # 当前bar的下限秒数
-                    bar.height = float(bar_data.get('height', 0))  # 当前Bar的高度限制
-                    bar.up_band = float(bar_data.get('up_band', 0))  # 高位区域的基线
-                    bar.down_band = float(bar_data.get('down_band', 0))  # 低位区域的基线
-                    bar.low_time = bar_data.get('low_time', None)  # 最后一次进入低位区域的时间
-                    bar.high_time = bar_data.get('high_time', None)  # 最后一次进入高位区域的时间
+                    seconds, high_seconds, low_seconds, height, up_band, down_band, low_time, high_time = renko_data
+                    bar.seconds = float(seconds)
+                    bar.high_seconds = float(high_seconds)  # 当前Bar的上限秒数
+                    bar.low_seconds = float(low_seconds)  # 当前bar的下限秒数
+                    bar.height = float(height)  # 当前Bar的高度限制
+                    bar.up_band = float(up_band)  # 高位区域的基线
+                    bar.down_band = float(down_band)  # 低位区域的基线
+                    bar.low_time = low_time  # 最后一次进入低位区域的时间
+                    bar.high_time = high_time  # 最后一次进入高位区域的时间
                 else:
                     bar_datetime = dt - timedelta(seconds=self.bar_interval_seconds)
 
@@ -266,21 +288,15 @@ class PortfolioTestingEngine(BackTestingEngine):
                         exchange=exchange,
                         datetime=bar_datetime
                     )
-                if 'open' in bar_data:
-                    bar.open_price = float(bar_data['open'])
-                    bar.close_price = float(bar_data['close'])
-                    bar.high_price = float(bar_data['high'])
-                    bar.low_price = float(bar_data['low'])
-                else:
-                    bar.open_price = float(bar_data['open_price'])
-                    bar.close_price = float(bar_data['close_price'])
-                    bar.high_price = float(bar_data['high_price'])
-                    bar.low_price = float(bar_data['low_price'])
 
-                bar.volume = int(bar_data['volume'])
+                bar.open_price = float(open_price)
+                bar.close_price = float(close_price)
+                bar.high_price = float(high_price)
+                bar.low_price = float(low_price)
+                bar.volume = int(volume)
                 bar.date = dt.strftime('%Y-%m-%d')
                 bar.time = dt.strftime('%H:%M:%S')
-                str_td = str(bar_data.get('trading_day', ''))
+                str_td = str(trading_day)
                 if len(str_td) == 8:
                     bar.trading_day = str_td[0:4] + '-' + str_td[4:6] + '-' + str_td[6:8]
                 else:
@@ -364,26 +380,40 @@ class PortfolioTestingEngine(BackTestingEngine):
 
         return None
 
-    def get_day_tick_df(self, test_day):
-        """获取某一天得所有合约tick"""
+    def get_day_tick_dict(self, test_day):
+        """获取某一天得所有合约tick, {vt_symbol: DataFrame}"""
         tick_data_dict = {}
 
         for vt_symbol in list(self.symbol_strategy_map.keys()):
             symbol, exchange = extract_vt_symbol(vt_symbol)
-            tick_list = self.load_bz2_cache(cache_folder=self.tick_path,
-                                            cache_symbol=symbol,
-                                            cache_date=test_day.strftime('%Y%m%d'))
-            if not tick_list or len(tick_list) == 0:
+            # 优先使用列式缓存(已去重)，没有时再读取bz2缓存
+            symbol_tick_df = load_day_tick_cache(cache_folder=self.tick_path,
+                                                 cache_symbol=symbol,
+                                                 cache_date=test_day.strftime('%Y%m%d'),
+                                                 on_error=self.write_error)
+            if symbol_tick_df is None:
+                tick_list = self.load_bz2_cache(cache_folder=self.tick_path,
+                                                cache_symbol=symbol,
+                                                cache_date=test_day.strftime('%Y%m%d'))
+                if not tick_list or len(tick_list) == 0:
+                    continue
+
+                symbol_tick_df = pd.DataFrame(tick_list)
+                # 缓存文件中，datetime字段，已经是datetime格式
+                # 暂时根据时间去重，没有汇总volume
+                symbol_tick_df.drop_duplicates(subset=['datetime'], keep='first', inplace=True)
+            elif len(symbol_tick_df) == 0:
                 continue
 
-            symbol_tick_df = pd.DataFrame(tick_list)
-            # 缓存文件中，datetime字段，已经是datetime格式
-            # 暂时根据时间去重，没有汇总volume
-            symbol_tick_df.drop_duplicates(subset=['datetime'], keep='first', inplace=True)
             symbol_tick_df.set_index('datetime', inplace=True)
 
             tick_data_dict.update({vt_symbol: symbol_tick_df})
 
+        return tick_data_dict
+
+    def get_day_tick_df(self, test_day):
+        """获取某一天得所有合约tick"""
+        tick_data_dict = self.get_day_tick_dict(test_day)
         if len(tick_data_dict) == 0:
             return None
 
@@ -391,6 +421,14 @@ class PortfolioTestingEngine(BackTestingEngine):
 
         return tick_df
 
+    def get_day_tick_stream(self, test_day):
+        """获取某一天得所有合约tick，按时间排序的回放数据流"""
+        tick_data_dict = self.get_day_tick_dict(test_day)
+        if len(tick_data_dict) == 0:
+            return None
+
+        return ReplayStream(tick_data_dict, ['price', 'volume'])
+
     def run_tick_test(self):
         """运行tick级别组合回测"""
         testdays = (self.data_end_date - self.data_start_date).days
@@ -405,14 +443,15 @@ class PortfolioTestingEngine(BackTestingEngine):
         for i in range(0, testdays):
             test_day = self.data_start_date + timedelta(days=i)
 
-            combined_df = self.get_day_tick_df(test_day)
+            tick_stream = self.get_day_tick_stream(test_day)
 
-            if combined_df is None:
+            if tick_stream is None:
                 continue
 
             try:
-                for (dt, vt_symbol), tick_data in combined_df.iterrows():
-                    symbol, exchange = extract_vt_symbol(vt_symbol)
+                symbol_exchanges = {vt_symbol: extract_vt_symbol(vt_symbol) for vt_symbol in tick_stream.keys}
+                for dt, vt_symbol, price, volume in tick_stream:
+                    symbol, exchange = symbol_exchanges[vt_symbol]
                     tick = TickData(
                         gateway_name='backtesting',
                         symbol=symbol,
@@ -421,8 +460,8 @@ class PortfolioTestingEngine(BackTestingEngine):
                         date=dt.strftime('%Y-%m-%d'),
                         time=dt.strftime('%H:%M:%S.%f'),
                         trading_day=test_day.strftime('%Y-%m-%d'),
-                        last_price=tick_data['price'],
-                        volume=tick_data['volume']
+                        last_price=price,
+                        volume=volume
                     )
 
                     self.new_tick(tick)
@@ -5,7 +5,6 @@ import uuid
 import bz2
 import pickle
 import traceback
-import zlib
 import json
 from abc import ABC
 from copy import copy
@@ -20,6 +19,7 @@ from .base import StopOrder,EngineType
 from vnpy.component.cta_grid_trade import CtaGrid, CtaGridTrade
 from vnpy.component.cta_position import CtaPosition
 from vnpy.component.cta_policy import CtaPolicy
+from vnpy.component.cta_kline_store import KlineStore, pack_klines_snapshot
 
 class CtaTemplate(ABC):
     """CTA股票策略模板"""
@@ -432,6 +432,7 @@ class CtaStockTemplate(CtaTemplate):
         self.policy = None  # 事务执行组件
         self.gt = None  # 网格交易组件（使用了dn_grids，作为买入/持仓/卖出任务）
         self.klines = {}  # K线组件字典: kline_name: kline
+        self.kline_store = None  # K线缓存
         self.positions = {}     # 策略内持仓记录，  vt_symbol: PositionData
         self.order_type = OrderType.LIMIT
         self.cancel_seconds = 10  # 撤单时间(秒)
@@ -474,28 +475,28 @@ class CtaStockTemplate(CtaTemplate):
             self.write_log(u'保存policy数据')
             self.policy.save()
 
+    def get_kline_store(self):
+        """K线缓存(按策略名称保存在数据目录)"""
+        if self.kline_store is None:
+            self.kline_store = KlineStore(self.cta_engine.get_data_path(), self.strategy_name)
+        return self.kline_store
+
     def save_klines_to_cache(self, kline_names: list = []):
         """
         保存K线数据到缓存
+        只保存数据(序列/属性)，bar列表按增量追加
         :param kline_names: 一般为self.klines的keys
         :return:
         """
         if len(kline_names) == 0:
             kline_names = list(self.klines.keys())
 
-        # 获取保存路径
-        save_path = self.cta_engine.get_data_path()
-        # 保存缓存的文件名
-        file_name = os.path.abspath(os.path.join(save_path, f'{self.strategy_name}_klines.pkb2'))
-        with bz2.BZ2File(file_name, 'wb') as f:
-            klines = {}
-            for kline_name in kline_names:
-                kline = self.klines.get(kline_name, None)
-                # if kline:
-                #    kline.strategy = None
-                #    kline.cb_on_bar = None
+        klines = {}
+        for kline_name in kline_names:
+            kline = self.klines.get(kline_name, None)
+            if kline:
                 klines.update({kline_name: kline})
-            pickle.dump(klines, f)
+        self.get_kline_store().save(klines)
 
     def load_klines_from_cache(self, kline_names: list = []):
         """
@@ -506,8 +507,42 @@ class CtaStockTemplate(CtaTemplate):
         if len(kline_names) == 0:
             kline_names = list(self.klines.keys())
 
+        kline_store = self.get_kline_store()
+        if not kline_store.exists():
+            # 兼容旧版本的pickle缓存
+            return self.load_klines_from_pickle(kline_names)
+
+        try:
+            last_bar_dt = None
+            klines = kline_store.load({kline_name: self.klines.get(kline_name, None) for kline_name in kline_names})
+            # 逐一重新绑定k线策略，on_bar回调函数保持不变
+            for kline_name, strategy_kline in klines.items():
+                strategy_kline.strategy = self
+
+                # 所有K线的最后时间
+                if last_bar_dt and strategy_kline.cur_datetime:
+                    last_bar_dt = max(last_bar_dt, strategy_kline.cur_datetime)
+                else:
+                    last_bar_dt = strategy_kline.cur_datetime
+
+                self.write_log(f'恢复{kline_name}缓存数据,最新bar结束时间:{last_bar_dt}')
+
+            self.write_log(u'加载缓存k线数据完毕')
+            return last_bar_dt
+        except Exception as ex:
+            self.write_error(f'加载缓存K线数据失败:{str(ex)}')
+        return None
+
+    def load_klines_from_pickle(self, kline_names: list):
+        """
+        从旧版本的pickle缓存加载K线数据
+        :param kline_names:
+        :return:
+        """
         save_path = self.cta_engine.get_data_path()
         file_name = os.path.abspath(os.path.join(save_path, f'{self.strategy_name}_klines.pkb2'))
+        if not os.path.exists(file_name):
+            return None
         try:
             last_bar_dt = None
             with bz2.BZ2File(file_name, 'rb') as f:
@@ -544,7 +579,7 @@ class CtaStockTemplate(CtaTemplate):
         return None
 
     def get_klines_snapshot(self):
-        """返回当前klines的切片数据"""
+        """返回当前klines的切片数据(列式容器)"""
         try:
             d = {
                 'strategy': self.strategy_name,
@@ -553,8 +588,8 @@ class CtaStockTemplate(CtaTemplate):
             for kline_name in sorted(self.klines.keys()):
                 klines.update({kline_name: self.klines.get(kline_name).get_data()})
             kline_names = list(klines.keys())
-            binary_data = zlib.compress(pickle.dumps(klines))
-            d.update({'kline_names': kline_names, 'klines': binary_data, 'zlib': True})
+            binary_data = pack_klines_snapshot(klines)
+            d.update({'kline_names': kline_names, 'klines': binary_data, 'columnar': True})
             return d
         except Exception as ex:
             self.write_error(f'获取klines切片数据失败:{str(ex)}')
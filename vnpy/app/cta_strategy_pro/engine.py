@@ -60,6 +60,7 @@ from vnpy.trader.utility import (
 
 from vnpy.trader.util_logger import setup_logger, logging
 from vnpy.trader.util_wechat import send_wx_msg
+from vnpy.trader.order_book import StopOrderBook
 from vnpy.trader.converter import OffsetConverter
 
 from .base import (
@@ -139,7 +140,7 @@ class CtaEngine(BaseEngine):
             set)  # strategy_name: orderid list
 
         self.stop_order_count = 0  # for generating stop_orderid
-        self.stop_orders = {}  # stop_orderid: stop_order
+        self.stop_orders = StopOrderBook()  # stop_orderid: stop_order, 按合约、方向、价格索引
 
         self.thread_executor = ThreadPoolExecutor(max_workers=1)
         self.thread_tasks = []
@@ -412,59 +413,57 @@ class CtaEngine(BaseEngine):
 
     def check_stop_order(self, tick: TickData):
         """"""
-        for stop_order in list(self.stop_orders.values()):
-            if stop_order.vt_symbol != tick.vt_symbol:
+        # 只取出触发价被最新价穿越的停止单
+        for stop_order in self.stop_orders.get_triggered(tick.vt_symbol, tick.last_price, tick.last_price):
+            # 可能已在前面停止单的回调中被撤销
+            if stop_order.stop_orderid not in self.stop_orders:
                 continue
 
-            long_triggered = stop_order.direction == Direction.LONG and tick.last_price >= stop_order.price
-            short_triggered = stop_order.direction == Direction.SHORT and tick.last_price <= stop_order.price
+            strategy = self.strategies[stop_order.strategy_name]
 
-            if long_triggered or short_triggered:
-                strategy = self.strategies[stop_order.strategy_name]
-
-                # To get excuted immediately after stop order is
-                # triggered, use limit price if available, otherwise
-                # use ask_price_5 or bid_price_5
-                if stop_order.direction == Direction.LONG:
-                    if tick.limit_up:
-                        price = tick.limit_up
-                    else:
-                        price = tick.ask_price_5
+            # To get excuted immediately after stop order is
+            # triggered, use limit price if available, otherwise
+            # use ask_price_5 or bid_price_5
+            if stop_order.direction == Direction.LONG:
+                if tick.limit_up:
+                    price = tick.limit_up
                 else:
-                    if tick.limit_down:
-                        price = tick.limit_down
-                    else:
-                        price = tick.bid_price_5
-
-                contract = self.main_engine.get_contract(stop_order.vt_symbol)
-
-                vt_orderids = self.send_limit_order(
-                    strategy,
-                    contract,
-                    stop_order.direction,
-                    stop_order.offset,
-                    price,
-                    stop_order.volume,
-                    stop_order.lock
-                )
+                    price = tick.ask_price_5
+            else:
+                if tick.limit_down:
+                    price = tick.limit_down
+                else:
+                    price = tick.bid_price_5
+
+            contract = self.main_engine.get_contract(stop_order.vt_symbol)
+
+            vt_orderids = self.send_limit_order(
+                strategy,
+                contract,
+                stop_order.direction,
+                stop_order.offset,
+                price,
+                stop_order.volume,
+                stop_order.lock
+            )
 
-                # Update stop order status if placed successfully
-                if vt_orderids:
-                    # Remove from relation map.
-                    self.stop_orders.pop(stop_order.stop_orderid)
+            # Update stop order status if placed successfully
+            if vt_orderids:
+                # Remove from relation map.
+                self.stop_orders.pop(stop_order.stop_orderid)
 
-                    strategy_vt_orderids = self.strategy_orderid_map[strategy.strategy_name]
-                    if stop_order.stop_orderid in strategy_vt_orderids:
-                        strategy_vt_orderids.remove(stop_order.stop_orderid)
+                strategy_vt_orderids = self.strategy_orderid_map[strategy.strategy_name]
+                if stop_order.stop_orderid in strategy_vt_orderids:
+                    strategy_vt_orderids.remove(stop_order.stop_orderid)
 
-                    # Change stop order status to cancelled and update to strategy.
-                    stop_order.status = StopOrderStatus.TRIGGERED
-                    stop_order.vt_orderids = vt_orderids
+                # Change stop order status to cancelled and update to strategy.
+                stop_order.status = StopOrderStatus.TRIGGERED
+                stop_order.vt_orderids = vt_orderids
 
-                    self.call_strategy_func(
-                        strategy, strategy.on_stop_order, stop_order
-                    )
-                    self.put_stop_order_event(stop_order)
+                self.call_strategy_func(
+                    strategy, strategy.on_stop_order, stop_order
+                )
+                self.put_stop_order_event(stop_order)
 
     def send_server_order(
             self,
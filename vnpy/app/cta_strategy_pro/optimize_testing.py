@@ -0,0 +1,453 @@
+# encoding: UTF-8
+
+'''
+本文件中包含的是CTA模块的参数优化引擎
+使用本地进程池，对参数网格(或遗传算法)中的每个参数组合，运行一次组合回测(PortfolioTestingEngine)或套利回测(SpreadTestingEngine)
+1、bar回测时，csv文件预先转换为列式缓存文件(vnpy.trader.tick_cache)，各进程memmap加载，共享操作系统缓存，不再各自解析csv
+2、每完成一个参数组合，结果追加到 {name}_optimize.jsonl，中断后重新运行，已完成的参数组合不再回测
+3、全部完成后，按优化目标排序，输出 {name}_optimize.csv
+'''
+from __future__ import division
+
+import os
+import sys
+import copy
+import json
+import random
+import hashlib
+import traceback
+import multiprocessing
+from collections import OrderedDict
+from datetime import datetime
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from vnpy.trader.tick_cache import TICK_CACHE_SUFFIX, save_tick_cache
+
+from .portfolio_testing import PortfolioTestingEngine
+
+
+class OptimizeSetting(object):
+    """
+    参数优化设置
+    参数名称：策略名.参数名，只修改该策略的参数；没有策略名时，修改所有策略的同名参数
+    """
+
+    def __init__(self):
+        self.params = OrderedDict()
+        self.target_name = 'Sharpe Ratio'  # 优化目标，对应回测结果show_backtesting_result中的字段
+
+    def add_parameter(self, name: str, start, end=None, step=None):
+        """
+        添加优化参数
+        :param name: 参数名称
+        :param start: 开始值，或者取值的列表
+        :param end: 结束值(包含)
+        :param step: 步进
+        """
+        if isinstance(start, (list, tuple)):
+            self.params[name] = list(start)
+            return
+
+        if end is None or not step:
+            self.params[name] = [start]
+            return
+
+        if start >= end:
+            print(u'参数优化起始点必须小于终止点', file=sys.stderr)
+            return
+
+        if step <= 0:
+            print(u'参数优化步进必须大于0', file=sys.stderr)
+            return
+
+        value_list = []
+        value = start
+        while value <= end:
+            value_list.append(value)
+            value += step
+
+        self.params[name] = value_list
+
+    def set_target(self, target_name: str):
+        self.target_name = target_name
+
+    def generate_settings(self) -> list:
+        """生成全部参数组合 [{参数名称: 参数值}]"""
+        keys = list(self.params.keys())
+        return [dict(zip(keys, values)) for values in product(*self.params.values())]
+
+
+def get_params_key(params: dict) -> str:
+    """参数组合的键值，用于断点续跑"""
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def apply_params(strategy_setting: dict, params: dict) -> dict:
+    """把参数组合更新到策略配置中，返回新的策略配置"""
+    strategy_setting = copy.deepcopy(strategy_setting)
+    for name, value in params.items():
+        if '.' in name:
+            strategy_name, param_name = name.split('.', 1)
+            strategy_names = [strategy_name]
+        else:
+            strategy_names, param_name = list(strategy_setting.keys()), name
+
+        for strategy_name in strategy_names:
+            if strategy_name not in strategy_setting:
+                raise KeyError(f'优化参数{name}对应的策略{strategy_name}不存在')
+            strategy_setting[strategy_name].setdefault('setting', {})[param_name] = value
+
+    return strategy_setting
+
+
+def optimize_test(engine_class, test_setting: dict, strategy_setting: dict) -> dict:
+    """
+    单个参数组合的回测(子进程中运行)
+    :return: 回测结果 show_backtesting_result
+    """
+    engine = engine_class()
+    engine.prepare_env(test_setting)
+    engine.run_portfolio_test(strategy_setting)
+    result_info = engine.show_backtesting_result()
+
+    # 无交易结果时，返回的是tuple
+    if not isinstance(result_info, dict):
+        return {}
+
+    result = OrderedDict()
+    for k, v in result_info.items():
+        if isinstance(v, (bool, int, float, np.number)):
+            result[k] = float(v)
+        else:
+            result[k] = str(v)
+    return result
+
+
+def run_optimize_task(task: dict) -> dict:
+    """进程池任务：执行回测，捕捉异常，返回结果记录"""
+    record = {
+        'key': task['key'],
+        'name': task['test_setting'].get('name'),
+        'params': task['params'],
+        'target': None,
+        'result': {},
+        'error': ''
+    }
+    try:
+        result = optimize_test(task['engine_class'], task['test_setting'], task['strategy_setting'])
+        record['result'] = result
+        value = result.get(task['target_name'])
+        if isinstance(value, float) and not np.isnan(value):
+            record['target'] = value
+    except Exception as ex:
+        record['error'] = '{},{}'.format(str(ex), traceback.format_exc())
+
+    return record
+
+
+class OptimizeTestingEngine(object):
+    """
+    参数优化引擎
+    """
+
+    def __init__(self, test_setting: dict, strategy_setting: dict, optimize_setting: OptimizeSetting,
+                 engine_class=PortfolioTestingEngine, processes: int = None, result_path: str = None):
+        """
+        :param test_setting: 回测设置，与single_test一致
+        :param strategy_setting: 策略设置，与single_test一致
+        :param optimize_setting: 参数优化设置
+        :param engine_class: 回测引擎 PortfolioTestingEngine / SpreadTestingEngine
+        :param processes: 进程数量，缺省为cpu数量
+        :param result_path: 结果保存目录，缺省为 data_path
+        """
+        self.test_setting = copy.deepcopy(test_setting)
+        self.strategy_setting = strategy_setting
+        self.optimize_setting = optimize_setting
+        self.engine_class = engine_class
+        self.processes = processes or multiprocessing.cpu_count()
+
+        self.name = self.test_setting.get('name', 'optimize_test')
+        self.data_path = os.path.abspath(self.test_setting.get('data_path', os.path.join(os.getcwd(), 'data')))
+        self.result_path = os.path.abspath(result_path or self.data_path)
+        os.makedirs(self.result_path, exist_ok=True)
+        self.result_file = os.path.join(self.result_path, f'{self.name}_optimize.jsonl')
+        self.ranked_file = os.path.join(self.result_path, f'{self.name}_optimize.csv')
+
+        self.results = OrderedDict()  # key: 结果记录
+        self.load_results()
+
+        self.data_prepared = False
+
+    def output(self, content):
+        """输出内容"""
+        print(u'{} {}\t{}'.format(datetime.now().strftime('%H:%M:%S'), self.name, content))
+
+    def load_results(self):
+        """加载已完成的结果(断点续跑)"""
+        if not os.path.isfile(self.result_file):
+            return
+        with open(self.result_file, 'r', encoding='utf8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # 中断时未写完整的记录
+                    continue
+                # 回测异常的参数组合，重新回测
+                if record.get('error'):
+                    continue
+                self.results[record['key']] = record
+        self.output(u'加载已完成的参数组合:{}个'.format(len(self.results)))
+
+    def save_result(self, record: dict):
+        """追加保存一条结果"""
+        self.results[record['key']] = record
+        with open(self.result_file, 'a', encoding='utf8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+    def prepare_data(self):
+        """
+        bar回测时，把各合约的csv文件转换为列式缓存文件，回测进程直接memmap加载
+        缓存文件名：csv文件名_完整路径hash.tkc；csv修改时间晚于缓存文件时，重新转换
+        """
+        if self.data_prepared:
+            return
+        self.data_prepared = True
+
+        if self.test_setting.get('mode', 'bar') != 'bar' or not hasattr(self.engine_class, 'load_bar_cache_to_df'):
+            return
+
+        symbol_datas = self.test_setting.get('symbol_datas', {})
+        if len(symbol_datas) == 0:
+            return
+
+        cache_path = os.path.join(self.data_path, 'optimize_cache')
+        os.makedirs(cache_path, exist_ok=True)
+
+        engine = self.engine_class()
+        engine.test_name = self.name
+        engine.test_start_date = None
+        engine.test_end_date = None
+
+        for symbol, symbol_data in symbol_datas.items():
+            bar_file = symbol_data.get('bar_file', None)
+            if not bar_file or not os.path.isfile(bar_file) or bar_file.endswith(TICK_CACHE_SUFFIX):
+                continue
+
+            # 不同目录下的同名csv，使用完整路径的hash区分
+            path_hash = hashlib.md5(os.path.abspath(bar_file).encode('utf8')).hexdigest()[:8]
+            cache_file = os.path.join(cache_path, '{}_{}{}'.format(
+                os.path.splitext(os.path.basename(bar_file))[0], path_hash, TICK_CACHE_SUFFIX))
+            if not os.path.isfile(cache_file) or os.path.getmtime(cache_file) < os.path.getmtime(bar_file):
+                if not engine.load_bar_csv_to_df(symbol, bar_file):
+                    self.output(u'{}转换缓存失败，使用csv文件'.format(bar_file))
+                    continue
+                symbol_df = engine.bar_df_dict.pop(symbol).reset_index()
+                save_tick_cache(symbol_df, cache_file, unique=False)
+                self.output(u'{} => {}'.format(bar_file, cache_file))
+
+            symbol_data.update({'bar_file': cache_file})
+
+    def create_task(self, params: dict) -> dict:
+        """创建参数组合的回测任务"""
+        key = get_params_key(params)
+        test_setting = copy.deepcopy(self.test_setting)
+        test_setting.update({'name': '{}_{}'.format(self.name, hashlib.md5(key.encode('utf8')).hexdigest()[:8])})
+        return {
+            'key': key,
+            'params': params,
+            'engine_class': self.engine_class,
+            'test_setting': test_setting,
+            'strategy_setting': apply_params(self.strategy_setting, params),
+            'target_name': self.optimize_setting.target_name
+        }
+
+    def run_tasks(self, pool, params_list: list) -> list:
+        """
+        运行未完成的参数组合，结果完成一个保存一个
+        :return: 对应的结果记录
+        """
+        tasks = OrderedDict()
+        for params in params_list:
+            key = get_params_key(params)
+            if key in self.results or key in tasks:
+                continue
+            tasks[key] = self.create_task(params)
+        tasks = list(tasks.values())
+
+        if tasks:
+            self.output(u'开始回测{}个参数组合，已完成:{}个'.format(len(tasks), len(self.results)))
+
+        for i, record in enumerate(pool.imap_unordered(run_optimize_task, tasks), start=1):
+            self.save_result(record)
+            if record['error']:
+                self.output(u'[{}/{}] {} 回测异常:{}'.format(i, len(tasks), record['params'], record['error']))
+            else:
+                self.output(u'[{}/{}] {} {}:{}'.format(i, len(tasks), record['params'],
+                                                       self.optimize_setting.target_name, record['target']))
+
+        return [self.results[get_params_key(params)] for params in params_list]
+
+    def create_pool(self):
+        """创建进程池，强制使用spawn方式创建子进程"""
+        ctx = multiprocessing.get_context('spawn')
+        return ctx.Pool(self.processes)
+
+    def run_optimization(self) -> list:
+        """
+        网格参数优化
+        :return: 按优化目标排序的结果记录
+        """
+        settings = self.optimize_setting.generate_settings()
+        if not settings:
+            self.output(u'优化参数组合为空，请检查')
+            return []
+
+        self.prepare_data()
+        self.output(u'参数优化空间:{}'.format(len(settings)))
+
+        pool = self.create_pool()
+        try:
+            self.run_tasks(pool, settings)
+        finally:
+            pool.terminate()
+            pool.join()
+
+        return self.save_ranked_results()
+
+    def run_ga_optimization(self, population_size: int = 20, ngen_size: int = 10,
+                            cxpb: float = 0.9, mutpb: float = 0.2, seed: int = None) -> list:
+        """
+        遗传算法参数优化
+        每一代的个体并行回测；保留最优的一半个体，交叉/变异产生下一代
+        已回测过的参数组合直接使用结果(包括中断前完成的)
+        :param population_size: 每代族群数量
+        :param ngen_size: 迭代次数
+        :param cxpb: 交叉概率
+        :param mutpb: 每个参数的变异概率
+        :param seed: 随机数种子
+        :return: 按优化目标排序的结果记录
+        """
+        names = list(self.optimize_setting.params.keys())
+        values = [self.optimize_setting.params[name] for name in names]
+        if not names or not all(values):
+            self.output(u'优化参数组合为空，请检查')
+            return []
+
+        rnd = random.Random(seed)
+        total_size = int(np.prod([len(v) for v in values]))
+        population_size = min(population_size, total_size)
+        mu = max(2, population_size // 2)
+
+        def to_params(individual):
+            return dict(zip(names, [values[i][j] for i, j in enumerate(individual)]))
+
+        def random_individual():
+            return tuple(rnd.randrange(len(v)) for v in values)
+
+        def fitness(individual):
+            record = self.results.get(get_params_key(to_params(individual)))
+            if record is None or record['target'] is None:
+                return -np.inf
+            return record['target']
+
+        self.prepare_data()
+        self.output(u'参数优化空间:{}, 每代族群总数:{}, 迭代次数:{}'.format(total_size, population_size, ngen_size))
+
+        population = set()
+        while len(population) < population_size:
+            population.add(random_individual())
+        population = list(population)
+
+        evaluated = set()
+        pool = self.create_pool()
+        try:
+            for gen in range(ngen_size):
+                self.run_tasks(pool, [to_params(ind) for ind in population])
+                evaluated.update(population)
+
+                elite = sorted(evaluated, key=fitness, reverse=True)[:mu]
+                self.output(u'第{}代，最优{}:{}, 参数:{}'.format(
+                    gen + 1, self.optimize_setting.target_name, fitness(elite[0]), to_params(elite[0])))
+
+                if len(evaluated) >= total_size:
+                    break
+
+                # 交叉/变异产生下一代，尽量不重复已回测的个体
+                children = set()
+                retry = 0
+                while len(children) < population_size and retry < population_size * 20:
+                    retry += 1
+                    if len(elite) > 1 and rnd.random() < cxpb:
+                        father, mother = rnd.sample(elite, 2)
+                        child = [rnd.choice(genes) for genes in zip(father, mother)]
+                    else:
+                        child = list(rnd.choice(elite))
+                    for i in range(len(child)):
+                        if rnd.random() < mutpb:
+                            child[i] = rnd.randrange(len(values[i]))
+                    child = tuple(child)
+                    if child not in evaluated:
+                        children.add(child)
+                if not children:
+                    break
+                population = list(children)
+        finally:
+            pool.terminate()
+            pool.join()
+
+        return self.save_ranked_results()
+
+    def get_ranked_results(self) -> list:
+        """按优化目标从高到低排序的结果记录，没有结果的排在最后"""
+        return sorted(self.results.values(),
+                      key=lambda r: (r['target'] is not None, r['target'] if r['target'] is not None else 0),
+                      reverse=True)
+
+    def save_ranked_results(self) -> list:
+        """保存排序后的结果表"""
+        ranked = self.get_ranked_results()
+        if not ranked:
+            return ranked
+
+        rows = []
+        for rank, record in enumerate(ranked, start=1):
+            row = OrderedDict({'rank': rank, 'name': record['name']})
+            row.update(record['params'])
+            row.update({self.optimize_setting.target_name: record['target']})
+            row.update(record['result'])
+            row.update({'error': record['error'].split(',')[0] if record['error'] else ''})
+            rows.append(row)
+
+        pd.DataFrame(rows).to_csv(self.ranked_file, index=False, encoding='utf8')
+        self.output(u'参数优化结果保存至:{}'.format(self.ranked_file))
+
+        for record in ranked[:10]:
+            self.output(u'参数:{}, 目标:{}'.format(record['params'], record['target']))
+
+        return ranked
+
+
+def optimize_test_run(test_setting: dict, strategy_setting: dict, optimize_setting: OptimizeSetting,
+                      engine_class=PortfolioTestingEngine, processes: int = None, use_ga: bool = False, **kwargs):
+    """
+    参数优化回测
+    : test_setting, 组合回测所需的配置，与single_test一致
+    ：strategy_setting, dict, 一个或多个策略配置
+    : optimize_setting, 参数优化设置
+    : use_ga, 使用遗传算法，kwargs为遗传算法的参数
+    """
+    engine = OptimizeTestingEngine(test_setting=test_setting,
+                                   strategy_setting=strategy_setting,
+                                   optimize_setting=optimize_setting,
+                                   engine_class=engine_class,
+                                   processes=processes)
+    if use_ga:
+        return engine.run_ga_optimization(**kwargs)
+    return engine.run_optimization()
@@ -32,6 +32,8 @@ from vnpy.trader.utility import (
     import_module_by_str
 )
 
+from vnpy.trader.tick_cache import load_day_tick_cache
+
 from .back_testing import BackTestingEngine
 
 # vnpy交易所，与淘宝数据tick目录得对应关系
@@ -303,16 +305,25 @@ class  SpreadTestingEngine(BackTestingEngine):
 
         for vt_symbol in list(self.symbol_strategy_map.keys()):
             symbol, exchange = extract_vt_symbol(vt_symbol)
-            tick_list = self.load_csv_file(tick_folder=self.tick_path,
-                                           vt_symbol=vt_symbol,
-                                           tick_date=test_day)
-            if not tick_list or len(tick_list) == 0:
+            # 优先使用列式缓存(已去重)，没有时再读取csv文件
+            symbol_tick_df = load_day_tick_cache(cache_folder=self.tick_path,
+                                                 cache_symbol=symbol,
+                                                 cache_date=test_day.strftime('%Y%m%d'),
+                                                 on_error=self.write_error)
+            if symbol_tick_df is None:
+                tick_list = self.load_csv_file(tick_folder=self.tick_path,
+                                               vt_symbol=vt_symbol,
+                                               tick_date=test_day)
+                if not tick_list or len(tick_list) == 0:
+                    continue
+
+                symbol_tick_df = pd.DataFrame(tick_list)
+                # 缓存文件中，datetime字段，已经是datetime格式
+                # 暂时根据时间去重，没有汇总volume
+                symbol_tick_df.drop_duplicates(subset=['datetime'], keep='first', inplace=True)
+            elif len(symbol_tick_df) == 0:
                 continue
 
-            symbol_tick_df = pd.DataFrame(tick_list)
-            # 缓存文件中，datetime字段，已经是datetime格式
-            # 暂时根据时间去重，没有汇总volume
-            symbol_tick_df.drop_duplicates(subset=['datetime'], keep='first', inplace=True)
             symbol_tick_df.set_index('datetime', inplace=True)
 
             tick_data_dict.update({vt_symbol: symbol_tick_df})
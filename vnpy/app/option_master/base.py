@@ -2,10 +2,13 @@ from datetime import datetime
 from typing import Dict, List, Callable
 from types import ModuleType
 
+import numpy as np
+
 from vnpy.trader.object import ContractData, TickData, TradeData
 from vnpy.trader.constant import Exchange, OptionType, Direction, Offset
 from vnpy.trader.converter import PositionHolding
 
+from .pricing import vectorized
 from .time import calculate_days_to_expiry, ANNUAL_DAYS
 
 
@@ -277,12 +280,16 @@ class UnderlyingData(InstrumentData):
 
     def update_tick(self, tick: TickData) -> None:
         """"""
-        super().update_tick(tick)
+        self.update_price(tick)
 
-        self.theo_delta = self.size * self.mid_price / 100
         for chain in self.chains.values():
             chain.update_underlying_tick()
 
+    def update_price(self, tick: TickData) -> None:
+        """只更新标的自身的价格和希腊值，不重新计算期权链"""
+        super().update_tick(tick)
+
+        self.theo_delta = self.size * self.mid_price / 100
         self.calculate_pos_greeks()
 
     def update_trade(self, trade: TradeData) -> None:
@@ -327,9 +334,15 @@ class ChainData:
         self.underlying_adjustment: float = 0
         self.days_to_expiry: int = 0
 
+        # 向量化定价模型(空字符串时逐个期权使用标量模块计算)
+        self.vector_model: str = ""
+        self.chain_arrays: tuple = None  # (期权列表, 行权价, 认购认沽, 剩余期限, 利率, 合约乘数)
+        self.option_positions: Dict[str, int] = {}  # vt_symbol: 在期权列表中的位置
+
     def add_option(self, option: OptionData) -> None:
         """"""
         self.options[option.vt_symbol] = option
+        self.chain_arrays = None
 
         if option.option_type > 0:
             self.calls[option.chain_index] = option
@@ -378,11 +391,103 @@ class ChainData:
         """"""
         self.calculate_underlying_adjustment()
 
-        for option in self.options.values():
-            option.update_underlying_tick(self.underlying_adjustment)
+        if self.vector_model:
+            self.calculate_chain_greeks()
+        else:
+            for option in self.options.values():
+                option.update_underlying_tick(self.underlying_adjustment)
 
         self.calculate_pos_greeks()
 
+    def get_chain_arrays(self) -> tuple:
+        """期权链的固定参数，期权或利率变化时重新生成"""
+        if self.chain_arrays is None:
+            options = list(self.options.values())
+            self.option_positions = {o.vt_symbol: i for i, o in enumerate(options)}
+            self.chain_arrays = (
+                options,
+                np.array([o.strike_price for o in options], dtype=np.float64),
+                np.array([o.option_type for o in options], dtype=np.float64),
+                np.array([o.time_to_expiry for o in options], dtype=np.float64),
+                np.array([o.interest_rate for o in options], dtype=np.float64),
+                np.array([o.size for o in options], dtype=np.float64)
+            )
+        return self.chain_arrays
+
+    def calculate_chain_greeks(self) -> None:
+        """
+        整个期权链一次批量计算隐含波动率和希腊值(与逐个调用 update_underlying_tick 的结果一致)
+        买卖价的隐含波动率以上一次的结果为初值
+        """
+        options, k, cp, t, r, size = self.get_chain_arrays()
+        for option in options:
+            option.underlying_adjustment = self.underlying_adjustment
+
+        underlying_price = self.underlying.mid_price if self.underlying else 0
+        if underlying_price and options:
+            s = underlying_price + self.underlying_adjustment
+            self.calculate_chain_impv(options, s, k, cp, t, r)
+
+            mid_impv = np.array([o.mid_impv for o in options], dtype=np.float64)
+            valid = np.flatnonzero(mid_impv)
+            if len(valid):
+                _, delta, gamma, theta, vega = vectorized.calculate_greeks(
+                    s, k[valid], r[valid], t[valid], mid_impv[valid], cp[valid],
+                    self.vector_model, ANNUAL_DAYS
+                )
+                for i, d, g, th, ve in zip(valid.tolist(), (delta * size[valid]).tolist(),
+                                           (gamma * size[valid]).tolist(), (theta * size[valid]).tolist(),
+                                           (vega * size[valid]).tolist()):
+                    option = options[i]
+                    option.theo_delta = d
+                    option.theo_gamma = g
+                    option.theo_theta = th
+                    option.theo_vega = ve
+
+        for option in options:
+            option.calculate_pos_greeks()
+
+    def update_options_impv(self, options: List[OptionData]) -> None:
+        """重新计算部分期权(收到期权行情的)的隐含波动率"""
+        if not self.vector_model:
+            for option in options:
+                option.calculate_option_impv()
+            return
+
+        underlying_price = self.underlying.mid_price if self.underlying else 0
+        if not underlying_price:
+            return
+        chain_options, k, cp, t, r, _ = self.get_chain_arrays()
+        s = underlying_price + self.underlying_adjustment
+        positions = [self.option_positions[o.vt_symbol] for o in options]
+        self.calculate_chain_impv(chain_options, s, k, cp, t, r, positions)
+
+    def calculate_chain_impv(self, options: list, s: float, k, cp, t, r, positions: list = None) -> None:
+        """
+        有行情的期权，买价、卖价的隐含波动率合并为一次计算
+        positions: 只计算期权列表中这些位置的期权
+        """
+        if positions is None:
+            positions = range(len(options))
+        quoted = [i for i in positions if options[i].tick]
+        if not quoted:
+            return
+        n = len(quoted)
+        index = np.array(quoted * 2)
+        prices = [options[i].tick.ask_price_1 for i in quoted] + [options[i].tick.bid_price_1 for i in quoted]
+        init_v = [options[i].ask_impv for i in quoted] + [options[i].bid_impv for i in quoted]
+
+        impv = vectorized.calculate_impv(
+            np.array(prices, dtype=np.float64), s, k[index], r[index], t[index], cp[index],
+            self.vector_model, init_v=np.array(init_v, dtype=np.float64)
+        ).tolist()
+
+        for j, i in enumerate(quoted):
+            option = options[i]
+            option.ask_impv = impv[j]
+            option.bid_impv = impv[j + n]
+            option.mid_impv = (option.ask_impv + option.bid_impv) / 2
+
     def update_trade(self, trade: TradeData) -> None:
         """"""
         option = self.options[trade.vt_symbol]
@@ -422,11 +527,13 @@ class ChainData:
         """"""
         for option in self.options.values():
             option.set_interest_rate(interest_rate)
+        self.chain_arrays = None
 
     def set_pricing_model(self, pricing_model: ModuleType) -> None:
         """"""
         for option in self.options.values():
             option.set_pricing_model(pricing_model)
+        self.vector_model = vectorized.get_model_name(pricing_model)
 
     def set_portfolio(self, portfolio: "PortfolioData") -> None:
         """"""
@@ -488,6 +595,11 @@ class PortfolioData:
         self.chains: Dict[str, ChainData] = {}
         self.underlyings: Dict[str, UnderlyingData] = {}
 
+        # 延迟计算：收到行情时只记录价格并标记，由 recalculate 批量计算
+        self.deferred: bool = False
+        self.dirty_chains: Dict[str, ChainData] = {}  # 标的行情更新的期权链
+        self.dirty_options: Dict[str, OptionData] = {}  # 期权行情更新的期权
+
     def calculate_pos_greeks(self) -> None:
         """"""
         self.long_pos = 0
@@ -516,6 +628,10 @@ class PortfolioData:
 
     def update_tick(self, tick: TickData) -> None:
         """"""
+        if self.deferred:
+            self.mark_tick(tick)
+            return
+
         if tick.vt_symbol in self.options:
             option = self.options[tick.vt_symbol]
             chain = option.chain
@@ -526,6 +642,48 @@ class PortfolioData:
             underlying.update_tick(tick)
             self.calculate_pos_greeks()
 
+    def mark_tick(self, tick: TickData) -> None:
+        """
+        延迟计算模式：只更新行情价格，标记需要重新计算的期权/期权链
+        标的价格、标的调整值(计算参考价使用)立即更新
+        """
+        vt_symbol = tick.vt_symbol
+        option = self.options.get(vt_symbol)
+        if option:
+            InstrumentData.update_tick(option, tick)
+            self.dirty_options[vt_symbol] = option
+            return
+
+        underlying = self.underlyings.get(vt_symbol)
+        if underlying:
+            underlying.update_price(tick)
+            for chain in underlying.chains.values():
+                chain.calculate_underlying_adjustment()
+                for chain_option in chain.options.values():
+                    chain_option.underlying_adjustment = chain.underlying_adjustment
+                self.dirty_chains[chain.chain_symbol] = chain
+
+    def is_dirty(self) -> bool:
+        return bool(self.dirty_chains or self.dirty_options)
+
+    def recalculate(self) -> None:
+        """计算标记的期权链/期权，结果与逐个行情计算一致"""
+        dirty_chains, self.dirty_chains = self.dirty_chains, {}
+        dirty_options, self.dirty_options = self.dirty_options, {}
+
+        # 重新计算的期权链已包含其中全部期权的隐含波动率
+        for chain in dirty_chains.values():
+            chain.update_underlying_tick()
+
+        chain_options: Dict[str, List[OptionData]] = {}
+        for option in dirty_options.values():
+            if option.chain.chain_symbol not in dirty_chains:
+                chain_options.setdefault(option.chain.chain_symbol, []).append(option)
+        for chain_symbol, options in chain_options.items():
+            options[0].chain.update_options_impv(options)
+
+        self.calculate_pos_greeks()
+
     def update_trade(self, trade: TradeData) -> None:
         """"""
         if trade.vt_symbol in self.options:
@@ -3,6 +3,7 @@
 from typing import Dict, List, Set
 from copy import copy
 from collections import defaultdict
+from time import perf_counter
 
 from vnpy.trader.object import (
     LogData, ContractData, TickData,
@@ -47,6 +48,88 @@ PRICING_MODELS = {
 }
 
 
+class RecalcScheduler:
+    """
+    组合定价的节流计算
+    interval: 两次计算的最小间隔(秒)，0为每个行情立即计算(原方式)
+    间隔内的行情只更新价格并标记，到达间隔的行情或定时器时合并为一次计算
+    """
+
+    def __init__(self, interval: float = 0):
+        """"""
+        self.interval: float = interval
+        self.portfolios: Dict[str, PortfolioData] = {}
+        self.last_times: Dict[str, float] = {}
+
+        # 统计
+        self.tick_count: int = 0
+        self.recalc_count: int = 0  # 执行的计算次数
+        self.skip_count: int = 0  # 合并(跳过)的计算次数
+        self.recalc_time: float = 0  # 计算总耗时(秒)
+
+    def add_portfolio(self, portfolio: PortfolioData) -> None:
+        """"""
+        portfolio.deferred = self.interval > 0
+        self.portfolios[portfolio.name] = portfolio
+        self.last_times[portfolio.name] = 0
+
+    def set_interval(self, interval: float) -> None:
+        """"""
+        self.interval = interval
+        for portfolio in self.portfolios.values():
+            self.flush(portfolio)
+            portfolio.deferred = interval > 0
+
+    def update_tick(self, portfolio: PortfolioData, tick: TickData) -> None:
+        """"""
+        self.tick_count += 1
+        if not portfolio.deferred:
+            start = perf_counter()
+            portfolio.update_tick(tick)
+            self.recalc_count += 1
+            self.recalc_time += perf_counter() - start
+            return
+
+        portfolio.update_tick(tick)
+        if self.is_due(portfolio):
+            self.flush(portfolio)
+        else:
+            self.skip_count += 1
+
+    def is_due(self, portfolio: PortfolioData) -> bool:
+        """距离上次计算是否已达到间隔"""
+        return perf_counter() - self.last_times.get(portfolio.name, 0) >= self.interval
+
+    def flush(self, portfolio: PortfolioData) -> None:
+        """计算组合中标记的期权链/期权"""
+        if not portfolio.is_dirty():
+            return
+
+        start = perf_counter()
+        portfolio.recalculate()
+        end = perf_counter()
+
+        self.last_times[portfolio.name] = end
+        self.recalc_count += 1
+        self.recalc_time += end - start
+
+    def flush_all(self) -> None:
+        """定时器调用：计算已达到间隔的组合"""
+        for portfolio in self.portfolios.values():
+            if self.is_due(portfolio):
+                self.flush(portfolio)
+
+    def get_metrics(self) -> Dict:
+        """"""
+        return {
+            "interval": self.interval,
+            "tick_count": self.tick_count,
+            "recalc_count": self.recalc_count,
+            "skip_count": self.skip_count,
+            "recalc_time": self.recalc_time,
+        }
+
+
 class OptionEngine(BaseEngine):
     """"""
 
@@ -73,6 +156,11 @@ class OptionEngine(BaseEngine):
         self.setting: Dict = {}
 
         self.load_setting()
+
+        self.recalc_scheduler: RecalcScheduler = RecalcScheduler(
+            self.setting.get("recalc_interval", 0)
+        )
+
         self.register_event()
 
     def close(self) -> None:
@@ -170,7 +258,7 @@ class OptionEngine(BaseEngine):
         if not portfolio:
             return
 
-        portfolio.update_tick(tick)
+        self.recalc_scheduler.update_tick(portfolio, tick)
 
     def process_order_event(self, event: Event) -> None:
         """"""
@@ -212,6 +300,8 @@ class OptionEngine(BaseEngine):
 
     def process_timer_event(self, event: Event) -> None:
         """"""
+        self.recalc_scheduler.flush_all()
+
         self.timer_count += 1
         if self.timer_count < self.timer_trigger:
             return
@@ -277,6 +367,7 @@ class OptionEngine(BaseEngine):
             return False
         portfolio = self.get_portfolio(portfolio_name)
         self.active_portfolios[portfolio_name] = portfolio
+        self.recalc_scheduler.add_portfolio(portfolio)
 
         # Subscribe market data
         for underlying in portfolio.underlyings.values():
@@ -336,6 +427,17 @@ class OptionEngine(BaseEngine):
         """"""
         self.timer_trigger = timer_trigger
 
+    def set_recalc_interval(self, interval: float) -> None:
+        """"""
+        self.recalc_scheduler.set_interval(interval)
+
+        self.setting["recalc_interval"] = interval
+        self.save_setting()
+
+    def get_recalc_metrics(self) -> Dict:
+        """"""
+        return self.recalc_scheduler.get_metrics()
+
 
 class OptionHedgeEngine:
     """"""
@@ -428,6 +530,7 @@ class OptionHedgeEngine:
 
         # Do nothing if portfolio delta is in the allowed range
         portfolio = self.option_engine.get_portfolio(self.portfolio_name)
+        self.option_engine.recalc_scheduler.flush(portfolio)
         if delta_min <= portfolio.pos_delta <= delta_max:
             return
 
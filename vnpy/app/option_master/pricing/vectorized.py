@@ -0,0 +1,224 @@
+# encoding: UTF-8
+
+# 期权链的向量化定价(NumPy)
+# 同一期权链所有行权价、认购/认沽的隐含波动率和希腊值一次批量计算，不依赖Cython模块(Linux可用)
+# 1、calculate_greeks: 价格和希腊值，计算口径与 black_76 / black_scholes 标量模块一致
+#    (delta、gamma按1%标的价格变动，theta按每交易日，vega按1%波动率)
+# 2、calculate_impv: 隐含波动率，牛顿迭代 + 区间保护(二分)：
+#    每次迭代按价格误差收缩波动率区间，牛顿步跳出区间或vega过小时改为取区间中点，保证收敛；
+#    可传入上一次的波动率作为初值(热启动)，行情小幅变化时通常2~3次迭代即可
+# 二叉树模型(美式)无法向量化，仍使用标量模块逐个计算
+
+from typing import Tuple
+
+import numpy as np
+from scipy.special import ndtr
+
+BLACK_76 = "black_76"
+BLACK_SCHOLES = "black_scholes"
+
+MIN_VOLATILITY = 1e-6
+MAX_VOLATILITY = 10.0
+INIT_VOLATILITY = 0.3
+
+SQRT_2PI = np.sqrt(2 * np.pi)
+
+
+def get_model_name(pricing_model) -> str:
+    """标量定价模块 => 向量化模型名称，不支持时返回空字符串"""
+    name = pricing_model.__name__.rsplit(".", 1)[-1]
+    for model in (BLACK_76, BLACK_SCHOLES):
+        if name == model or name == model + "_cython":
+            return model
+    return ""
+
+
+def to_arrays(*values) -> tuple:
+    """参数 => 相同形状的一维float64数组 + 原形状(标量参数时结果为0维数组)"""
+    arrays = np.broadcast_arrays(*[np.asarray(a, dtype=np.float64) for a in values])
+    shape = arrays[0].shape
+    return [a.reshape(-1) for a in arrays], shape
+
+
+def norm_pdf(x: np.ndarray) -> np.ndarray:
+    return np.exp(-0.5 * x * x) / SQRT_2PI
+
+
+def calculate_d1(
+    s: np.ndarray,
+    k: np.ndarray,
+    r: np.ndarray,
+    t: np.ndarray,
+    v: np.ndarray,
+    model: str = BLACK_76
+) -> np.ndarray:
+    """Calculate option D1 value"""
+    if model == BLACK_SCHOLES:
+        return (np.log(s / k) + (r + 0.5 * v * v) * t) / (v * np.sqrt(t))
+    return (np.log(s / k) + 0.5 * v * v * t) / (v * np.sqrt(t))
+
+
+def calculate_price_vega(
+    s: np.ndarray,
+    k: np.ndarray,
+    r: np.ndarray,
+    t: np.ndarray,
+    v: np.ndarray,
+    cp: np.ndarray,
+    model: str = BLACK_76
+) -> Tuple[np.ndarray, np.ndarray]:
+    """价格和原始vega(波动率变动1.0)，用于隐含波动率迭代"""
+    sqrt_t = np.sqrt(t)
+    d1 = calculate_d1(s, k, r, t, v, model)
+    d2 = d1 - v * sqrt_t
+    discount = np.exp(-r * t)
+
+    if model == BLACK_SCHOLES:
+        price = cp * (s * ndtr(cp * d1) - k * ndtr(cp * d2) * discount)
+        vega = s * norm_pdf(d1) * sqrt_t
+    else:
+        price = cp * (s * ndtr(cp * d1) - k * ndtr(cp * d2)) * discount
+        vega = s * discount * norm_pdf(d1) * sqrt_t
+    return price, vega
+
+
+def calculate_price(
+    s: np.ndarray,
+    k: np.ndarray,
+    r: np.ndarray,
+    t: np.ndarray,
+    v: np.ndarray,
+    cp: np.ndarray,
+    model: str = BLACK_76
+) -> np.ndarray:
+    """Calculate option price，波动率不为正时为内在价值"""
+    (s, k, r, t, v, cp), shape = to_arrays(s, k, r, t, v, cp)
+    valid = (v > 0) & (t > 0)
+    price = np.maximum(cp * (s - k), 0)
+    if valid.any():
+        price[valid] = calculate_price_vega(
+            s[valid], k[valid], r[valid], t[valid], v[valid], cp[valid], model)[0]
+    return price.reshape(shape)
+
+
+def calculate_greeks(
+    s: np.ndarray,
+    k: np.ndarray,
+    r: np.ndarray,
+    t: np.ndarray,
+    v: np.ndarray,
+    cp: np.ndarray,
+    model: str = BLACK_76,
+    annual_days: int = 240
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Calculate option price and greeks
+    波动率不为正的，价格为内在价值，希腊值为0
+    """
+    (s, k, r, t, v, cp), shape = to_arrays(s, k, r, t, v, cp)
+    price = np.maximum(cp * (s - k), 0)
+    delta = np.zeros_like(s)
+    gamma = np.zeros_like(s)
+    theta = np.zeros_like(s)
+    vega = np.zeros_like(s)
+
+    valid = (v > 0) & (t > 0)
+    if not valid.any():
+        return tuple(a.reshape(shape) for a in (price, delta, gamma, theta, vega))
+    s, k, r, t, v, cp = s[valid], k[valid], r[valid], t[valid], v[valid], cp[valid]
+
+    sqrt_t = np.sqrt(t)
+    d1 = calculate_d1(s, k, r, t, v, model)
+    d2 = d1 - v * sqrt_t
+    discount = np.exp(-r * t)
+    pdf_d1 = norm_pdf(d1)
+    cdf_d1 = ndtr(cp * d1)
+    cdf_d2 = ndtr(cp * d2)
+
+    if model == BLACK_SCHOLES:
+        price[valid] = cp * (s * cdf_d1 - k * cdf_d2 * discount)
+        delta[valid] = cp * cdf_d1 * s * 0.01
+        gamma[valid] = pdf_d1 / (s * v * sqrt_t) * s * s * 0.0001
+        theta[valid] = (-s * pdf_d1 * v / (2 * sqrt_t)
+                        - cp * r * k * discount * cdf_d2) / annual_days
+        vega[valid] = s * pdf_d1 * sqrt_t / 100
+    else:
+        price[valid] = cp * (s * cdf_d1 - k * cdf_d2) * discount
+        delta[valid] = cp * discount * cdf_d1 * s * 0.01
+        gamma[valid] = discount * pdf_d1 / (s * v * sqrt_t) * s * s * 0.0001
+        theta[valid] = (-s * discount * pdf_d1 * v / (2 * sqrt_t)
+                        + cp * r * s * discount * cdf_d1
+                        - cp * r * k * discount * cdf_d2) / annual_days
+        vega[valid] = s * discount * pdf_d1 * sqrt_t / 100
+
+    return tuple(a.reshape(shape) for a in (price, delta, gamma, theta, vega))
+
+
+def calculate_impv(
+    price: np.ndarray,
+    s: np.ndarray,
+    k: np.ndarray,
+    r: np.ndarray,
+    t: np.ndarray,
+    cp: np.ndarray,
+    model: str = BLACK_76,
+    init_v: np.ndarray = None,
+    max_iter: int = 50,
+    tolerance: float = 0.00001
+) -> np.ndarray:
+    """
+    Calculate option implied volatility
+    init_v: 初值(如上一次的隐含波动率)，不为正的使用 INIT_VOLATILITY
+    价格不为正、不高于内在价值(折现)或超出波动率区间的，返回0；结果保留4位小数(同标量模块)
+    """
+    (price, s, k, r, t, cp), shape = to_arrays(price, s, k, r, t, cp)
+    result = np.zeros(price.shape, dtype=np.float64)
+
+    # 价格需为正，且高于内在价值
+    discount = np.exp(-r * t)
+    with np.errstate(invalid="ignore"):
+        intrinsic = np.where(cp > 0, (s - k) * discount, k * discount - s)
+        valid = (price > 0) & (price > intrinsic) & (t > 0) & (s > 0) & (k > 0)
+    index = np.flatnonzero(valid)
+    if len(index) == 0:
+        return result.reshape(shape)
+
+    target = price[index]
+    s, k, r, t, cp = s[index], k[index], r[index], t[index], cp[index]
+    if init_v is None:
+        v = np.full(len(index), INIT_VOLATILITY)
+    else:
+        v = np.broadcast_to(np.asarray(init_v, dtype=np.float64), shape).reshape(-1)[index].copy()
+        v[~(v > 0)] = INIT_VOLATILITY
+    v = np.clip(v, MIN_VOLATILITY * 2, MAX_VOLATILITY / 2)
+
+    lower = np.full(len(index), MIN_VOLATILITY)
+    upper = np.full(len(index), MAX_VOLATILITY)
+    active = np.arange(len(index))
+
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for _ in range(max_iter):
+            va = v[active]
+            p, vega = calculate_price_vega(s[active], k[active], r[active], t[active], va, cp[active], model)
+            diff = p - target[active]
+
+            # 价格随波动率单调递增，按误差方向收缩区间
+            above = diff > 0
+            upper[active] = np.where(above, va, upper[active])
+            lower[active] = np.where(above, lower[active], va)
+
+            step = diff / vega
+            v_next = va - step
+            bisect = ~np.isfinite(v_next) | (v_next <= lower[active]) | (v_next >= upper[active])
+            v_next = np.where(bisect, 0.5 * (lower[active] + upper[active]), v_next)
+
+            done = ((np.abs(v_next - va) < tolerance) & ~bisect) | (upper[active] - lower[active] < tolerance)
+            v[active] = v_next
+            active = active[~done]
+            if len(active) == 0:
+                break
+
+    # 没有收敛到区间内部的(价格超过波动率上限对应的价格等)，视为无效
+    solved = (v > MIN_VOLATILITY * 1.5) & (v < MAX_VOLATILITY * 0.999)
+    result[index] = np.where(solved, np.round(v, 4), 0)
+    return result.reshape(shape)
@@ -1,11 +1,13 @@
 """"""
 import sys
 import traceback
-from typing import Optional, Callable
+from typing import Any, Callable, Dict, Optional
 
 from vnpy.event import Event, EventEngine
 from vnpy.rpc import RpcServer
+from vnpy.rpc.codec import DEFAULT_CODEC
 from vnpy.trader.engine import BaseEngine, MainEngine
+from vnpy.trader.event import EVENT_TICK, EVENT_BAR
 from vnpy.trader.utility import load_json, save_json
 from vnpy.trader.object import LogData
 
@@ -24,16 +26,19 @@ class RpcEngine(BaseEngine):
 
         self.rep_address = "tcp://*:2014"
         self.pub_address = "tcp://*:4102"
+        self.codec = DEFAULT_CODEC          # 推送数据的编解码器: binary/pickle
+        self.conflate_interval = 0.5        # 合并行情的发送间隔(秒)
+        self.pub_hwm = 100000               # 每个客户端的发送缓冲(消息数)
 
         self.server: Optional[RpcServer] = None
 
-        self.init_server()
         self.load_setting()
+        self.init_server()
         self.register_event()
 
     def init_server(self):
         """"""
-        self.server = RpcServer()
+        self.server = RpcServer(self.codec, self.conflate_interval, self.pub_hwm)
 
         self.server.register(self.main_engine.get_all_gateway_status)
         self.server.register(self.main_engine.subscribe)
@@ -59,6 +64,8 @@ class RpcEngine(BaseEngine):
         self.server.register(self.main_engine.get_all_active_orders)
         self.server.register(self.main_engine.get_all_custom_contracts)
 
+        self.server.register(self.get_rpc_metrics)
+
     def register(self, func: Callable):
         """ 扩展注册接口"""
         if self.server:
@@ -69,12 +76,18 @@ class RpcEngine(BaseEngine):
         setting = load_json(self.setting_filename)
         self.rep_address = setting.get("rep_address", self.rep_address)
         self.pub_address = setting.get("pub_address", self.pub_address)
+        self.codec = setting.get("codec", self.codec)
+        self.conflate_interval = setting.get("conflate_interval", self.conflate_interval)
+        self.pub_hwm = setting.get("pub_hwm", self.pub_hwm)
 
     def save_setting(self):
         """"""
         setting = {
             "rep_address": self.rep_address,
-            "pub_address": self.pub_address
+            "pub_address": self.pub_address,
+            "codec": self.codec,
+            "conflate_interval": self.conflate_interval,
+            "pub_hwm": self.pub_hwm
         }
         save_json(self.setting_filename, setting)
 
@@ -120,9 +133,25 @@ class RpcEngine(BaseEngine):
         self.event_engine.register_general(self.process_event)
 
     def process_event(self, event: Event):
-        """"""
+        """
+        推送事件，topic为 事件类型 + vt_symbol(如 eTick.rb2010.SHFE)，
+        客户端可按合约订阅行情，或按事件类型前缀订阅(如 eOrder.)
+        行情积压时只推送最新的，交易数据按顺序推送
+        """
         if self.server.is_active():
-            self.server.publish("", event)
+            vt_symbol = getattr(event.data, "vt_symbol", None)
+            topic = event.type + vt_symbol if vt_symbol else event.type
+            if event.type == EVENT_TICK or event.type == EVENT_BAR:
+                self.server.publish_market(topic, event)
+            else:
+                self.server.publish(topic, event)
+
+    def get_rpc_metrics(self) -> Dict[str, Any]:
+        """推送统计：发布线程，以及各客户端上报的延时、合并、丢失数量"""
+        return {
+            "publisher": self.server.get_publish_metrics(),
+            "subscribers": self.server.get_subscriber_metrics()
+        }
 
     def write_log(self, msg: str) -> None:
         """"""
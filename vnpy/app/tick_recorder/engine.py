@@ -3,12 +3,9 @@ tick 文件记录
 华富资产
 """
 import os
-import csv
 from threading import Thread
 from queue import Queue, Empty
 from copy import copy
-from collections import defaultdict
-from datetime import datetime
 
 from vnpy.event import Event, EventEngine
 from vnpy.trader.engine import BaseEngine, MainEngine
@@ -20,6 +17,7 @@ from vnpy.trader.object import (
 )
 from vnpy.trader.event import EVENT_TICK, EVENT_CONTRACT
 from vnpy.trader.utility import load_json, save_json
+from vnpy.trader.tick_cache import TickCacheWriter, export_tick_csv
 from vnpy.app.spread_trading.base import EVENT_SPREAD_DATA, SpreadData
 
 
@@ -30,75 +28,35 @@ EVENT_RECORDER_UPDATE = "eRecorderUpdate"
 
 
 class TickFileRecorder(object):
-    """ Tick 文件保存"""
-    def __init__(self, tick_folder: str):
-
-        self.tick_dict = defaultdict(list)   # symbol_hour_min: []
+    """
+    Tick 文件保存
+    tick按合约缓存在列缓冲中，由后台写线程批量追加到按交易日的列式文件(见vnpy.trader.tick_cache)，
+    替代每分钟逐个合约打开csv追加；需要csv时，在关闭时导出
+    """
+    def __init__(self, tick_folder: str, flush_size: int = 1000, flush_seconds: int = 60, export_csv: bool = False):
 
         self.tick_folder = tick_folder
+        self.export_csv = export_csv
 
-        self.last_minute = 0
+        self.writer = TickCacheWriter(tick_folder, flush_size=flush_size, flush_seconds=flush_seconds)
 
     def save_tick_data(self, tick_list: list = []):
         """接收外部的保存tick请求"""
-        min = None
         for tick in tick_list:
-            min = tick.datetime.minute
-            key = f'{tick.vt_symbol}_{tick.datetime.hour}-{tick.datetime.minute}'
-            save_list = self.tick_dict[key]
-            save_list.append(tick)
-
-        if min is not None and min != self.last_minute:
-            self.last_minute = min
-            self.save_expire_datas()
+            self.writer.add_tick(tick)
 
     def save_expire_datas(self):
         """保存超时得数据"""
-        dt = datetime.now()
-        for key in [key for key in self.tick_dict.keys() if not key.endswith(f'{dt.hour}-{dt.minute}')]:
-            vt_symbol = key.split('_')[0]
-            tick_list = self.tick_dict.pop(key)
-
-            self.append_ticks_2_file(symbol=vt_symbol, tick_list=tick_list)
-
-    def append_ticks_2_file(self, symbol: str, tick_list: list):
-        """创建/追加tick list 到csv文件"""
-        if len(tick_list) == 0:
-            return
-
-        trading_day = tick_list[0].trading_day
-
-        file_folder = os.path.abspath(os.path.join(self.tick_folder, trading_day.replace('-', '/')))
-        if not os.path.exists(file_folder):
-            os.makedirs(file_folder)
+        self.writer.flush_expired()
 
-        file_name = os.path.abspath(os.path.join(file_folder, f'{symbol}_{trading_day}.csv'))
-
-        dict_fieldnames = sorted(list(tick_list[0].__dict__))
-
-        dict_fieldnames.remove('datetime')
-
-        dict_fieldnames.insert(0, 'datetime')
+    def close(self):
+        """保存全部数据，导出csv"""
+        self.writer.close()
 
-        if not os.path.exists(file_name):
-            # 写入表头
-            print(f'create and write data into {file_name}')
-            with open(file_name, 'a', encoding='utf8', newline='') as csvWriteFile:
-                writer = csv.DictWriter(f=csvWriteFile, fieldnames=dict_fieldnames, dialect='excel')
-                writer.writeheader()
-                for tick in tick_list:
-                    d = tick.__dict__
-                    d.update({'datetime': tick.datetime.strftime('%Y-%m-%d %H:%M:%S.%f')})
-                    writer.writerow(d)
-        else:
-            # 写入数据
-            print(f'write data into {file_name}')
-            with open(file_name, 'a', encoding='utf8', newline='') as csvWriteFile:
-                writer = csv.DictWriter(f=csvWriteFile, fieldnames=dict_fieldnames, dialect='excel', extrasaction='ignore')
-                for tick in tick_list:
-                    d = tick.__dict__
-                    d.update({'datetime': tick.datetime.strftime('%Y-%m-%d %H:%M:%S.%f')})
-                    writer.writerow(d)
+        if self.export_csv:
+            for file_name in sorted(self.writer.files):
+                csv_file = export_tick_csv(file_name)
+                print(f'export {file_name} => {csv_file}')
 
 
 class TickRecorderEngine(BaseEngine):
@@ -115,10 +73,16 @@ class TickRecorderEngine(BaseEngine):
 
         self.tick_recordings = {}
         self.tick_folder = ''
+        self.flush_size = 1000  # 每个合约缓存多少条tick后写入
+        self.flush_seconds = 60  # 每个合约最多缓存多少秒后写入
+        self.export_csv = False  # 关闭时是否导出csv
 
         self.load_setting()
 
-        self.tick_recorder = TickFileRecorder(self.tick_folder)
+        self.tick_recorder = TickFileRecorder(self.tick_folder,
+                                              flush_size=self.flush_size,
+                                              flush_seconds=self.flush_seconds,
+                                              export_csv=self.export_csv)
 
         self.register_event()
         self.start()
@@ -129,11 +93,18 @@ class TickRecorderEngine(BaseEngine):
         setting = load_json(self.setting_filename)
         self.tick_recordings = setting.get("tick", {})
         self.tick_folder = setting.get('tick_folder', os.getcwd())
+        self.flush_size = setting.get('flush_size', self.flush_size)
+        self.flush_seconds = setting.get('flush_seconds', self.flush_seconds)
+        self.export_csv = setting.get('export_csv', self.export_csv)
 
     def save_setting(self):
         """"""
         setting = {
-            "tick": self.tick_recordings
+            "tick": self.tick_recordings,
+            "tick_folder": self.tick_folder,
+            "flush_size": self.flush_size,
+            "flush_seconds": self.flush_seconds,
+            "export_csv": self.export_csv
         }
         save_json(self.setting_filename, setting)
 
@@ -148,15 +119,18 @@ class TickRecorderEngine(BaseEngine):
                     self.tick_recorder.save_tick_data([data])
 
             except Empty:
+                self.tick_recorder.save_expire_datas()
                 continue
 
     def close(self):
         """"""
         self.active = False
 
-        if self.thread.isAlive():
+        if self.thread.is_alive():
             self.thread.join()
 
+        self.tick_recorder.close()
+
     def start(self):
         """"""
         self.active = True
@@ -0,0 +1,88 @@
+# encoding: UTF-8
+
+# K线指标计算的流水线
+# 每个指标计算函数(__count_xxx)登记为一个阶段，并声明启用条件与依赖关系，
+# K线根据自身的参数编译出只包含已启用指标的有序列表，on_bar时按顺序执行，
+# 每根bar的调度开销只与实际配置的指标数量有关
+
+
+class IndicatorStage(object):
+    """
+    指标计算阶段
+    name: 阶段名称，对应K线的 __count_{name} 方法
+    enabled: 启用条件，参数为K线对象，返回True/False
+    depends: 须在本阶段之前执行的阶段(仅影响顺序)
+    requires: 必须同时启用的阶段，否则本阶段不启用；元素为tuple时，表示其中任意一个启用即可
+    with_bar: 计算函数是否需要传入当前bar
+    """
+
+    def __init__(self, name: str, enabled, depends: tuple = (), requires: tuple = (), with_bar: bool = False):
+        self.name = name
+        self.enabled = enabled
+        self.requires = tuple(requires)
+        self.with_bar = with_bar
+
+        # requires 中的阶段，同时也是顺序依赖
+        depends = list(depends)
+        for item in self.requires:
+            for dep in (item if isinstance(item, tuple) else (item,)):
+                if dep not in depends:
+                    depends.append(dep)
+        self.depends = tuple(depends)
+
+    def __repr__(self):
+        return f'IndicatorStage({self.name})'
+
+
+def compile_indicator_stages(kline, stages: list) -> list:
+    """
+    根据K线的参数，编译出启用的指标阶段
+    1、按启用条件筛选，再剔除 requires 不满足的阶段(反复检查，直至不再变化)
+    2、按登记顺序排列，并保证 depends 中已启用的阶段排在前面
+    :param kline: K线对象
+    :param stages: 登记的全部阶段 [IndicatorStage]
+    :return: 有序的 [IndicatorStage]
+    """
+    stage_dict = {}
+    for stage in stages:
+        if stage.name in stage_dict:
+            raise ValueError(f'指标阶段重复登记:{stage.name}')
+        stage_dict[stage.name] = stage
+
+    active = set(stage.name for stage in stages if stage.enabled(kline))
+
+    changed = True
+    while changed:
+        changed = False
+        for name in list(active):
+            for item in stage_dict[name].requires:
+                choices = item if isinstance(item, tuple) else (item,)
+                if not any(dep in active for dep in choices):
+                    active.discard(name)
+                    changed = True
+                    break
+
+    result = []
+    visited = set()
+    visiting = set()
+
+    def visit(name: str):
+        if name in visited:
+            return
+        if name in visiting:
+            raise ValueError(f'指标阶段存在循环依赖:{name}')
+        visiting.add(name)
+        for dep in stage_dict[name].depends:
+            if dep not in stage_dict:
+                raise ValueError(f'指标阶段{name}依赖未登记的阶段:{dep}')
+            if dep in active:
+                visit(dep)
+        visiting.discard(name)
+        visited.add(name)
+        result.append(stage_dict[name])
+
+    for stage in stages:
+        if stage.name in active:
+            visit(stage.name)
+
+    return result
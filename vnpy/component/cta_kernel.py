@@ -0,0 +1,523 @@
+# encoding: UTF-8
+
+# 增量指标计算器
+# 每根bar只输入最新数据，O(1)(MACD为固定窗口的O(window))更新指标值，
+# 与CtaLineBar原有的talib窗口计算方式(只取[-1])结果一致
+# batch() 为向量化版本，一次性计算整段数据上每个位置的指标值，用于K线批量预热
+
+import math
+from collections import deque
+from functools import lru_cache
+
+import numpy as np
+import talib as ta
+from numpy.lib.stride_tricks import sliding_window_view
+
+from vnpy.component.cta_series import CtaSeries
+
+
+class CtaKernel(object):
+    """
+    增量指标计算器基类
+    window: 决定当前指标值所需的最近输入数量，不足时value为nan
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.count = 0  # 已输入的数据数量
+        self.value = np.nan
+        self.bar_num = 0  # 已同步到的bar序号，由CtaLineBar维护
+
+    @property
+    def ready(self) -> bool:
+        """输入数据是否已满足窗口"""
+        return self.count >= self.window
+
+    def reset(self):
+        """清除状态"""
+        self.count = 0
+        self.value = np.nan
+
+    def update(self, *args) -> float:
+        """输入最新数据，返回最新指标值"""
+        raise NotImplementedError
+
+    def batch(self, *arrays) -> dict:
+        """
+        向量化计算
+        :param arrays: 与update()参数对应的完整数据数组
+        :return: {属性名: 数组}，数组第i个值为以第i个数据为窗口末端的指标值，窗口不足为nan
+        """
+        raise NotImplementedError
+
+
+def windows(data: np.ndarray, window: int) -> np.ndarray:
+    """滑动窗口视图，返回 (len(data) - window + 1, window)"""
+    return sliding_window_view(np.asarray(data, dtype=float), window)
+
+
+def align(values: np.ndarray, length: int) -> np.ndarray:
+    """窗口计算结果对齐到数据末端，前面补nan"""
+    result = np.full(length, np.nan)
+    if len(values) > 0:
+        result[length - len(values):] = values
+    return result
+
+
+class MeanKernel(CtaKernel):
+    """
+    简单移动平均(滑动求和)
+    对应 ta.MA(data[-n:], n)[-1]
+    """
+
+    def __init__(self, n: int):
+        super().__init__(n)
+        self.n = n
+        self.reset()
+
+    def reset(self):
+        super().reset()
+        self.data = deque(maxlen=self.n)
+        self.total = 0.0
+
+    def update(self, x: float) -> float:
+        if len(self.data) == self.n:
+            self.total -= self.data[0]
+        self.data.append(x)
+        self.total += x
+        self.count += 1
+
+        # 定期重新求和，消除累计误差
+        if self.count % self.n == 0:
+            self.total = math.fsum(self.data)
+
+        if self.ready:
+            self.value = self.total / self.n
+        return self.value
+
+    def batch(self, x: np.ndarray) -> dict:
+        if len(x) < self.n:
+            return {'value': align([], len(x))}
+        return {'value': align(windows(x, self.n).mean(axis=1), len(x))}
+
+
+class StdKernel(CtaKernel):
+    """
+    滑动窗口的均值/标准差(Welford)
+    ddof=0: 对应 ta.BBANDS / ta.STDDEV 的总体标准差
+    ddof=1: 对应 np.std(data[-n:], ddof=1)
+    """
+
+    def __init__(self, n: int, ddof: int = 0):
+        super().__init__(n)
+        self.n = n
+        self.ddof = ddof
+        self.reset()
+
+    def reset(self):
+        super().reset()
+        self.data = deque(maxlen=self.n)
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, x: float) -> float:
+        if len(self.data) == self.n:
+            # 窗口已满，替换最早的数据
+            old = self.data[0]
+            self.data.append(x)
+            old_mean = self.mean
+            self.mean = old_mean + (x - old) / self.n
+            self.m2 += (x - old) * (x - self.mean + old - old_mean)
+        else:
+            self.data.append(x)
+            delta = x - self.mean
+            self.mean += delta / len(self.data)
+            self.m2 += delta * (x - self.mean)
+        self.count += 1
+
+        # 定期重算，消除累计误差
+        if self.count % self.n == 0:
+            data = np.array(self.data)
+            self.mean = data.mean()
+            self.m2 = float(((data - self.mean) ** 2).sum())
+
+        if self.ready:
+            self.value = math.sqrt(max(self.m2, 0) / (self.n - self.ddof))
+        return self.value
+
+    def batch(self, x: np.ndarray) -> dict:
+        if len(x) < self.n:
+            return {'value': align([], len(x)), 'mean': align([], len(x))}
+        data = windows(x, self.n)
+        return {'value': align(data.std(axis=1, ddof=self.ddof), len(x)),
+                'mean': align(data.mean(axis=1), len(x))}
+
+
+class MaxKernel(CtaKernel):
+    """
+    滑动窗口最大值(单调队列)
+    对应 max(data[-n:])
+    """
+
+    def __init__(self, n: int):
+        super().__init__(n)
+        self.n = n
+        self.reset()
+
+    def reset(self):
+        super().reset()
+        self.queue = deque()  # (序号, 数值)，数值单调递减
+
+    def _better(self, new: float, old: float) -> bool:
+        return new >= old
+
+    def update(self, x: float) -> float:
+        queue = self.queue
+        while queue and self._better(x, queue[-1][1]):
+            queue.pop()
+        queue.append((self.count, x))
+        self.count += 1
+        while queue[0][0] <= self.count - 1 - self.n:
+            queue.popleft()
+
+        if self.ready:
+            self.value = queue[0][1]
+        return self.value
+
+    def batch(self, x: np.ndarray) -> dict:
+        if len(x) < self.n:
+            return {'value': align([], len(x))}
+        return {'value': align(self._reduce(windows(x, self.n)), len(x))}
+
+    def _reduce(self, data: np.ndarray) -> np.ndarray:
+        return data.max(axis=1)
+
+
+class MinKernel(MaxKernel):
+    """
+    滑动窗口最小值(单调队列)
+    对应 min(data[-n:])
+    """
+
+    def _better(self, new: float, old: float) -> bool:
+        return new <= old
+
+    def _reduce(self, data: np.ndarray) -> np.ndarray:
+        return data.min(axis=1)
+
+
+class EmaKernel(CtaKernel):
+    """
+    与talib一致的窗口指数平均
+    ta.EMA(data[-window:], n)[-1] 并非无限递归的EMA，而是：
+        以窗口内前n个数据的SMA为种子，再对剩余 m = window - n 个数据递归
+        ema = beta^m * SMA(种子段) + alpha * sum(beta^j * x[t-j], j=0..m-1)
+    分别滑动维护种子段之和与递归段的加权和，每次更新O(1)
+    alpha缺省为 2/(n+1)；Wilder平滑(ATR/RSI)为 1/n
+    """
+
+    def __init__(self, n: int, window: int = None, alpha: float = None):
+        window = window if window else n
+        super().__init__(window)
+        self.n = n
+        self.alpha = 2 / (n + 1) if alpha is None else alpha
+        self.beta = 1 - self.alpha
+        self.m = window - n
+        self.beta_m = self.beta ** self.m
+        self.reset()
+
+    def reset(self):
+        super().reset()
+        self.data = deque(maxlen=self.window)
+        self.seed_total = 0.0  # 种子段之和
+        self.ema_total = 0.0  # 递归段的加权和
+
+    def update(self, x: float) -> float:
+        data = self.data
+        if len(data) == self.window:
+            # 移出窗口的数据，属于种子段
+            self.seed_total -= data[0]
+        data.append(x)
+        self.count += 1
+
+        if self.m == 0:
+            self.seed_total += x
+        else:
+            self.ema_total = x + self.beta * self.ema_total
+            if len(data) > self.m:
+                # 离开递归段，进入种子段的数据
+                x_m = data[-self.m - 1]
+                self.ema_total -= self.beta_m * x_m
+                self.seed_total += x_m
+
+        # 定期重算，消除累计误差
+        if self.count % self.window == 0:
+            self.resync()
+
+        if self.ready:
+            self.value = self.beta_m * self.seed_total / self.n + self.alpha * self.ema_total
+        return self.value
+
+    def resync(self):
+        """根据窗口数据，重新计算种子段之和与递归段的加权和"""
+        data = np.array(self.data)
+        recent = data[len(data) - self.m:] if self.m > 0 else data[:0]
+        self.seed_total = math.fsum(data[:len(data) - len(recent)])
+        self.ema_total = float(np.dot(recent[::-1], self.beta ** np.arange(len(recent))))
+
+    def batch(self, x: np.ndarray) -> dict:
+        if len(x) < self.window:
+            return {'value': align([], len(x))}
+        data = windows(x, self.window)
+        seed = data[:, :self.n].mean(axis=1)
+        ema = data[:, self.n:] @ (self.beta ** np.arange(self.m)[::-1])
+        return {'value': align(self.beta_m * seed + self.alpha * ema, len(x))}
+
+
+class AtrKernel(CtaKernel):
+    """
+    ATR
+    对应 ta.ATR(high[-2n:], low[-2n:], close[-2n:], n)[-1]
+    窗口内2n根bar，产生2n-1个真实波幅，前n个求SMA作为种子，剩余n-1个Wilder平滑
+    """
+
+    def __init__(self, n: int):
+        super().__init__(2 * n)
+        self.n = n
+        self.ema = EmaKernel(n, window=2 * n - 1, alpha=1 / n)
+        self.reset()
+
+    def reset(self):
+        super().reset()
+        self.ema.reset()
+        self.pre_close = None
+
+    def update(self, high: float, low: float, close: float) -> float:
+        self.count += 1
+        if self.pre_close is not None:
+            tr = max(high - low, abs(self.pre_close - high), abs(self.pre_close - low))
+            self.value = self.ema.update(tr)
+        self.pre_close = close
+        return self.value
+
+    def batch(self, high: np.ndarray, low: np.ndarray, close: np.ndarray) -> dict:
+        high, low, close = [np.asarray(a, dtype=float) for a in (high, low, close)]
+        pre_close = close[:-1]
+        tr = np.maximum.reduce([high[1:] - low[1:], np.abs(pre_close - high[1:]), np.abs(pre_close - low[1:])])
+        value = self.ema.batch(tr)['value']
+        return {'value': align(value, len(close))}
+
+
+class RsiKernel(CtaKernel):
+    """
+    RSI
+    对应 ta.RSI(close[-2n:], n)[-1]
+    窗口内2n个收盘价，2n-1个涨跌幅，平均涨幅/跌幅分别做Wilder平滑
+    """
+
+    def __init__(self, n: int):
+        super().__init__(2 * n)
+        self.n = n
+        self.gain = EmaKernel(n, window=2 * n - 1, alpha=1 / n)
+        self.loss = EmaKernel(n, window=2 * n - 1, alpha=1 / n)
+        self.reset()
+
+    def reset(self):
+        super().reset()
+        self.gain.reset()
+        self.loss.reset()
+        self.pre_close = None
+
+    def update(self, close: float) -> float:
+        self.count += 1
+        if self.pre_close is not None:
+            diff = close - self.pre_close
+            gain = self.gain.update(diff if diff > 0 else 0.0)
+            loss = self.loss.update(-diff if diff < 0 else 0.0)
+            if self.ready:
+                total = gain + loss
+                self.value = 100 * gain / total if abs(total) >= 1e-14 else 0.0
+        self.pre_close = close
+        return self.value
+
+    def batch(self, close: np.ndarray) -> dict:
+        diff = np.diff(np.asarray(close, dtype=float))
+        gain = np.where(diff > 0, diff, 0.0)
+        loss = np.where(diff < 0, -diff, 0.0)
+        gain[np.isnan(diff)] = np.nan
+        loss[np.isnan(diff)] = np.nan
+        gain = self.gain.batch(gain)['value']
+        loss = self.loss.batch(loss)['value']
+        total = gain + loss
+        with np.errstate(divide='ignore', invalid='ignore'):
+            value = np.where(np.abs(total) >= 1e-14, 100 * gain / total, 0.0)
+        value[np.isnan(total)] = np.nan
+        return {'value': align(value, len(close))}
+
+
+class MacdKernel(CtaKernel):
+    """
+    MACD
+    对应 ta.MACD(close[-window:], fast, slow, signal)的最后一组值
+    talib的MACD在固定窗口内是收盘价的线性函数(SMA种子 + EMA递归)，
+    初始化时用单位向量求出dif/dea的权重，之后每根bar只需两次定长点积，与历史长度无关
+    """
+
+    def __init__(self, fast: int, slow: int, signal: int, window: int):
+        super().__init__(window)
+        self.fast = fast
+        self.slow = slow
+        self.signal = signal
+
+        self.dif_weights = np.zeros(window)
+        self.dea_weights = np.zeros(window)
+        for i in range(window):
+            unit = np.zeros(window)
+            unit[i] = 1.0
+            dif, dea, _ = ta.MACD(unit, fastperiod=fast, slowperiod=slow, signalperiod=signal)
+            self.dif_weights[i] = dif[-1]
+            self.dea_weights[i] = dea[-1]
+
+        self.reset()
+
+    def reset(self):
+        super().reset()
+        self.data = CtaSeries(self.window)
+        self.dif = np.nan
+        self.dea = np.nan
+        self.macd = np.nan
+
+    def update(self, close: float) -> float:
+        self.data.append(close)
+        self.count += 1
+        if self.ready:
+            values = self.data.values
+            self.dif = float(np.dot(self.dif_weights, values))
+            self.dea = float(np.dot(self.dea_weights, values))
+            self.macd = self.dif - self.dea
+            self.value = self.macd
+        return self.value
+
+    def batch(self, close: np.ndarray) -> dict:
+        if len(close) < self.window:
+            empty = align([], len(close))
+            return {'value': empty, 'dif': empty, 'dea': empty, 'macd': empty}
+        data = windows(close, self.window)
+        dif = align(data @ self.dif_weights, len(close))
+        dea = align(data @ self.dea_weights, len(close))
+        return {'value': dif - dea, 'dif': dif, 'dea': dea, 'macd': dif - dea}
+
+
+class CciKernel(CtaKernel):
+    """
+    CCI
+    对应 tp = data[-n:]; (tp[-1] - mean(tp)) / (0.015 * mean(|tp - mean(tp)|))
+    平均绝对偏差无法滑动更新，每次对窗口内n个数据计算(与原计算方式逐位一致)
+    """
+
+    def __init__(self, n: int):
+        super().__init__(n)
+        self.n = n
+        self.data = deque(maxlen=n)
+
+    def reset(self):
+        super().reset()
+        self.data.clear()
+
+    def update(self, tp: float) -> float:
+        self.data.append(tp)
+        self.count += 1
+        if self.ready:
+            data = np.array(self.data)
+            mean = np.mean(data)
+            md = np.mean(np.abs(data - mean))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                self.value = float((data[-1] - mean) / (0.015 * md))
+        return self.value
+
+    def batch(self, tp: np.ndarray) -> dict:
+        if len(tp) < self.n:
+            return {'value': align([], len(tp))}
+        data = windows(tp, self.n)
+        mean = data.mean(axis=1)
+        md = np.abs(data - mean[:, None]).mean(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            value = (data[:, -1] - mean) / (0.015 * md)
+        return {'value': align(value, len(tp))}
+
+
+@lru_cache(maxsize=64)
+def ema_weights(length: int, spans: tuple) -> np.ndarray:
+    """
+    依次做 pd.Series(data).ewm(span, adjust=False).mean() 后，最后一个值对length个输入数据的权重
+    adjust=False 的ewm是输入数据的线性函数，用单位矩阵递推求出权重
+    """
+    values = np.eye(length)
+    for span in spans:
+        alpha = 2 / (span + 1)
+        for i in range(1, length):
+            values[i] = alpha * values[i] + (1 - alpha) * values[i - 1]
+    return values[-1]
+
+
+def ema_last_state(data: np.ndarray, span: int) -> tuple:
+    """
+    ta.EMA(data + [最新值], span)[-1] 的递推状态，最新值到达时只需一步：前值 + (最新值 - 前值) * 权重
+    data不足span个时，前值取均值、权重取1/span，与talib的SMA种子一致；不足span-1个时前值为nan
+    :return: (前值, 权重)
+    """
+    data = np.asarray(data, dtype=float)
+    valid = ~np.isnan(data)
+    # talib跳过开头的nan
+    data = data[valid.argmax():] if valid.any() else data[:0]
+    if len(data) >= span:
+        return float(ta.EMA(data, span)[-1]), 2 / (span + 1)
+    if len(data) == span - 1 and span > 1:
+        return float(data.mean()), 1 / span
+    return np.nan, 0.0
+
+
+def cci_rt_base(high: np.ndarray, low: np.ndarray, close: np.ndarray, n: int) -> dict:
+    """
+    实时CCI的基础数据：最近n-1根已完成bar的典型价格(排序后)及其前缀和
+    最新典型价格到达时，均值和平均绝对偏差用二分查找即可求出，不必重新遍历窗口
+    """
+    if n > 1:
+        tp = np.sort((np.asarray(high[1 - n:], dtype=float) + low[1 - n:] + close[1 - n:]) / 3)
+    else:
+        tp = np.empty(0)
+    return {'n': n, 'tp': tp, 'tp_cumsum': np.concatenate(([0.0], np.cumsum(tp)))}
+
+
+def cci_rt_value(base: dict, cur_tp: float) -> float:
+    """在cci_rt_base上叠加最新典型价格，得到实时CCI"""
+    n, tp, cumsum = base['n'], base['tp'], base['tp_cumsum']
+    total = cumsum[-1]
+    ma = (total + cur_tp) / n
+    # 小于均值的k个典型价格，偏差为 ma*k - 前缀和；其余为 后缀和 - ma*(n-1-k)
+    k = int(np.searchsorted(tp, ma))
+    md = (ma * k - cumsum[k] + (total - cumsum[k]) - ma * (len(tp) - k) + abs(cur_tp - ma)) / n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return float((cur_tp - ma) / (0.015 * md))
+
+
+class CtaBatchKernel(object):
+    """
+    增量指标计算器的批量计算结果
+    接口与CtaKernel一致(ready/value 及 mean/dif/dea/macd 等属性)，
+    K线批量预热时，代替CtaKernel逐根更新，每根bar只需定位到对应的结果
+    """
+
+    def __init__(self, kernel: CtaKernel, *arrays):
+        self.window = kernel.window
+        # 转换为list，逐根取值时比ndarray.item更快
+        self.results = [(name, values.tolist()) for name, values in kernel.batch(*arrays).items()]
+        self.ready = False
+        self.value = np.nan
+
+    def seek(self, index: int, ready: bool):
+        """定位到第index个数据"""
+        self.ready = ready
+        for name, values in self.results:
+            setattr(self, name, values[index])
+        return self
@@ -0,0 +1,457 @@
+# encoding: UTF-8
+
+# K线组件的列式持久化缓存
+# 替代 bz2 + pickle 整个K线对象的 {strategy}_klines.pkb2：
+# 1、只保存数据：开高低收、line_xxx 等环形序列保存为numpy数据块，其他属性保存为带类型标记的json，
+#    加载时不反序列化任何代码对象，只按类路径恢复vnpy自身的枚举和数据类(BarData、CtaPeriod等)的实例属性
+# 2、容器结构：MAGIC(8字节) + 头部长度(uint32) + 头部(json) + 各数据块，数据块可用lz4/zlib压缩(不压缩时为零拷贝视图)，
+#    头部记录版本号；K线类增加属性后，缓存中没有的属性保持新实例的初始值
+# 3、K线的bar列表(line_bar)写入追加式的bar日志 {strategy}_klines.klb，每次只追加上次保存后完成的bar；
+#    状态文件 {strategy}_klines.kls 记录日志编号/有效长度、各K线已完成bar的数量、最后时间，以及未完成的bar
+
+import os
+import json
+import struct
+import uuid
+import importlib
+from datetime import datetime, date
+from enum import Enum
+
+import numpy as np
+import pandas as pd
+
+from vnpy.component.cta_series import CtaSeries
+from vnpy.trader.tick_cache import compress_block, decompress_block, check_codec, get_fast_codec
+
+KLINE_STORE_VERSION = 1
+
+MAGIC = b'VNKLS\x00\x00\x01'
+STATE_SUFFIX = '.kls'
+LOG_SUFFIX = '.klb'
+
+# 不保存的属性：策略/回调，增量计算器、实时指标缓存(加载后重建)
+SKIP_KEYS = ['strategy', 'cb_on_bar', 'cb_on_period', 'cb_dict', 'indicator_pipeline',
+             'kernels', 'batch_kernels', 'rt_cache', 'rt_bases']
+
+# bar日志中的bar数量超过K线bar数量的倍数时，重写日志
+COMPACT_RATIO = 3
+
+
+def pack_blocks(header: dict, arrays: dict, codec: str = None) -> bytes:
+    """
+    打包为容器
+    :param header: 头部(可json序列化)
+    :param arrays: {名称: numpy数组}
+    :param codec: 压缩方式 None/'lz4'/'zstd'/'zlib'
+    """
+    check_codec(codec)
+    blocks = []
+    raws = []
+    for name, values in arrays.items():
+        values = np.ascontiguousarray(values)
+        raw = values.tobytes()
+        if codec:
+            raw = compress_block(codec, raw)
+        blocks.append({'name': name, 'dtype': values.dtype.str, 'shape': list(values.shape), 'size': len(raw)})
+        raws.append(raw)
+
+    head = dict(header, version=KLINE_STORE_VERSION, codec=codec, blocks=blocks)
+    head = json.dumps(head).encode('utf-8')
+    return b''.join([MAGIC, struct.pack('<I', len(head)), head] + raws)
+
+
+def unpack_blocks(data: bytes):
+    """
+    解包容器
+    :return: (头部, {名称: numpy数组})，不压缩时数组为data的只读视图
+    """
+    n = len(MAGIC)
+    if bytes(data[:n]) != MAGIC:
+        raise ValueError('不是K线缓存数据')
+    head_len = struct.unpack_from('<I', data, n)[0]
+    header = json.loads(bytes(data[n + 4:n + 4 + head_len]).decode('utf-8'))
+    if header.get('version') != KLINE_STORE_VERSION:
+        raise ValueError(f"K线缓存版本{header.get('version')}与当前版本{KLINE_STORE_VERSION}不一致")
+
+    codec = header.get('codec')
+    view = memoryview(data)
+    offset = n + 4 + head_len
+    arrays = {}
+    for block in header['blocks']:
+        raw = view[offset:offset + block['size']]
+        offset += block['size']
+        if codec:
+            raw = decompress_block(codec, raw)
+        arrays[block['name']] = np.frombuffer(raw, dtype=np.dtype(block['dtype'])).reshape(block['shape'])
+    return header, arrays
+
+
+def _class_path(cls) -> str:
+    return f'{cls.__module__}:{cls.__qualname__}'
+
+
+def _load_class(path: str):
+    """按类路径加载类，只允许vnpy中的类"""
+    module_name, _, qualname = path.partition(':')
+    if module_name.split('.')[0] != 'vnpy':
+        raise ValueError(f'不支持恢复{path}')
+    obj = importlib.import_module(module_name)
+    for name in qualname.split('.'):
+        obj = getattr(obj, name)
+    return obj
+
+
+class ValueEncoder(object):
+    """属性值 <=> 带类型标记的json + numpy数据块"""
+
+    def __init__(self, arrays: dict = None):
+        self.arrays = arrays if arrays is not None else {}
+
+    def add_array(self, values: np.ndarray) -> str:
+        """加入数据块，返回数据块名称"""
+        name = str(len(self.arrays))
+        self.arrays[name] = values
+        return name
+
+    def encode(self, value):
+        """属性值 => json，不支持的类型抛出TypeError"""
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return value
+        if isinstance(value, np.generic):
+            return value.item()
+        if isinstance(value, CtaSeries):
+            return {'__series__': self.add_array(value.values), 'max_len': value.max_len}
+        if isinstance(value, np.ndarray):
+            if value.dtype.kind not in 'biufcmM':
+                raise TypeError(f'不支持保存{value.dtype}数组')
+            return {'__array__': self.add_array(value)}
+        if isinstance(value, Enum):
+            return {'__enum__': _class_path(type(value)), 'name': value.name}
+        if isinstance(value, datetime):
+            return {'__datetime__': value.isoformat()}
+        if isinstance(value, date):
+            return {'__date__': value.isoformat()}
+        if isinstance(value, list):
+            return [self.encode(v) for v in value]
+        if isinstance(value, tuple):
+            return {'__tuple__': [self.encode(v) for v in value]}
+        if isinstance(value, (set, frozenset)):
+            return {'__set__': [self.encode(v) for v in value]}
+        if isinstance(value, dict):
+            if all(isinstance(k, str) and not k.startswith('__') for k in value):
+                return {k: self.encode(v) for k, v in value.items()}
+            return {'__items__': [[self.encode(k), self.encode(v)] for k, v in value.items()]}
+        if hasattr(value, '__dict__') and type(value).__module__.split('.')[0] == 'vnpy':
+            return {'__object__': _class_path(type(value)), 'state': self.encode(value.__dict__)}
+        raise TypeError(f'不支持保存{type(value)}')
+
+    def decode(self, value):
+        """json => 属性值"""
+        if isinstance(value, list):
+            return [self.decode(v) for v in value]
+        if not isinstance(value, dict):
+            return value
+        if '__series__' in value:
+            return CtaSeries.from_values(value['max_len'], self.arrays[value['__series__']])
+        if '__array__' in value:
+            return np.array(self.arrays[value['__array__']])
+        if '__enum__' in value:
+            return _load_class(value['__enum__'])[value['name']]
+        if '__datetime__' in value:
+            return datetime.fromisoformat(value['__datetime__'])
+        if '__date__' in value:
+            return date.fromisoformat(value['__date__'])
+        if '__tuple__' in value:
+            return tuple(self.decode(v) for v in value['__tuple__'])
+        if '__set__' in value:
+            return set(self.decode(v) for v in value['__set__'])
+        if '__items__' in value:
+            return {self.decode(k): self.decode(v) for k, v in value['__items__']}
+        if '__object__' in value:
+            cls = _load_class(value['__object__'])
+            obj = cls.__new__(cls)
+            obj.__dict__.update(self.decode(value['state']))
+            return obj
+        return {k: self.decode(v) for k, v in value.items()}
+
+
+def pack_bars(bars: list, encoder: ValueEncoder) -> dict:
+    """
+    bar列表 => 列式数据
+    数值列、无时区的时间列保存为数据块，整列相同的(合约、交易所、周期等)保存为常量，其他逐个保存
+    """
+    if len(bars) == 0:
+        return {'rows': 0, 'columns': {}}
+
+    columns = {}
+    for key in bars[0].__dict__.keys():
+        values = [getattr(bar, key, None) for bar in bars]
+        first = values[0]
+        if all(isinstance(v, (int, float, np.number)) and not isinstance(v, bool) for v in values):
+            columns[key] = {'values': encoder.add_array(np.asarray(values))}
+        elif all(isinstance(v, datetime) and v.tzinfo is None for v in values):
+            columns[key] = {'datetime': encoder.add_array(np.asarray(values, dtype='datetime64[us]'))}
+        elif (first is None or isinstance(first, (str, bool, Enum))) \
+                and all(type(v) is type(first) and v == first for v in values):
+            columns[key] = {'const': encoder.encode(first)}
+        else:
+            columns[key] = {'list': encoder.encode(values)}
+
+    return {'cls': _class_path(type(bars[0])), 'rows': len(bars), 'columns': columns}
+
+
+def unpack_bars(data: dict, encoder: ValueEncoder) -> list:
+    """列式数据 => bar列表"""
+    rows = data['rows']
+    if rows == 0:
+        return []
+
+    cls = _load_class(data['cls'])
+    columns = {}
+    for key, col in data['columns'].items():
+        if 'values' in col:
+            columns[key] = encoder.arrays[col['values']].tolist()
+        elif 'datetime' in col:
+            columns[key] = encoder.arrays[col['datetime']].tolist()
+        elif 'const' in col:
+            columns[key] = [encoder.decode(col['const'])] * rows
+        else:
+            columns[key] = encoder.decode(col['list'])
+
+    keys = list(columns.keys())
+    bars = []
+    for row in zip(*columns.values()):
+        bar = cls.__new__(cls)
+        for key, value in zip(keys, row):
+            setattr(bar, key, value)
+        bars.append(bar)
+    return bars
+
+
+def encode_kline_state(kline, encoder: ValueEncoder) -> dict:
+    """K线属性(不含line_bar) => json，跳过回调、计算器缓存和无法保存的属性"""
+    state = {}
+    for key, value in kline.__dict__.items():
+        if key in SKIP_KEYS or key == 'line_bar' or callable(value):
+            continue
+        try:
+            state[key] = encoder.encode(value)
+        except (TypeError, ValueError):
+            continue
+    return state
+
+
+class KlineStore(object):
+    """
+    策略的K线缓存
+    save_path/{strategy_name}_klines.kls: 状态文件
+    save_path/{strategy_name}_klines.klb: bar日志，由若干 长度(uint32) + 容器 组成
+    """
+
+    def __init__(self, save_path: str, strategy_name: str, codec: str = None):
+        self.state_file = os.path.abspath(os.path.join(save_path, f'{strategy_name}_klines{STATE_SUFFIX}'))
+        self.log_file = os.path.abspath(os.path.join(save_path, f'{strategy_name}_klines{LOG_SUFFIX}'))
+        self.codec = codec or get_fast_codec()
+
+        self.log_id = None  # bar日志编号，None时下次保存重写日志
+        self.log_size = 0  # bar日志的有效长度
+        self.log_rows = {}  # kline_name: 日志中的bar数量
+        self.last_dts = {}  # kline_name: 日志中最后一根bar的时间
+
+    def exists(self) -> bool:
+        return os.path.isfile(self.state_file)
+
+    def save(self, klines: dict) -> int:
+        """
+        保存K线
+        :param klines: {kline_name: kline}
+        :return: 本次写入bar日志的bar数量
+        """
+        rewrite = self.log_id is None or not os.path.isfile(self.log_file) \
+            or os.path.getsize(self.log_file) < self.log_size
+        if not rewrite:
+            rewrite = any(self.log_rows.get(name, 0) > COMPACT_RATIO * max(len(getattr(kline, 'line_bar', [])), 1)
+                          for name, kline in klines.items())
+        log_id = uuid.uuid4().hex if rewrite else self.log_id
+
+        encoder = ValueEncoder()
+        states = {}
+        chunks = []
+        last_dts = {}
+        new_rows = {}
+        for name, kline in klines.items():
+            bars = list(getattr(kline, 'line_bar', []))
+            # 最后一根bar可能还未完成，每次保存在状态文件中，不写入日志
+            completed = bars[:-1]
+            last_dt = None if rewrite else self.last_dts.get(name)
+            new_bars = completed
+            if last_dt is not None:
+                i = len(completed)
+                while i > 0 and completed[i - 1].datetime > last_dt:
+                    i -= 1
+                new_bars = completed[i:]
+
+            if new_bars:
+                bar_encoder = ValueEncoder()
+                chunk_header = {'log_id': log_id, 'kline': name, 'bars': pack_bars(new_bars, bar_encoder)}
+                chunk = pack_blocks(chunk_header, bar_encoder.arrays, self.codec)
+                chunks.append(struct.pack('<I', len(chunk)) + chunk)
+            last_dts[name] = completed[-1].datetime if completed else last_dt
+            new_rows[name] = len(new_bars)
+
+            states[name] = {
+                'state': encode_kline_state(kline, encoder),
+                'bars': {
+                    'count': len(completed),
+                    'last_dt': encoder.encode(last_dts[name]),
+                    'forming': encoder.encode(bars[-1]) if bars else None
+                }
+            }
+
+        data = b''.join(chunks)
+        if rewrite:
+            tmp_file = f'{self.log_file}.{os.getpid()}.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_file, self.log_file)
+            log_size = len(data)
+        else:
+            # 截掉上次保存后写入失败的部分，再追加
+            with open(self.log_file, 'r+b') as f:
+                f.seek(self.log_size)
+                f.truncate()
+                f.write(data)
+            log_size = self.log_size + len(data)
+
+        # 先写日志，后写状态文件，状态文件只引用已写入的日志长度
+        state_data = pack_blocks({'log_id': log_id, 'log_size': log_size, 'klines': states},
+                                 encoder.arrays, self.codec)
+        tmp_file = f'{self.state_file}.{os.getpid()}.tmp'
+        with open(tmp_file, 'wb') as f:
+            f.write(state_data)
+        os.replace(tmp_file, self.state_file)
+
+        if rewrite:
+            self.log_rows = {}
+            self.last_dts = {}
+        self.log_id = log_id
+        self.log_size = log_size
+        for name, rows in new_rows.items():
+            self.log_rows[name] = self.log_rows.get(name, 0) + rows
+            self.last_dts[name] = last_dts[name]
+        return sum(new_rows.values())
+
+    def read_log(self, log_id: str, log_size: int) -> dict:
+        """
+        读取bar日志
+        :return: {kline_name: [bar]}
+        """
+        if log_size == 0:
+            return {}
+        with open(self.log_file, 'rb') as f:
+            data = f.read(log_size)
+        if len(data) < log_size:
+            raise ValueError(f'bar日志{self.log_file}不完整')
+
+        klines_bars = {}
+        offset = 0
+        while offset < log_size:
+            n = struct.unpack_from('<I', data, offset)[0]
+            header, arrays = unpack_blocks(memoryview(data)[offset + 4:offset + 4 + n])
+            offset += 4 + n
+            if header.get('log_id') != log_id:
+                raise ValueError(f'bar日志{self.log_file}与状态文件不一致')
+            klines_bars.setdefault(header['kline'], []).extend(unpack_bars(header['bars'], ValueEncoder(arrays)))
+        return klines_bars
+
+    def load(self, klines: dict) -> dict:
+        """
+        恢复K线，缓存中没有的K线保持不变
+        恢复后需重新绑定K线的策略(strategy)，回调函数保持不变
+        :param klines: {kline_name: kline}
+        :return: {kline_name: kline} 已恢复的K线
+        """
+        with open(self.state_file, 'rb') as f:
+            header, arrays = unpack_blocks(f.read())
+        encoder = ValueEncoder(arrays)
+        klines_bars = self.read_log(header['log_id'], header['log_size'])
+
+        restored = {}
+        last_dts = {}
+        log_rows = {}
+        for name, kline in klines.items():
+            item = header['klines'].get(name)
+            if item is None or kline is None:
+                continue
+
+            state = {key: encoder.decode(value) for key, value in item['state'].items()}
+            count = item['bars']['count']
+            last_dt = encoder.decode(item['bars']['last_dt'])
+            log_bars = klines_bars.get(name, [])
+            # 日志中是连续追加的bar，取最后一次保存时的已完成bar
+            bars = [bar for bar in log_bars if last_dt is not None and bar.datetime <= last_dt]
+            bars = bars[-count:] if count > 0 else []
+            forming = encoder.decode(item['bars']['forming'])
+            if forming is not None:
+                bars.append(forming)
+            state['line_bar'] = bars
+
+            restored[name] = (kline, state)
+            last_dts[name] = last_dt
+            log_rows[name] = len(log_bars)
+
+        # 全部解码成功后，再更新K线
+        for name, (kline, state) in restored.items():
+            kline.__setstate__(state)
+
+        self.log_id = header['log_id']
+        self.log_size = header['log_size']
+        self.last_dts = last_dts
+        self.log_rows = log_rows
+        return {name: kline for name, (kline, state) in restored.items()}
+
+
+def pack_klines_snapshot(klines: dict, codec: str = None) -> bytes:
+    """
+    K线切片 => 容器
+    :param klines: {kline_name: kline.get_data()}，data_list按列保存为数据块
+    """
+    encoder = ValueEncoder()
+    items = {}
+    for name, data in klines.items():
+        data = dict(data)
+        data_list = data.pop('data_list', None)
+        columns = None
+        if data_list:
+            columns = {}
+            df = pd.DataFrame(data_list)
+            for key in df.columns:
+                series = df[key]
+                if series.dtype.kind == 'M' and getattr(series.dt, 'tz', None) is not None:
+                    series = series.dt.tz_localize(None)
+                if series.dtype.kind in 'biufM':
+                    columns[str(key)] = {'values': encoder.add_array(series.to_numpy())}
+                else:
+                    columns[str(key)] = {'list': encoder.encode(series.tolist())}
+        items[name] = {'info': encoder.encode(data), 'columns': columns}
+
+    return pack_blocks({'klines': items}, encoder.arrays, codec or get_fast_codec())
+
+
+def unpack_klines_snapshot(data: bytes) -> dict:
+    """
+    容器 => K线切片
+    :return: {kline_name: {name, type, ..., data_frame}}，data_frame为按列恢复的DataFrame
+    """
+    header, arrays = unpack_blocks(data)
+    encoder = ValueEncoder(arrays)
+    klines = {}
+    for name, item in header['klines'].items():
+        d = encoder.decode(item['info'])
+        columns = item.get('columns')
+        if columns is not None:
+            d['data_frame'] = pd.DataFrame({
+                key: arrays[col['values']] if 'values' in col else encoder.decode(col['list'])
+                for key, col in columns.items()})
+        klines[name] = d
+    return klines
@@ -26,9 +26,26 @@ from vnpy.component.base import (
     NIGHT_MARKET_23,
     NIGHT_MARKET_SQ2,
     MARKET_ZJ)
+from vnpy.component.cta_indicator import IndicatorStage, compile_indicator_stages
 from vnpy.component.cta_period import CtaPeriod, Period
+from vnpy.component.cta_series import CtaSeries
+from vnpy.component.cta_kernel import (
+    MeanKernel,
+    StdKernel,
+    MaxKernel,
+    MinKernel,
+    EmaKernel,
+    AtrKernel,
+    RsiKernel,
+    MacdKernel,
+    CciKernel,
+    CtaBatchKernel,
+    cci_rt_base,
+    cci_rt_value,
+    ema_last_state,
+    ema_weights)
 from vnpy.trader.object import BarData, TickData
-from vnpy.trader.constant import Interval, Color
+from vnpy.trader.constant import Exchange, Interval, Color
 from vnpy.trader.utility import round_to, get_trading_date, get_underlying_symbol
 
 
@@ -143,6 +160,37 @@ class CtaLineBar(object):
     # 参数列表，保存了参数的名称
     paramList = ['vt_symbol']
 
+    # 指标计算阶段登记表(按执行顺序)，对应 __count_{name}，未启用的指标不参与on_bar计算
+    indicator_stages = [
+        IndicatorStage('pre_high_low', lambda k: k.para_pre_len > 0),
+        IndicatorStage('ma', lambda k: k.para_ma1_len > 0 or k.para_ma2_len > 0 or k.para_ma3_len > 0),
+        IndicatorStage('ema', lambda k: k.para_ema1_len > 0 or k.para_ema2_len > 0 or k.para_ema3_len > 0),
+        IndicatorStage('dmi', lambda k: k.para_dmi_len > 0),
+        IndicatorStage('atr', lambda k: max(k.para_atr1_len, k.para_atr2_len, k.para_atr3_len) > 0),
+        IndicatorStage('vol_ma', lambda k: k.para_vol_len > 0),
+        IndicatorStage('rsi', lambda k: k.para_rsi1_len > 0 or k.para_rsi2_len > 0),
+        IndicatorStage('cmi', lambda k: k.para_cmi_len > 0),
+        IndicatorStage('kdj', lambda k: k.para_kdj_len > 0),
+        IndicatorStage('kdj_tb', lambda k: k.para_kdj_tb_len > 0),
+        IndicatorStage('boll', lambda k: (k.para_boll_len > 0 or k.para_boll2_len > 0
+                                          or k.para_boll_tb_len > 0 or k.para_boll2_tb_len > 0)),
+        IndicatorStage('macd', lambda k: (k.para_macd_fast_len > 0 and k.para_macd_slow_len > 0
+                                          and k.para_macd_signal_len > 0)),
+        IndicatorStage('cci', lambda k: k.para_cci_len > 0),
+        IndicatorStage('kf', lambda k: k.para_active_kf),
+        # 周期：依赖rsi，以及卡尔曼均线或布林中轨
+        IndicatorStage('period', lambda k: True, requires=('rsi', ('kf', 'boll')), with_bar=True),
+        IndicatorStage('skd', lambda k: k.para_active_skd),
+        IndicatorStage('yb', lambda k: k.para_active_yb),
+        IndicatorStage('sar', lambda k: k.para_sar_step > 0 or k.para_sar_limit > k.para_sar_step),
+        IndicatorStage('golden_section', lambda k: k.para_golden_n > 0),
+        # 区域：依赖ma与布林
+        IndicatorStage('area', lambda k: k.para_active_area, requires=('ma', 'boll'), with_bar=True),
+        IndicatorStage('bias', lambda k: k.para_bias_len > 0 or k.para_bias2_len > 0 or k.para_bias3_len > 0),
+        IndicatorStage('bd', lambda k: k.para_bd_len > 0),
+        IndicatorStage('skdj', lambda k: k.para_skdj_m > 0 and k.para_skdj_n > 0),
+    ]
+
     def __init__(self, strategy, cb_on_bar, setting=None):
 
         # on_bar事件回调函数,X周期bar合成完毕时，回调到策略的cb_on_bar接口
@@ -176,21 +224,15 @@ class CtaLineBar(object):
 
         # (实时运行时，或者addbar小于bar得周期时，不包含最后一根正在合成的Bar）
         # 目标bar合成成功后，才会更新以下序列
-        self.open_array = np.zeros(self.max_hold_bars)  # 与lineBar一致得开仓价清单
-        self.open_array[:] = np.nan
-        self.high_array = np.zeros(self.max_hold_bars)  # 与lineBar一致得最高价清单
-        self.high_array[:] = np.nan
-        self.low_array = np.zeros(self.max_hold_bars)  # 与lineBar一致得最低价清单
-        self.low_array[:] = np.nan
-        self.close_array = np.zeros(self.max_hold_bars)  # 与lineBar一致得收盘价清单
-        self.close_array[:] = np.nan
-
-        self.mid3_array = np.zeros(self.max_hold_bars)  # 收盘价/最高/最低价 的平均价
-        self.mid3_array[:] = np.nan
-        self.mid4_array = np.zeros(self.max_hold_bars)  # 收盘价*2/最高/最低价 的平均价
-        self.mid4_array[:] = np.nan
-        self.mid5_array = np.zeros(self.max_hold_bars)  # 收盘价*2/开仓价/最高/最低价 的平均价
-        self.mid5_array[:] = np.nan
+        # 环形缓冲存储，通过 open_array 等属性获取连续的numpy数组视图
+        self.open_series = CtaSeries(self.max_hold_bars, fill=np.nan)  # 与lineBar一致得开仓价清单
+        self.high_series = CtaSeries(self.max_hold_bars, fill=np.nan)  # 与lineBar一致得最高价清单
+        self.low_series = CtaSeries(self.max_hold_bars, fill=np.nan)  # 与lineBar一致得最低价清单
+        self.close_series = CtaSeries(self.max_hold_bars, fill=np.nan)  # 与lineBar一致得收盘价清单
+
+        self.mid3_series = CtaSeries(self.max_hold_bars, fill=np.nan)  # 收盘价/最高/最低价 的平均价
+        self.mid4_series = CtaSeries(self.max_hold_bars, fill=np.nan)  # 收盘价*2/最高/最低价 的平均价
+        self.mid5_series = CtaSeries(self.max_hold_bars, fill=np.nan)  # 收盘价*2/开仓价/最高/最低价 的平均价
         # 导出到CSV文件 的目录名 和 要导出的 字段
         self.export_filename = None  # 数据要导出的目标文件夹
         self.export_fields = []  # 定义要导出的数据字段
@@ -203,7 +245,17 @@ class CtaLineBar(object):
 
         # 启动实时得函数
         self.rt_funcs = set()
-        self.rt_executed = False
+        self.rt_cache = {}  # key: 实时函数名, value: 最近一次计算时的行情键值(行情不变则不重复计算)
+        self.rt_bases = {}  # key: 实时指标基础数据的键值, value: (bar序号, 基础数据)，每根bar只计算一次
+
+        # 增量指标计算器
+        self.use_kernels = True  # 是否使用增量计算(False时，全部使用talib窗口计算)
+        self.kernels = {}  # key: 指标名称+参数, value: CtaKernel
+        self.bar_num = 0  # 已写入开高低收序列的bar数量
+        self.batch_kernels = None  # 批量预热时，增量指标的向量化计算结果
+
+        # 指标流水线 [(计算函数, 是否传入bar)]，首次on_bar时根据参数编译
+        self.indicator_pipeline = None
 
         # 注册回调函数
         self.cb_dict = {}
@@ -350,7 +402,7 @@ class CtaLineBar(object):
         """移除Pickle dump()时不支持的Attribute"""
         state = self.__dict__.copy()
         # Remove the unpicklable entries.
-        remove_keys = ['strategy', 'cb_on_bar', 'cb_on_period']
+        remove_keys = ['strategy', 'cb_on_bar', 'cb_on_period', 'indicator_pipeline']
         for key in self.__dict__.keys():
             if key in remove_keys:
                 del state[key]
@@ -359,11 +411,79 @@ class CtaLineBar(object):
     def __setstate__(self, state):
         """Pickle load()"""
         self.__dict__.update(state)
+        self.upgrade_series()
 
     def restore(self, state):
         """从Pickle中恢复数据"""
         for key in state.__dict__.keys():
             self.__dict__[key] = state.__dict__[key]
+        self.upgrade_series()
+
+    def upgrade_series(self):
+        """
+        兼容旧版本的缓存：
+        numpy数组形式的开高低收序列、list形式的指标序列，转换为环形缓冲序列
+        """
+        for name in ['open', 'high', 'low', 'close', 'mid3', 'mid4', 'mid5']:
+            old_array = self.__dict__.pop(f'{name}_array', None)
+            if old_array is not None and f'{name}_series' not in self.__dict__:
+                series = CtaSeries(self.max_hold_bars, fill=np.nan)
+                series.extend(old_array)
+                self.__dict__[f'{name}_series'] = series
+
+        # 使用一个空白对象，识别哪些指标属性是环形缓冲序列
+        blank = self.__class__.__new__(self.__class__)
+        blank.max_hold_bars = self.max_hold_bars
+        CtaLineBar.init_indicators(blank)
+        for key, value in blank.__dict__.items():
+            if isinstance(value, CtaSeries) and isinstance(self.__dict__.get(key), list):
+                self.__dict__[key] = CtaSeries(value.max_len, data=self.__dict__[key])
+
+        # 增量指标计算器，首次使用时从序列中重建
+        self.__dict__.setdefault('use_kernels', True)
+        self.__dict__.setdefault('kernels', {})
+        self.batch_kernels = None
+        self.__dict__.pop('rt_executed', None)
+        self.rt_cache = {}
+        self.rt_bases = {}
+        if 'bar_num' not in self.__dict__:
+            self.bar_num = int(np.count_nonzero(~np.isnan(self.close_array)))
+        self.indicator_pipeline = None
+
+    @property
+    def open_array(self):
+        """开仓价序列(numpy数组视图)"""
+        return self.open_series.values
+
+    @property
+    def high_array(self):
+        """最高价序列(numpy数组视图)"""
+        return self.high_series.values
+
+    @property
+    def low_array(self):
+        """最低价序列(numpy数组视图)"""
+        return self.low_series.values
+
+    @property
+    def close_array(self):
+        """收盘价序列(numpy数组视图)"""
+        return self.close_series.values
+
+    @property
+    def mid3_array(self):
+        """(收盘价+最高+最低价)/3 序列(numpy数组视图)"""
+        return self.mid3_series.values
+
+    @property
+    def mid4_array(self):
+        """(收盘价*2+最高+最低价)/4 序列(numpy数组视图)"""
+        return self.mid4_series.values
+
+    @property
+    def mid5_array(self):
+        """(收盘价*2+开仓价+最高+最低价)/5 序列(numpy数组视图)"""
+        return self.mid5_series.values
 
     def init_indicators(self):
         """ 初始化定义所有的指标输入参数，以及指标生成的数据 """
@@ -441,18 +561,18 @@ class CtaLineBar(object):
         self.para_bd_len = 0   # 波段买卖观测长度
 
         # --------------- K 线的指标相关计算结果数据 ----------------
-        self.line_pre_high = []  # K线的前para_pre_len的的最高
-        self.line_pre_low = []  # K线的前para_pre_len的的最低
+        self.line_pre_high = CtaSeries(self.max_hold_bars + 1)  # K线的前para_pre_len的的最高
+        self.line_pre_low = CtaSeries(self.max_hold_bars + 1)  # K线的前para_pre_len的的最低
 
-        self.line_ma1 = []  # K线的MA(para_ma1_len)均线，不包含未走完的bar
-        self.line_ma2 = []  # K线的MA(para_ma2_len)均线，不包含未走完的bar
-        self.line_ma3 = []  # K线的MA(para_ma3_len)均线，不包含未走完的bar
+        self.line_ma1 = CtaSeries(self.max_hold_bars + 1)  # K线的MA(para_ma1_len)均线，不包含未走完的bar
+        self.line_ma2 = CtaSeries(self.max_hold_bars + 1)  # K线的MA(para_ma2_len)均线，不包含未走完的bar
+        self.line_ma3 = CtaSeries(self.max_hold_bars + 1)  # K线的MA(para_ma3_len)均线，不包含未走完的bar
         self._rt_ma1 = None  # K线的实时MA(para_ma1_len)
         self._rt_ma2 = None  # K线的实时MA(para_ma2_len)
         self._rt_ma3 = None  # K线的实时MA(para_ma3_len)
-        self.line_ma1_atan = []  # K线的MA(para_ma2_len)均线斜率
-        self.line_ma2_atan = []  # K线的MA(para_ma2_len)均线斜率
-        self.line_ma3_atan = []  # K线的MA(para_ma2_len)均线斜率
+        self.line_ma1_atan = CtaSeries(self.max_hold_bars + 1)  # K线的MA(para_ma2_len)均线斜率
+        self.line_ma2_atan = CtaSeries(self.max_hold_bars + 1)  # K线的MA(para_ma2_len)均线斜率
+        self.line_ma3_atan = CtaSeries(self.max_hold_bars + 1)  # K线的MA(para_ma2_len)均线斜率
         self._rt_ma1_atan = None
         self._rt_ma2_atan = None
         self._rt_ma3_atan = None
@@ -461,9 +581,9 @@ class CtaLineBar(object):
         self.ma13_count = 0  # ma1 与 ma3 ,金叉/死叉后第几根bar，金叉正数，死叉负数
         self.ma23_count = 0  # ma2 与 ma3 ,金叉/死叉后第几根bar，金叉正数，死叉负数
 
-        self.line_ema1 = []  # K线的EMA1均线，周期是para_ema1_len1，不包含当前bar
-        self.line_ema2 = []  # K线的EMA2均线，周期是para_ema1_len2，不包含当前bar
-        self.line_ema3 = []  # K线的EMA3均线，周期是para_ema1_len3，不包含当前bar
+        self.line_ema1 = CtaSeries(self.max_hold_bars + 1)  # K线的EMA1均线，周期是para_ema1_len1，不包含当前bar
+        self.line_ema2 = CtaSeries(self.max_hold_bars + 1)  # K线的EMA2均线，周期是para_ema1_len2，不包含当前bar
+        self.line_ema3 = CtaSeries(self.max_hold_bars + 1)  # K线的EMA3均线，周期是para_ema1_len3，不包含当前bar
 
         self._rt_ema1 = None  # K线的实时EMA(para_ema1_len)
         self._rt_ema2 = None  # K线的实时EMA(para_ema2_len)
@@ -473,14 +593,14 @@ class CtaLineBar(object):
         self.cur_pdi = 0  # bar内的升动向指标，即做多的比率
         self.cur_mdi = 0  # bar内的下降动向指标，即做空的比率
 
-        self.line_pdi = []  # 升动向指标，即做多的比率
-        self.line_mdi = []  # 下降动向指标，即做空的比率
+        self.line_pdi = CtaSeries(self.max_hold_bars + 1)  # 升动向指标，即做多的比率
+        self.line_mdi = CtaSeries(self.max_hold_bars + 1)  # 下降动向指标，即做空的比率
 
-        self.line_dx = []  # 趋向指标列表，最大长度为inputM*2
+        self.line_dx = CtaSeries(self.max_hold_bars + 1)  # 趋向指标列表，最大长度为inputM*2
         self.cur_adx = 0  # Bar内计算的平均趋向指标
-        self.line_adx = []  # 平均趋向指标
+        self.line_adx = CtaSeries(self.max_hold_bars + 1)  # 平均趋向指标
         self.cur_adxr = 0  # 趋向平均值，为当日ADX值与M日前的ADX值的均值
-        self.line_adxr = []  # 平均趋向变化指标
+        self.line_adxr = CtaSeries(self.max_hold_bars + 1)  # 平均趋向变化指标
 
         # K线的基于DMI、ADX计算的结果
         self.cur_adx_trend = 0  # ADX值持续高于前一周期时，市场行情将维持原趋势
@@ -490,20 +610,20 @@ class CtaLineBar(object):
         self.signal_adx_short = False  # 空过滤器条件,做空趋势的判断，ADXR高于前一天，下降动向> inputMM
 
         # K线的ATR技术数据
-        self.line_atr1 = []  # K线的ATR1,周期为para_atr1_len
-        self.line_atr2 = []  # K线的ATR2,周期为para_atr2_len
-        self.line_atr3 = []  # K线的ATR3,周期为para_atr3_len
+        self.line_atr1 = CtaSeries(self.max_hold_bars + 1)  # K线的ATR1,周期为para_atr1_len
+        self.line_atr2 = CtaSeries(self.max_hold_bars + 1)  # K线的ATR2,周期为para_atr2_len
+        self.line_atr3 = CtaSeries(self.max_hold_bars + 1)  # K线的ATR3,周期为para_atr3_len
 
         self.cur_atr1 = 0
         self.cur_atr2 = 0
         self.cur_atr3 = 0
 
         # K线的交易量平均
-        self.line_vol_ma = []  # K 线的交易量平均
+        self.line_vol_ma = CtaSeries(self.max_hold_bars + 1)  # K 线的交易量平均
 
         # K线的RSI计算数据
-        self.line_rsi1 = []  # 记录K线对应的RSI数值，只保留para_rsi1_len*8
-        self.line_rsi2 = []  # 记录K线对应的RSI数值，只保留para_rsi2_len*8
+        self.line_rsi1 = CtaSeries(self.max_hold_bars + 1)  # 记录K线对应的RSI数值，只保留para_rsi1_len*8
+        self.line_rsi2 = CtaSeries(self.max_hold_bars + 1)  # 记录K线对应的RSI数值，只保留para_rsi2_len*8
 
         self.para_rsi_low = 30  # RSI的最低线
         self.para_rsi_high = 70  # RSI的最高线
@@ -513,17 +633,17 @@ class CtaLineBar(object):
         self.cur_rsi_top_buttom = {}  # 最近的一个波峰/波谷
 
         # K线的CMI计算数据
-        self.line_cmi = []  # 记录K线对应的Cmi数值，只保留para_cmi_len*8
+        self.line_cmi = CtaSeries(self.max_hold_bars + 1)  # 记录K线对应的Cmi数值，只保留para_cmi_len*8
 
         # K线的布林特计算数据
-        self.line_boll_upper = []  # 上轨
-        self.line_boll_middle = []  # 中线
-        self.line_boll_lower = []  # 下轨
-        self.line_boll_std = []  # 标准差
-
-        self.line_upper_atan = []
-        self.line_middle_atan = []
-        self.line_lower_atan = []
+        self.line_boll_upper = CtaSeries(self.max_hold_bars + 1)  # 上轨
+        self.line_boll_middle = CtaSeries(self.max_hold_bars + 1)  # 中线
+        self.line_boll_lower = CtaSeries(self.max_hold_bars + 1)  # 下轨
+        self.line_boll_std = CtaSeries(self.max_hold_bars + 1)  # 标准差
+
+        self.line_upper_atan = CtaSeries(self.max_hold_bars + 1)
+        self.line_middle_atan = CtaSeries(self.max_hold_bars + 1)
+        self.line_lower_atan = CtaSeries(self.max_hold_bars + 1)
         self._rt_upper = None
         self._rt_middle = None
         self._rt_lower = None
@@ -535,14 +655,14 @@ class CtaLineBar(object):
         self.cur_middle = 0  # 最后一根K的Boll中轨数值（与price_tick取整）
         self.cur_lower = 0  # 最后一根K的Boll下轨数值（与price_tick取整+1）
 
-        self.line_boll2_upper = []  # 上轨
-        self.line_boll2_middle = []  # 中线
-        self.line_boll2_lower = []  # 下轨
-        self.line_boll2_std = []  # 标准差
+        self.line_boll2_upper = CtaSeries(self.max_hold_bars + 1)  # 上轨
+        self.line_boll2_middle = CtaSeries(self.max_hold_bars + 1)  # 中线
+        self.line_boll2_lower = CtaSeries(self.max_hold_bars + 1)  # 下轨
+        self.line_boll2_std = CtaSeries(self.max_hold_bars + 1)  # 标准差
 
-        self.line_upper2_atan = []
-        self.line_middle2_atan = []
-        self.line_lower2_atan = []
+        self.line_upper2_atan = CtaSeries(self.max_hold_bars + 1)
+        self.line_middle2_atan = CtaSeries(self.max_hold_bars + 1)
+        self.line_lower2_atan = CtaSeries(self.max_hold_bars + 1)
 
         self._rt_upper2 = None
         self._rt_middle2 = None
@@ -556,12 +676,12 @@ class CtaLineBar(object):
         self.cur_lower2 = 0  # 最后一根K的Boll2下轨数值（与price_tick取整+1）
 
         # K线的KDJ指标计算数据
-        self.line_k = []  # K为快速指标
-        self.line_d = []  # D为慢速指标
-        self.line_j = []  #
+        self.line_k = CtaSeries(self.max_hold_bars + 1)  # K为快速指标
+        self.line_d = CtaSeries(self.max_hold_bars + 1)  # D为慢速指标
+        self.line_j = CtaSeries(self.max_hold_bars + 1)  #
         self.kdj_top_list = []  # 记录KDJ最高峰，只保留 para_kdj_len个
         self.kdj_buttom_list = []  # 记录KDJ的最低谷，只保留 para_kdj_len个
-        self.line_rsv = []  # RSV
+        self.line_rsv = CtaSeries(self.max_hold_bars + 1)  # RSV
         self.cur_kdj_top_buttom = {}  # 最近的一个波峰/波谷
         self.cur_k = 0  # bar内计算时，最后一个未关闭的bar的实时K值
         self.cur_d = 0  # bar内计算时，最后一个未关闭的bar的实时值
@@ -572,9 +692,9 @@ class CtaLineBar(object):
         self.cur_kd_cross_price = 0  # 最近一次发生金叉/死叉的价格
 
         # K线的MACD计算数据(26,12,9)
-        self.line_dif = []  # DIF = EMA12 - EMA26，即为talib-MACD返回值macd
-        self.line_dea = []  # DEA = （前一日DEA X 8/10 + 今日DIF X 2/10），即为talib-MACD返回值
-        self.line_macd = []  # (dif-dea)*2，但是talib中MACD的计算是bar = (dif-dea)*1,国内一般是乘以2
+        self.line_dif = CtaSeries(self.max_hold_bars + 1)  # DIF = EMA12 - EMA26，即为talib-MACD返回值macd
+        self.line_dea = CtaSeries(self.max_hold_bars + 1)  # DEA = （前一日DEA X 8/10 + 今日DIF X 2/10），即为talib-MACD返回值
+        self.line_macd = CtaSeries(self.max_hold_bars + 1)  # (dif-dea)*2，但是talib中MACD的计算是bar = (dif-dea)*1,国内一般是乘以2
         self.macd_segment_list = []  # macd 金叉/死叉的段列表，记录价格的最高/最低，Dif的最高，最低，Macd的最高/最低，Macd面接
         self._rt_dif = None
         self._rt_dea = None
@@ -591,8 +711,8 @@ class CtaLineBar(object):
         self.macd_buttom_divergence = False  # mcad 面积 与price 底背离
 
         # K 线的CCI计算数据
-        self.line_cci = []
-        self.line_cci_ema = []
+        self.line_cci = CtaSeries(self.max_hold_bars + 1)
+        self.line_cci_ema = CtaSeries(self.max_hold_bars + 1)
         self.cur_cci = None
         self.cur_cci_ema = None
         self._rt_cci = None
@@ -600,17 +720,17 @@ class CtaLineBar(object):
 
         # 卡尔曼过滤器
         self.kf = None
-        self.line_state_mean = []  # 卡尔曼均线
-        self.line_state_upper = []  # 卡尔曼均线+2标准差
-        self.line_state_lower = [] # 卡尔曼均线-2标准差
-        self.line_state_covar = []  # 方差
+        self.line_state_mean = CtaSeries(self.max_hold_bars + 1)  # 卡尔曼均线
+        self.line_state_upper = CtaSeries(self.max_hold_bars + 1)  # 卡尔曼均线+2标准差
+        self.line_state_lower = CtaSeries(self.max_hold_bars + 1) # 卡尔曼均线-2标准差
+        self.line_state_covar = CtaSeries(self.max_hold_bars + 1)  # 方差
         self.cur_state_std = None
 
         # SAR 抛物线
         self.cur_sar_direction = ''  # up/down
-        self.line_sar = []
-        self.line_sar_top = []
-        self.line_sar_buttom = []
+        self.line_sar = CtaSeries(self.max_hold_bars + 1)
+        self.line_sar_top = CtaSeries(self.max_hold_bars + 1)
+        self.line_sar_buttom = CtaSeries(self.max_hold_bars + 1)
         self.line_sar_sr_up = []
         self.line_sar_ep_up = []
         self.line_sar_af_up = []
@@ -621,15 +741,15 @@ class CtaLineBar(object):
 
         # 周期
         self.cur_atan = None
-        self.line_atan = []
+        self.line_atan = CtaSeries(self.max_hold_bars + 1)
         self.cur_period = None  # 当前所在周期
         self.period_list = []
 
         # 优化的多空动量线
-        self.line_skd_rsi = []  # 参照的RSI
-        self.line_skd_sto = []  # 根据RSI演算的STO
-        self.line_sk = []  # 快线
-        self.line_sd = []  # 慢线
+        self.line_skd_rsi = CtaSeries(self.max_hold_bars + 1)  # 参照的RSI
+        self.line_skd_sto = CtaSeries(self.max_hold_bars + 1)  # 根据RSI演算的STO
+        self.line_sk = CtaSeries(self.max_hold_bars + 1)  # 快线
+        self.line_sd = CtaSeries(self.max_hold_bars + 1)  # 慢线
 
         self.cur_skd_count = 0  # 当前金叉/死叉后累加
         self._rt_sk = None  # 实时SK值
@@ -644,7 +764,7 @@ class CtaLineBar(object):
         self.rt_skd_cross_price = 0  # 发生实时金叉死叉时的价格
 
         # 多空趋势线
-        self.line_yb = []
+        self.line_yb = CtaSeries(self.max_hold_bars + 1)
         self.cur_yb_count = 0  # 当前黄/蓝累加
         self._rt_yb = None
 
@@ -661,9 +781,9 @@ class CtaLineBar(object):
         self.pre_area = None
 
         # BIAS
-        self.line_bias = []  # BIAS1
-        self.line_bias2 = []  # BIAS2
-        self.line_bias3 = []  # BIAS3
+        self.line_bias = CtaSeries(self.max_hold_bars + 1)  # BIAS1
+        self.line_bias2 = CtaSeries(self.max_hold_bars + 1)  # BIAS2
+        self.line_bias3 = CtaSeries(self.max_hold_bars + 1)  # BIAS3
         self.cur_bias = 0  # 最后一个bar的BIAS1值
         self.cur_bias2 = 0  # 最后一个bar的BIAS2值
         self.cur_bias3 = 0  # 最后一个bar的BIAS3值
@@ -672,16 +792,16 @@ class CtaLineBar(object):
         self._rt_bias3 = None
 
         # 波段买卖指标
-        self.line_bd_fast = []  # 波段快线
-        self.line_bd_slow = []  # 波段慢线
+        self.line_bd_fast = CtaSeries(self.max_hold_bars + 1)  # 波段快线
+        self.line_bd_slow = CtaSeries(self.max_hold_bars + 1)  # 波段慢线
         self.cur_bd_count = 0  # 当前波段快线慢线金叉死叉， +金叉计算， - 死叉技术
 
         self._bd_fast = 0
         self._bd_slow = 0
 
         # SKDJ
-        self.line_skdj_k = []
-        self.line_skdj_d = []
+        self.line_skdj_k = CtaSeries(self.max_hold_bars + 1)
+        self.line_skdj_d = CtaSeries(self.max_hold_bars + 1)
         self.cur_skdj_k = 0
         self.cur_skdj_d = 0
 
@@ -692,6 +812,23 @@ class CtaLineBar(object):
             if key in setting:
                 d[key] = setting[key]
 
+        # 参数变化后，重新编译指标流水线
+        self.invalidate_pipeline()
+
+    def invalidate_pipeline(self):
+        """指标流水线失效，下次on_bar时重新编译；直接修改指标参数(para_xxx)后调用"""
+        self.indicator_pipeline = None
+
+    def compile_indicators(self):
+        """
+        根据指标参数，编译出需要计算的指标流水线
+        运行中修改了指标参数(para_xxx)时，需要重新调用
+        """
+        stages = compile_indicator_stages(self, self.indicator_stages)
+        self.indicator_pipeline = [(getattr(self, f'_CtaLineBar__count_{stage.name}'), stage.with_bar)
+                                   for stage in stages]
+        self.write_log(u'{}启用指标:{}'.format(self.name, ','.join([stage.name for stage in stages])))
+
     def set_mode(self, mode: str):
         """Tick/Bar模式"""
         self.mode = mode
@@ -802,9 +939,6 @@ class CtaLineBar(object):
 
             lastBar.open_interest = bar.open_interest
 
-            # 实时计算
-            self.rt_executed = False
-
     def on_bar(self, bar: BarData):
         """OnBar事件"""
         # 将上一根bar合成完结了，触发本on_bar事件(缓存开高收低等序列，计算各个指标)
@@ -817,27 +951,17 @@ class CtaLineBar(object):
         bar_mid4 = round((2 * bar.close_price + bar.high_price + bar.low_price) / 4, self.round_n)
         bar_mid5 = round((2 * bar.close_price + bar.open_price + bar.high_price + bar.low_price) / 5, self.round_n)
 
-        # 扩展open,close,high,low numpy array列表 平移更新序列最新值
-        self.open_array[:-1] = self.open_array[1:]
-        self.open_array[-1] = bar.open_price
-
-        self.high_array[:-1] = self.high_array[1:]
-        self.high_array[-1] = bar.high_price
-
-        self.low_array[:-1] = self.low_array[1:]
-        self.low_array[-1] = bar.low_price
-
-        self.close_array[:-1] = self.close_array[1:]
-        self.close_array[-1] = bar.close_price
-
-        self.mid3_array[:-1] = self.mid3_array[1:]
-        self.mid3_array[-1] = bar_mid3
-
-        self.mid4_array[:-1] = self.mid4_array[1:]
-        self.mid4_array[-1] = bar_mid4
-
-        self.mid5_array[:-1] = self.mid5_array[1:]
-        self.mid5_array[-1] = bar_mid5
+        # 扩展open,close,high,low 序列(环形缓冲，O(1)追加最新值)
+        self.open_series.append(bar.open_price)
+        self.high_series.append(bar.high_price)
+        self.low_series.append(bar.low_price)
+        self.close_series.append(bar.close_price)
+        self.mid3_series.append(bar_mid3)
+        self.mid4_series.append(bar_mid4)
+        self.mid5_series.append(bar_mid5)
+        self.bar_num += 1
+        if self.batch_kernels is not None:
+            self.__check_batch_bar()
 
         # 计算当前self.line_bar长度，并维持self.line_bar序列在max_hold_bars长度
         self.bar_len = len(self.line_bar)   # 当前K线得真实数量(包含已经合成以及正在合成的bar)
@@ -845,32 +969,16 @@ class CtaLineBar(object):
             del self.line_bar[0]
             self.bar_len = self.bar_len - 1  # 删除了最前面的bar，bar长度少一位
 
-        self.__count_pre_high_low()
-        self.__count_ma()
-        self.__count_ema()
-        self.__count_dmi()
-        self.__count_atr()
-        self.__count_vol_ma()
-        self.__count_rsi()
-        self.__count_cmi()
-        self.__count_kdj()
-        self.__count_kdj_tb()
-        self.__count_boll()
-        self.__count_macd()
-        self.__count_cci()
-        self.__count_kf()
-        self.__count_period(bar)
-        self.__count_skd()
-        self.__count_yb()
-        self.__count_sar()
-        self.__count_golden_section()
-        self.__count_area(bar)
-        self.__count_bias()
-        self.__count_bd()
-        self.__count_skdj()
-        self.export_to_csv(bar)
+        # 按编译好的指标流水线，计算已启用的指标
+        if self.indicator_pipeline is None:
+            self.compile_indicators()
+        for func, with_bar in self.indicator_pipeline:
+            if with_bar:
+                func(bar)
+            else:
+                func()
 
-        self.rt_executed = False  # 是否 启动实时计算得函数
+        self.export_to_csv(bar)
 
         # 回调上层调用者，将合成的 x分钟bar，回调给策略 def on_bar_x(self, bar: BarData):函数
         if self.cb_on_bar:
@@ -887,23 +995,217 @@ class CtaLineBar(object):
             self.write_log(u'{}添加{}到实时函数中'.format(self.name, str(func.__name__)))
             self.rt_funcs.add(func)
 
-        self.run_rt_count()
+        self.run_rt_func(func)
 
     def run_rt_count(self):
         """
         根据实时计算得要求，执行实时指标计算
         :return:
         """
-        if self.rt_executed:
+        for func in list(self.rt_funcs):
+            self.run_rt_func(func)
+
+    def get_rt_key(self) -> tuple:
+        """实时计算的行情键值：已完成的bar数量 + 正在合成的bar及最新价，变化后实时指标需重新计算"""
+        if len(self.line_bar) == 0:
+            return self.bar_num, None, self.cur_price
+        bar = self.line_bar[-1]
+        return self.bar_num, bar.datetime, bar.close_price, bar.high_price, bar.low_price, self.cur_price
+
+    def run_rt_func(self, func):
+        """执行实时计算函数，行情未变化时直接使用上次的结果"""
+        key = self.get_rt_key()
+        name = func.__name__
+        if self.rt_cache.get(name) == key:
             return
+        self.rt_cache[name] = key
 
-        for func in list(self.rt_funcs):
-            try:
-                func()
-            except Exception as ex:
-                print(u'{}调用实时计算,异常:{},{}'.format(self.name, str(ex), traceback.format_exc()), file=sys.stderr)
+        try:
+            func()
+        except Exception as ex:
+            print(u'{}调用实时计算,异常:{},{}'.format(self.name, str(ex), traceback.format_exc()), file=sys.stderr)
+
+    def get_rt_base(self, key: tuple, func):
+        """
+        获取实时指标的基础数据
+        基础数据只依赖已完成的bar，每根bar只计算一次；每个tick只需在基础数据上叠加最新价格
+        :param key: 基础数据的键值(指标名称+参数)
+        :param func: 计算基础数据的函数
+        """
+        base = self.rt_bases.get(key)
+        if base is None or base[0] != self.bar_num:
+            base = (self.bar_num, func())
+            self.rt_bases[key] = base
+        return base[1]
+
+    def get_kernel(self, key: tuple, factory, *series_list):
+        """
+        获取增量指标计算器，并同步到最新一根bar
+        :param key: 计算器的键值(指标名称+参数)
+        :param factory: 创建计算器的函数
+        :param series_list: 计算器的输入序列，如 self.close_series
+        :return: CtaKernel
+        """
+        kernel = self.kernels.get(key)
+        if kernel is None:
+            kernel = factory()
+            self.kernels[key] = kernel
+
+        if self.batch_kernels is not None:
+            # 批量预热，直接使用整段数据的向量化计算结果
+            batch = self.batch_kernels['kernels'].get(key)
+            if batch is None:
+                batch = CtaBatchKernel(kernel, *[self.batch_kernels['data'][id(series)] for series in series_list])
+                self.batch_kernels['kernels'][key] = batch
+            pos = self.batch_kernels['offset'] + self.bar_num - self.batch_kernels['bar_num']
+            ready = self.bar_num >= kernel.window and len(series_list[0]) >= kernel.window
+            return batch.seek(pos, ready)
+
+        if kernel.bar_num == self.bar_num:
+            return kernel
+
+        if kernel.bar_num == self.bar_num - 1:
+            # 正常情况，只输入最新一根bar
+            kernel.update(*[series[-1] for series in series_list])
+        else:
+            # 首次使用，或中间有遗漏，使用最近的window根bar重建
+            kernel.reset()
+            n = min(kernel.window, self.bar_num, len(series_list[0]))
+            for values in zip(*[series.values[-n:].tolist() for series in series_list]):
+                kernel.update(*values)
+        kernel.bar_num = self.bar_num
+        return kernel
+
+    def add_bars(self, bars, bar_freq: int = 1, symbol: str = None, exchange: Exchange = Exchange.LOCAL):
+        """
+        批量添加bar(历史数据预热)
+        结果与逐根调用 add_bar(bar, bar_is_completed=True) 一致
+        向量化的范围：增量指标计算器(MA/EMA/ATR/RSI/BOLL/MACD/CCI/前高前低/黄金分割等)的窗口计算，
+        在整段数据上一次性完成，每根bar只取出对应的结果
+        逐根执行的部分：依赖上一根结果的递推和状态(金叉死叉计数、KDJ的K/D递推、SKD、SAR、DMI、卡尔曼、
+        周期/区域判断、指标回调等)，这些无法向量化，仍按bar顺序执行，但不再包含窗口计算
+        :param bars: [BarData]，或包含 datetime/open/high/low/close/volume[/open_interest/trading_day] 列的DataFrame
+        :param bar_freq: 插入的bar，其分钟周期数
+        :param symbol: DataFrame生成bar时使用的合约，缺省为underly_symbol
+        :param exchange: DataFrame生成bar时使用的交易所
+        :return:
+        """
+        if isinstance(bars, pd.DataFrame):
+            bars = self.df_to_bars(bars, symbol=symbol, exchange=exchange)
+        if len(bars) == 0:
+            return
 
-        self.rt_executed = True
+        # 按add_bar的处理方式，推算依次进入on_bar的bar：
+        # 当前最后一根bar(没有则为首根bar)，以及除最后一根以外的新bar(最后一根留在line_bar中等待下一根bar)
+        on_bars = [self.line_bar[-1] if len(self.line_bar) > 0 else bars[0]] + list(bars[:-1])
+        opens = [bar.open_price for bar in on_bars]
+        highs = [bar.high_price for bar in on_bars]
+        lows = [bar.low_price for bar in on_bars]
+        closes = [bar.close_price for bar in on_bars]
+        new_values = {
+            'open': opens,
+            'high': highs,
+            'low': lows,
+            'close': closes,
+            'mid3': [round((c + h + l) / 3, self.round_n) for c, h, l in zip(closes, highs, lows)],
+            'mid4': [round((2 * c + h + l) / 4, self.round_n) for c, h, l in zip(closes, highs, lows)],
+            'mid5': [round((2 * c + o + h + l) / 5, self.round_n) for c, o, h, l in zip(closes, opens, highs, lows)]
+        }
+
+        data = {}
+        hist_len = len(self.close_series)
+        for name, values in new_values.items():
+            series = getattr(self, f'{name}_series')
+            if len(series) != hist_len:
+                # 序列长度不一致，无法对齐，逐根计算
+                data = None
+                break
+            data[id(series)] = np.concatenate([series.values, np.array(values, dtype=float)])
+
+        if data is not None:
+            self.batch_kernels = {
+                'bar_num': self.bar_num,  # 批量开始前的bar序号
+                'offset': hist_len - 1,  # 批量开始前，最后一个数据在数组中的位置
+                'data': data,  # key: id(序列), value: 历史数据 + 推算的新数据
+                'kernels': {}  # key: 计算器的键值, value: CtaBatchKernel
+            }
+        try:
+            if type(self).add_bar is not CtaLineBar.add_bar:
+                # 子类(分钟/小时/日/周K线)有自己的合成逻辑
+                for bar in bars:
+                    self.add_bar(bar, bar_is_completed=True, bar_freq=bar_freq)
+                return
+
+            # 同 add_bar(bar, bar_is_completed=True)：每根都是新bar，上一根进入on_bar
+            # bar的属性均为不可变值，浅拷贝即可
+            minutes = timedelta(minutes=bar_freq)
+            for bar in bars:
+                self.cur_price = bar.close_price
+                self.cur_datetime = bar.datetime + minutes
+                self.cur_trading_day = bar.trading_day
+                if len(self.line_bar) == 0:
+                    self.line_bar.append(copy.copy(bar))
+                    self.on_bar(bar)
+                else:
+                    last_bar = self.line_bar[-1]
+                    self.line_bar.append(copy.copy(bar))
+                    self.on_bar(last_bar)
+        finally:
+            # 增量计算器的bar_num已落后，后续使用时会自动从序列末端重建
+            self.batch_kernels = None
+
+    def __check_batch_bar(self):
+        """批量预热时，核对进入on_bar的bar与推算的是否一致，不一致(例如子类合并了bar)则改为逐根计算"""
+        pos = self.batch_kernels['offset'] + self.bar_num - self.batch_kernels['bar_num']
+        data = self.batch_kernels['data']
+        for series in [self.open_series, self.close_series, self.high_series, self.low_series]:
+            values = data[id(series)]
+            if pos < len(values) and values.item(pos) == series[-1]:
+                continue
+            self.write_log(u'{}批量预热数据与实际bar不一致，改为逐根计算'.format(self.name))
+            self.batch_kernels = None
+            return
+
+    def df_to_bars(self, df: pd.DataFrame, symbol: str = None, exchange: Exchange = Exchange.LOCAL):
+        """
+        DataFrame => [BarData]
+        按列一次性取出数据，不使用逐行的iterrows
+        """
+        if symbol is None:
+            symbol = self.underly_symbol
+        if 'datetime' in df.columns:
+            dts = pd.DatetimeIndex(df['datetime']).to_pydatetime().tolist()
+        else:
+            dts = pd.DatetimeIndex(df.index).to_pydatetime().tolist()
+        opens = df['open'].astype(float).tolist()
+        highs = df['high'].astype(float).tolist()
+        lows = df['low'].astype(float).tolist()
+        closes = df['close'].astype(float).tolist()
+        volumes = df['volume'].astype(float).tolist() if 'volume' in df.columns else [0] * len(df)
+        open_interests = df['open_interest'].astype(float).tolist() if 'open_interest' in df.columns else [0] * len(df)
+        if 'trading_day' in df.columns:
+            trading_days = [str(d) for d in df['trading_day'].tolist()]
+        else:
+            trading_days = [get_trading_date(dt) for dt in dts]
+
+        bars = []
+        for dt, trading_day, o, h, l, c, v, oi in zip(dts, trading_days, opens, highs, lows, closes,
+                                                      volumes, open_interests):
+            bars.append(BarData(
+                gateway_name='',
+                symbol=symbol,
+                exchange=exchange,
+                datetime=dt,
+                trading_day=trading_day,
+                interval=self.interval,
+                interval_num=self.bar_interval,
+                open_price=o,
+                high_price=h,
+                low_price=l,
+                close_price=c,
+                volume=v,
+                open_interest=oi))
+        return bars
 
     def export_to_csv(self, bar: BarData):
         """ 输出到csv文件"""
@@ -1283,9 +1585,6 @@ class CtaLineBar(object):
             else:
                 lastBar.color = Color.EQUAL
 
-            # 实时计算
-            self.rt_executed = False
-
         if not endtick:
             self.last_tick = tick
 
@@ -1298,18 +1597,13 @@ class CtaLineBar(object):
 
         # 2.计算前self.para_pre_len周期内的Bar高点和低点(不包含当前周期，因为当前正在合成的bar
         # 还未触发on_bar，不会存入开高低收序列）
-        preHigh = max(self.high_array[-count_len:])
-        preLow = min(self.low_array[-count_len:])
+        preHigh, preLow = self.__count_window_hhv_llv(count_len, self.para_pre_len)
         if np.isnan(preHigh) or np.isnan(preLow):
             return
         # 保存前高值到 前高序列
-        if len(self.line_pre_high) > self.max_hold_bars:  # 维持最大缓存数量 超过则删除最前面
-            del self.line_pre_high[0]
         self.line_pre_high.append(preHigh)
 
         # 保存前低值到 前低序列
-        if len(self.line_pre_low) > self.max_hold_bars:  # 维持最大缓存数量 超过则删除最前面
-            del self.line_pre_low[0]
         self.line_pre_low.append(preLow)
 
     def get_sar(self, direction, cur_sar, cur_af=0, sar_limit=0.2, sar_step=0.02):
@@ -1469,8 +1763,6 @@ class CtaLineBar(object):
         if self.line_sar_buttom[-1] > self.low_array[-1]:
             self.line_sar_buttom[-1] = self.low_array[-1]
 
-        if len(self.line_sar) > self.max_hold_bars:
-            del self.line_sar[0]
 
     def __count_ma(self):
         """计算K线的MA1 和MA2"""
@@ -1489,61 +1781,49 @@ class CtaLineBar(object):
         if self.para_ma1_len > 0:
             count_len = min(self.para_ma1_len, self.bar_len)
 
-            barMa1 = ta.MA(self.close_array[-count_len:], count_len)[-1]
+            barMa1 = self.__count_sma(count_len, self.para_ma1_len)
             if np.isnan(barMa1):
                 return
             barMa1 = round(barMa1, self.round_n)
 
-            if len(self.line_ma1) > self.max_hold_bars:
-                del self.line_ma1[0]
             self.line_ma1.append(barMa1)
 
             # 计算斜率
             if len(self.line_ma1) > 2 and self.line_ma1[-2] != 0:
                 ma1_atan = math.atan((self.line_ma1[-1] / self.line_ma1[-2] - 1) * 100) * 180 / math.pi
                 ma1_atan = round(ma1_atan, self.round_n)
-                if len(self.line_ma1_atan) > self.max_hold_bars:
-                    del self.line_ma1_atan[0]
                 self.line_ma1_atan.append(ma1_atan)
 
         # 计算第二条MA均线
         if self.para_ma2_len > 0:
             count_len = min(self.para_ma2_len, self.bar_len)
-            barMa2 = ta.MA(self.close_array[-count_len:], count_len)[-1]
+            barMa2 = self.__count_sma(count_len, self.para_ma2_len)
             if np.isnan(barMa2):
                 return
             barMa2 = round(barMa2, self.round_n)
 
-            if len(self.line_ma2) > self.max_hold_bars:
-                del self.line_ma2[0]
             self.line_ma2.append(barMa2)
 
             # 计算斜率
             if len(self.line_ma2) > 2 and self.line_ma2[-2] != 0:
                 ma2_atan = math.atan((self.line_ma2[-1] / self.line_ma2[-2] - 1) * 100) * 180 / math.pi
                 ma2_atan = round(ma2_atan, self.round_n)
-                if len(self.line_ma2_atan) > self.max_hold_bars:
-                    del self.line_ma2_atan[0]
                 self.line_ma2_atan.append(ma2_atan)
 
         # 计算第三条MA均线
         if self.para_ma3_len > 0:
             count_len = min(self.para_ma3_len, self.bar_len)
-            barMa3 = ta.MA(self.close_array[-count_len:], count_len)[-1]
+            barMa3 = self.__count_sma(count_len, self.para_ma3_len)
             if np.isnan(barMa3):
                 return
             barMa3 = round(barMa3, self.round_n)
 
-            if len(self.line_ma3) > self.max_hold_bars:
-                del self.line_ma3[0]
             self.line_ma3.append(barMa3)
 
             # 计算斜率
             if len(self.line_ma3) > 2 and self.line_ma3[-2] != 0:
                 ma3_atan = math.atan((self.line_ma3[-1] / self.line_ma3[-2] - 1) * 100) * 180 / math.pi
                 ma3_atan = round(ma3_atan, self.round_n)
-                if len(self.line_ma3_atan) > self.max_hold_bars:
-                    del self.line_ma3_atan[0]
                 self.line_ma3_atan.append(ma3_atan)
 
         # 计算MA1，MA2，MA3的金叉死叉
@@ -1623,47 +1903,41 @@ class CtaLineBar(object):
                 elif self.line_ma1[-1] > self.line_ma3[-1]:
                     self.ma13_count += 1
 
+    def __count_sma(self, count_len, para_len):
+        """计算最近count_len根bar收盘价的简单平均"""
+        if self.use_kernels and count_len == para_len:
+            kernel = self.get_kernel(('ma', count_len), lambda: MeanKernel(count_len), self.close_series)
+            if kernel.ready:
+                return kernel.value
+        return ta.MA(self.close_array[-count_len:], count_len)[-1]
+
     def rt_count_ma(self):
         """
         实时计算MA得值
-        :param ma_num:第几条均线, 1，对应inputMa1Len,,,,
+        已完成bar的收盘价之和每根bar只计算一次，每个tick只需加上最新价
         :return:
         """
-        if self.para_ma1_len > 0:
-            count_len = min(self.bar_len, self.para_ma1_len)
-            if count_len > 0:
-                close_ma_array = ta.MA(np.append(self.close_array[-count_len:], [self.line_bar[-1].close_price]),
-                                       count_len)
-                self._rt_ma1 = round(close_ma_array[-1], self.round_n)
-
-                # 计算斜率
-                if len(close_ma_array) > 2 and close_ma_array[-2] != 0:
-                    self._rt_ma1_atan = round(
-                        math.atan((close_ma_array[-1] / close_ma_array[-2] - 1) * 100) * 180 / math.pi, 3)
-
-        if self.para_ma2_len > 0:
-            count_len = min(self.bar_len, self.para_ma2_len)
-            if count_len > 0:
-                close_ma_array = ta.MA(np.append(self.close_array[-count_len:], [self.line_bar[-1].close_price]),
-                                       count_len)
-                self._rt_ma2 = round(close_ma_array[-1], self.round_n)
+        cur_close = self.line_bar[-1].close_price
+        for i, para_len in enumerate([self.para_ma1_len, self.para_ma2_len, self.para_ma3_len], start=1):
+            if para_len <= 0:
+                continue
+            count_len = min(self.bar_len, para_len)
+            if count_len <= 0:
+                continue
 
-                # 计算斜率
-                if len(close_ma_array) > 2 and close_ma_array[-2] != 0:
-                    self._rt_ma2_atan = round(
-                        math.atan((close_ma_array[-1] / close_ma_array[-2] - 1) * 100) * 180 / math.pi, 3)
+            total, pre_ma = self.get_rt_base(('ma', count_len), lambda: self.__rt_ma_base(count_len))
+            ma = (total + cur_close) / count_len
+            setattr(self, f'_rt_ma{i}', round(ma, self.round_n))
 
-        if self.para_ma3_len > 0:
-            count_len = min(self.bar_len, self.para_ma3_len)
-            if count_len > 0:
-                close_ma_array = ta.MA(np.append(self.close_array[-count_len:], [self.line_bar[-1].close_price]),
-                                       count_len)
-                self._rt_ma3 = round(close_ma_array[-1], self.round_n)
+            # 计算斜率
+            if count_len > 1 and pre_ma != 0:
+                setattr(self, f'_rt_ma{i}_atan', round(math.atan((ma / pre_ma - 1) * 100) * 180 / math.pi, 3))
 
-                # 计算斜率
-                if len(close_ma_array) > 2 and close_ma_array[-2] != 0:
-                    self._rt_ma3_atan = round(
-                        math.atan((close_ma_array[-1] / close_ma_array[-2] - 1) * 100) * 180 / math.pi, 3)
+    def __rt_ma_base(self, count_len):
+        """实时MA的基础数据：最近count_len-1根bar的收盘价之和，最近count_len根bar的MA"""
+        total = math.fsum(self.close_series[1 - count_len:]) if count_len > 1 else 0.0
+        pre_ma = (total + self.close_series[-count_len]) / count_len
+        return total, pre_ma
 
     @property
     def rt_ma1(self):
@@ -1728,13 +2002,11 @@ class CtaLineBar(object):
             count_len = min(self.para_ema1_len, self.bar_len)
 
             # 3、获取前InputN周期(不包含当前周期）的K线
-            barEma1 = ta.EMA(self.close_array[-ema1_data_len:], count_len)[-1]
+            barEma1 = self.__count_window_ema(count_len, ema1_data_len)
             if np.isnan(barEma1):
                 return
             barEma1 = round(float(barEma1), self.round_n)
 
-            if len(self.line_ema1) > self.max_hold_bars:
-                del self.line_ema1[0]
             self.line_ema1.append(barEma1)
 
         # 计算第二条EMA均线
@@ -1743,13 +2015,11 @@ class CtaLineBar(object):
 
             # 3、获取前InputN周期(不包含当前周期）的自适应均线
 
-            barEma2 = ta.EMA(self.close_array[-ema2_data_len:], count_len)[-1]
+            barEma2 = self.__count_window_ema(count_len, ema2_data_len)
             if np.isnan(barEma2):
                 return
             barEma2 = round(float(barEma2), self.round_n)
 
-            if len(self.line_ema2) > self.max_hold_bars:
-                del self.line_ema2[0]
             self.line_ema2.append(barEma2)
 
         # 计算第三条EMA均线
@@ -1757,17 +2027,28 @@ class CtaLineBar(object):
             count_len = min(self.bar_len, self.para_ema3_len)
 
             # 3、获取前InputN周期(不包含当前周期）的自适应均线
-            barEma3 = ta.EMA(self.close_array[-ema3_data_len:], count_len)[-1]
+            barEma3 = self.__count_window_ema(count_len, ema3_data_len)
             if np.isnan(barEma3):
                 return
             barEma3 = round(float(barEma3), self.round_n)
 
-            if len(self.line_ema3) > self.max_hold_bars:
-                del self.line_ema3[0]
             self.line_ema3.append(barEma3)
 
+    def __count_window_ema(self, count_len, data_len):
+        """计算最近data_len根bar收盘价的EMA(与talib一致，以窗口前count_len个数据的均值为种子)"""
+        if self.use_kernels:
+            kernel = self.get_kernel(('ema', count_len, data_len),
+                                     lambda: EmaKernel(count_len, window=data_len), self.close_series)
+            if kernel.ready:
+                return kernel.value
+        return ta.EMA(self.close_array[-data_len:], count_len)[-1]
+
     def rt_count_ema(self):
-        """计算K线的EMA1 和EMA2"""
+        """
+        计算K线的实时EMA1/EMA2/EMA3
+        ta.EMA(已完成bar + 最新价)[-1] = (1 - alpha) * ta.EMA(已完成bar)[-1] + alpha * 最新价，
+        已完成bar的EMA每根bar只计算一次
+        """
 
         if not (self.para_ema1_len > 0 or self.para_ema2_len > 0 or self.para_ema3_len > 0):  # 不计算
             return
@@ -1780,36 +2061,22 @@ class CtaLineBar(object):
         if self.bar_len < max_data_len:
             return
 
-        # 计算第一条EMA均线
-        if self.para_ema1_len > 0:
-            count_len = min(self.para_ema1_len, self.bar_len)
-
-            # 3、获取前InputN周期(不包含当前周期）的K线
-            barEma1 = ta.EMA(np.append(self.close_array[-ema1_data_len:], [self.cur_price]), count_len)[-1]
-            if np.isnan(barEma1):
-                return
-            self._rt_ema1 = round(float(barEma1), self.round_n)
-
-        # 计算第二条EMA均线
-        if self.para_ema2_len > 0:
-            count_len = min(self.bar_len, self.para_ema2_len)
-
-            # 3、获取前InputN周期(不包含当前周期）的自适应均线
-
-            barEma2 = ta.EMA(np.append(self.close_array[-ema2_data_len:], [self.cur_price]), count_len)[-1]
-            if np.isnan(barEma2):
-                return
-            self._rt_ema2 = round(float(barEma2), self.round_n)
-
-        # 计算第三条EMA均线
-        if self.para_ema3_len > 0:
-            count_len = min(self.bar_len, self.para_ema3_len)
-
-            # 3、获取前InputN周期(不包含当前周期）的自适应均线
-            barEma3 = ta.EMA(np.append(self.close_array[-ema3_data_len:], [self.cur_price]), count_len)[-1]
-            if np.isnan(barEma3):
+        for i, (para_len, data_len) in enumerate([(self.para_ema1_len, ema1_data_len),
+                                                  (self.para_ema2_len, ema2_data_len),
+                                                  (self.para_ema3_len, ema3_data_len)], start=1):
+            if para_len <= 0:
+                continue
+            count_len = min(self.bar_len, para_len)
+
+            # 前data_len根bar(不包含当前周期)的EMA
+            pre_ema = self.get_rt_base(
+                ('ema', count_len, data_len),
+                lambda: float(ta.EMA(self.close_array[-data_len:], count_len)[-1]))
+            alpha = 2 / (count_len + 1)
+            bar_ema = (1 - alpha) * pre_ema + alpha * self.cur_price
+            if np.isnan(bar_ema):
                 return
-            self._rt_ema3 = round(float(barEma3), self.round_n)
+            setattr(self, f'_rt_ema{i}', round(bar_ema, self.round_n))
 
     @property
     def rt_ema1(self):
@@ -1881,9 +2148,6 @@ class CtaLineBar(object):
         else:
             self.cur_pdi = barPdm * 100 / barTr1
 
-        if len(self.line_pdi) > self.max_hold_bars:
-            del self.line_pdi[0]
-
         self.line_pdi.append(self.cur_pdi)
 
         # 7、计算下降动向指标，即做空的比率
@@ -1898,14 +2162,8 @@ class CtaLineBar(object):
         else:
             dx = 100 * abs(self.cur_mdi - self.cur_pdi) / (self.cur_mdi + self.cur_pdi)
 
-        if len(self.line_mdi) > self.max_hold_bars:
-            del self.line_mdi[0]
-
         self.line_mdi.append(self.cur_mdi)
 
-        if len(self.line_dx) > self.max_hold_bars:
-            del self.line_dx[0]
-
         self.line_dx.append(dx)
 
         # 平均趋向指标，MA计算
@@ -1915,8 +2173,6 @@ class CtaLineBar(object):
             self.cur_adx = ta.EMA(np.array(self.line_dx, dtype=float), self.para_dmi_len)[-1]
 
         # 保存Adx值
-        if len(self.line_adx) > self.max_hold_bars:
-            del self.line_adx[0]
 
         self.line_adx.append(self.cur_adx)
 
@@ -1927,8 +2183,6 @@ class CtaLineBar(object):
             self.cur_adxr = (self.line_adx[-1] + self.line_adx[-2]) / 2
 
         # 保存Adxr值
-        if len(self.line_adxr) > self.max_hold_bars:
-            del self.line_adxr[0]
         self.line_adxr.append(self.cur_adxr)
 
         # 7、计算A，ADX值持续高于前一周期时，市场行情将维持原趋势
@@ -1983,33 +2237,30 @@ class CtaLineBar(object):
         # 计算 ATR
         if self.para_atr1_len > 0:
             count_len = min(self.bar_len, self.para_atr1_len)
-            cur_atr1 = ta.ATR(self.high_array[-count_len * 2:], self.low_array[-count_len * 2:],
-                              self.close_array[-count_len * 2:], count_len)
-            self.cur_atr1 = round(cur_atr1[-1], self.round_n)
-            if len(self.line_atr1) > self.max_hold_bars:
-                del self.line_atr1[0]
+            self.cur_atr1 = round(self.__count_window_atr(count_len, self.para_atr1_len), self.round_n)
             self.line_atr1.append(self.cur_atr1)
 
         if self.para_atr2_len > 0:
             count_len = min(self.bar_len, self.para_atr2_len)
-            cur_atr2 = ta.ATR(self.high_array[-count_len * 2:], self.low_array[-count_len * 2:],
-                              self.close_array[-count_len * 2:], count_len)
-            self.cur_atr2 = round(cur_atr2[-1], self.round_n)
-            if len(self.line_atr2) > self.max_hold_bars:
-                del self.line_atr2[0]
+            self.cur_atr2 = round(self.__count_window_atr(count_len, self.para_atr2_len), self.round_n)
             self.line_atr2.append(self.cur_atr2)
 
         if self.para_atr3_len > 0:
             count_len = min(self.bar_len, self.para_atr3_len)
-            cur_atr3 = ta.ATR(self.high_array[-count_len * 2:], self.low_array[-count_len * 2:],
-                              self.close_array[-count_len * 2:], count_len)
-            self.cur_atr3 = round(cur_atr3[-1], self.round_n)
-
-            if len(self.line_atr3) > self.max_hold_bars:
-                del self.line_atr3[0]
+            self.cur_atr3 = round(self.__count_window_atr(count_len, self.para_atr3_len), self.round_n)
 
             self.line_atr3.append(self.cur_atr3)
 
+    def __count_window_atr(self, count_len, para_len):
+        """计算最近count_len * 2根bar的ATR"""
+        if self.use_kernels and count_len == para_len:
+            kernel = self.get_kernel(('atr', count_len), lambda: AtrKernel(count_len),
+                                     self.high_series, self.low_series, self.close_series)
+            if kernel.ready:
+                return kernel.value
+        return ta.ATR(self.high_array[-count_len * 2:], self.low_array[-count_len * 2:],
+                      self.close_array[-count_len * 2:], count_len)[-1]
+
     def __count_vol_ma(self):
         """计算平均成交量"""
 
@@ -2021,8 +2272,6 @@ class CtaLineBar(object):
         sumVol = sum([x.volume for x in self.line_bar[-bar_len:]])
         avgVol = round(sumVol / bar_len, 0)
 
-        if len(self.line_vol_ma) > self.max_hold_bars:
-            del self.line_vol_ma[0]
         self.line_vol_ma.append(avgVol)
 
     def __count_rsi(self):
@@ -2039,12 +2288,9 @@ class CtaLineBar(object):
         # 计算第1根RSI曲线
         # 3、inputRsi1Len(包含当前周期）的相对强弱
 
-        barRsi = ta.RSI(self.close_array[-2 * self.para_rsi1_len:], self.para_rsi1_len)[-1]
+        barRsi = self.__count_window_rsi(self.para_rsi1_len)
         barRsi = round(float(barRsi), self.round_n)
 
-        if len(self.line_rsi1) > self.max_hold_bars:
-            del self.line_rsi1[0]
-
         self.line_rsi1.append(barRsi)
 
         if len(self.line_rsi1) > 3:
@@ -2078,14 +2324,19 @@ class CtaLineBar(object):
             if self.bar_len < self.para_rsi2_len + 2:
                 return
 
-            barRsi = ta.RSI(self.close_array[-2 * self.para_rsi2_len:], self.para_rsi2_len)[-1]
+            barRsi = self.__count_window_rsi(self.para_rsi2_len)
             barRsi = round(float(barRsi), self.round_n)
 
-            if len(self.line_rsi2) > self.max_hold_bars:
-                del self.line_rsi2[0]
-
             self.line_rsi2.append(barRsi)
 
+    def __count_window_rsi(self, rsi_len):
+        """计算最近rsi_len * 2根bar的RSI"""
+        if self.use_kernels:
+            kernel = self.get_kernel(('rsi', rsi_len), lambda: RsiKernel(rsi_len), self.close_series)
+            if kernel.ready:
+                return kernel.value
+        return ta.RSI(self.close_array[-2 * rsi_len:], rsi_len)[-1]
+
     def __count_cmi(self):
         """市场波动指数（Choppy Market Index，CMI）是一个用来判断市场走势类型的技术分析指标。
         它通过计算当前收盘价与一定周期前的收盘价的差值与这段时间内价格波动的范围的比值，来判断目前的股价走势是趋势还是盘整。
@@ -2116,9 +2367,6 @@ class CtaLineBar(object):
 
         cmi = round(cmi, self.round_n)
 
-        if len(self.line_cmi) > self.max_hold_bars:
-            del self.line_cmi[0]
-
         self.line_cmi.append(cmi)
 
     def __count_boll(self):
@@ -2137,34 +2385,23 @@ class CtaLineBar(object):
                 bollLen = min(self.bar_len, self.para_boll_len)
 
                 # 不包含当前最新的Bar
-                upper_list, middle_list, lower_list = ta.BBANDS(self.close_array,
-                                                                timeperiod=bollLen, nbdevup=self.para_boll_std_rate,
-                                                                nbdevdn=self.para_boll_std_rate, matype=0)
-                if np.isnan(upper_list[-1]):
+                upper_value, middle_value, lower_value = self.__count_window_boll(bollLen, self.para_boll_len, self.para_boll_std_rate)
+                if np.isnan(upper_value):
                     return
 
-                if len(self.line_boll_upper) > self.max_hold_bars:
-                    del self.line_boll_upper[0]
-                if len(self.line_boll_middle) > self.max_hold_bars:
-                    del self.line_boll_middle[0]
-                if len(self.line_boll_lower) > self.max_hold_bars:
-                    del self.line_boll_lower[0]
-                if len(self.line_boll_std) > self.max_hold_bars:
-                    del self.line_boll_std[0]
-
                 # 1标准差
-                std = (upper_list[-1] - lower_list[-1]) / (self.para_boll_std_rate * 2)
+                std = (upper_value - lower_value) / (self.para_boll_std_rate * 2)
                 self.line_boll_std.append(std)
 
-                upper = round(upper_list[-1], self.round_n)
+                upper = round(upper_value, self.round_n)
                 self.line_boll_upper.append(upper)  # 上轨
                 self.cur_upper = upper  # 上轨
 
-                middle = round(middle_list[-1], self.round_n)
+                middle = round(middle_value, self.round_n)
                 self.line_boll_middle.append(middle)  # 中轨
                 self.cur_middle = middle  # 中轨
 
-                lower = round(lower_list[-1], self.round_n)
+                lower = round(lower_value, self.round_n)
                 self.line_boll_lower.append(lower)  # 下轨
                 self.cur_lower = lower  # 下轨
 
@@ -2172,22 +2409,16 @@ class CtaLineBar(object):
                 if len(self.line_boll_upper) > 2 and self.line_boll_upper[-2] != 0:
                     up_atan = math.atan((self.line_boll_upper[-1] / self.line_boll_upper[-2] - 1) * 100) * 180 / math.pi
                     up_atan = round(up_atan, self.round_n)
-                    if len(self.line_upper_atan) > self.max_hold_bars:
-                        del self.line_upper_atan[0]
                     self.line_upper_atan.append(up_atan)
                 if len(self.line_boll_middle) > 2 and self.line_boll_middle[-2] != 0:
                     mid_atan = math.atan(
                         (self.line_boll_middle[-1] / self.line_boll_middle[-2] - 1) * 100) * 180 / math.pi
                     mid_atan = round(mid_atan, self.round_n)
-                    if len(self.line_middle_atan) > self.max_hold_bars:
-                        del self.line_middle_atan[0]
                     self.line_middle_atan.append(mid_atan)
                 if len(self.line_boll_lower) > 2 and self.line_boll_lower[-2] != 0:
                     low_atan = math.atan(
                         (self.line_boll_lower[-1] / self.line_boll_lower[-2] - 1) * 100) * 180 / math.pi
                     low_atan = round(low_atan, self.round_n)
-                    if len(self.line_lower_atan) > self.max_hold_bars:
-                        del self.line_lower_atan[0]
                     self.line_lower_atan.append(low_atan)
 
         if self.para_boll2_len > 0:
@@ -2198,33 +2429,23 @@ class CtaLineBar(object):
                 boll2Len = min(self.bar_len, self.para_boll2_len)
 
                 # 不包含当前最新的Bar
-                upper_list, middle_list, lower_list = ta.BBANDS(self.close_array,
-                                                                timeperiod=boll2Len, nbdevup=self.para_boll2_std_rate,
-                                                                nbdevdn=self.para_boll2_std_rate, matype=0)
-                if np.isnan(upper_list[-1]):
+                upper_value, middle_value, lower_value = self.__count_window_boll(boll2Len, self.para_boll2_len, self.para_boll2_std_rate)
+                if np.isnan(upper_value):
                     return
-                if len(self.line_boll2_upper) > self.max_hold_bars:
-                    del self.line_boll2_upper[0]
-                if len(self.line_boll2_middle) > self.max_hold_bars:
-                    del self.line_boll2_middle[0]
-                if len(self.line_boll2_lower) > self.max_hold_bars:
-                    del self.line_boll2_lower[0]
-                if len(self.line_boll2_std) > self.max_hold_bars:
-                    del self.line_boll2_std[0]
 
                 # 1标准差
-                std = (upper_list[-1] - lower_list[-1]) / (self.para_boll2_std_rate * 2)
+                std = (upper_value - lower_value) / (self.para_boll2_std_rate * 2)
                 self.line_boll2_std.append(std)
 
-                upper = round(upper_list[-1], self.round_n)
+                upper = round(upper_value, self.round_n)
                 self.line_boll2_upper.append(upper)  # 上轨
                 self.cur_upper2 = upper  # 上轨
 
-                middle = round(middle_list[-1], self.round_n)
+                middle = round(middle_value, self.round_n)
                 self.line_boll2_middle.append(middle)  # 中轨
                 self.cur_middle2 = middle  # 中轨
 
-                lower = round(lower_list[-1], self.round_n)
+                lower = round(lower_value, self.round_n)
                 self.line_boll2_lower.append(lower)  # 下轨
                 self.cur_lower2 = lower  # 下轨
 
@@ -2233,22 +2454,16 @@ class CtaLineBar(object):
                     up_atan = math.atan(
                         (self.line_boll2_upper[-1] / self.line_boll2_upper[-2] - 1) * 100) * 180 / math.pi
                     up_atan = round(up_atan, self.round_n)
-                    if len(self.line_upper2_atan) > self.max_hold_bars:
-                        del self.line_upper2_atan[0]
                     self.line_upper2_atan.append(up_atan)
                 if len(self.line_boll2_middle) > 2 and self.line_boll2_middle[-2] != 0:
                     mid_atan = math.atan(
                         (self.line_boll2_middle[-1] / self.line_boll2_middle[-2] - 1) * 100) * 180 / math.pi
                     mid_atan = round(mid_atan, self.round_n)
-                    if len(self.line_middle2_atan) > self.max_hold_bars:
-                        del self.line_middle2_atan[0]
                     self.line_middle2_atan.append(mid_atan)
                 if len(self.line_boll2_lower) > 2 and self.line_boll2_lower[-2] != 0:
                     low_atan = math.atan(
                         (self.line_boll2_lower[-1] / self.line_boll2_lower[-2] - 1) * 100) * 180 / math.pi
                     low_atan = round(low_atan, self.round_n)
-                    if len(self.line_lower2_atan) > self.max_hold_bars:
-                        del self.line_lower2_atan[0]
                     self.line_lower2_atan.append(low_atan)
 
         if self.para_boll_tb_len > 0:
@@ -2260,20 +2475,10 @@ class CtaLineBar(object):
 
                 # 不包含当前最新的Bar
 
-                if len(self.line_boll_upper) > self.max_hold_bars:
-                    del self.line_boll_upper[0]
-                if len(self.line_boll_middle) > self.max_hold_bars:
-                    del self.line_boll_middle[0]
-                if len(self.line_boll_lower) > self.max_hold_bars:
-                    del self.line_boll_lower[0]
-                if len(self.line_boll_std) > self.max_hold_bars:
-                    del self.line_boll_std[0]
-
                 # 1标准差
-                std = np.std(self.close_array[-2 * bollLen:], ddof=1)
+                std, middle = self.__count_window_std(2 * bollLen, 2 * self.para_boll_tb_len)
                 self.line_boll_std.append(std)
 
-                middle = np.mean(self.close_array[-2 * bollLen:])
                 self.line_boll_middle.append(middle)  # 中轨
                 self.cur_middle = middle - middle % self.price_tick  # 中轨取整
 
@@ -2289,22 +2494,16 @@ class CtaLineBar(object):
                 if len(self.line_boll_upper) > 2 and self.line_boll_upper[-2] != 0:
                     up_atan = math.atan((self.line_boll_upper[-1] / self.line_boll_upper[-2] - 1) * 100) * 180 / math.pi
                     up_atan = round(up_atan, self.round_n)
-                    if len(self.line_upper_atan) > self.max_hold_bars:
-                        del self.line_upper_atan[0]
                     self.line_upper_atan.append(up_atan)
                 if len(self.line_boll_middle) > 2 and self.line_boll_middle[-2] != 0:
                     mid_atan = math.atan(
                         (self.line_boll_middle[-1] / self.line_boll_middle[-2] - 1) * 100) * 180 / math.pi
                     mid_atan = round(mid_atan, self.round_n)
-                    if len(self.line_middle_atan) > self.max_hold_bars:
-                        del self.line_middle_atan[0]
                     self.line_middle_atan.append(mid_atan)
                 if len(self.line_boll_lower) > 2 and self.line_boll_lower[-2] != 0:
                     low_atan = math.atan(
                         (self.line_boll_lower[-1] / self.line_boll_lower[-2] - 1) * 100) * 180 / math.pi
                     low_atan = round(low_atan, self.round_n)
-                    if len(self.line_lower_atan) > self.max_hold_bars:
-                        del self.line_lower_atan[0]
                     self.line_lower_atan.append(low_atan)
 
         if self.para_boll2_tb_len > 0:
@@ -2314,20 +2513,10 @@ class CtaLineBar(object):
             else:
                 boll2Len = min(self.bar_len, self.para_boll2_tb_len)
 
-                if len(self.line_boll2_upper) > self.max_hold_bars:
-                    del self.line_boll2_upper[0]
-                if len(self.line_boll2_middle) > self.max_hold_bars:
-                    del self.line_boll2_middle[0]
-                if len(self.line_boll2_lower) > self.max_hold_bars:
-                    del self.line_boll2_lower[0]
-                if len(self.line_boll2_std) > self.max_hold_bars:
-                    del self.line_boll2_std[0]
-
                 # 1标准差
-                std = np.std(self.close_array[-2 * boll2Len:], ddof=1)
+                std, middle = self.__count_window_std(2 * boll2Len, 2 * self.para_boll2_tb_len)
                 self.line_boll2_std.append(std)
 
-                middle = np.mean(self.close_array[-2 * boll2Len:])
                 self.line_boll2_middle.append(middle)  # 中轨
                 self.cur_middle2 = middle  # 中轨取整
 
@@ -2344,24 +2533,39 @@ class CtaLineBar(object):
                     up_atan = math.atan(
                         (self.line_boll2_upper[-1] / self.line_boll2_upper[-2] - 1) * 100) * 180 / math.pi
                     up_atan = round(up_atan, self.round_n)
-                    if len(self.line_upper2_atan) > self.max_hold_bars:
-                        del self.line_upper2_atan[0]
                     self.line_upper2_atan.append(up_atan)
                 if len(self.line_boll2_middle) > 2 and self.line_boll2_middle[-2] != 0:
                     mid_atan = math.atan(
                         (self.line_boll2_middle[-1] / self.line_boll2_middle[-2] - 1) * 100) * 180 / math.pi
                     mid_atan = round(mid_atan, self.round_n)
-                    if len(self.line_middle2_atan) > self.max_hold_bars:
-                        del self.line_middle2_atan[0]
                     self.line_middle2_atan.append(mid_atan)
                 if len(self.line_boll2_lower) > 2 and self.line_boll2_lower[-2] != 0:
                     low_atan = math.atan(
                         (self.line_boll2_lower[-1] / self.line_boll2_lower[-2] - 1) * 100) * 180 / math.pi
                     low_atan = round(low_atan, self.round_n)
-                    if len(self.line_lower2_atan) > self.max_hold_bars:
-                        del self.line_lower2_atan[0]
                     self.line_lower2_atan.append(low_atan)
 
+    def __count_window_boll(self, boll_len, para_len, std_rate):
+        """计算最近boll_len根bar收盘价的布林通道(总体标准差)，返回上轨、中轨、下轨"""
+        if self.use_kernels and boll_len == para_len:
+            kernel = self.get_kernel(('std', boll_len, 0), lambda: StdKernel(boll_len), self.close_series)
+            if kernel.ready:
+                return kernel.mean + std_rate * kernel.value, kernel.mean, kernel.mean - std_rate * kernel.value
+
+        upper_list, middle_list, lower_list = ta.BBANDS(self.close_array,
+                                                        timeperiod=boll_len, nbdevup=std_rate,
+                                                        nbdevdn=std_rate, matype=0)
+        return upper_list[-1], middle_list[-1], lower_list[-1]
+
+    def __count_window_std(self, data_len, para_data_len):
+        """计算最近data_len根bar收盘价的样本标准差和均值"""
+        if self.use_kernels and data_len == para_data_len:
+            kernel = self.get_kernel(('std', data_len, 1), lambda: StdKernel(data_len, ddof=1), self.close_series)
+            if kernel.ready:
+                return kernel.value, kernel.mean
+
+        return np.std(self.close_array[-data_len:], ddof=1), np.mean(self.close_array[-data_len:])
+
     def rt_count_boll(self):
         """实时计算布林上下轨，斜率"""
         boll_01_len = max(self.para_boll_len, self.para_boll_tb_len)
@@ -2370,7 +2574,7 @@ class CtaLineBar(object):
         if not (boll_01_len > 0 or boll_02_len > 0):  # 不计算
             return
 
-        rt_close_array = np.append(self.close_array, [self.line_bar[-1].close_price])
+        cur_close = self.line_bar[-1].close_price
 
         if boll_01_len > 0:
             if self.bar_len < min(14, boll_01_len) + 1:
@@ -2379,19 +2583,14 @@ class CtaLineBar(object):
             bollLen = min(boll_01_len, self.bar_len)
 
             if self.para_boll_tb_len == 0:
-                upper_list, middle_list, lower_list = ta.BBANDS(rt_close_array,
-                                                                timeperiod=bollLen, nbdevup=self.para_boll_std_rate,
-                                                                nbdevdn=self.para_boll_std_rate, matype=0)
-
                 # 1标准差
-                std = (upper_list[-1] - lower_list[-1]) / (self.para_boll_std_rate * 2)
-                self._rt_upper = round(upper_list[-1], self.round_n)
-                self._rt_middle = round(middle_list[-1], self.round_n)
-                self._rt_lower = round(lower_list[-1], self.round_n)
+                std, middle = self.__rt_window_std(bollLen, 0, cur_close)
+                self._rt_upper = round(middle + self.para_boll_std_rate * std, self.round_n)
+                self._rt_middle = round(middle, self.round_n)
+                self._rt_lower = round(middle - self.para_boll_std_rate * std, self.round_n)
             else:
                 # 1标准差
-                std = np.std(rt_close_array[-boll_01_len:])
-                middle = np.mean(rt_close_array[-boll_01_len:])
+                std, middle = self.__rt_window_std(boll_01_len, 0, cur_close)
                 self._rt_middle = round(middle, self.round_n)
                 upper = middle + self.para_boll_std_rate * std
                 self._rt_upper = round(upper, self.round_n)
@@ -2418,20 +2617,14 @@ class CtaLineBar(object):
             bollLen = min(boll_02_len, self.bar_len)
 
             if self.para_boll2_tb_len == 0:
-                upper_list, middle_list, lower_list = ta.BBANDS(
-                    rt_close_array,
-                    timeperiod=bollLen, nbdevup=self.para_boll2_std_rate,
-                    nbdevdn=self.para_boll2_std_rate, matype=0)
-
                 # 1标准差
-                std = (upper_list[-1] - lower_list[-1]) / (self.para_boll2_std_rate * 2)
-                self._rt_upper2 = round(upper_list[-1], self.round_n)
-                self._rt_middle2 = round(middle_list[-1], self.round_n)
-                self._rt_lower2 = round(lower_list[-1], self.round_n)
+                std, middle = self.__rt_window_std(bollLen, 0, cur_close)
+                self._rt_upper2 = round(middle + self.para_boll2_std_rate * std, self.round_n)
+                self._rt_middle2 = round(middle, self.round_n)
+                self._rt_lower2 = round(middle - self.para_boll2_std_rate * std, self.round_n)
             else:
                 # 1标准差
-                std = np.std(rt_close_array[-bollLen:], ddof=1)
-                middle = np.mean(rt_close_array[-bollLen:])
+                std, middle = self.__rt_window_std(bollLen, 1, cur_close)
                 self._rt_middle2 = round(middle, self.round_n)
                 upper = middle + self.para_boll_std_rate * std
                 self._rt_upper2 = round(upper, self.round_n)
@@ -2451,6 +2644,24 @@ class CtaLineBar(object):
                 low_atan = math.atan((self._rt_lower2 / self.line_boll2_lower[-1] - 1) * 100) * 180 / math.pi
                 self._rt_lower2_atan = round(low_atan, self.round_n)
 
+    def __rt_window_std(self, data_len, ddof, cur_close):
+        """
+        实时计算最近data_len个收盘价(含最新价)的标准差、均值
+        已完成的data_len-1根bar，以最后收盘价为基准的偏差之和/平方和，每根bar只计算一次
+        """
+        def count_base():
+            values = np.array(self.close_series[1 - data_len:] if data_len > 1 else [], dtype=float)
+            ref = self.close_series[-1]
+            return ref, float((values - ref).sum()), float(((values - ref) ** 2).sum())
+
+        ref, total, square_total = self.get_rt_base(('std', data_len), count_base)
+        delta = cur_close - ref
+        total += delta
+        square_total += delta * delta
+        mean = total / data_len
+        var = (square_total - total * mean) / (data_len - ddof)
+        return math.sqrt(max(var, 0)), ref + mean
+
     @property
     def rt_upper(self):
         self.check_rt_funcs(self.rt_count_boll)
@@ -2567,8 +2778,7 @@ class CtaLineBar(object):
 
         inputKdjLen = min(self.para_kdj_len, self.bar_len)
 
-        hhv = max(self.high_array[-inputKdjLen:])
-        llv = min(self.low_array[-inputKdjLen:])
+        hhv, llv = self.__count_window_hhv_llv(inputKdjLen, self.para_kdj_len)
         if np.isnan(hhv) or np.isnan(llv):
             return
         if len(self.line_k) > 0:
@@ -2606,16 +2816,10 @@ class CtaLineBar(object):
 
         j = self.para_kdj_smooth_len * k - (self.para_kdj_smooth_len - 1) * d
 
-        if len(self.line_k) > self.max_hold_bars:
-            del self.line_k[0]
         self.line_k.append(k)
 
-        if len(self.line_d) > self.max_hold_bars:
-            del self.line_d[0]
         self.line_d.append(d)
 
-        if len(self.line_j) > self.max_hold_bars:
-            del self.line_j[0]
         self.line_j.append(j)
 
         # 增加KDJ的J谷顶和波底
@@ -2682,8 +2886,7 @@ class CtaLineBar(object):
 
         data_len = min(self.bar_len, self.para_kdj_tb_len)
 
-        hhv = max(self.high_array[-data_len:])
-        llv = min(self.low_array[-data_len:])
+        hhv, llv = self.__count_window_hhv_llv(data_len, self.para_kdj_tb_len)
         if np.isnan(hhv) or np.isnan(llv):
             return
 
@@ -2722,16 +2925,10 @@ class CtaLineBar(object):
 
         j = self.para_kdj_smooth_len * k - (self.para_kdj_smooth_len - 1) * d
 
-        if len(self.line_k) > self.max_hold_bars:
-            del self.line_k[0]
         self.line_k.append(k)
 
-        if len(self.line_d) > self.max_hold_bars:
-            del self.line_d[0]
         self.line_d.append(d)
 
-        if len(self.line_j) > self.max_hold_bars:
-            del self.line_j[0]
         self.line_j.append(j)
 
         # 增加KDJ的J谷顶和波底
@@ -2764,6 +2961,16 @@ class CtaLineBar(object):
 
         self.__update_kd_cross()
 
+    def __count_window_hhv_llv(self, data_len, para_len):
+        """计算最近data_len根bar的最高价和最低价"""
+        if self.use_kernels and 0 < data_len == para_len:
+            high_kernel = self.get_kernel(('max', data_len), lambda: MaxKernel(data_len), self.high_series)
+            low_kernel = self.get_kernel(('min', data_len), lambda: MinKernel(data_len), self.low_series)
+            if high_kernel.ready and low_kernel.ready:
+                return high_kernel.value, low_kernel.value
+
+        return max(self.high_array[-data_len:]), min(self.low_array[-data_len:])
+
     def __update_kd_cross(self):
         """更新KDJ金叉死叉"""
         if len(self.line_k) < 2 or len(self.line_d) < 2:
@@ -2814,27 +3021,33 @@ class CtaLineBar(object):
             self.write_log(u'数据未充分,当前Bar数据数量：{0}，计算MACD需要：{1}'.format(len(self.line_bar), maxLen))
             return
 
-        dif_list, dea_list, macd_list = ta.MACD(self.close_array[-2 * maxLen:], fastperiod=self.para_macd_fast_len,
-                                                slowperiod=self.para_macd_slow_len,
-                                                signalperiod=self.para_macd_signal_len)
-        if np.isnan(dif_list[-1]) or np.isnan(dea_list[-1]) or np.isnan(macd_list[-1]):
+        kernel = None
+        if self.use_kernels:
+            kernel = self.get_kernel(('macd', self.para_macd_fast_len, self.para_macd_slow_len,
+                                      self.para_macd_signal_len, 2 * maxLen),
+                                     lambda: MacdKernel(self.para_macd_fast_len, self.para_macd_slow_len,
+                                                        self.para_macd_signal_len, 2 * maxLen),
+                                     self.close_series)
+        if kernel and kernel.ready:
+            dif, dea, macd = kernel.dif, kernel.dea, kernel.macd
+        else:
+            dif_list, dea_list, macd_list = ta.MACD(self.close_array[-2 * maxLen:],
+                                                    fastperiod=self.para_macd_fast_len,
+                                                    slowperiod=self.para_macd_slow_len,
+                                                    signalperiod=self.para_macd_signal_len)
+            dif, dea, macd = dif_list[-1], dea_list[-1], macd_list[-1]
+        if np.isnan(dif) or np.isnan(dea) or np.isnan(macd):
             return
         # dif, dea, macd = ta.MACDEXT(np.array(listClose, dtype=float),
         #                            fastperiod=self.inputMacdFastPeriodLen, fastmatype=1,
         #                            slowperiod=self.inputMacdSlowPeriodLen, slowmatype=1,
         #                            signalperiod=self.inputMacdSignalPeriodLen, signalmatype=1)
 
-        if len(self.line_dif) > self.max_hold_bars:
-            del self.line_dif[0]
-        self.line_dif.append(round(dif_list[-1], self.round_n))
+        self.line_dif.append(round(dif, self.round_n))
 
-        if len(self.line_dea) > self.max_hold_bars:
-            del self.line_dea[0]
-        self.line_dea.append(round(dea_list[-1], self.round_n))
+        self.line_dea.append(round(dea, self.round_n))
 
-        if len(self.line_macd) > self.max_hold_bars:
-            del self.line_macd[0]
-        self.line_macd.append(round(macd_list[-1] * 2, self.round_n))  # 国内一般是2倍
+        self.line_macd.append(round(macd * 2, self.round_n))  # 国内一般是2倍
 
         # 更新 “段”（金叉-》死叉；或 死叉-》金叉)
         segment = self.macd_segment_list[-1] if len(self.macd_segment_list) > 0 else {}
@@ -2927,6 +3140,7 @@ class CtaLineBar(object):
         今日DEA = （前一日DEA X 8/10 + 今日DIF X 2/10），即为talib-MACD返回值signal
         DIF与它自己的移动平均之间差距的大小一般BAR=（DIF-DEA)*2，即为MACD柱状图。
         但是talib中MACD的计算是bar = (dif-dea)*1
+        固定窗口内的talib MACD是收盘价的线性函数，已完成bar部分的加权和每根bar只计算一次，每个tick只需加上最新价的权重
         """
         if self.para_macd_fast_len <= 0 or self.para_macd_slow_len <= 0 or self.para_macd_signal_len <= 0:
             return
@@ -2935,16 +3149,26 @@ class CtaLineBar(object):
         if self.bar_len < maxLen:
             return
 
-        dif, dea, macd = ta.MACD(np.append(self.close_array[-maxLen:], [self.line_bar[-1].close]),
-                                 fastperiod=self.para_macd_fast_len,
-                                 slowperiod=self.para_macd_slow_len, signalperiod=self.para_macd_signal_len)
-
-        if np.isnan(dif[-1]) or np.isnan(dea[-1]) or np.isnan(macd[-1]):
+        key = ('rt_macd', self.para_macd_fast_len, self.para_macd_slow_len, self.para_macd_signal_len, maxLen + 1)
+        kernel = self.kernels.get(key)
+        if kernel is None:
+            kernel = MacdKernel(self.para_macd_fast_len, self.para_macd_slow_len, self.para_macd_signal_len, maxLen + 1)
+            self.kernels[key] = kernel
+
+        pre_dif, pre_dea = self.get_rt_base(key, lambda: (
+            float(np.dot(kernel.dif_weights[:-1], self.close_array[-maxLen:])),
+            float(np.dot(kernel.dea_weights[:-1], self.close_array[-maxLen:]))))
+        cur_close = self.line_bar[-1].close_price
+        dif = pre_dif + float(kernel.dif_weights[-1]) * cur_close
+        dea = pre_dea + float(kernel.dea_weights[-1]) * cur_close
+        macd = dif - dea
+
+        if np.isnan(dif) or np.isnan(dea):
             return
 
-        self._rt_dif = round(dif[-1], self.round_n) if len(dif) > 0 else None
-        self._rt_dea = round(dea[-1], self.round_n) if len(dea) > 0 else None
-        self._rt_macd = round(macd[-1] * 2, self.round_n) if len(macd) > 0 else None
+        self._rt_dif = round(dif, self.round_n)
+        self._rt_dea = round(dea, self.round_n)
+        self._rt_macd = round(macd * 2, self.round_n)
 
         # 判断是否实时金叉/死叉
         if self._rt_macd is not None:
@@ -3131,13 +3355,7 @@ class CtaLineBar(object):
         # CLOSE = CLOSE[-min_length:]
         # TP = (HIGH + LOW + CLOSE) / 3
 
-        TP = self.mid3_array[-self.para_cci_len:]
-        # MA = pd.Series(data=TP).rolling(window=self.para_cci_len).mean().values
-        # MD = pd.Series(data=(TP - MA)).abs().rolling(window=self.para_cci_len).mean().values
-        # CCI = (TP - MA) / (0.015 * MD)
-        MA = np.mean(TP)
-        MD = np.mean(np.abs(TP - MA))
-        CCI = (TP[-1] - MA) / (0.015 * MD)
+        CCI = self.__count_window_cci(self.para_cci_len)
 
         self.cur_cci = round(CCI, self.round_n)
 
@@ -3146,19 +3364,29 @@ class CtaLineBar(object):
 
         # self.cur_cci = round(float(cur_cci), self.round_n)
 
-        if len(self.line_cci) > self.max_hold_bars:
-            del self.line_cci[0]
         self.line_cci.append(self.cur_cci)
 
         if len(self.line_cci) < 30:
             self.cur_cci_ema = self.cur_cci
         else:
-            self.cur_cci_ema = self.__ema(self.__ema(self.__ema(self.line_cci[-30:], 3), 2), 2)[-1]
+            self.cur_cci_ema = self.__ema_last(self.line_cci[-30:], 3, 2, 2)
 
-        if len(self.line_cci_ema) > self.max_hold_bars:
-            del self.line_cci_ema[0]
         self.line_cci_ema.append(self.cur_cci_ema)
 
+    def __count_window_cci(self, cci_len):
+        """计算最近cci_len根bar的CCI"""
+        if self.use_kernels:
+            kernel = self.get_kernel(('cci', cci_len), lambda: CciKernel(cci_len), self.mid3_series)
+            if kernel.ready:
+                return kernel.value
+
+        TP = self.mid3_array[-cci_len:]
+        # MA = pd.Series(data=TP).rolling(window=self.para_cci_len).mean().values
+        # MD = pd.Series(data=(TP - MA)).abs().rolling(window=self.para_cci_len).mean().values
+        # CCI = (TP - MA) / (0.015 * MD)
+        MA = np.mean(TP)
+        MD = np.mean(np.abs(TP - MA))
+        return (TP[-1] - MA) / (0.015 * MD)
 
     def rt_count_cci(self):
         """实时计算CCI值"""
@@ -3171,19 +3399,26 @@ class CtaLineBar(object):
                            format(len(self.line_bar), self.para_cci_len + 2))
             return
 
-        HIGH = np.append(self.high_array[-2 * self.para_cci_len:], [self.line_bar[-1].high_price])
-        LOW = np.append(self.low_array[-2 * self.para_cci_len:], [self.line_bar[-1].low_price])
-        CLOSE = np.append(self.close_array[-2 * self.para_cci_len:],[self.line_bar[-1].close_price])
-        TP = (HIGH + LOW + CLOSE) / 3
-        TP = TP[-self.para_cci_len:]
-        MA = np.mean(TP)
-        MD = np.mean(np.abs(TP - MA))
-        CCI = (TP[-1] - MA) / (0.015 * MD)
-
-        self._rt_cci = CCI
-        rt_line_cci = np.append(self.line_cci[-30:], [CCI])
-        self._rt_cci_ema = self.__ema(self.__ema(self.__ema(rt_line_cci, 3), 2), 2)[-1]
+        base = self.get_rt_base(('cci', self.para_cci_len), self.__rt_cci_base)
+        cur_bar = self.line_bar[-1]
+        cur_tp = (cur_bar.high_price + cur_bar.low_price + cur_bar.close_price) / 3
+        self._rt_cci = cci_rt_value(base, cur_tp)
 
+        if base['cci_weights'] is not None and np.isfinite(self._rt_cci):
+            self._rt_cci_ema = base['cci_dot'] + base['cci_weights'][-1] * self._rt_cci
+        else:
+            self._rt_cci_ema = self.__ema_last(np.append(base['cci_hist'], [self._rt_cci]), 3, 2, 2)
+
+    def __rt_cci_base(self):
+        """实时CCI的基础数据：最近cci_len-1根bar的典型价格，历史CCI(最近30个)做EMA的权重"""
+        base = cci_rt_base(self.high_array, self.low_array, self.close_array, self.para_cci_len)
+        cci_hist = np.array(self.line_cci[-30:], dtype=float)
+        base['cci_hist'] = cci_hist
+        base['cci_weights'] = None
+        if np.isfinite(cci_hist).all():
+            base['cci_weights'] = ema_weights(len(cci_hist) + 1, (3, 2, 2))
+            base['cci_dot'] = float(base['cci_weights'][:-1] @ cci_hist)
+        return base
 
     @property
     def rt_cci(self):
@@ -3209,6 +3444,7 @@ class CtaLineBar(object):
             except Exception:
                 self.write_log(u'导入卡尔曼过滤器失败,需先安装 pip install pykalman')
                 self.para_active_kf = False
+                self.invalidate_pipeline()
 
             state_means, state_covariances = self.kf.filter(self.close_array[-1])
             m = state_means[-1].item()
@@ -3226,15 +3462,6 @@ class CtaLineBar(object):
         std_len = 26 if self.bar_len > 26 else self.bar_len
         std = np.std(self.close_array[-std_len:], ddof=1)
         self.cur_state_std = std
-        if len(self.line_state_mean) > self.max_hold_bars:
-            del self.line_state_mean[0]
-        if len(self.line_state_covar) > self.max_hold_bars:
-            del self.line_state_covar[0]
-
-        if len(self.line_state_upper) > self.max_hold_bars:
-            del self.line_state_upper[0]
-        if len(self.line_state_lower) > self.max_hold_bars:
-            del self.line_state_lower[0]
 
         self.line_state_upper.append(m + 3 * std)
         self.line_state_mean.append(m)
@@ -3282,8 +3509,6 @@ class CtaLineBar(object):
             self.cur_period = CtaPeriod(mode=Period.SHOCK, price=bar.close_price, pre_mode=Period.INIT, dt=bar.datetime)
             self.period_list.append(self.cur_period)
 
-        if len(self.line_atan) > self.max_hold_bars:
-            del self.line_atan[0]
         self.line_atan.append(self.cur_atan)
 
         if len_rsi < 3:
@@ -3509,8 +3734,6 @@ class CtaLineBar(object):
         # 计算最后一根Bar的RSI指标
         last_rsi = ta.RSI(self.close_array[-data_len:], self.para_skd_fast_len)[-1]
         # 添加到lineSkdRSI队列
-        if len(self.line_skd_rsi) > self.max_hold_bars:
-            del self.line_skd_rsi[0]
         self.line_skd_rsi.append(last_rsi)
 
         if len(self.line_skd_rsi) < self.para_skd_slow_len:
@@ -3526,8 +3749,6 @@ class CtaLineBar(object):
         else:
             sto = 100 * (last_rsi - rsi_LLV) / (rsi_HHV - rsi_LLV)
         sto_len = len(self.line_skd_sto)
-        if sto_len > self.max_hold_bars:
-            del self.line_skd_sto[0]
         self.line_skd_sto.append(sto)
 
         # 根据STO，计算SK = EMA(STO,5)
@@ -3535,8 +3756,6 @@ class CtaLineBar(object):
             return
         sk = ta.EMA(np.array(self.line_skd_sto, dtype=float), 5)[-1]
         sk = round(sk, self.round_n)
-        if len(self.line_sk) > self.max_hold_bars:
-            del self.line_sk[0]
         self.line_sk.append(sk)
 
         if len(self.line_sk) < 3:
@@ -3544,8 +3763,6 @@ class CtaLineBar(object):
 
         sd = ta.EMA(np.array(self.line_sk, dtype=float), 3)[-1]
         sd = round(sd, self.round_n)
-        if len(self.line_sd) > self.max_hold_bars:
-            del self.line_sd[0]
         self.line_sd.append(sd)
 
         if len(self.line_sd) < 2:
@@ -3750,23 +3967,22 @@ class CtaLineBar(object):
         if len(self.line_bar) < data_len:
             return
 
-        # 收盘价 = 结算bar + 最后一个未结束得close
-        close_array = np.append(self.close_array[-data_len:], [self.line_bar[-1].close_price])
-
-        # 计算最后得动态RSI值
-        last_rsi = ta.RSI(close_array[-2 * self.para_skd_fast_len:], self.para_skd_fast_len)[-1]
-
         # 所有RSI值长度不足计算标准
         if len(self.line_skd_rsi) < self.para_skd_slow_len:
             return
 
-        # 拼接RSI list
-        rsi_list = self.line_skd_rsi[1 - self.para_skd_slow_len:]
-        rsi_list.append(last_rsi)
+        base = self.get_rt_base(('skd', self.para_skd_fast_len, self.para_skd_slow_len), self.__rt_skd_base)
 
-        # 获取 RSI得最高/最低值
-        rsi_HHV = max(rsi_list)
-        rsi_LLV = min(rsi_list)
+        # 计算最后得动态RSI值(收盘价 = 结算bar + 最后一个未结束得close)
+        diff = self.line_bar[-1].close_price - base['pre_close']
+        gain = (1 - base['alpha']) * base['gain'] + base['alpha'] * (diff if diff > 0 else 0.0)
+        loss = (1 - base['alpha']) * base['loss'] + base['alpha'] * (-diff if diff < 0 else 0.0)
+        total = gain + loss
+        last_rsi = 100 * gain / total if abs(total) >= 1e-14 else 0.0
+
+        # 获取 RSI得最高/最低值(前slow_len-1个RSI + 最后得动态RSI)
+        rsi_HHV = max(base['rsi_hhv'], last_rsi)
+        rsi_LLV = min(base['rsi_llv'], last_rsi)
 
         # 计算动态STO
         if rsi_HHV == rsi_LLV:
@@ -3780,19 +3996,44 @@ class CtaLineBar(object):
             self._rt_sd = self.line_sd[-1] if len(self.line_sd) > 0 else 0
             return
 
-        # 历史STO
-        sto_list = self.line_skd_sto[:]
-        sto_list.append(sto)
-
-        self._rt_sk = ta.EMA(np.array(sto_list, dtype=float), 5)[-1]
-        self._rt_sk = round(self._rt_sk, self.round_n)
-        sk_list = self.line_sk[:]
-        sk_list.append(self._rt_sk)
-        if len(sk_list) < 5:
+        # 历史STO + 动态STO 的EMA
+        pre_sto, k = base['sto_ema']
+        self._rt_sk = round(pre_sto + (sto - pre_sto) * k, self.round_n)
+        if len(self.line_sk) + 1 < 5:
             self._rt_sd = self.line_sd[-1] if len(self.line_sd) > 0 else 0
         else:
-            self._rt_sd = ta.EMA(np.array(sk_list, dtype=float), 3)[-1]
-            self._rt_sd = round(self._rt_sd, self.round_n)
+            # 历史SK + 动态SK 的EMA
+            pre_sk, k = base['sk_ema']
+            self._rt_sd = round(pre_sk + (self._rt_sk - pre_sk) * k, self.round_n)
+
+    def __rt_skd_base(self):
+        """
+        实时SK/SD的基础数据(只依赖已完成的bar)
+        RSI为Wilder平滑：已完成bar的平均涨幅/跌幅，加上最新价的涨跌即得到动态RSI
+        """
+        fast_len = self.para_skd_fast_len
+        alpha = 1 / fast_len
+
+        # ta.RSI(2*fast_len个收盘价)：前fast_len个涨跌幅的均值为种子，再做Wilder平滑；这里先算到倒数第二个涨跌幅
+        diffs = np.diff(self.close_array[1 - 2 * fast_len:])
+        gain = EmaKernel(fast_len, window=len(diffs), alpha=alpha)
+        loss = EmaKernel(fast_len, window=len(diffs), alpha=alpha)
+        for diff in diffs.tolist():
+            gain.update(diff if diff > 0 else 0.0)
+            loss.update(-diff if diff < 0 else 0.0)
+
+        rsi_list = self.line_skd_rsi[1 - self.para_skd_slow_len:]
+        return {
+            'alpha': alpha,
+            'pre_close': self.close_series[-1],
+            'gain': gain.value,
+            'loss': loss.value,
+            'rsi_hhv': max(rsi_list) if len(rsi_list) > 0 else -np.inf,
+            'rsi_llv': min(rsi_list) if len(rsi_list) > 0 else np.inf,
+            # 历史STO/SK的EMA递推状态，不足EMA周期时以SMA为种子
+            'sto_ema': ema_last_state(self.line_skd_sto, 5),
+            'sk_ema': ema_last_state(self.line_sk, 3)
+        }
 
     def is_skd_has_risk(self, direction, dist=15, runtime=False):
         """
@@ -3850,7 +4091,7 @@ class CtaLineBar(object):
             if self.rt_count_skd not in self.rt_funcs:
                 self.write_log(u'rt_count_skd(),添加rt_countSkd到实时函数中')
                 self.rt_funcs.add(self.rt_count_skd)
-                self.rt_count_sk_sd()
+            self.run_rt_func(self.rt_count_sk_sd)
             if self._rt_sk is None or self._rt_sd is None:
                 return False
 
@@ -3893,7 +4134,7 @@ class CtaLineBar(object):
             if self.rt_count_skd not in self.rt_funcs:
                 self.write_log(u'skd_is_low_golden_cross添加rt_countSkd到实时函数中')
                 self.rt_funcs.add(self.rt_count_skd)
-                self.rt_count_sk_sd()
+            self.run_rt_func(self.rt_count_sk_sd)
 
             if self._rt_sk is None or self._rt_sd is None:
                 return False
@@ -3927,7 +4168,7 @@ class CtaLineBar(object):
         """
         if self.para_active_skd:
             # 计算实时指标 rt_SK, rt_SD
-            self.rt_count_sk_sd()
+            self.run_rt_func(self.rt_count_sk_sd)
 
             # 计算 实时金叉/死叉
             self.is_skd_high_dead_cross(runtime=True, high_skd=0)
@@ -3975,9 +4216,6 @@ class CtaLineBar(object):
         bar_mid3_ema10 = ta.EMA(self.mid3_array[-ema_len * 4:], ema_len)[-1]
         bar_mid3_ema10 = round(float(bar_mid3_ema10), self.round_n)
 
-        if len(self.line_yb) > self.max_hold_bars:
-            del self.line_yb[0]
-
         self.line_yb.append(bar_mid3_ema10)
 
         if len(self.line_yb) < self.para_yb_ref + 1:
@@ -4008,7 +4246,9 @@ class CtaLineBar(object):
             return
         # 3、获取前InputN周期(包含当前周期）的K线
         last_bar_mid3 = (self.line_bar[-1].close_price + self.line_bar[-1].high_price + self.line_bar[-1].low_price) / 3
-        bar_mid3_ema10 = ta.EMA(np.append(self.mid3_array[-ema_len * 3:], [last_bar_mid3]), ema_len)[-1]
+        # 已完成bar的EMA每根bar只计算一次，每个tick只需叠加最新的mid3
+        pre_ema, k = self.get_rt_base(('yb', ema_len), lambda: ema_last_state(self.mid3_array[-ema_len * 3:], ema_len))
+        bar_mid3_ema10 = pre_ema + (last_bar_mid3 - pre_ema) * k
         self._rt_yb = round(float(bar_mid3_ema10), self.round_n)
 
     @property
@@ -4029,8 +4269,7 @@ class CtaLineBar(object):
             return
         bar_len = min(self.para_golden_n, self.bar_len)
 
-        hhv = max(self.high_array[-bar_len:])
-        llv = min(self.low_array[-bar_len:])
+        hhv, llv = self.__count_window_hhv_llv(bar_len, self.para_golden_n)
 
         if np.isnan(hhv) or np.isnan(llv):
             return
@@ -4123,8 +4362,6 @@ class CtaLineBar(object):
                 m = np.mean(self.close_array[-BiasLen:])
                 bias = (self.close_array[-1] - m) / m * 100
                 self.line_bias.append(bias)  # 中轨
-                if len(self.line_bias) > self.max_hold_bars:
-                    del self.line_bias[0]
 
                 self.cur_bias = bias
 
@@ -4138,8 +4375,6 @@ class CtaLineBar(object):
                 m = np.mean(self.close_array[-Bias2Len:])
                 bias2 = (self.close_array[-1] - m) / m * 100
                 self.line_bias2.append(bias2)  # 中轨
-                if len(self.line_bias2) > self.max_hold_bars:
-                    del self.line_bias2[0]
                 self.cur_bias2 = bias2
 
         if self.para_bias3_len > 0:
@@ -4152,45 +4387,32 @@ class CtaLineBar(object):
                 m = np.mean(self.close_array[-Bias3Len:])
                 bias3 = (self.close_array[-1] - m) / m * 100
                 self.line_bias3.append(bias3)  # 中轨
-                if len(self.line_bias3) > self.max_hold_bars:
-                    del self.line_bias3[0]
 
                 self.cur_bias3 = bias3
 
     def rt_count_bias(self):
-        """实时计算乖离率"""
+        """
+        实时计算乖离率
+        已完成bar的收盘价之和每根bar只计算一次，每个tick只需加上最新价
+        """
         if not (self.para_bias_len > 0 or self.para_bias2_len or self.para_bias3_len > 0):  # 不计算
             return
 
-        if self.para_bias_len > 0:
-            if self.bar_len < min(6, self.para_bias_len) + 1:
-                return
-            else:
-                biasLen = min(self.bar_len, self.para_bias_len) - 1
-
-                # 计算BIAS
-                m = np.mean(np.append(self.close_array[-biasLen:], [self.cur_price]))
-                self._rt_bias = (self.cur_price - m) / m * 100
-
-        if self.para_bias2_len > 0:
-            if self.bar_len < min(6, self.para_bias2_len) + 1:
+        for name, para_len in [('_rt_bias', self.para_bias_len),
+                               ('_rt_bias2', self.para_bias2_len),
+                               ('_rt_bias3', self.para_bias3_len)]:
+            if para_len <= 0:
+                continue
+            if self.bar_len < min(6, para_len) + 1:
                 return
-            else:
-                biasLen = min(self.bar_len, self.para_bias2_len) - 1
 
-                # 计算BIAS
-                m = np.mean(np.append(self.close_array[-biasLen:], [self.cur_price]))
-                self._rt_bias2 = (self.cur_price - m) / m * 100
-
-        if self.para_bias3_len > 0:
-            if self.bar_len < min(6, self.para_bias3_len) + 1:
-                return
-            else:
-                biasLen = min(self.bar_len, self.para_bias3_len) - 1
+            bias_len = min(self.bar_len, para_len) - 1
+            total = self.get_rt_base(('bias', bias_len),
+                                     lambda: math.fsum(self.close_series[-bias_len:]) if bias_len > 0 else 0.0)
 
             # 计算BIAS
-            m = np.mean(np.append(self.close_array[-biasLen:], [self.cur_price]))
-            self._rt_bias3 = (self.cur_price - m) / m * 100
+            m = (total + self.cur_price) / (bias_len + 1)
+            setattr(self, name, (self.cur_price - m) / m * 100)
 
     @property
     def rt_bias(self):
@@ -4216,6 +4438,18 @@ class CtaLineBar(object):
     def __ema(self, data, span):
         return pd.Series(data=data).ewm(span=span, adjust=False).mean().values
 
+    def __ema_last(self, data, *spans):
+        """
+        依次按spans做__ema后的最后一个值
+        没有nan/inf时直接用预先求出的权重做一次点积，不再每次构造pandas序列
+        """
+        data = np.asarray(data, dtype=float)
+        if len(data) > 0 and np.isfinite(data).all():
+            return float(ema_weights(len(data), spans) @ data)
+        for span in spans:
+            data = self.__ema(data, span)
+        return data[-1]
+
     def __iema(self, this_value, prev_value, span):
         return (2 * prev_value + (span - 1) * this_value) / (span + 1)
 
@@ -4250,13 +4484,9 @@ class CtaLineBar(object):
         # 修改完毕
 
         # 快线/慢线最后记录，追加到line_bd_fast/ list_bd_slow中
-        if len(self.line_bd_fast) > self.max_hold_bars:
-            self.line_bd_fast.pop(0)
         if not np.isnan(fast_array[-1]):
             self.line_bd_fast.append(fast_array[-1])
 
-        if len(self.line_bd_slow) > self.max_hold_bars:
-            self.line_bd_slow.pop(0)
         if not np.isnan(slow_array[-1]):
             self.line_bd_slow.append(slow_array[-1])
 
@@ -4268,30 +4498,78 @@ class CtaLineBar(object):
                 self.cur_bd_count = min(-1, self.cur_bd_count - 1)
 
     def rt_count_bd(self):
-        """实时计算波段指标"""
+        """
+        实时计算波段指标
+        已完成bar的ewm递推状态、标准差窗口每根bar只计算一次，每个tick只需递推一步
+        """
         if self.para_bd_len <= 0:
             # 不计算
             return
 
-        var2 = self.close_array[self.close_array>0]
-        if len(var2) < (5 * self.para_bd_len):
+        base = self.get_rt_base(('bd', self.para_bd_len), self.__rt_bd_base)
+        if base['count'] < (5 * self.para_bd_len):
             return
         bar_mid4 = (self.line_bar[-1].close_price * 2 + self.line_bar[-1].high_price + self.line_bar[-1].low_price)/4
         bar_mid4 = round(bar_mid4, self.round_n)
 
-        mid4_array = np.append(self.mid4_array, [bar_mid4])
-        mid4_ema_array = self.__ema(mid4_array, self.para_bd_len)
+        if base['states'] is None:
+            # 递推状态无效(存在nan/inf)，按完整数据计算
+            mid4_array = np.append(self.mid4_array, [bar_mid4])
+            mid4_ema_array = self.__ema(mid4_array, self.para_bd_len)
 
-        mid4_std = self.__std(mid4_array, self.para_bd_len)
+            mid4_std = self.__std(mid4_array, self.para_bd_len)
 
-        mid4_ema_diff_array = mid4_array - mid4_ema_array
-        var5_array = (mid4_ema_diff_array / mid4_std * 100 + 200) / 4
-        var6_array = (self.__ema(var5_array, 5) - 25) * 1.56
-        fast_array = self.__ema(var6_array, 2) * 1.22
-        slow_array = self.__ema(fast_array, 2)
+            mid4_ema_diff_array = mid4_array - mid4_ema_array
+            var5_array = (mid4_ema_diff_array / mid4_std * 100 + 200) / 4
+            var6_array = (self.__ema(var5_array, 5) - 25) * 1.56
+            fast_array = self.__ema(var6_array, 2) * 1.22
+            slow_array = self.__ema(fast_array, 2)
 
-        self._bd_fast = fast_array[-1]
-        self._bd_slow = slow_array[-1]
+            self._bd_fast = fast_array[-1]
+            self._bd_slow = slow_array[-1]
+            return
+
+        pre_mid4_ema, pre_var5_ema, pre_var6_ema, pre_slow = base['states']
+        alpha = 2 / (self.para_bd_len + 1)
+        mid4_ema = (1 - alpha) * pre_mid4_ema + alpha * bar_mid4
+
+        # 最近bd_len-1个mid4(相对ref的偏移)加上最新mid4的样本标准差
+        diff = bar_mid4 - base['ref']
+        mean = (base['sum'] + diff) / self.para_bd_len
+        var = (base['sum_sq'] + diff * diff - self.para_bd_len * mean * mean) / (self.para_bd_len - 1)
+        mid4_std = np.sqrt(np.float64(max(var, 0.0)))
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var5 = ((bar_mid4 - mid4_ema) / mid4_std * 100 + 200) / 4
+        var6 = (1 - 2 / 6) * pre_var5_ema + 2 / 6 * var5
+        var6 = (var6 - 25) * 1.56
+        fast = ((1 - 2 / 3) * pre_var6_ema + 2 / 3 * var6) * 1.22
+        self._bd_fast = fast
+        self._bd_slow = (1 - 2 / 3) * pre_slow + 2 / 3 * fast
+
+    def __rt_bd_base(self):
+        """实时波段指标的基础数据：已完成bar上各ewm的最后状态，最近bd_len-1个mid4的和/平方和"""
+        bd_len = self.para_bd_len
+        mid4_array = self.mid4_array
+        base = {'count': int((self.close_array > 0).sum()), 'states': None}
+        if bd_len < 2 or len(mid4_array) < bd_len:
+            return base
+
+        mid4_ema_array = self.__ema(mid4_array, bd_len)
+        var5_array = ((mid4_array - mid4_ema_array) / self.__std(mid4_array, bd_len) * 100 + 200) / 4
+        var5_ema_array = self.__ema(var5_array, 5)
+        var6_ema_array = self.__ema((var5_ema_array - 25) * 1.56, 2)
+        slow_array = self.__ema(var6_ema_array * 1.22, 2)
+        states = (mid4_ema_array[-1], var5_ema_array[-1], var6_ema_array[-1], slow_array[-1])
+        # ewm在nan之后不是简单的一步递推
+        if not np.isfinite(states + (mid4_array[-1], var5_array[-1])).all():
+            return base
+
+        # 相对最后一个mid4的偏移，减少平方和的舍入误差
+        ref = mid4_array[-1]
+        diffs = mid4_array[1 - bd_len:] - ref
+        base.update({'states': states, 'ref': ref, 'sum': math.fsum(diffs), 'sum_sq': math.fsum(diffs * diffs)})
+        return base
 
     @property
     def rt_bd_fast(self):
@@ -4330,15 +4608,10 @@ class CtaLineBar(object):
         K = self.__ema(RSV, MM)
         D = pd.Series(data=K).rolling(window=MM).mean().values
 
-
-        if len(self.line_skdj_k) > self.max_hold_bars:
-            self.line_skdj_k.pop(0)
         if not np.isnan(K[-1]):
             self.line_skdj_k.append(K[-1])
             self.cur_skdj_k = K[-1]
 
-        if len(self.line_skdj_d) > self.max_hold_bars:
-            self.line_skdj_d.pop(0)
         if not np.isnan(D[-1]):
             self.line_skdj_d.append(D[-1])
             self.cur_skdj_d = D[-1]
@@ -4871,12 +5144,11 @@ class CtaMinuteBar(CtaLineBar):
 
     def __setstate__(self, state):
         """Pickle load()"""
-        self.__dict__.update(state)
+        super().__setstate__(state)
 
     def restore(self, state):
         """从Pickle中恢复数据"""
-        for key in state.__dict__.keys():
-            self.__dict__[key] = state.__dict__[key]
+        super().restore(state)
 
     def init_properties(self):
         """
@@ -4983,9 +5255,6 @@ class CtaMinuteBar(CtaLineBar):
             lastBar.volume = lastBar.volume + bar.volume
             lastBar.open_interest = bar.open_interest
 
-            # 实时计算
-            self.rt_executed = False
-
     def generate_bar(self, tick):
         """
         生成 line Bar
@@ -5100,9 +5369,6 @@ class CtaMinuteBar(CtaLineBar):
             else:
                 lastBar.color = Color.EQUAL
 
-            # 实时计算
-            self.rt_executed = False
-
 
 class CtaHourBar(CtaLineBar):
     """
@@ -5127,12 +5393,11 @@ class CtaHourBar(CtaLineBar):
 
     def __setstate__(self, state):
         """Pickle load()"""
-        self.__dict__.update(state)
+        super().__setstate__(state)
 
     def restore(self, state):
         """从Pickle中恢复数据"""
-        for key in state.__dict__.keys():
-            self.__dict__[key] = state.__dict__[key]
+        super().restore(state)
 
     def init_properties(self):
         """
@@ -5217,9 +5482,6 @@ class CtaHourBar(CtaLineBar):
 
             self.m1_bars_count += bar_freq
 
-            # 实时计算
-            self.rt_executed = False
-
     def generate_bar(self, tick):
         """
         生成 line Bar
@@ -5335,9 +5597,6 @@ class CtaHourBar(CtaLineBar):
             else:
                 lastBar.color = Color.EQUAL
 
-            # 实时计算
-            self.rt_executed = False
-
         if not endtick:
             self.lastTick = tick
 
@@ -5364,12 +5623,11 @@ class CtaDayBar(CtaLineBar):
 
     def __setstate__(self, state):
         """Pickle load()"""
-        self.__dict__.update(state)
+        super().__setstate__(state)
 
     def restore(self, state):
         """从Pickle中恢复数据"""
-        for key in state.__dict__.keys():
-            self.__dict__[key] = state.__dict__[key]
+        super().restore(state)
 
     def init_properties(self):
         """
@@ -5441,9 +5699,6 @@ class CtaDayBar(CtaLineBar):
             lastBar.volume = lastBar.volume + bar.volume
             lastBar.open_interest = bar.open_interest
 
-            # 实时计算
-            self.rt_executed = False
-
     def generate_bar(self, tick):
         """
         生成 line Bar
@@ -5500,9 +5755,6 @@ class CtaDayBar(CtaLineBar):
             else:
                 lastBar.color = Color.EQUAL
 
-            # 实时计算
-            self.rt_executed = False
-
         self.lastTick = tick
 
 
@@ -5564,12 +5816,11 @@ class CtaWeekBar(CtaLineBar):
 
     def __setstate__(self, state):
         """Pickle load()"""
-        self.__dict__.update(state)
+        super().__setstate__(state)
 
     def restore(self, state):
         """从Pickle中恢复数据"""
-        for key in state.__dict__.keys():
-            self.__dict__[key] = state.__dict__[key]
+        super().restore(state)
 
     def init_properties(self):
         """
@@ -5646,9 +5897,6 @@ class CtaWeekBar(CtaLineBar):
 
             lastBar.open_interest = bar.open_interest
 
-            # 实时计算
-            self.rt_executed = False
-
     def get_bar_start_dt(self, cur_dt):
         """获取当前时间计算的周线Bar开始时间"""
 
@@ -5729,7 +5977,4 @@ class CtaWeekBar(CtaLineBar):
             else:
                 lastBar.color = Color.EQUAL
 
-            # 实时计算
-            self.rt_executed = False
-
         self.last_tick = tick
@@ -17,6 +17,8 @@ from pykalman import KalmanFilter
 from vnpy.trader.object import RenkoBarData
 from vnpy.trader.utility import round_to
 from vnpy.trader.constant import Direction, Color
+from vnpy.component.cta_indicator import IndicatorStage, compile_indicator_stages
+from vnpy.component.cta_kernel import cci_rt_base, cci_rt_value, ema_last_state
 from vnpy.component.cta_period import CtaPeriod, Period
 
 
@@ -30,6 +32,30 @@ class CtaRenkoBar(object):
     # 参数列表，保存了参数的名称
     param_list = ['symbol']
 
+    # 指标计算阶段登记表(按执行顺序)，对应 __count_{name}，未启用的指标不参与on_bar计算
+    indicator_stages = [
+        IndicatorStage('pre_high_low', lambda k: k.para_pre_len > 0),
+        IndicatorStage('ma', lambda k: k.para_ma1_len > 0 or k.para_ma2_len > 0 or k.para_ma3_len > 0),
+        IndicatorStage('ema', lambda k: k.para_ema1_len > 0 or k.para_ema2_len > 0 or k.para_ema3_len > 0),
+        IndicatorStage('atr', lambda k: max(k.para_atr1_len, k.para_atr2_len, k.para_atr3_len) > 0),
+        IndicatorStage('rsi', lambda k: k.para_rsi1_len > 0 or k.para_rsi2_len > 0),
+        IndicatorStage('ama', lambda k: k.para_ama_len > 0),
+        IndicatorStage('dmi', lambda k: k.para_dmi_len > 0),
+        IndicatorStage('cmi', lambda k: k.para_cmi_len > 0),
+        IndicatorStage('kdj', lambda k: k.para_kdj_len > 0),
+        IndicatorStage('kdj_tb', lambda k: k.para_kdj_tb_len > 0),
+        IndicatorStage('boll', lambda k: k.para_boll_len > 0 or k.para_boll2_len > 0),
+        IndicatorStage('macd', lambda k: (k.para_macd_fast_len > 0 and k.para_macd_slow_len > 0
+                                          and k.para_macd_signal_len > 0)),
+        IndicatorStage('cci', lambda k: k.para_cci_len > 0),
+        IndicatorStage('kf', lambda k: k.para_active_kf),
+        IndicatorStage('skd', lambda k: k.para_active_skd),
+        IndicatorStage('yb', lambda k: k.para_active_yb),
+        IndicatorStage('golden_section', lambda k: k.para_golden_n >= 2),
+        # 周期：使用ma2、rsi1，须在其后计算
+        IndicatorStage('period', lambda k: k.para_active_period, depends=('ma', 'rsi'), with_bar=True),
+    ]
+
     def __init__(self, strategy, cb_on_bar, setting=None):
 
         self.cb_on_bar = cb_on_bar
@@ -249,6 +275,8 @@ class CtaRenkoBar(object):
 
         self.para_boll2_len = 0  # K线周期
         self.inputBoll2StdRate = 2  # 两倍标准差
+        self.inputBollTBLen = 0  # 实时布林使用的TB计算方式长度(0：使用ta.BBANDS)
+        self.inputBoll2TBLen = 0
         self.line_boll2_upper = []  # 上轨
         self.line_boll2_middle = []  # 中线
         self.line_boll2_lower = []  # 下轨
@@ -400,6 +428,11 @@ class CtaRenkoBar(object):
 
         # 启动实时得函数
         self.rt_funcs = set()
+        self.rt_bases = {}  # key: 实时指标基础数据的键值, value: (bar序号, 基础数据)，每根bar只计算一次
+        self.bar_num = 0  # 已完成的bar数量
+
+        # 指标流水线 [(计算函数, 是否传入bar)]，首次on_bar时根据参数编译
+        self.indicator_pipeline = None
 
         # 当前时间
         self.cur_datetime = None
@@ -425,16 +458,23 @@ class CtaRenkoBar(object):
         state.pop('strategy', None)
         state.pop('cb_on_bar', None)
         state.pop('cb_dict', None)
+        state.pop('indicator_pipeline', None)
         return state
 
     def __setstate__(self, state):
         """Pickle load()"""
         self.__dict__.update(state)
+        self.__dict__.setdefault('bar_num', 0)
+        self.rt_bases = {}
+        self.indicator_pipeline = None
 
     def restore(self, state):
         """从Pickle中恢复数据"""
         for key in state.__dict__.keys():
             self.__dict__[key] = state.__dict__[key]
+        self.__dict__.setdefault('bar_num', 0)
+        self.rt_bases = {}
+        self.indicator_pipeline = None
 
     def setParam(self, setting):
         """设置参数"""
@@ -443,6 +483,23 @@ class CtaRenkoBar(object):
             if key in setting:
                 d[key] = setting[key]
 
+        # 参数变化后，重新编译指标流水线
+        self.invalidate_pipeline()
+
+    def invalidate_pipeline(self):
+        """指标流水线失效，下次on_bar时重新编译；直接修改指标参数(para_xxx)后调用"""
+        self.indicator_pipeline = None
+
+    def compile_indicators(self):
+        """
+        根据指标参数，编译出需要计算的指标流水线
+        运行中修改了指标参数(para_xxx)时，需要重新调用
+        """
+        stages = compile_indicator_stages(self, self.indicator_stages)
+        self.indicator_pipeline = [(getattr(self, f'_CtaRenkoBar__count_{stage.name}'), stage.with_bar)
+                                   for stage in stages]
+        self.write_log(u'{}启用指标:{}'.format(self.name, ','.join([stage.name for stage in stages])))
+
     def register_call_back(self, event_type, cb_func):
         """注册事件回调函数"""
         self.cb_dict.update({event_type: cb_func})
@@ -591,7 +648,7 @@ class CtaRenkoBar(object):
                 return
 
         # 更新最后价格
-        self.cur_price = bar.close
+        self.cur_price = bar.close_price
         self.cur_datetime = bar.datetime
 
         # 计算相关数据
@@ -671,31 +728,20 @@ class CtaRenkoBar(object):
 
         # 添加bar=>lineBar
         self.line_bar.append(bar)
+        self.bar_num += 1
 
         bar_close_time = bar.datetime + timedelta(seconds=bar.seconds)
         if self.cur_datetime is None or self.cur_datetime < bar_close_time:
             self.cur_datetime = bar_close_time
 
-        self.__count_pre_high_low()
-        self.__count_ma()
-        self.__count_ema()
-        self.__count_atr()
-        self.__count_rsi()
-        self.__count_ama()
-
-        self.__count_dmi()
-        self.__count_cmi()
-        self.__count_kdj()
-        self.__count_kdj_tb()
-        self.__count_boll()
-        self.__count_macd()
-        self.__count_cci()
-        self.__count_kf()
-        self.__count_skd()
-        self.__count_yb()
-        self.__count_golden_section()
-
-        self.__count_period(bar)
+        # 按编译好的指标流水线，计算已启用的指标
+        if self.indicator_pipeline is None:
+            self.compile_indicators()
+        for func, with_bar in self.indicator_pipeline:
+            if with_bar:
+                func(bar)
+            else:
+                func()
 
         self.export_to_csv(bar)
 
@@ -719,6 +765,19 @@ class CtaRenkoBar(object):
             self.write_log(u'修改:{}砖块高度:{}=>{}'.format(self.name, self.height, height))
             self.height = height
 
+    def get_rt_base(self, key: tuple, func):
+        """
+        获取实时指标的基础数据
+        基础数据只依赖已完成的bar，每根bar只计算一次；实时计算只需在基础数据上叠加当前bar
+        :param key: 基础数据的键值(指标名称+参数)
+        :param func: 计算基础数据的函数
+        """
+        base = self.rt_bases.get(key)
+        if base is None or base[0] != self.bar_num:
+            base = (self.bar_num, func())
+            self.rt_bases[key] = base
+        return base[1]
+
     def runtime_recount(self):
         """
         根据实时计算得要求，执行实时指标计算
@@ -1443,7 +1502,7 @@ class CtaRenkoBar(object):
         if self.para_ma1_len > 0:
             count_len = min(self.bar_len, self.para_ma1_len)
             if count_len > 0:
-                close_ma_array = ta.MA(np.append(self.close_array[-count_len:], [self.line_bar[-1].close]), count_len)
+                close_ma_array = ta.MA(np.append(self.close_array[-count_len:], [self.line_bar[-1].close_price]), count_len)
                 self._rt_ma1 = round(float(close_ma_array[-1]), self.round_n)
 
                 # 计算斜率
@@ -1454,7 +1513,7 @@ class CtaRenkoBar(object):
         if self.para_ma2_len > 0:
             count_len = min(self.bar_len, self.para_ma2_len)
             if count_len > 0:
-                close_ma_array = ta.MA(np.append(self.close_array[-count_len:], [self.line_bar[-1].close]), count_len)
+                close_ma_array = ta.MA(np.append(self.close_array[-count_len:], [self.line_bar[-1].close_price]), count_len)
                 self._rt_ma2 = round(float(close_ma_array[-1]), self.round_n)
 
                 # 计算斜率
@@ -1465,7 +1524,7 @@ class CtaRenkoBar(object):
         if self.para_ma3_len > 0:
             count_len = min(self.bar_len, self.para_ma3_len)
             if count_len > 0:
-                close_ma_array = ta.MA(np.append(self.close_array[-count_len:], [self.line_bar[-1].close]), count_len)
+                close_ma_array = ta.MA(np.append(self.close_array[-count_len:], [self.line_bar[-1].close_price]), count_len)
                 self._rt_ma3 = round(float(close_ma_array[-1]), self.round_n)
 
                 # 计算斜率
@@ -1939,8 +1998,8 @@ class CtaRenkoBar(object):
                 self._rt_lower = round(lower_list[-1], self.round_n)
             else:
                 # 1标准差
-                std = np.std(np.append(self.close_array[-self.para_boll_len:], [self.line_bar[-1].close]), ddof=1)
-                middle = np.mean(np.append(self.close_array[-self.para_boll_len:], [self.line_bar[-1].close]))
+                std = np.std(np.append(self.close_array[-self.para_boll_len:], [self.line_bar[-1].close_price]), ddof=1)
+                middle = np.mean(np.append(self.close_array[-self.para_boll_len:], [self.line_bar[-1].close_price]))
                 self._rt_middle = round(middle, self.round_n)
                 self._rt_upper = round(middle + self.para_boll_std_rate * std, self.round_n)
                 self._rt_lower = round(middle - self.para_boll_std_rate * std, self.round_n)
@@ -1973,8 +2032,8 @@ class CtaRenkoBar(object):
                 self._rt_lower2 = round(lower_list[-1], self.round_n)
             else:
                 # 1标准差
-                std = np.std(np.append(self.close_array[-self.para_boll2_len:], [self.line_bar[-1].close]), ddof=1)
-                middle = np.mean(np.append(self.close_array[-self.para_boll2_len:], [self.line_bar[-1].close]))
+                std = np.std(np.append(self.close_array[-self.para_boll2_len:], [self.line_bar[-1].close_price]), ddof=1)
+                middle = np.mean(np.append(self.close_array[-self.para_boll2_len:], [self.line_bar[-1].close_price]))
                 self._rt_middle2 = round(middle, self.round_n)
                 self._rt_upper2 = round(middle + self.para_boll_std_rate * std, self.round_n)
                 self._rt_lower2 = round(middle - self.para_boll_std_rate * std, self.round_n)
@@ -2321,7 +2380,7 @@ class CtaRenkoBar(object):
                 # 发生金叉
                 self.cur_kd_count = 1
                 self.cur_kd_cross = round((self.line_k[-1] + self.line_k[-2]) / 2, 2)
-                self.cur_kd_cross_price = self.line_bar[-1].close
+                self.cur_kd_cross_price = self.line_bar[-1].close_price
 
         # K值小于D值
         else:
@@ -2332,7 +2391,7 @@ class CtaRenkoBar(object):
                 # 发生死叉
                 self.cur_kd_count = -1
                 self.cur_kd_cross = round((self.line_k[-1] + self.line_k[-2]) / 2, 2)
-                self.cur_kd_cross_price = self.line_bar[-1].close
+                self.cur_kd_cross_price = self.line_bar[-1].close_price
 
     def __count_macd(self):
         """
@@ -2668,11 +2727,12 @@ class CtaRenkoBar(object):
                            format(len(self.line_bar), self.para_cci_len + 2))
             return
 
-        self._rt_cci = ta.CCI(high=np.append(self.high_array[-2 * self.para_cci_len:], [self.cur_bar.high_price]),
-                              low=np.append(self.low_array[-2 * self.para_cci_len:], [self.cur_bar.low_price]),
-                              close=np.append(self.close_array[-2 * self.para_cci_len:],
-                                              [self.cur_bar.close_price]),
-                              timeperiod=self.para_cci_len)[-1]
+        base = self.get_rt_base(('cci', self.para_cci_len),
+                                lambda: cci_rt_base(self.high_array, self.low_array, self.close_array, self.para_cci_len))
+        cur_tp = (self.cur_bar.high_price + self.cur_bar.low_price + self.cur_bar.close_price) / 3
+        rt_cci = cci_rt_value(base, cur_tp)
+        # 与ta.CCI一致，平均偏差为0时为0
+        self._rt_cci = rt_cci if np.isfinite(rt_cci) else 0.0
 
     @property
     def rt_cci(self):
@@ -2698,6 +2758,7 @@ class CtaRenkoBar(object):
             except Exception:
                 self.write_log(u'导入卡尔曼过滤器失败,需先安装 pip install pykalman')
                 self.para_active_kf = False
+                self.invalidate_pipeline()
 
             state_means, state_covariances = self.kf.filter(np.array(self.close_array, dtype=float))
             m = state_means[-1].item()
@@ -3214,7 +3275,9 @@ class CtaRenkoBar(object):
 
         last_bar_mid3 = (self.cur_bar.close_price + self.cur_bar.high_price + self.cur_bar.low_price) / 3
 
-        bar_mid3_ema10 = ta.EMA(np.append(self.mid3_array[-ema_len * 3:], [last_bar_mid3]), ema_len)[-1]
+        # 已完成bar的EMA每根bar只计算一次，实时计算只需叠加当前bar的mid3
+        pre_ema, k = self.get_rt_base(('yb', ema_len), lambda: ema_last_state(self.mid3_array[-ema_len * 3:], ema_len))
+        bar_mid3_ema10 = pre_ema + (last_bar_mid3 - pre_ema) * k
         self._rt_yb = round(float(bar_mid3_ema10), self.round_n)
 
     @property
@@ -0,0 +1,153 @@
+# encoding: UTF-8
+
+# K线数据/指标序列的环形缓冲存储
+
+import numpy as np
+
+
+class CtaSeries(object):
+    """
+    环形缓冲的数值序列，用于K线的开高低收序列，以及各个 line_xxx 指标序列
+    1、预分配 2 * max_len 的numpy数组，每个数值同时写入 i 和 i + max_len 两个位置，
+       最近 max_len 个数值始终是一段连续内存，values 返回其视图，可直接传给talib计算，无需拷贝
+    2、append() 为O(1)，超过max_len时自动丢弃最前面的数据，不再需要 del list[0] 的平移操作
+    3、提供与list一致的常用接口( len, [i], [a:b], append, pop(0), del [0], 迭代)，兼容原有代码
+    """
+
+    def __init__(self, max_len: int, data=None, fill: float = None):
+        """
+        :param max_len: 序列最大长度
+        :param data: 初始数据
+        :param fill: 非None时，用该值预填满整个序列(例如 np.nan，与原来 np.zeros + nan 的数组一致)
+        """
+        self.max_len = max(int(max_len), 1)
+        self._buf = np.full(2 * self.max_len, np.nan)
+        self._head = 0  # 下一个写入的位置, [0, max_len)
+        self._len = 0  # 当前有效数据的长度
+
+        if fill is not None:
+            self._buf[:] = fill
+            self._len = self.max_len
+
+        if data is not None:
+            self.extend(data)
+
+    @classmethod
+    def from_values(cls, max_len: int, values):
+        """从数组恢复序列(K线缓存加载)，一次性写入缓冲区，无需逐个append"""
+        series = cls(max_len)
+        n = series.max_len
+        values = np.asarray(values, dtype=float)[-n:]
+        series._buf[n - len(values):n] = values
+        series._buf[2 * n - len(values):] = values
+        series._len = len(values)
+        return series
+
+    @property
+    def values(self) -> np.ndarray:
+        """最近 len 个数据的连续数组视图(只读使用，修改请使用 series[i] = x )"""
+        end = self._head + self.max_len
+        return self._buf[end - self._len:end]
+
+    def append(self, value):
+        """追加数值"""
+        i = self._head
+        self._buf[i] = value
+        self._buf[i + self.max_len] = value
+        self._head = i + 1 if i + 1 < self.max_len else 0
+        if self._len < self.max_len:
+            self._len += 1
+
+    def extend(self, data):
+        """批量追加数值"""
+        data = np.asarray(data, dtype=float)
+        if len(data) > self.max_len:
+            data = data[-self.max_len:]
+        for value in data:
+            self.append(value)
+
+    def pop(self, index: int = -1):
+        """弹出数值，仅支持首/尾(O(1))"""
+        if self._len == 0:
+            raise IndexError('pop from empty CtaSeries')
+        if index == 0 or index == -self._len:
+            value = self[0]
+            self._len -= 1
+            return value
+        if index == -1 or index == self._len - 1:
+            value = self[-1]
+            self._head = self._head - 1 if self._head > 0 else self.max_len - 1
+            self._len -= 1
+            return value
+        raise IndexError('CtaSeries only support pop(0) or pop(-1)')
+
+    def clear(self):
+        """清空序列"""
+        self._head = 0
+        self._len = 0
+
+    def tolist(self) -> list:
+        return self.values.tolist()
+
+    def _pos(self, index: int) -> int:
+        """序列下标 => 缓冲区下标"""
+        n = self._len
+        if index < 0:
+            index += n
+        if index < 0 or index >= n:
+            raise IndexError('CtaSeries index out of range')
+        return self._head + self.max_len - n + index
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            # 与list一致，切片返回新的list
+            return self.values[index].tolist()
+        n = self._len
+        if index < 0:
+            index += n
+        if index < 0 or index >= n:
+            raise IndexError('CtaSeries index out of range')
+        return self._buf.item(self._head + self.max_len - n + index)
+
+    def __setitem__(self, index, value):
+        pos = self._pos(index)
+        self._buf[pos] = value
+        # 同步更新镜像位置
+        if pos >= self.max_len:
+            self._buf[pos - self.max_len] = value
+        else:
+            self._buf[pos + self.max_len] = value
+
+    def __delitem__(self, index):
+        if index == 0:
+            self.pop(0)
+            return
+        data = self.tolist()
+        del data[index]
+        self.clear()
+        self.extend(data)
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __add__(self, other):
+        return self.tolist() + list(other)
+
+    def __radd__(self, other):
+        return list(other) + self.tolist()
+
+    def __eq__(self, other):
+        if isinstance(other, (CtaSeries, list, tuple)):
+            return self.tolist() == list(other)
+        return NotImplemented
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.values
+        return self.values.astype(dtype)
+
+    def __repr__(self):
+        return f'CtaSeries({self.tolist()})'
@@ -4,8 +4,8 @@
 
 import sys
 from time import sleep
-from pymongo import MongoClient, ASCENDING
-from pymongo.errors import ConnectionFailure, AutoReconnect
+from pymongo import MongoClient, ASCENDING, UpdateOne
+from pymongo.errors import ConnectionFailure, AutoReconnect, BulkWriteError
 
 
 class MongoData(object):
@@ -249,6 +249,47 @@ class MongoData(object):
 
         return None
 
+    def db_bulk_update(self, db_name, col_name, updates, upsert=True, ordered=False):
+        """
+        批量更新数据，updates: [(filter_dict, data_dict)]，每条为一次 $set
+        :return: 成功返回True，连接断开返回False(可重试)
+        其他异常(数据问题，如 bson.errors.InvalidDocument)重试也不会成功，记录日志后抛出，由调用方处理
+        """
+        if not updates:
+            return True
+        try:
+            if self.db_client:
+                db = self.db_client[db_name]
+                collection = db[col_name]
+                requests = [UpdateOne(flt, {'$set': d}, upsert=upsert) for flt, d in updates]
+                collection.bulk_write(requests, ordered=ordered)
+                return True
+
+            else:
+                self.write_log('db bulk update fail')
+                if self.db_has_connected:
+                    self.write_log(u'重新尝试连接数据库')
+                    self.db_connect()
+
+        except BulkWriteError as ex:
+            # 部分记录写入失败(数据问题)，其他记录已写入，不再重试
+            self.write_error(u'dbBulkUpdate 部分失败:{}'.format(str(ex.details.get('writeErrors', [])[:3])))
+            return True
+        except AutoReconnect as ex:
+            self.write_error(u'数据库连接断开重连:{}'.format(str(ex)))
+            sleep(1)
+        except ConnectionFailure:
+            self.db_client = None
+            self.write_error(u'数据库连接断开')
+            if self.db_has_connected:
+                self.write_log(u'重新尝试连接数据库')
+                self.db_connect()
+        except Exception as ex:
+            self.write_error(u'dbBulkUpdate exception:{}'.format(str(ex)))
+            raise
+
+        return False
+
     def db_delete(self, db_name, col_name, flt):
         """
         向mongodb中，删除数据，flt是过滤条件
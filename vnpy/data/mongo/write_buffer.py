@@ -0,0 +1,160 @@
+# encoding: UTF-8
+
+# mongodb 写入合并缓冲
+# 替代逐条 update_one(upsert=True) 的同步写入：
+# 1、按 (db, collection, 过滤条件) 合并：刷新前同一条记录的多次更新，合并为一次 $set(后更新的字段覆盖先前的)
+# 2、按 (db, collection) 分组，一次 bulk_write 批量写入
+# 3、待写入记录数达到 batch_size，或最早的记录等待超过 flush_interval 秒时刷新
+# 4、统计 排队数量、合并次数、刷新耗时(直方图)
+# 5、写入返回False(连接断开)的记录放回缓冲，下次刷新时重试；
+#    写入抛出异常(数据问题，如 bson.errors.InvalidDocument)的批次二分拆开重写，定位并丢弃坏记录，不阻塞整个collection
+# 不依赖pymongo，写入函数由外部传入(MongoData.db_bulk_update，或测试用的替身)
+
+from time import perf_counter_ns, monotonic
+from typing import Any, Callable, Dict, List, Tuple
+
+from vnpy.event.monitor import LatencyHistogram
+
+
+def make_filter_key(flt: dict) -> tuple:
+    """过滤条件 => 可hash的键(与字段顺序无关)"""
+    items = sorted(flt.items())
+    try:
+        hash(tuple(items))
+        return tuple(items)
+    except TypeError:
+        return tuple((k, repr(v)) for k, v in items)
+
+
+class MongoWriteBuffer(object):
+    """
+    mongodb 写入合并缓冲
+    put()/flush() 需在同一个线程中调用(一般为数据库写入线程)，无需加锁
+    writer(db_name, col_name, [(filter, data)]) 批量upsert，成功返回True，连接断开返回False(稍后重试)，数据错误抛出异常
+    """
+
+    def __init__(self, writer: Callable, batch_size: int = 500, flush_interval: float = 0.5):
+        self.writer = writer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        # (db_name, col_name, filter_key): (filter, data)
+        self.pending: Dict[tuple, Tuple[dict, dict]] = {}
+        self.first_time = None  # 最早一条待写入记录的时间
+
+        self.put_count = 0  # 收到的更新次数
+        self.merge_count = 0  # 被合并的更新次数
+        self.write_count = 0  # 写入数据库的记录数
+        self.fail_count = 0  # 写入失败的批次
+        self.drop_count = 0  # 数据错误而丢弃的记录数
+        self.max_pending = 0
+        self.flush_latency = LatencyHistogram()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def put(self, db_name: str, col_name: str, flt: dict, data: dict):
+        """加入一条更新"""
+        key = (db_name, col_name, make_filter_key(flt))
+        self.put_count += 1
+
+        item = self.pending.get(key)
+        if item is None:
+            self.pending[key] = (flt, data)
+            if self.first_time is None:
+                self.first_time = monotonic()
+            if len(self.pending) > self.max_pending:
+                self.max_pending = len(self.pending)
+        else:
+            # 与逐条 $set 的结果一致：后更新的字段覆盖先前的
+            self.pending[key] = (flt, {**item[1], **data})
+            self.merge_count += 1
+
+    def is_due(self) -> bool:
+        """是否需要刷新"""
+        if not self.pending:
+            return False
+        return len(self.pending) >= self.batch_size or monotonic() - self.first_time >= self.flush_interval
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """
+        按 (db, collection) 分组批量写入
+        :return: 各批次的写入结果 [{db_name, col_name, count, ms, success, dropped, error}]
+        """
+        if not self.pending:
+            return []
+
+        groups: Dict[tuple, list] = {}
+        for (db_name, col_name, _), (flt, data) in self.pending.items():
+            groups.setdefault((db_name, col_name), []).append((flt, data))
+        self.pending = {}
+        self.first_time = None
+
+        results = []
+        for (db_name, col_name), items in groups.items():
+            for i in range(0, len(items), self.batch_size):
+                self.write_batch(db_name, col_name, items[i:i + self.batch_size], results)
+
+        return results
+
+    def write_batch(self, db_name: str, col_name: str, batch: list, results: list):
+        """
+        写入一个批次
+        连接断开：放回缓冲，下次刷新时重试
+        数据错误：拆成两半分别重写，直至定位到单条坏记录后丢弃
+        """
+        start = perf_counter_ns()
+        error = ''
+        try:
+            success = bool(self.writer(db_name, col_name, batch))
+        except Exception as ex:
+            success = False
+            error = '{}: {}'.format(type(ex).__name__, str(ex))
+        ns = perf_counter_ns() - start
+        self.flush_latency.record(ns)
+
+        if success:
+            self.write_count += len(batch)
+        else:
+            self.fail_count += 1
+            if not error:
+                self.restore(db_name, col_name, batch)
+        results.append({
+            'db_name': db_name,
+            'col_name': col_name,
+            'count': len(batch),
+            'ms': round(ns / 1e6, 3),
+            'success': success,
+            'dropped': len(batch) if error and len(batch) == 1 else 0,
+            'error': error
+        })
+
+        if error:
+            if len(batch) == 1:
+                self.drop_count += 1
+            else:
+                half = len(batch) // 2
+                self.write_batch(db_name, col_name, batch[:half], results)
+                self.write_batch(db_name, col_name, batch[half:], results)
+
+    def restore(self, db_name: str, col_name: str, items: list):
+        """写入失败的记录放回缓冲，期间收到的新更新覆盖失败的字段"""
+        for flt, data in items:
+            key = (db_name, col_name, make_filter_key(flt))
+            item = self.pending.get(key)
+            self.pending[key] = (flt, data) if item is None else (flt, {**data, **item[1]})
+        if self.pending and self.first_time is None:
+            self.first_time = monotonic()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """统计数据"""
+        return {
+            'pending': len(self.pending),
+            'max_pending': self.max_pending,
+            'put_count': self.put_count,
+            'merge_count': self.merge_count,
+            'write_count': self.write_count,
+            'fail_count': self.fail_count,
+            'drop_count': self.drop_count,
+            'flush': self.flush_latency.to_dict()
+        }
@@ -0,0 +1,150 @@
+# encoding: UTF-8
+
+# 股票复权K线的持久化缓存
+# 1、复权记录按除权除息日期排序，用 np.searchsorted 一次性按日期对齐到K线，
+#    除权除息日(含)之后的所有K线(日线、分钟线)使用新的复权因子
+#    (原来的 插入首日/排序/reindex/ffill 只在K线时间恰好等于 除权日 09:31:00 时切换，
+#     5分钟线、日线等没有该时间的K线会漏掉复权，或晚一天切换)
+# 2、复权后的K线保存为列式缓存文件(见vnpy.trader.tick_cache)，不压缩时memmap加载，
+#    多个回测进程共享同一份文件，无需每次回测都解析csv、重新复权
+# 3、缓存头部记录版本号和指纹(K线文件大小/修改时间 + 复权记录 + 复权类型)，
+#    某只股票新增除权除息记录、或K线文件更新后，只重算该股票
+
+import os
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from vnpy.trader.tick_cache import (
+    TICK_CACHE_SUFFIX,
+    save_tick_cache,
+    load_tick_cache,
+    read_tick_cache_header
+)
+
+# 2: 复权因子改为按日期对齐，旧版本的缓存重新生成
+ADJUST_BAR_VERSION = 2
+
+# 复权记录的时间(除权除息日的开盘后)，计算复权因子时只比较日期
+ADJUST_TIME = ' 09:31:00'
+
+NS_PER_DAY = 86400 * 10 ** 9
+
+
+def get_adjust_records(adj_list: list) -> pd.DataFrame:
+    """
+    复权记录列表(从baostock下载) => DataFrame, 以除权除息时间为索引
+    不修改原来的复权记录
+    """
+    adj_data = pd.DataFrame(adj_list)
+    adj_data["dividOperateDate"] = pd.to_datetime(adj_data["dividOperateDate"] + ADJUST_TIME,
+                                                  format="%Y-%m-%d %H:%M:%S")
+    return adj_data.set_index("dividOperateDate")
+
+
+def calc_adjust_factor(index: pd.DatetimeIndex, adj_data: pd.DataFrame, adj_type: str) -> np.ndarray:
+    """
+    计算每根K线的复权因子
+    按日期对齐：K线日期之前(含当日)最近一次除权除息记录的因子，
+    除权除息日当天的所有K线(包括00:00的日线)即使用新的因子；K线在第一条复权记录的日期之前时为nan
+    :param index: K线的时间索引
+    :param adj_data: 复权记录
+    :param adj_type: fore, 前复权(最后一个复权因子为1)， 其他，后复权(第一个复权因子为1)
+    """
+    adj_days = pd.DatetimeIndex(adj_data.index).values.astype('datetime64[ns]').view('i8') // NS_PER_DAY
+    order = np.argsort(adj_days, kind='stable')
+    adj_days = adj_days[order]
+
+    # 按日期排序后再归一
+    if adj_type == 'fore':
+        factors = adj_data["foreAdjustFactor"].to_numpy(dtype=float)[order]
+        factors = factors / factors[-1]
+    else:
+        factors = adj_data["backAdjustFactor"].to_numpy(dtype=float)[order]
+        factors = factors / factors[0]
+
+    bar_days = pd.DatetimeIndex(index).values.astype('datetime64[ns]').view('i8') // NS_PER_DAY
+    pos = np.searchsorted(adj_days, bar_days, side='right') - 1
+    return np.where(pos >= 0, factors[np.maximum(pos, 0)], np.nan)
+
+
+def adjust_bar_df(raw_data: pd.DataFrame, adj_data: pd.DataFrame, adj_type: str) -> pd.DataFrame:
+    """
+    股票数据复权转换
+    :param raw_data: 不复权数据，以datetime为索引
+    :param adj_data: 复权记录
+    :param adj_type: 复权类型
+    :return: 增加adj字段，open,high,low,close乘以复权因子，volume除以复权因子
+    """
+    adj = calc_adjust_factor(raw_data.index, adj_data, adj_type)
+    raw_data['adj'] = adj
+
+    for col in ['open', 'high', 'low', 'close']:
+        raw_data[col] = raw_data[col].to_numpy() * adj
+    raw_data['volume'] = raw_data['volume'].to_numpy() / adj
+
+    return raw_data
+
+
+class AdjustBarStore(object):
+    """
+    复权K线缓存
+    cache_folder/{vt_symbol}_{adj_type}.tkc
+    """
+
+    def __init__(self, cache_folder: str):
+        self.cache_folder = cache_folder
+
+    def get_cache_file(self, vt_symbol: str, adj_type: str) -> str:
+        """缓存文件"""
+        return os.path.join(self.cache_folder, f'{vt_symbol}_{adj_type}{TICK_CACHE_SUFFIX}')
+
+    @staticmethod
+    def get_fingerprint(bar_file: str, adj_data: pd.DataFrame, adj_type: str) -> str:
+        """K线文件 + 复权记录 + 复权类型的指纹"""
+        stat = os.stat(bar_file)
+        records = []
+        if adj_data is not None and len(adj_data) > 0:
+            records = [[str(dt), fore, back] for dt, fore, back in zip(adj_data.index,
+                                                                       adj_data["foreAdjustFactor"].tolist(),
+                                                                       adj_data["backAdjustFactor"].tolist())]
+        text = json.dumps([ADJUST_BAR_VERSION, adj_type, stat.st_size, stat.st_mtime_ns, records])
+        return hashlib.md5(text.encode('utf-8')).hexdigest()
+
+    def load(self, vt_symbol: str, bar_file: str, adj_data: pd.DataFrame, adj_type: str) -> pd.DataFrame:
+        """
+        加载复权K线
+        :return: 以datetime为索引的DataFrame，缓存不存在或已过期时返回None
+        """
+        cache_file = self.get_cache_file(vt_symbol, adj_type)
+        if not os.path.isfile(cache_file):
+            return None
+
+        try:
+            meta = read_tick_cache_header(cache_file).get('meta', {})
+            if meta.get('fingerprint') != self.get_fingerprint(bar_file, adj_data, adj_type):
+                return None
+            df = load_tick_cache(cache_file)
+        except Exception:
+            return None
+
+        return df.set_index('datetime')
+
+    def save(self, vt_symbol: str, bar_file: str, adj_data: pd.DataFrame, adj_type: str, df: pd.DataFrame) -> int:
+        """
+        保存复权K线
+        :param df: 以datetime为索引的DataFrame
+        :return: 保存的行数
+        """
+        if df is None or len(df) == 0:
+            return 0
+
+        meta = {
+            'version': ADJUST_BAR_VERSION,
+            'vt_symbol': vt_symbol,
+            'adj_type': adj_type,
+            'fingerprint': self.get_fingerprint(bar_file, adj_data, adj_type)
+        }
+        return save_tick_cache(df.reset_index(), self.get_cache_file(vt_symbol, adj_type), unique=False, meta=meta)
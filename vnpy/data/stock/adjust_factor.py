@@ -118,6 +118,41 @@ def download_adjust_factor():
         save_data_to_pkb2(factor_dict, cache_file_name)
         print(f'保存除权除息至文件:{cache_file_name}')
 
+    return factor_dict
+
+
+def update_adjust_factor(vt_symbols: list):
+    """
+    增量更新指定股票的复权因子(例如出现新的除权除息记录时)
+    复权K线缓存(adjust_bar.AdjustBarStore)按复权记录校验，只有这些股票会重新复权
+    :param vt_symbols: 股票列表
+    :return: 更新后的所有股票复权因子
+    """
+    cache_file_name = os.path.abspath(os.path.join(os.path.dirname(__file__), ADJUST_FACTOR_FILE))
+    factor_dict = load_data_from_pkb2(cache_file_name)
+    if factor_dict is None:
+        return download_adjust_factor()
+
+    login_msg = bs.login()
+    if login_msg.error_code != '0':
+        print(f'证券宝登录错误代码:{login_msg.error_code}, 错误信息:{login_msg.error_msg}')
+        return factor_dict
+
+    base_dict = get_stock_base()
+    updated = False
+    for vt_symbol in vt_symbols:
+        stock_name = base_dict.get(vt_symbol, {}).get('name', '')
+        factor_list = get_adjust_factor(vt_symbol=vt_symbol, stock_name=stock_name, need_login=False)
+        if len(factor_list) > 0 and factor_list != factor_dict.get(vt_symbol):
+            factor_dict.update({vt_symbol: factor_list})
+            updated = True
+
+    if updated:
+        save_data_to_pkb2(factor_dict, cache_file_name)
+        print(f'保存除权除息至文件:{cache_file_name}')
+
+    return factor_dict
+
 
 if __name__ == '__main__':
     download_adjust_factor()
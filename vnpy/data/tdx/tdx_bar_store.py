@@ -0,0 +1,198 @@
+# encoding: UTF-8
+
+# 通达信k线的本地分区存储
+# 1、每个合约一个目录，按月分区为csv：{root}/{symbol}/{symbol}_{YYYYMM}_{period}.csv
+#    每次只追加比最后一根bar新的数据，已完成的月份不再读取、改写
+# 2、DownloadCheckpoint 记录一次下载任务中已完成的合约，中断后重新运行时跳过
+
+import csv
+import json
+import os
+from datetime import datetime
+from threading import Lock
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from vnpy.trader.utility import get_csv_last_dt
+
+DT_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class TdxBarStore(object):
+    """按合约、月份分区的k线csv存储"""
+
+    def __init__(self, root: str, period: str = '1min'):
+        self.root = root
+        self.period = period
+        os.makedirs(root, exist_ok=True)
+
+    def get_folder(self, symbol: str) -> str:
+        return os.path.join(self.root, symbol)
+
+    def get_partitions(self, symbol: str) -> Dict[str, str]:
+        """合约的分区 {YYYYMM: 文件路径}，按月份排序"""
+        folder = self.get_folder(symbol)
+        if not os.path.isdir(folder):
+            return {}
+        prefix = f'{symbol}_'
+        suffix = f'_{self.period}.csv'
+        partitions = {}
+        for file_name in os.listdir(folder):
+            if file_name.startswith(prefix) and file_name.endswith(suffix):
+                month = file_name[len(prefix):-len(suffix)]
+                if len(month) == 6 and month.isdigit():
+                    partitions[month] = os.path.join(folder, file_name)
+        return dict(sorted(partitions.items()))
+
+    def get_last_dt(self, symbol: str) -> Optional[datetime]:
+        """最后一根bar的时间，没有数据时返回None"""
+        partitions = self.get_partitions(symbol)
+        for month in reversed(list(partitions)):
+            last_dt = read_last_dt(partitions[month])
+            if last_dt:
+                return last_dt
+        return None
+
+    def append(self, symbol: str, data: pd.DataFrame) -> int:
+        """
+        追加k线(index为datetime)，只写入比已有数据新的bar
+        :return: 写入的数量
+        """
+        if data is None or len(data) == 0:
+            return 0
+        data = data.drop(columns=['datetime'], errors='ignore')
+        data = data[~data.index.duplicated(keep='last')].sort_index()
+        last_dt = self.get_last_dt(symbol)
+        if last_dt:
+            data = data[data.index > last_dt]
+        if len(data) == 0:
+            return 0
+
+        folder = self.get_folder(symbol)
+        os.makedirs(folder, exist_ok=True)
+        for month, month_data in data.groupby(data.index.strftime('%Y%m')):
+            file_name = os.path.join(folder, f'{symbol}_{month}_{self.period}.csv')
+            append_csv(file_name, month_data)
+        return len(data)
+
+    def load(self, symbol: str, start_dt: datetime = None, end_dt: datetime = None) -> pd.DataFrame:
+        """读取时间范围内的k线，只读取涉及的分区"""
+        start_month = start_dt.strftime('%Y%m') if start_dt else ''
+        end_month = end_dt.strftime('%Y%m') if end_dt else '999999'
+        frames = [read_csv(file_name) for month, file_name in self.get_partitions(symbol).items()
+                  if start_month <= month <= end_month]
+        if not frames:
+            return pd.DataFrame()
+        data = pd.concat(frames)
+        if start_dt:
+            data = data[data.index >= start_dt]
+        if end_dt:
+            data = data[data.index <= end_dt]
+        return data
+
+    def import_csv(self, symbol: str, file_name: str) -> int:
+        """从单一csv文件导入(本地已有的历史数据，避免重新下载)"""
+        if not os.path.exists(file_name):
+            return 0
+        return self.append(symbol, read_csv(file_name))
+
+    def export_csv(self, symbol: str, file_name: str) -> int:
+        """
+        导出为单一csv文件(回测使用的格式)
+        文件已存在时，只追加比文件最后一行新的数据
+        """
+        last_dt = read_last_dt(file_name) if os.path.exists(file_name) else None
+        data = self.load(symbol, start_dt=last_dt)
+        if last_dt and len(data) > 0:
+            data = data[data.index > last_dt]
+        if len(data) == 0:
+            return 0
+        append_csv(file_name, data)
+        return len(data)
+
+
+def read_last_dt(file_name: str) -> Optional[datetime]:
+    """csv最后一行的时间，最后一行不完整(写入中断)时，读取整个文件"""
+    if os.path.getsize(file_name) == 0:
+        return None
+    last_dt = get_csv_last_dt(file_name, dt_format=DT_FORMAT)
+    if last_dt:
+        return last_dt
+    index = pd.to_datetime(pd.read_csv(file_name, usecols=[0]).iloc[:, 0], format=DT_FORMAT, errors='coerce')
+    last_dt = index.max()
+    return None if pd.isnull(last_dt) else last_dt.to_pydatetime()
+
+
+def read_csv(file_name: str) -> pd.DataFrame:
+    data = pd.read_csv(file_name, index_col=0)
+    data.index = pd.to_datetime(data.index, format=DT_FORMAT, errors='coerce')
+    return data[data.index.notnull()]
+
+
+def append_csv(file_name: str, data: pd.DataFrame) -> None:
+    """追加到csv，文件已存在时按原有的表头对齐列"""
+    if os.path.exists(file_name) and os.path.getsize(file_name) > 0:
+        with open(file_name, 'r', encoding='utf8') as f:
+            headers = next(csv.reader(f), [])
+        data = data.reindex(columns=headers[1:])
+        # 上次写入中断时，最后一行可能没有换行符
+        with open(file_name, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                with open(file_name, 'a', encoding='utf8') as fa:
+                    fa.write('\n')
+        data.to_csv(file_name, mode='a', header=False, index=True, index_label='datetime',
+                    date_format=DT_FORMAT, encoding='utf8')
+    else:
+        data.to_csv(file_name, index=True, index_label='datetime', date_format=DT_FORMAT, encoding='utf8')
+
+
+class DownloadCheckpoint(object):
+    """
+    下载进度
+    task: 任务名称(如 1min_20201018)，与文件记录的任务不同时，重新开始
+    """
+
+    def __init__(self, file_name: str, task: str):
+        self.file_name = file_name
+        self.task = task
+        self.finished: Dict[str, str] = {}  # 合约: 最后一根bar时间
+        self.errors: Dict[str, str] = {}
+        self.lock = Lock()
+
+        if os.path.exists(file_name):
+            try:
+                with open(file_name, 'r', encoding='utf8') as f:
+                    d = json.load(f)
+            except ValueError:
+                d = {}
+            if d.get('task') == task:
+                self.finished = d.get('finished', {})
+                self.errors = d.get('errors', {})
+
+    def is_finished(self, symbol: str) -> bool:
+        return symbol in self.finished
+
+    def get_pending(self, symbols: List[str]) -> List[str]:
+        """未完成的合约"""
+        return [s for s in symbols if s not in self.finished]
+
+    def finish(self, symbol: str, last_dt: datetime = None) -> None:
+        with self.lock:
+            self.finished[symbol] = last_dt.strftime(DT_FORMAT) if last_dt else ''
+            self.errors.pop(symbol, None)
+            self.save()
+
+    def fail(self, symbol: str, error: str) -> None:
+        with self.lock:
+            self.errors[symbol] = error
+            self.save()
+
+    def save(self) -> None:
+        """先写临时文件再替换，中断时不会损坏原文件"""
+        tmp_file = self.file_name + '.tmp'
+        with open(tmp_file, 'w', encoding='utf8') as f:
+            json.dump({'task': self.task, 'finished': self.finished, 'errors': self.errors},
+                      f, indent=4, ensure_ascii=False)
+        os.replace(tmp_file, self.file_name)
@@ -0,0 +1,245 @@
+# encoding: UTF-8
+
+# 通达信期货k线的并发下载
+# 1、TdxConnectionPool: 按 rank_hosts 的测速结果，向多个最快的服务器各建立连接；
+#    每个连接同一时间只给一个线程使用，出错的连接关闭后换下一个服务器重连
+# 2、TdxFutureDownloader: 多个合约并发下载，单个合约的分页也并发请求
+#    (首批只请求1页，增量更新时通常一页就够；需要更多时每批页数加倍，直至连接数)
+#    下载的数据只追加新bar到 TdxBarStore，每完成一个合约记录到 DownloadCheckpoint
+
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from queue import Queue
+from threading import Lock
+from typing import Dict, List
+
+from pytdx.exhq import TdxExHq_API
+
+from vnpy.trader.utility import get_underlying_symbol
+from vnpy.data.tdx.tdx_common import PERIOD_MAPPING
+from vnpy.data.tdx.tdx_future_data import QSIZE, TdxFutureData, tdx_bars_to_df
+from vnpy.data.tdx.tdx_bar_store import DownloadCheckpoint, TdxBarStore
+
+
+class TdxConnectionPool(object):
+    """通达信行情连接池"""
+
+    def __init__(self, size: int = 4, strategy=None, proxy_ip: str = "", proxy_port: int = 0):
+        self.size = size
+        self.proxy_ip = proxy_ip
+        self.proxy_port = proxy_port
+        self.data = TdxFutureData(strategy=strategy, proxy_ip=proxy_ip, proxy_port=proxy_port)
+
+        self.hosts: List[dict] = []
+        self.host_index = 0
+        self.lock = Lock()
+        self.queue: Queue = Queue()
+        self.connected = False
+
+    def write_log(self, content):
+        self.data.write_log(content)
+
+    def connect(self) -> None:
+        """测速后，建立size个连接(排名靠前的服务器各一个)"""
+        if self.connected:
+            return
+        self.hosts = self.data.rank_hosts()
+        self.write_log('服务器排名:{}'.format([f"{h['ip']}:{h['port']}" for h in self.hosts[:self.size]]))
+        for _ in range(self.size):
+            try:
+                self.queue.put(self.create_connection())
+            except ConnectionError as ex:
+                # 延迟到使用时再重连
+                self.data.write_error(str(ex))
+                self.queue.put(None)
+        self.connected = True
+
+    def next_host(self) -> dict:
+        with self.lock:
+            host = self.hosts[self.host_index % len(self.hosts)]
+            self.host_index += 1
+            return host
+
+    def create_connection(self) -> TdxExHq_API:
+        """按排名依次尝试服务器，全部失败时抛出ConnectionError"""
+        for _ in range(len(self.hosts)):
+            host = self.next_host()
+            api = TdxExHq_API(heartbeat=True, auto_retry=True, raise_exception=True)
+            try:
+                if len(self.proxy_ip) > 0 and self.proxy_port > 0:
+                    api.connect(ip=host['ip'], port=host['port'],
+                                proxy_ip=self.proxy_ip, proxy_port=self.proxy_port)
+                else:
+                    api.connect(ip=host['ip'], port=host['port'])
+                if api.get_instrument_count() >= 10:
+                    self.write_log(u'创建tdx连接, IP: {}/{}'.format(host['ip'], host['port']))
+                    return api
+                self.data.write_error(u'该服务器IP {}/{}无响应'.format(host['ip'], host['port']))
+            except Exception as ex:
+                self.data.write_error(u'连接服务器{}/{}异常:{}'.format(host['ip'], host['port'], str(ex)))
+            self.close_api(api)
+        raise ConnectionError(u'所有通达信行情服务器均无法连接')
+
+    @staticmethod
+    def close_api(api: TdxExHq_API) -> None:
+        try:
+            api.disconnect()
+        except Exception:  # noqa
+            pass
+
+    @contextmanager
+    def connection(self):
+        """取得一个连接，用完归还；使用中出错时关闭，下次使用时重连"""
+        api = self.queue.get()
+        try:
+            if api is None:
+                api = self.create_connection()
+            yield api
+        except Exception:
+            if api is not None:
+                self.close_api(api)
+            api = None
+            raise
+        finally:
+            self.queue.put(api)
+
+    def close(self) -> None:
+        for _ in range(self.size):
+            api = self.queue.get()
+            if api is not None:
+                self.close_api(api)
+        self.connected = False
+
+
+class TdxFutureDownloader(object):
+    """
+    期货k线并发下载
+    store: 本地分区存储
+    pool_size: 连接数，也是并发下载的合约数
+    """
+
+    def __init__(self,
+                 store: TdxBarStore,
+                 pool: TdxConnectionPool = None,
+                 pool_size: int = 4,
+                 period: str = '1min',
+                 retry: int = 3,
+                 strategy=None):
+        self.store = store
+        self.pool = pool or TdxConnectionPool(size=pool_size, strategy=strategy)
+        self.period = period
+        self.tdx_period = PERIOD_MAPPING[period]
+        self.retry = retry
+        self.data = self.pool.data
+
+        self.page_executor: ThreadPoolExecutor = None
+
+    def write_log(self, content):
+        self.data.write_log(content)
+
+    def download(self,
+                 symbols: List[str],
+                 start_dt: datetime,
+                 checkpoint: DownloadCheckpoint = None) -> Dict[str, int]:
+        """
+        下载多个合约，合约并发、分页并发
+        start_dt: 本地没有数据时的开始时间
+        checkpoint: 跳过已完成的合约，每完成一个合约保存一次
+        :return: {合约: 新增bar数量}，失败的合约不在其中
+        """
+        if checkpoint:
+            skipped = len(symbols)
+            symbols = checkpoint.get_pending(symbols)
+            skipped -= len(symbols)
+            if skipped:
+                self.write_log(f'任务{checkpoint.task}已完成{skipped}个合约，继续下载剩余{len(symbols)}个')
+
+        self.pool.connect()
+        results = {}
+        # 合约线程不占用连接，只有分页请求占用，两级线程池不会互相等待
+        with ThreadPoolExecutor(max_workers=self.pool.size) as self.page_executor, \
+                ThreadPoolExecutor(max_workers=self.pool.size) as executor:
+            futures = {executor.submit(self.download_symbol, symbol, start_dt): symbol for symbol in symbols}
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    results[symbol] = future.result()
+                except Exception as ex:
+                    self.data.write_error(f'下载{symbol}异常:{str(ex)}, {traceback.format_exc()}')
+                    if checkpoint:
+                        checkpoint.fail(symbol, str(ex))
+                    continue
+                if checkpoint:
+                    checkpoint.finish(symbol, self.store.get_last_dt(symbol))
+        self.page_executor = None
+        return results
+
+    def download_symbol(self, symbol: str, start_dt: datetime) -> int:
+        """下载单个合约，追加到本地存储"""
+        last_dt = self.store.get_last_dt(symbol)
+        # 最后一天的bar可能不完整，从前一天开始下载，写入时过滤
+        qry_start_dt = last_dt - timedelta(days=1) if last_dt else start_dt
+
+        raw_bars = self.fetch_bars(symbol, qry_start_dt)
+        if len(raw_bars) == 0:
+            self.write_log(f'{symbol}没有数据')
+            return 0
+
+        data = tdx_bars_to_df(raw_bars, symbol)
+        data = data[data.index >= qry_start_dt]
+        count = self.store.append(symbol, data)
+        self.write_log(f'更新{symbol}: 新增{count}根bar, 最后时间:{data.index[-1] if len(data) else last_dt}')
+        return count
+
+    def fetch_bars(self, symbol: str, start_dt: datetime) -> List[dict]:
+        """
+        分页下载tdx的原始k线(从最新往前，每页QSIZE根)
+        每批并发请求多页，直到某一页的首根bar早于start_dt，或没有更多数据
+        """
+        if '.' in symbol:
+            symbol = symbol.split('.')[0]
+        tdx_symbol = symbol.upper().replace('_', '').replace('99', 'L9')
+        tdx_index_symbol = get_underlying_symbol(symbol).upper() + 'L9'
+        market_id = self.data.symbol_market_dict.get(tdx_index_symbol, 0)
+
+        pages = []
+        pos = 0
+        batch = 1
+        finished = False
+        while not finished:
+            offsets = [pos + i * QSIZE for i in range(batch)]
+            results = self.page_executor.map(
+                lambda offset: self.fetch_page(market_id, tdx_symbol, offset), offsets)
+            for res in results:
+                if not res:
+                    finished = True
+                    break
+                pages.append(res)
+                first_dt = datetime.strptime(res[0]['datetime'], '%Y-%m-%d %H:%M')
+                if first_dt <= start_dt or len(res) < QSIZE:
+                    finished = True
+                    break
+            pos += batch * QSIZE
+            batch = min(batch * 2, self.pool.size)
+
+        bars = []
+        for res in reversed(pages):
+            bars.extend(res)
+        return bars
+
+    def fetch_page(self, market_id: int, tdx_symbol: str, offset: int) -> list:
+        """请求一页，出错时换连接重试"""
+        for i in range(self.retry):
+            try:
+                with self.pool.connection() as api:
+                    return api.get_instrument_bars(self.tdx_period, market_id, tdx_symbol, offset, QSIZE)
+            except Exception as ex:
+                self.data.write_error(f'下载{tdx_symbol}第{offset}根起的数据异常({i + 1}/{self.retry}):{str(ex)}')
+                if i + 1 == self.retry:
+                    raise
+        return []
+
+    def close(self) -> None:
+        self.pool.close()
@@ -15,11 +15,12 @@ import bz2
 import copy
 import traceback
 
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, time
 from logging import ERROR
 from typing import Dict, Callable
 
-from pandas import to_datetime
+from pandas import DataFrame, to_datetime
 from pytdx.exhq import TdxExHq_API
 
 from vnpy.trader.constant import Exchange
@@ -88,6 +89,47 @@ def get_tdx_marketid(symbol):
     return market_id
 
 
+def tdx_bars_to_df(bars: list, symbol: str) -> DataFrame:
+    """
+    tdx返回的k线 [dict] => dataframe(index为datetime，并保留datetime列)
+    夜盘的时间修正为自然日
+    """
+    data = DataFrame(bars)
+    if len(data) == 0:
+        return data
+    data = data.assign(datetime=to_datetime(data['datetime']))
+    data = data.assign(ticker=symbol)
+    data['instrument_id'] = data['ticker']
+    data['symbol'] = symbol
+    data = data.drop(
+        ['year', 'month', 'day', 'hour', 'minute', 'price', 'amount', 'ticker'],
+        errors='ignore',
+        axis=1)
+    data = data.rename(
+        index=str,
+        columns={
+            'position': 'open_interest',
+            'trade': 'volume',
+        })
+
+    data['total_turnover'] = data['volume'] * data['close']
+    data["limit_down"] = 0
+    data["limit_up"] = 999999
+    data['trading_day'] = data['datetime'].dt.strftime('%Y-%m-%d')
+    monday_ts = data['datetime'].dt.weekday == 0  # 星期一
+    night_ts1 = data['datetime'].dt.hour > ALL_MARKET_END_HOUR
+    night_ts2 = data['datetime'].dt.hour < ALL_MARKET_BEGIN_HOUR
+    data.loc[night_ts1, 'datetime'] -= timedelta(days=1)  # 所有日期的夜盘(21:00~24:00), 减一天
+    monday_ts1 = monday_ts & night_ts1  # 星期一的夜盘(21:00~24:00), 再减两天
+    data.loc[monday_ts1, 'datetime'] -= timedelta(days=2)
+    monday_ts2 = monday_ts & night_ts2  # 星期一的夜盘(00:00~04:00), 再减两天
+    data.loc[monday_ts2, 'datetime'] -= timedelta(days=2)
+    # data['datetime'] -= timedelta(minutes=1) # 直接给Strategy使用, RiceQuant格式, 不需要减1分钟
+    data['date'] = data['datetime'].dt.strftime('%Y-%m-%d')
+    data['time'] = data['datetime'].dt.strftime('%H:%M:%S')
+    return data.set_index('datetime', drop=False)
+
+
 class TdxFutureData(object):
 
     # ----------------------------------------------------------------------
@@ -217,9 +259,7 @@ class TdxFutureData(object):
         """
         self.write_log(u'选择通达信行情服务器')
 
-        data_future = [self.ping(x['ip'], x['port']) for x in TDX_FUTURE_HOSTS if x['ip'] not in exclude_ips]
-
-        best_future_ip = TDX_FUTURE_HOSTS[data_future.index(min(data_future))]
+        best_future_ip = self.rank_hosts(exclude_ips)[0]
 
         self.write_log(u'选取 {}:{}'.format(best_future_ip['ip'], best_future_ip['port']))
         # print(u'选取 {}:{}'.format(best_future_ip['ip'], best_future_ip['port']))
@@ -227,6 +267,16 @@ class TdxFutureData(object):
         save_cache_json(best_future_ip, TDX_FUTURE_CONFIG)
         return best_future_ip
 
+    def rank_hosts(self, exclude_ips=[], max_workers=8):
+        """
+        并发ping行情服务器，按耗时排序(无响应的排在最后)
+        :return: [host dict]
+        """
+        hosts = [x for x in TDX_FUTURE_HOSTS if x['ip'] not in exclude_ips] or TDX_FUTURE_HOSTS
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            costs = list(executor.map(lambda x: self.ping(x['ip'], x['port']), hosts))
+        return [dict(host) for _, host in sorted(zip(costs, hosts), key=lambda c: c[0])]
+
     def _get_vn_exchange(self, symbol):
         """获取"""
         underlying_symbol = get_underlying_symbol(symbol).upper()
@@ -344,45 +394,11 @@ class TdxFutureData(object):
                 return False, ret_bars
 
             current_datetime = datetime.now()
-            data = self.api.to_df(_bars)
-            data = data.assign(datetime=to_datetime(data['datetime']))
-            data = data.assign(ticker=symbol)
-            data['instrument_id'] = data['ticker']
-            data['symbol'] = symbol
-            data = data.drop(
-                ['year', 'month', 'day', 'hour', 'minute', 'price', 'amount', 'ticker'],
-                errors='ignore',
-                axis=1)
-            data = data.rename(
-                index=str,
-                columns={
-                    'position': 'open_interest',
-                    'trade': 'volume',
-                })
+            data = tdx_bars_to_df(_bars, symbol)
             if len(data) == 0:
                 print('{} Handling {}, len2={}..., continue'.format(
                     str(datetime.now()), tdx_symbol, len(data)))
                 return False, ret_bars
-
-            data['total_turnover'] = data['volume'] * data['close']
-            data["limit_down"] = 0
-            data["limit_up"] = 999999
-            data['trading_day'] = data['datetime']
-            data['trading_day'] = data['trading_day'].apply(lambda x: (x.strftime('%Y-%m-%d')))
-            monday_ts = data['datetime'].dt.weekday == 0  # 星期一
-            night_ts1 = data['datetime'].dt.hour > ALL_MARKET_END_HOUR
-            night_ts2 = data['datetime'].dt.hour < ALL_MARKET_BEGIN_HOUR
-            data.loc[night_ts1, 'datetime'] -= timedelta(days=1)  # 所有日期的夜盘(21:00~24:00), 减一天
-            monday_ts1 = monday_ts & night_ts1  # 星期一的夜盘(21:00~24:00), 再减两天
-            data.loc[monday_ts1, 'datetime'] -= timedelta(days=2)
-            monday_ts2 = monday_ts & night_ts2  # 星期一的夜盘(00:00~04:00), 再减两天
-            data.loc[monday_ts2, 'datetime'] -= timedelta(days=2)
-            # data['datetime'] -= timedelta(minutes=1) # 直接给Strategy使用, RiceQuant格式, 不需要减1分钟
-            # data['dt_datetime'] = data['datetime']
-            data['date'] = data['datetime'].apply(lambda x: (x.strftime('%Y-%m-%d')))
-            data['time'] = data['datetime'].apply(lambda x: (x.strftime('%H:%M:%S')))
-            # data['datetime'] = data['datetime'].apply(lambda x: float(x.strftime('%Y%m%d%H%M%S')))
-            data = data.set_index('datetime', drop=False)
             if return_bar:
                 self.write_log('dataframe => [bars]')
                 for index, row in data.iterrows():
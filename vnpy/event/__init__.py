@@ -1 +1,2 @@
 from .engine import Event, EventEngine, EVENT_TIMER
+from .monitor import EVENT_MONITOR, LatencyHistogram
@@ -3,10 +3,12 @@ Event-driven framework of vn.py framework.
 """
 import sys
 from collections import defaultdict
-from queue import Empty, Queue
-from threading import Thread
-from time import sleep, time
-from typing import Any, Callable, List
+from queue import Empty, Queue, SimpleQueue
+from threading import Lock, Thread
+from time import perf_counter_ns, sleep, time
+from typing import Any, Callable, Dict, List
+
+from .monitor import EVENT_MONITOR, EventMonitor, merge_monitors
 
 EVENT_TIMER = "eTimer"
 
@@ -22,12 +24,53 @@ class Event:
         """"""
         self.type: str = type
         self.data: Any = data
+        self.put_ns: int = 0  # 放入队列的时间(perf_counter_ns)，仅统计模式使用
 
 
 # Defines handler function to be used in event engine.
 HandlerType = Callable[[Event], None]
 
 
+def default_shard_key(event: Event) -> Any:
+    """
+    分片模式的路由键值：
+    数据带有vt_symbol的(tick/order/trade/position等)，按vt_symbol路由，同一合约的事件保持顺序；
+    其他事件按事件类型路由
+    """
+    return getattr(event.data, "vt_symbol", None) or event.type
+
+
+class CoalesceSlot:
+    """
+    可合并事件在分片队列中的占位
+    分片处理落后时，同一合约尚未处理的tick，只保留最新的一个
+    """
+
+    __slots__ = ("event", "shard_key", "coalesce_key")
+
+    def __init__(self, event: Event, shard_key: Any, coalesce_key: Any):
+        self.event: Event = event
+        self.shard_key: Any = shard_key
+        self.coalesce_key: Any = coalesce_key
+
+
+class EventShard:
+    """
+    事件分片：独立的队列和处理线程
+    """
+
+    def __init__(self, index: int):
+        self.index: int = index
+        self.queue: SimpleQueue = SimpleQueue()
+        self.lock: Lock = Lock()
+        # 等待处理的可合并事件 shard_key: {coalesce_key: CoalesceSlot}
+        self.pending: Dict[Any, Dict[Any, CoalesceSlot]] = {}
+        self.thread: Thread = None
+        self.put_count: int = 0
+        self.coalesced_count: int = 0
+        self.monitor: EventMonitor = EventMonitor(f"shard{index}")
+
+
 class EventEngine:
     """
     Event engine distributes event object based on its type
@@ -37,7 +80,17 @@ class EventEngine:
     which can be used for timing purpose.
     """
 
-    def __init__(self, interval: int = 1, debug: bool = False, over_ms: int = 500):
+    def __init__(
+        self,
+        interval: int = 1,
+        debug: bool = False,
+        over_ms: int = 500,
+        shards: int = 0,
+        shard_key: Callable[[Event], Any] = default_shard_key,
+        coalesce_types: tuple = ("eTick.",),
+        monitor: bool = False,
+        monitor_interval: int = 60
+    ):
         """
         Timer event is generated every 1 second by default, if
         interval not specified.
@@ -45,6 +98,14 @@ class EventEngine:
             debug: performance debug
             over_ms: over micro seconds for each handler execution.
             add try catch handel event exception
+        分片模式(shards > 0)：
+            事件按 shard_key(event) 路由到 shards 个队列，每个队列一个处理线程，
+            同一键值的事件按put顺序处理，不同键值的事件并行处理(handler需线程安全)；
+            coalesce_types 中的事件(缺省为tick)，处理落后时，同一合约只保留最新的一个
+        统计模式(monitor=True)：
+            按(事件类型, handler)记录处理耗时的直方图(perf_counter_ns)，按事件类型记录排队等待时间，
+            以及各队列的长度，通过 get_monitor_stats() 获取，
+            monitor_interval 秒推送一次 EVENT_MONITOR 事件(0: 不推送)；统计模式优先于debug模式
         """
         self._interval: int = interval
         self._queue: Queue = Queue()
@@ -56,6 +117,16 @@ class EventEngine:
         self._handlers: defaultdict = defaultdict(list)
         self._general_handlers: List = []
 
+        self._shard_key: Callable[[Event], Any] = shard_key
+        self._coalesce_types: set = set(coalesce_types or [])
+        self._shards: List[EventShard] = [EventShard(i) for i in range(shards)]
+        for shard in self._shards:
+            shard.thread = Thread(target=self._run_shard, args=(shard,))
+
+        self._monitor: bool = monitor
+        self._monitor_interval: int = monitor_interval
+        self._main_monitor: EventMonitor = EventMonitor("main")
+
     def _run(self) -> None:
         """
         Get event from queue and then process it.
@@ -63,10 +134,127 @@ class EventEngine:
         while self._active:
             try:
                 event = self._queue.get(block=True, timeout=1)
-                self._process(event) if not self._debug else self._process_debug(event)
+                if self._monitor:
+                    self._process_monitor(event, self._main_monitor, self._queue.qsize())
+                else:
+                    self._process(event) if not self._debug else self._process_debug(event)
             except Empty:
                 pass
 
+    def _run_shard(self, shard: EventShard) -> None:
+        """
+        Get event from shard queue and then process it.
+        """
+        while self._active:
+            try:
+                item = shard.queue.get(block=True, timeout=1)
+            except Empty:
+                continue
+
+            if isinstance(item, CoalesceSlot):
+                with shard.lock:
+                    event = item.event
+                    slots = shard.pending.get(item.shard_key)
+                    if slots and slots.get(item.coalesce_key) is item:
+                        slots.pop(item.coalesce_key)
+                        if not slots:
+                            shard.pending.pop(item.shard_key)
+            else:
+                event = item
+
+            if self._monitor:
+                self._process_monitor(event, shard.monitor, shard.queue.qsize())
+            else:
+                self._process(event) if not self._debug else self._process_debug(event)
+
+    def _put_shard(self, event: Event) -> None:
+        """
+        Put an event object into shard queue.
+        """
+        shard_key = self._shard_key(event)
+        shard = self._shards[hash(shard_key) % len(self._shards)]
+        shard.put_count += 1
+
+        vt_symbol = getattr(event.data, "vt_symbol", None) if event.type in self._coalesce_types else None
+        if vt_symbol is None:
+            # 不可合并的事件，之后的tick不能再合并到它之前，保证同一键值的顺序
+            if shard.pending:
+                with shard.lock:
+                    shard.pending.pop(shard_key, None)
+            shard.queue.put(event)
+            return
+
+        coalesce_key = (event.type, vt_symbol)
+        with shard.lock:
+            slots = shard.pending.setdefault(shard_key, {})
+            slot = slots.get(coalesce_key)
+            if slot:
+                # 尚未处理的旧tick，替换为最新的
+                slot.event = event
+                shard.coalesced_count += 1
+                return
+            slot = CoalesceSlot(event, shard_key, coalesce_key)
+            slots[coalesce_key] = slot
+        shard.queue.put(slot)
+
+    def get_shard_stats(self) -> List[dict]:
+        """
+        分片模式下，各分片的队列长度、put数量、合并的事件数量
+        """
+        return [
+            {
+                "index": shard.index,
+                "qsize": shard.queue.qsize(),
+                "put_count": shard.put_count,
+                "coalesced_count": shard.coalesced_count
+            }
+            for shard in self._shards
+        ]
+
+    def _process_monitor(self, event: Event, monitor: EventMonitor, depth: int) -> None:
+        """
+        process event with monitor mode:
+        record queue wait time, queue depth and latency of each handler
+        with debug mode, catch and print exception like _process_debug
+        """
+        if event.put_ns:
+            monitor.record_wait(event.type, perf_counter_ns() - event.put_ns, depth)
+
+        if event.type in self._handlers:
+            for handler in self._handlers[event.type]:
+                self._call_monitor(event, handler, monitor)
+
+        if self._general_handlers:
+            for handler in self._general_handlers:
+                self._call_monitor(event, handler, monitor)
+
+    def _call_monitor(self, event: Event, handler: HandlerType, monitor: EventMonitor) -> None:
+        """
+        call handler and record its latency, even if it raised
+        """
+        start = perf_counter_ns()
+        try:
+            handler(event)
+        except Exception as ex:
+            if not self._debug:
+                raise
+            print(f'运行 {event.type} {handler.__qualname__} 异常:{str(ex)}',
+                  file=sys.stderr)
+        finally:
+            monitor.record_handler(event.type, handler, perf_counter_ns() - start)
+
+    def get_monitor_stats(self, reset: bool = False) -> Dict[str, Any]:
+        """
+        统计模式下，获取各handler处理耗时、排队等待时间、队列长度
+        :param reset: 获取后清空统计
+        """
+        monitors = [shard.monitor for shard in self._shards] if self._shards else [self._main_monitor]
+        stats = merge_monitors(monitors)
+        if reset:
+            for monitor in monitors:
+                monitor.reset()
+        return stats
+
     def _process_debug(self, event: Event) -> None:
         """
         process event with debug mode:
@@ -118,17 +306,28 @@ class EventEngine:
         """
         Sleep by interval second(s) and then generate a timer event.
         """
+        seconds = 0
         while self._active:
             sleep(self._interval)
             event = Event(EVENT_TIMER)
             self.put(event)
 
+            if self._monitor and self._monitor_interval > 0:
+                seconds += self._interval
+                if seconds >= self._monitor_interval:
+                    seconds = 0
+                    self.put(Event(EVENT_MONITOR, self.get_monitor_stats()))
+
     def start(self) -> None:
         """
         Start event engine to process events and generate timer events.
         """
         self._active = True
-        self._thread.start()
+        if self._shards:
+            for shard in self._shards:
+                shard.thread.start()
+        else:
+            self._thread.start()
         self._timer.start()
 
     def stop(self) -> None:
@@ -137,13 +336,23 @@ class EventEngine:
         """
         self._active = False
         self._timer.join()
-        self._thread.join()
+        if self._shards:
+            for shard in self._shards:
+                shard.thread.join()
+        else:
+            self._thread.join()
 
     def put(self, event: Event) -> None:
         """
         Put an event object into event queue.
         """
-        self._queue.put(event)
+        if self._monitor:
+            event.put_ns = perf_counter_ns()
+
+        if self._shards:
+            self._put_shard(event)
+        else:
+            self._queue.put(event)
 
     def register(self, type: str, handler: HandlerType) -> None:
         """
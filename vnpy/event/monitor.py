@@ -0,0 +1,142 @@
+"""
+Latency instrumentation of event engine.
+"""
+from typing import Any, Dict, List
+
+EVENT_MONITOR = "eEventMonitor"
+
+
+class LatencyHistogram:
+    """
+    纳秒耗时的直方图，按2的幂次分桶(第i个桶: [2^(i-1), 2^i) 纳秒)
+    记录一次只需几次整数运算，适合在生产环境中常开
+    """
+
+    __slots__ = ("buckets", "count", "total", "max")
+
+    def __init__(self):
+        self.buckets: List[int] = [0] * 64
+        self.count: int = 0
+        self.total: int = 0
+        self.max: int = 0
+
+    def record(self, ns: int) -> None:
+        """记录一次耗时(纳秒)"""
+        if ns < 0:
+            ns = 0
+        self.buckets[min(ns.bit_length(), 63)] += 1
+        self.count += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """合并另一个直方图"""
+        for i, n in enumerate(other.buckets):
+            if n:
+                self.buckets[i] += n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> int:
+        """百分位数的近似值(所在桶的上限，纳秒)"""
+        if not self.count:
+            return 0
+        target = self.count * q / 100
+        acc = 0
+        for i, n in enumerate(self.buckets):
+            acc += n
+            if n and acc >= target:
+                return min(1 << i, self.max)
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        """统计结果，时间单位为微秒"""
+        return {
+            "count": self.count,
+            "mean_us": round(self.total / self.count / 1000, 3) if self.count else 0,
+            "max_us": round(self.max / 1000, 3),
+            "p50_us": round(self.percentile(50) / 1000, 3),
+            "p90_us": round(self.percentile(90) / 1000, 3),
+            "p99_us": round(self.percentile(99) / 1000, 3),
+            "buckets": {1 << i: n for i, n in enumerate(self.buckets) if n}
+        }
+
+
+class EventMonitor:
+    """
+    单个事件队列(处理线程)的统计数据
+    每个处理线程只写自己的EventMonitor，无需加锁
+    """
+
+    def __init__(self, name: str):
+        self.name: str = name
+        # (事件类型, handler): 处理耗时
+        self.handlers: Dict[tuple, LatencyHistogram] = {}
+        # 事件类型: 排队等待时间
+        self.waits: Dict[str, LatencyHistogram] = {}
+        self.depth: int = 0
+        self.max_depth: int = 0
+
+    def record_wait(self, type: str, ns: int, depth: int) -> None:
+        """记录事件的排队等待时间，以及取出事件时的队列长度"""
+        hist = self.waits.get(type)
+        if hist is None:
+            hist = self.waits[type] = LatencyHistogram()
+        hist.record(ns)
+
+        self.depth = depth
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+    def record_handler(self, type: str, handler: Any, ns: int) -> None:
+        """记录handler的处理耗时"""
+        key = (type, handler)
+        hist = self.handlers.get(key)
+        if hist is None:
+            hist = self.handlers[key] = LatencyHistogram()
+        hist.record(ns)
+
+    def reset(self) -> None:
+        """清空统计"""
+        self.handlers = {}
+        self.waits = {}
+        self.max_depth = self.depth
+
+
+def get_handler_name(handler: Any) -> str:
+    """handler的名称"""
+    return getattr(handler, "__qualname__", None) or str(handler)
+
+
+def merge_monitors(monitors: List[EventMonitor]) -> Dict[str, Any]:
+    """
+    合并各队列的统计结果
+    handlers: [{type, handler, count, mean_us, ...}]，按总耗时从大到小排序
+    waits: {事件类型: {count, mean_us, ...}}
+    queues: [{name, depth, max_depth}]
+    """
+    handlers: Dict[tuple, LatencyHistogram] = {}
+    waits: Dict[str, LatencyHistogram] = {}
+    queues = []
+
+    for monitor in monitors:
+        for (type, handler), hist in list(monitor.handlers.items()):
+            key = (type, get_handler_name(handler))
+            handlers.setdefault(key, LatencyHistogram()).merge(hist)
+        for type, hist in list(monitor.waits.items()):
+            waits.setdefault(type, LatencyHistogram()).merge(hist)
+        queues.append({"name": monitor.name, "depth": monitor.depth, "max_depth": monitor.max_depth})
+
+    handler_stats = []
+    for (type, name), hist in sorted(handlers.items(), key=lambda item: item[1].total, reverse=True):
+        d = {"type": type, "handler": name}
+        d.update(hist.to_dict())
+        handler_stats.append(d)
+
+    return {
+        "handlers": handler_stats,
+        "waits": {type: hist.to_dict() for type, hist in waits.items()},
+        "queues": queues
+    }
@@ -0,0 +1,117 @@
+# encoding: UTF-8
+
+# CTP类接口(ctp, rohon, mini, sopt, femas, sgit)的行情数据处理
+# 1、日期：本地日期只在跨日时重新获取；TradingDay/ActionDay 每个取值只解析一次
+# 2、时间：UpdateTime按 ':' 拆分后直接构造datetime(不经过字符串拼接 + strptime)，
+#    同一日期、秒数、100毫秒内的tick共用结果(datetime不可变，可共享)，全市场订阅时绝大部分命中缓存
+# 3、2~5档行情：只设置有挂单的档位，没有挂单的保持TickData的默认值0
+
+import sys
+from datetime import date, datetime, time as dt_time, timedelta
+from time import time
+from typing import Dict, Tuple
+
+from vnpy.trader.object import TickData
+from vnpy.trader.utility import get_trading_date
+
+MAX_FLOAT = sys.float_info.max
+
+# 2~5档: (买价, 买量, 卖价, 卖量) 的 (CTP字段, TickData属性)
+DEPTH_FIELDS = [
+    (
+        (f"BidPrice{i}", f"bid_price_{i}"),
+        (f"BidVolume{i}", f"bid_volume_{i}"),
+        (f"AskPrice{i}", f"ask_price_{i}"),
+        (f"AskVolume{i}", f"ask_volume_{i}")
+    )
+    for i in range(2, 6)
+]
+
+
+def adjust_price(price: float) -> float:
+    """没有数据的价格(MAX_FLOAT) => 0"""
+    if price == MAX_FLOAT:
+        price = 0
+    return price
+
+
+class CtpTickNormalizer:
+    """
+    CTP类接口的tick时间处理
+    date_field: 日期的来源
+        None: 本地日期(ctp/rohon，交易所的ActionDay/TradingDay不可靠)
+        "ActionDay" / "TradingDay": 行情数据中的字段，格式 %Y%m%d
+    """
+
+    def __init__(self, date_field: str = None, cache_size: int = 10000):
+        self.date_field = date_field
+        self.cache_size = cache_size
+
+        # (日期, UpdateTime, 100毫秒) => (datetime, date, time, trading_day)
+        self.cache: Dict[tuple, tuple] = {}
+        # 日期字符串 => (年, 月, 日, '%Y-%m-%d')
+        self.dates: Dict[str, tuple] = {}
+
+        self.local_date: str = ""
+        self.local_date_end: float = 0  # 本地日期的结束时间戳
+
+    def get_local_date(self) -> str:
+        """本地日期 %Y%m%d，跨日时才重新获取"""
+        if time() >= self.local_date_end:
+            today = date.today()
+            self.local_date = today.strftime("%Y%m%d")
+            self.local_date_end = datetime.combine(today + timedelta(days=1), dt_time.min).timestamp()
+        return self.local_date
+
+    def parse_date(self, s: str) -> tuple:
+        """%Y%m%d => (年, 月, 日, '%Y-%m-%d')"""
+        day = self.dates.get(s)
+        if day is None:
+            day = (int(s[:4]), int(s[4:6]), int(s[6:8]), f"{s[:4]}-{s[4:6]}-{s[6:8]}")
+            self.dates[s] = day
+        return day
+
+    def get_datetime(self, data: dict) -> Tuple[datetime, str, str, str]:
+        """
+        行情数据 => (datetime, date, time, trading_day)
+        毫秒按100毫秒取整(与原来的 strptime 方式一致)
+        """
+        s_date = data[self.date_field] if self.date_field else self.get_local_date()
+        update_time = data["UpdateTime"]
+        key = (s_date, update_time, data["UpdateMillisec"] // 100)
+
+        result = self.cache.get(key)
+        if result is None:
+            year, month, day, date_str = self.parse_date(s_date)
+            hour, minute, second = update_time.split(":")
+            dt = datetime(year, month, day, int(hour), int(minute), int(second), key[2] * 100000)
+            if self.date_field == "TradingDay":
+                trading_day = date_str
+            else:
+                trading_day = get_trading_date(dt)
+            result = (dt, date_str, dt.strftime("%H:%M:%S.%f"), trading_day)
+
+            # 按时间顺序到达，缓存满时整体清空即可
+            if len(self.cache) >= self.cache_size:
+                self.cache.clear()
+            self.cache[key] = result
+        return result
+
+
+def set_depth(tick: TickData, data: dict, adjust: bool = True) -> None:
+    """
+    设置2~5档行情，只设置有挂单的档位
+    adjust: 价格是否需要处理 MAX_FLOAT
+    """
+    for bid_price, bid_volume, ask_price, ask_volume in DEPTH_FIELDS:
+        volume = data[bid_volume[0]]
+        if volume:
+            price = data[bid_price[0]]
+            setattr(tick, bid_price[1], 0 if adjust and price == MAX_FLOAT else price)
+            setattr(tick, bid_volume[1], volume)
+
+        volume = data[ask_volume[0]]
+        if volume:
+            price = data[ask_price[0]]
+            setattr(tick, ask_price[1], 0 if adjust and price == MAX_FLOAT else price)
+            setattr(tick, ask_volume[1], volume)
@@ -59,6 +59,7 @@ from vnpy.trader.object import (
     SubscribeRequest,
 )
 from vnpy.trader.utility import get_folder_path
+from vnpy.gateway.ctp_tick import CtpTickNormalizer
 from vnpy.trader.event import EVENT_TIMER
 
 
@@ -237,6 +238,7 @@ class CtpMdApi(MdApi):
         self.connect_status = False
         self.login_status = False
         self.subscribed = set()
+        self.tick_normalizer = CtpTickNormalizer("ActionDay")
 
         self.userid = ""
         self.password = ""
@@ -291,12 +293,15 @@ class CtpMdApi(MdApi):
         if not exchange:
             return
 
-        timestamp = f"{data['ActionDay']} {data['UpdateTime']}.{int(data['UpdateMillisec']/100)}"
+        dt, s_date, s_time, trading_day = self.tick_normalizer.get_datetime(data)
 
         tick = TickData(
             symbol=symbol,
             exchange=exchange,
-            datetime=datetime.strptime(timestamp, "%Y%m%d %H:%M:%S.%f"),
+            datetime=dt,
+            date=s_date,
+            time=s_time,
+            trading_day=trading_day,
             name=symbol_name_map[symbol],
             volume=data["Volume"],
             last_price=data["LastPrice"],
@@ -54,6 +54,7 @@ from vnpy.trader.object import (
     TradeData,
 )
 from vnpy.trader.utility import get_folder_path
+from vnpy.gateway.ctp_tick import CtpTickNormalizer
 
 
 STATUS_FEMAS2VT = {
@@ -218,6 +219,7 @@ class FemasMdApi(MdApi):
         self.login_failed = False
 
         self.subscribed = set()
+        self.tick_normalizer = CtpTickNormalizer("TradingDay")
 
         self.userid = ""
         self.password = ""
@@ -272,12 +274,15 @@ class FemasMdApi(MdApi):
         if not exchange:
             return
 
-        timestamp = f"{data['TradingDay']} {data['UpdateTime']}.{int(data['UpdateMillisec'] / 100)}"
+        dt, s_date, s_time, trading_day = self.tick_normalizer.get_datetime(data)
 
         tick = TickData(
             symbol=symbol,
             exchange=exchange,
-            datetime=datetime.strptime(timestamp, "%Y%m%d %H:%M:%S.%f"),
+            datetime=dt,
+            date=s_date,
+            time=s_time,
+            trading_day=trading_day,
             name=symbol_name_map[symbol],
             volume=data["Volume"],
             last_price=data["LastPrice"],
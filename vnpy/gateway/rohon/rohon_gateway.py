@@ -70,6 +70,7 @@ from vnpy.trader.utility import (
     BarGenerator
 )
 from vnpy.trader.event import EVENT_TIMER
+from vnpy.gateway.ctp_tick import CtpTickNormalizer, set_depth
 
 # 增加通达信指数接口行情
 from time import sleep
@@ -434,6 +435,7 @@ class RohonMdApi(MdApi):
         self.connect_status = False
         self.login_status = False
         self.subscribed = set()
+        self.tick_normalizer = CtpTickNormalizer()
 
         self.userid = ""
         self.password = ""
@@ -489,11 +491,8 @@ class RohonMdApi(MdApi):
         exchange = symbol_exchange_map.get(symbol, "")
         if not exchange:
             return
-        # 取当前时间
-        dt = datetime.now()
-        s_date = dt.strftime('%Y-%m-%d')
-        timestamp = f"{s_date} {data['UpdateTime']}.{int(data['UpdateMillisec'] / 100)}"
-        dt = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S.%f")
+        # 本地日期 + 行情时间
+        dt, s_date, s_time, trading_day = self.tick_normalizer.get_datetime(data)
 
         # 不处理开盘前的tick数据
         if dt.hour in [8, 20] and dt.minute < 59:
@@ -506,8 +505,8 @@ class RohonMdApi(MdApi):
             exchange=exchange,
             datetime=dt,
             date=s_date,
-            time=dt.strftime('%H:%M:%S.%f'),
-            trading_day=get_trading_date(dt),
+            time=s_time,
+            trading_day=trading_day,
             name=symbol_name_map[symbol],
             volume=data["Volume"],
             open_interest=data["OpenInterest"],
@@ -525,26 +524,7 @@ class RohonMdApi(MdApi):
             gateway_name=self.gateway_name
         )
 
-        if data["BidVolume2"] or data["AskVolume2"]:
-            tick.bid_price_2 = adjust_price(data["BidPrice2"])
-            tick.bid_price_3 = adjust_price(data["BidPrice3"])
-            tick.bid_price_4 = adjust_price(data["BidPrice4"])
-            tick.bid_price_5 = adjust_price(data["BidPrice5"])
-
-            tick.ask_price_2 = adjust_price(data["AskPrice2"])
-            tick.ask_price_3 = adjust_price(data["AskPrice3"])
-            tick.ask_price_4 = adjust_price(data["AskPrice4"])
-            tick.ask_price_5 = adjust_price(data["AskPrice5"])
-
-            tick.bid_volume_2 = adjust_price(data["BidVolume2"])
-            tick.bid_volume_3 = adjust_price(data["BidVolume3"])
-            tick.bid_volume_4 = adjust_price(data["BidVolume4"])
-            tick.bid_volume_5 = adjust_price(data["BidVolume5"])
-
-            tick.ask_volume_2 = adjust_price(data["AskVolume2"])
-            tick.ask_volume_3 = adjust_price(data["AskVolume3"])
-            tick.ask_volume_4 = adjust_price(data["AskVolume4"])
-            tick.ask_volume_5 = adjust_price(data["AskVolume5"])
+        set_depth(tick, data)
 
         self.gateway.on_tick(tick)
         self.gateway.on_custom_tick(tick)
@@ -1,3 +1,5 @@
+from threading import Lock
+
 from vnpy.event import Event
 from vnpy.rpc import RpcClient
 from vnpy.trader.gateway import BaseGateway
@@ -7,6 +9,19 @@ from vnpy.trader.object import (
     OrderRequest
 )
 from vnpy.trader.constant import Exchange
+from vnpy.trader.event import (
+    EVENT_TICK, EVENT_BAR, EVENT_TRADE, EVENT_ORDER, EVENT_POSITION, EVENT_ACCOUNT, EVENT_CONTRACT, EVENT_LOG,
+    EVENT_STRATEGY_POS, EVENT_STRATEGY_SNAPSHOT, EVENT_HISTORY_TRADE, EVENT_HISTORY_ORDER, EVENT_FUNDS_FLOW,
+    EVENT_ERROR, EVENT_WARNING, EVENT_CRITICAL, EVENT_TIMER
+)
+
+# 不订阅全部推送时，连接后订阅的推送(按事件类型前缀)，行情按合约在subscribe时订阅
+# 注意：此时服务端的其他事件(如各应用、策略界面的事件)不再转发
+SUBSCRIBE_TOPICS = [
+    EVENT_TRADE, EVENT_ORDER, EVENT_POSITION, EVENT_ACCOUNT, EVENT_CONTRACT, EVENT_LOG,
+    EVENT_STRATEGY_POS, EVENT_STRATEGY_SNAPSHOT, EVENT_HISTORY_TRADE, EVENT_HISTORY_ORDER, EVENT_FUNDS_FLOW,
+    EVENT_ERROR, EVENT_WARNING, EVENT_CRITICAL
+]
 
 
 class RpcGateway(BaseGateway):
@@ -16,7 +31,8 @@ class RpcGateway(BaseGateway):
 
     default_setting = {
         "主动请求地址": "tcp://127.0.0.1:2014",
-        "推送订阅地址": "tcp://127.0.0.1:4102"
+        "推送订阅地址": "tcp://127.0.0.1:4102",
+        "订阅全部推送": ["是", "否"]
     }
 
     exchanges = list(Exchange)
@@ -26,25 +42,40 @@ class RpcGateway(BaseGateway):
         super().__init__(event_engine, "RPC")
 
         self.symbol_gateway_map = {}
+        self.trade_ids = set()          # 已推送的成交，重新查询与推送之间去重
+        self.trade_lock = Lock()        # 推送在接收线程，重新查询在事件线程
+        self.resync_needed = False      # 交易数据丢失，需重新查询
+        self.report_interval = 10       # 上报推送接收统计的间隔(秒)
+        self.timer_count = 0
 
         self.client = RpcClient()
         self.client.callback = self.client_callback
+        self.client.on_sequence_gap = self.client_sequence_gap
 
     def connect(self, setting: dict):
         """"""
         req_address = setting["主动请求地址"]
         pub_address = setting["推送订阅地址"]
 
-        self.client.subscribe_topic("")
+        # 订阅全部推送(缺省)：接收服务端的所有事件(含全部合约的行情)
+        # 否：只接收SUBSCRIBE_TOPICS的交易数据，以及已订阅合约的行情
+        if setting.get("订阅全部推送", "是") == "是":
+            self.client.subscribe_topic("")
+        else:
+            for topic in SUBSCRIBE_TOPICS:
+                self.client.subscribe_topic(topic)
         self.client.start(req_address, pub_address)
 
         self.write_log("服务器连接成功，开始初始化查询")
 
         self.query_all()
+        self.event_engine.register(EVENT_TIMER, self.process_timer_event)
 
     def subscribe(self, req: SubscribeRequest):
         """"""
         gateway_name = self.symbol_gateway_map.get(req.vt_symbol, "")
+        self.client.subscribe_topic(EVENT_TICK + req.vt_symbol, market=True)
+        self.client.subscribe_topic(EVENT_BAR + req.vt_symbol, market=True)
         self.client.subscribe(req, gateway_name)
 
     def send_order(self, req: OrderRequest):
@@ -74,6 +105,10 @@ class RpcGateway(BaseGateway):
             self.on_contract(contract)
         self.write_log("合约信息查询成功")
 
+        self.query_trading_data()
+
+    def query_trading_data(self):
+        """查询资金、持仓、委托、成交"""
         accounts = self.client.get_all_accounts()
         for account in accounts:
             account.gateway_name = self.gateway_name
@@ -94,15 +129,42 @@ class RpcGateway(BaseGateway):
 
         trades = self.client.get_all_trades()
         for trade in trades:
+            if not self.check_new_trade(trade.vt_tradeid):
+                continue
             trade.gateway_name = self.gateway_name
             self.on_trade(trade)
         self.write_log("成交信息查询成功")
 
+    def check_new_trade(self, vt_tradeid: str) -> bool:
+        """是否未推送过的成交(并记录)"""
+        with self.trade_lock:
+            if vt_tradeid in self.trade_ids:
+                return False
+            self.trade_ids.add(vt_tradeid)
+            return True
+
     def close(self):
         """"""
+        self.event_engine.unregister(EVENT_TIMER, self.process_timer_event)
         self.client.stop()
         self.client.join()
 
+    def process_timer_event(self, event: Event):
+        """交易数据丢失时重新查询；定时上报推送接收统计"""
+        if self.resync_needed:
+            self.resync_needed = False
+            self.write_log("推送的交易数据有丢失，重新查询资金、持仓、委托、成交")
+            self.query_trading_data()
+
+        self.timer_count += 1
+        if self.timer_count >= self.report_interval:
+            self.timer_count = 0
+            self.client.report_metrics()
+
+    def client_sequence_gap(self, topic: str, count: int):
+        """推送的交易数据丢失(在接收线程中，不直接查询)"""
+        self.resync_needed = True
+
     def client_callback(self, topic: str, event: Event):
         """"""
         if event is None:
@@ -111,6 +173,10 @@ class RpcGateway(BaseGateway):
 
         data = event.data
 
+        # 重新查询时已推送的成交，晚到的推送不再重复
+        if event.type == EVENT_TRADE and not self.check_new_trade(data.vt_tradeid):
+            return
+
         if hasattr(data, "gateway_name"):
             data.gateway_name = self.gateway_name
 
@@ -60,6 +60,7 @@ from vnpy.trader.object import (
     SubscribeRequest,
 )
 from vnpy.trader.utility import get_folder_path
+from vnpy.gateway.ctp_tick import CtpTickNormalizer, set_depth
 from vnpy.trader.event import EVENT_TIMER
 
 
@@ -228,6 +229,7 @@ class SoptMdApi(MdApi):
         self.connect_status = False
         self.login_status = False
         self.subscribed = set()
+        self.tick_normalizer = CtpTickNormalizer("TradingDay")
 
         self.userid = ""
         self.password = ""
@@ -281,12 +283,15 @@ class SoptMdApi(MdApi):
         exchange = symbol_exchange_map.get(symbol, "")
         if not exchange:
             return
-        timestamp = f"{data['TradingDay']} {data['UpdateTime']}.{int(data['UpdateMillisec']/100)}"
+        dt, s_date, s_time, trading_day = self.tick_normalizer.get_datetime(data)
 
         tick = TickData(
             symbol=symbol,
             exchange=exchange,
-            datetime=datetime.strptime(timestamp, "%Y%m%d %H:%M:%S.%f"),
+            datetime=dt,
+            date=s_date,
+            time=s_time,
+            trading_day=trading_day,
             name=symbol_name_map[symbol],
             volume=data["Volume"],
             open_interest=data["OpenInterest"],
@@ -304,25 +309,7 @@ class SoptMdApi(MdApi):
             gateway_name=self.gateway_name
         )
 
-        tick.bid_price_2 = data["BidPrice2"]
-        tick.bid_price_3 = data["BidPrice3"]
-        tick.bid_price_4 = data["BidPrice4"]
-        tick.bid_price_5 = data["BidPrice5"]
-
-        tick.ask_price_2 = data["AskPrice2"]
-        tick.ask_price_3 = data["AskPrice3"]
-        tick.ask_price_4 = data["AskPrice4"]
-        tick.ask_price_5 = data["AskPrice5"]
-
-        tick.bid_volume_2 = data["BidVolume2"]
-        tick.bid_volume_3 = data["BidVolume3"]
-        tick.bid_volume_4 = data["BidVolume4"]
-        tick.bid_volume_5 = data["BidVolume5"]
-
-        tick.ask_volume_2 = data["AskVolume2"]
-        tick.ask_volume_3 = data["AskVolume3"]
-        tick.ask_volume_4 = data["AskVolume4"]
-        tick.ask_volume_5 = data["AskVolume5"]
+        set_depth(tick, data, adjust=False)
 
         self.gateway.on_tick(tick)
 
@@ -1,17 +1,25 @@
 import os
+import platform
 import signal
 import threading
 import traceback
+import uuid
 from datetime import datetime, timedelta
 from functools import lru_cache
-from typing import Any, Callable, Dict
+from typing import Any, Callable, Dict, Union
 from pathlib import Path
+from time import time_ns
 
 import zmq
 import zmq.auth
-from zmq.backend.cython.constants import NOBLOCK
+from zmq import NOBLOCK
 from zmq.auth.thread import ThreadAuthenticator
 
+from vnpy.event.monitor import LatencyHistogram
+
+from .codec import BaseCodec, DEFAULT_CODEC, decode, find_codec, get_codec
+from .publisher import CONFLATE_PREFIX, HEADER, KIND_CONFLATED, KIND_MARKET, KIND_TRADE, RpcPublisher
+
 
 # Achieve Ctrl-c interrupt recv
 signal.signal(signal.SIGINT, signal.SIG_DFL)
@@ -21,6 +29,9 @@ KEEP_ALIVE_TOPIC: str = "_keep_alive"
 KEEP_ALIVE_INTERVAL: timedelta = timedelta(seconds=1)
 KEEP_ALIVE_TOLERANCE: timedelta = timedelta(seconds=3)
 
+REPORT_SUBSCRIBER: str = "_report_subscriber"
+RECV_BATCH: int = 1000      # 客户端一次最多接收的推送数量
+
 
 class RemoteException(Exception):
     """
@@ -43,21 +54,39 @@ class RemoteException(Exception):
 class RpcServer:
     """"""
 
-    def __init__(self):
+    def __init__(
+        self,
+        codec: Union[str, BaseCodec] = DEFAULT_CODEC,
+        conflate_interval: float = 0.5,
+        pub_hwm: int = 100000
+    ):
         """
         Constructor
+        codec: 推送数据使用的编解码器(binary/pickle)，请求的回复使用请求方的编解码器
+        conflate_interval: 合并行情的发送间隔(秒)
+        pub_hwm: 每个客户端的发送缓冲(消息数)，超过后zmq丢弃消息，客户端按交易数据的序号发现丢失
         """
+        self.__codec: BaseCodec = get_codec(codec)
+
         # Save functions dict: key is fuction name, value is fuction object
         self.__functions: Dict[str, Any] = {}
 
         # Zmq port related
         self.__context: zmq.Context = zmq.Context()
+        # 退出时不等待未发送的推送(积压的客户端可能有大量未发送的数据)
+        self.__context.setsockopt(zmq.LINGER, 0)
 
         # Reply socket (Request–reply pattern)
         self.__socket_rep: zmq.Socket = self.__context.socket(zmq.REP)
 
         # Publish socket (Publish–subscribe pattern)
-        self.__socket_pub: zmq.Socket = self.__context.socket(zmq.PUB)
+        # XPUB: 发布线程可获得客户端的订阅，只发送被订阅的合并行情
+        self.__socket_pub: zmq.Socket = self.__context.socket(zmq.XPUB)
+        self.__socket_pub.setsockopt(zmq.SNDHWM, pub_hwm)
+        self.__publisher: RpcPublisher = RpcPublisher(self.__socket_pub, self.__codec, conflate_interval)
+
+        # 客户端上报的接收统计 client_id: metrics
+        self.__subscribers: Dict[str, Dict[str, Any]] = {}
 
         # Worker thread related
         self.__active: bool = False                     # RpcServer status
@@ -68,6 +97,16 @@ class RpcServer:
 
         self._register(KEEP_ALIVE_TOPIC, lambda n: n)
 
+        # 不注册绑定方法，避免循环引用(zmq.Context在垃圾回收时会阻塞)
+        subscribers = self.__subscribers
+
+        def report_subscriber(client_id: str, metrics: Dict[str, Any]) -> None:
+            """客户端上报接收统计"""
+            metrics["report_time"] = datetime.now()
+            subscribers[client_id] = metrics
+
+        self._register(REPORT_SUBSCRIBER, report_subscriber)
+
     def is_active(self) -> bool:
         """"""
         return self.__active
@@ -109,6 +148,7 @@ class RpcServer:
 
         # Start RpcServer status
         self.__active = True
+        self.__publisher.start()
 
         # Start RpcServer thread
         self.__thread = threading.Thread(target=self.run)
@@ -143,12 +183,15 @@ class RpcServer:
 
             if delta >= KEEP_ALIVE_INTERVAL:
                 self.publish(KEEP_ALIVE_TOPIC, cur)
+                start = cur
 
             if not self.__socket_rep.poll(1000):
                 continue
 
             # Receive request data from Reply socket
-            req = self.__socket_rep.recv_pyobj()
+            msg = self.__socket_rep.recv()
+            codec = find_codec(msg)
+            req = codec.decode(msg)
 
             # Get function name and parameters
             name, args, kwargs = req
@@ -162,7 +205,10 @@ class RpcServer:
                 rep = [False, traceback.format_exc()]
 
             # send callable response by Reply socket
-            self.__socket_rep.send_pyobj(rep)
+            self.__socket_rep.send(codec.encode(rep))
+
+        # 发送完队列中的推送数据
+        self.__publisher.stop()
 
         # Unbind socket address
         self.__socket_pub.unbind(self.__socket_pub.LAST_ENDPOINT)
@@ -171,8 +217,27 @@ class RpcServer:
     def publish(self, topic: str, data: Any) -> None:
         """
         Publish data
+        交易数据，按顺序发送，不合并
+        topic 与数据分帧发送，客户端按topic前缀过滤(zmq在发送端过滤，未订阅的数据不占用带宽)
+        """
+        if self.__publisher.active:
+            self.__publisher.put(topic, data)
+
+    def publish_market(self, topic: str, data: Any) -> None:
         """
-        self.__socket_pub.send_pyobj([topic, data])
+        Publish market data
+        行情数据，积压时同一topic只发送最新一条
+        """
+        if self.__publisher.active:
+            self.__publisher.put(topic, data, market=True)
+
+    def get_publish_metrics(self) -> Dict[str, Any]:
+        """发布线程的统计数据"""
+        return self.__publisher.get_metrics()
+
+    def get_subscriber_metrics(self) -> Dict[str, Dict[str, Any]]:
+        """各客户端的接收统计(延时、是否积压、合并/丢失数量等)"""
+        return dict(self.__subscribers)
 
     def register(self, func: Callable) -> None:
         """
@@ -190,8 +255,29 @@ class RpcServer:
 class RpcClient:
     """"""
 
-    def __init__(self):
-        """Constructor"""
+    def __init__(self, codec: Union[str, BaseCodec] = DEFAULT_CODEC, lag_threshold: float = 1.0):
+        """
+        Constructor
+        codec: 请求使用的编解码器(binary/pickle)，推送数据按消息自带的编码解码
+        lag_threshold: 推送延时超过该秒数时，行情改为订阅合并行情，延时低于一半时恢复
+        """
+        self.__codec: BaseCodec = get_codec(codec)
+        self.client_id: str = f"{platform.node()}_{os.getpid()}_{uuid.uuid4().hex[:8]}"
+
+        # 推送接收统计
+        self.lag_threshold: float = lag_threshold
+        self.lagging: bool = False                  # 是否积压(订阅合并行情)
+        self.market_topics: set = set()             # 订阅的行情topic
+        self.trade_seqs: Dict[bytes, int] = {}      # 交易数据各topic的序号
+        self.min_delay: int = None                  # 最小的推送耗时，作为计算延时的基准(消除双方的时钟偏差)
+        self.lag_ns: int = 0                        # 当前延时
+        self.lag_latency: LatencyHistogram = LatencyHistogram()
+        self.received_count: int = 0
+        self.dispatch_count: int = 0
+        self.conflated_count: int = 0               # 被更新的行情覆盖、未处理的行情
+        self.gap_count: int = 0                     # 丢失的交易数据
+        self.switch_count: int = 0                  # 切换为合并行情的次数
+
         # zmq port related
         self.__context: zmq.Context = zmq.Context()
 
@@ -224,8 +310,8 @@ class RpcClient:
 
             # Send request and wait for response
             with self.__lock:
-                self.__socket_req.send_pyobj(req)
-                rep = self.__socket_req.recv_pyobj()
+                self.__socket_req.send(self.__codec.encode(req))
+                rep = decode(self.__socket_req.recv())
 
             # Return response if successed; Trigger exception if failed
             if rep[0]:
@@ -269,6 +355,7 @@ class RpcClient:
             self.__socket_req.curve_serverkey = serverkey
 
         # Connect zmq port
+        self.__socket_sub.setsockopt_string(zmq.SUBSCRIBE, KEEP_ALIVE_TOPIC)
         self.__socket_req.connect(req_address)
         self.__socket_sub.connect(sub_address)
 
@@ -314,17 +401,122 @@ class RpcClient:
                 continue
 
             # Receive data from subscribe socket
-            topic, data = self.__socket_sub.recv_pyobj(flags=NOBLOCK)
+            # 一次取出已到达的全部推送，积压的行情只处理每个topic的最新一条
+            messages = []
+            while len(messages) < RECV_BATCH:
+                try:
+                    messages.append(self.__socket_sub.recv_multipart(flags=NOBLOCK))
+                except zmq.Again:
+                    break
+
+            self.process_messages(messages)
+            self.check_lagging()
+
+        # Close socket
+        self.__socket_req.close()
+        self.__socket_sub.close()
+
+    def process_messages(self, messages: list) -> None:
+        """
+        处理一批推送 [topic, 消息头, 数据]
+        交易数据按顺序处理；行情只处理同一topic的最后一条，被覆盖的不解码
+        """
+        now = time_ns()
+        items = []
+        latest = {}
+        for frames in messages:
+            topic = frames[0]
+            kind = KIND_TRADE
+            if len(frames) > 2:
+                kind, seq, stamp = HEADER.unpack(frames[1])
+                self.record_delay(now - stamp)
+
+                if kind == KIND_TRADE:
+                    self.check_sequence(topic, seq)
+                elif kind == KIND_CONFLATED:
+                    # 未积压时，忽略其他客户端订阅的合并行情(订阅了""时也会收到)
+                    if not self.lagging:
+                        continue
+                    topic = topic[len(CONFLATE_PREFIX):]
+
+            if kind != KIND_TRADE:
+                latest[topic] = len(items)
+            items.append((kind, topic, frames[-1]))
+
+        self.received_count += len(messages)
+
+        for i, (kind, topic, msg) in enumerate(items):
+            if kind != KIND_TRADE and latest[topic] != i:
+                self.conflated_count += 1
+                continue
 
+            topic = topic.decode("utf-8")
+            data = decode(msg)
             if topic == KEEP_ALIVE_TOPIC:
                 self._last_received_ping = data
             else:
                 # Process data by callable function
+                self.dispatch_count += 1
                 self.callback(topic, data)
 
-        # Close socket
-        self.__socket_req.close()
-        self.__socket_sub.close()
+    def record_delay(self, delay: int) -> None:
+        """记录推送延时(纳秒)：发送至接收的耗时 - 最小耗时"""
+        if self.min_delay is None or delay < self.min_delay:
+            self.min_delay = delay
+        self.lag_ns = delay - self.min_delay
+        self.lag_latency.record(self.lag_ns)
+
+    def check_sequence(self, topic: bytes, seq: int) -> None:
+        """检查交易数据的序号是否连续(服务端重启后序号从1开始)"""
+        last = self.trade_seqs.get(topic)
+        self.trade_seqs[topic] = seq
+        if last is not None and seq > last + 1:
+            self.gap_count += seq - last - 1
+            self.on_sequence_gap(topic.decode("utf-8"), seq - last - 1)
+
+    def check_lagging(self) -> None:
+        """延时超过阈值时，行情改为订阅合并行情；延时低于阈值的一半时恢复"""
+        threshold = int(self.lag_threshold * 1e9)
+        if not self.lagging and self.lag_ns > threshold and self.market_topics:
+            for topic in self.market_topics:
+                self.__socket_sub.setsockopt_string(zmq.SUBSCRIBE, CONFLATE_PREFIX + topic)
+                self.__socket_sub.setsockopt_string(zmq.UNSUBSCRIBE, topic)
+            self.lagging = True
+            self.switch_count += 1
+        elif self.lagging and self.lag_ns < threshold // 2:
+            for topic in self.market_topics:
+                self.__socket_sub.setsockopt_string(zmq.SUBSCRIBE, topic)
+                self.__socket_sub.setsockopt_string(zmq.UNSUBSCRIBE, CONFLATE_PREFIX + topic)
+            self.lagging = False
+
+    def on_sequence_gap(self, topic: str, count: int) -> None:
+        """
+        交易数据丢失(超过服务端的发送缓冲)，可重新查询委托、成交等
+        """
+        pass
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """推送接收统计"""
+        return {
+            "client_id": self.client_id,
+            "lagging": self.lagging,
+            "lag_ms": round(self.lag_ns / 1e6, 3),
+            "lag": self.lag_latency.to_dict(),
+            "received_count": self.received_count,
+            "dispatch_count": self.dispatch_count,
+            "conflated_count": self.conflated_count,
+            "gap_count": self.gap_count,
+            "switch_count": self.switch_count,
+            "market_topics": len(self.market_topics)
+        }
+
+    def report_metrics(self) -> bool:
+        """向服务端上报推送接收统计"""
+        try:
+            getattr(self, REPORT_SUBSCRIBER)(self.client_id, self.get_metrics())
+            return True
+        except RemoteException:
+            return False
 
     @staticmethod
     def _on_unexpected_disconnected():
@@ -337,12 +529,28 @@ class RpcClient:
         """
         raise NotImplementedError
 
-    def subscribe_topic(self, topic: str) -> None:
+    def subscribe_topic(self, topic: str, market: bool = False) -> None:
         """
         Subscribe data
+        topic为前缀匹配，"" 订阅全部
+        market: 行情topic，积压时改为订阅合并行情
         """
+        if market:
+            self.market_topics.add(topic)
+            if self.lagging:
+                topic = CONFLATE_PREFIX + topic
         self.__socket_sub.setsockopt_string(zmq.SUBSCRIBE, topic)
 
+    def unsubscribe_topic(self, topic: str) -> None:
+        """
+        Unsubscribe data
+        """
+        if topic in self.market_topics:
+            self.market_topics.discard(topic)
+            if self.lagging:
+                topic = CONFLATE_PREFIX + topic
+        self.__socket_sub.setsockopt_string(zmq.UNSUBSCRIBE, topic)
+
 
 def generate_certificates(name: str) -> None:
     """
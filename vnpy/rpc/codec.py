@@ -0,0 +1,354 @@
+# encoding: UTF-8
+
+# rpc 消息编解码
+# 每个消息的首字节为编解码器id，接收方按id选择解码器，无需与发送方约定
+# 1、PickleCodec: 原 send_pyobj 的pickle格式
+# 2、BinaryCodec: 按结构编码 vnpy.trader.object 的数据类
+#    数据类只发送 类编号 + 按字段定义顺序的值(不发送字段名)，枚举只发送编号，
+#    datetime 发送年月日时分秒微秒，其余基础类型原样交给 marshal 序列化(C实现，紧凑、快速)
+#    双方的类/枚举定义需一致，消息头带有结构校验码，不一致时解码报错
+#    无法按结构编码的对象(numpy数值、带其他时区的datetime等)，单独使用pickle编码
+#    使用__slots__的数据类(TickData、BarData)直接按slot取值，不经过 obj.__dict__
+
+import marshal
+import pickle
+from dataclasses import fields, is_dataclass
+from datetime import date, datetime, timedelta, timezone
+from enum import Enum
+from operator import attrgetter
+from typing import Any, Dict, Iterable, Union
+from zlib import crc32
+
+from vnpy.event import Event
+from vnpy.trader import constant, object as trader_object
+from vnpy.trader.object import get_instance_dict
+
+PRIMITIVE_TYPES = frozenset([str, int, float, bool, bytes, type(None)])
+
+# 特殊值编码为 (标签, ...) 元组，标签为单字节bytes
+TAG_DATACLASS = b"D"
+TAG_EVENT = b"V"
+TAG_ENUM = b"E"
+TAG_DATETIME = b"T"
+TAG_DATE = b"d"
+TAG_TUPLE = b"U"    # 首元素恰好为单字节bytes的普通元组
+TAG_SET = b"S"
+TAG_FROZENSET = b"F"
+TAG_PICKLE = b"P"
+
+
+class BaseCodec:
+    """编解码器"""
+
+    name: str = ""
+    codec_id: int = 0
+
+    def encode(self, obj: Any) -> bytes:
+        """对象 => 消息(含首字节的编解码器id)"""
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> Any:
+        """消息 => 对象"""
+        raise NotImplementedError
+
+
+class PickleCodec(BaseCodec):
+    """pickle编码"""
+
+    name = "pickle"
+    codec_id = 1
+
+    def __init__(self):
+        self.header = bytes([self.codec_id])
+
+    def encode(self, obj: Any) -> bytes:
+        return self.header + pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+
+    def decode(self, data: bytes) -> Any:
+        return pickle.loads(memoryview(data)[1:])
+
+
+class BinaryCodec(BaseCodec):
+    """
+    按结构的二进制编码
+    classes: 额外支持的数据类，enums: 额外支持的枚举类
+    """
+
+    name = "binary"
+    codec_id = 2
+
+    def __init__(self, classes: Iterable[type] = (), enums: Iterable[type] = ()):
+        self._header: bytes = None
+        self.classes = []       # 类编号 => (类, 字段名)
+        self.enum_members = []  # 枚举编号 => 枚举值
+        self.enum_codes: Dict[int, int] = {}  # id(枚举值) => 枚举编号，避免调用Enum.__hash__
+
+        self.packers: Dict[type, Any] = {
+            list: self.pack_list,
+            dict: self.pack_dict,
+            tuple: self.pack_tuple,
+            set: self.pack_set,
+            frozenset: self.pack_set,
+            datetime: self.pack_datetime,
+            date: self.pack_date,
+            Event: self.pack_event
+        }
+        self.unpackers: Dict[bytes, Any] = {
+            TAG_DATACLASS: self.unpack_dataclass,
+            TAG_EVENT: self.unpack_event,
+            TAG_ENUM: lambda item: self.enum_members[item[1]],
+            TAG_DATETIME: self.unpack_datetime,
+            TAG_DATE: lambda item: date.fromordinal(item[1]),
+            TAG_TUPLE: lambda item: tuple(self.unpack_list(item[1])),
+            TAG_SET: lambda item: set(self.unpack_list(item[1])),
+            TAG_FROZENSET: lambda item: frozenset(self.unpack_list(item[1])),
+            TAG_PICKLE: lambda item: pickle.loads(item[1])
+        }
+
+        # 按名称排序，保证双方编号一致
+        for cls in sorted(self.find_types(trader_object, is_dataclass), key=lambda c: c.__name__):
+            self.register_class(cls)
+        for cls in classes:
+            self.register_class(cls)
+
+        is_enum = lambda obj: issubclass(obj, Enum) and obj is not Enum  # noqa
+        for cls in sorted(self.find_types(constant, is_enum), key=lambda c: c.__name__):
+            self.register_enum(cls)
+        for cls in enums:
+            self.register_enum(cls)
+
+    @staticmethod
+    def find_types(module, check) -> list:
+        """模块中定义的类"""
+        return [obj for obj in vars(module).values()
+                if isinstance(obj, type) and obj.__module__ == module.__name__ and check(obj)]
+
+    @property
+    def header(self) -> bytes:
+        """编解码器id + 结构校验码"""
+        schema = [(cls.__name__, names) for cls, names in self.classes]
+        schema.append([member.name for member in self.enum_members])
+        schema.append(marshal.version)
+        return bytes([self.codec_id]) + crc32(repr(schema).encode()).to_bytes(4, "little")
+
+    def register_class(self, cls: type) -> None:
+        """注册数据类"""
+        if cls in self.packers:
+            return
+        names = tuple(f.name for f in fields(cls))
+        slots = cls.__dict__.get("__slots__")
+        if slots and tuple(slots[:len(names)]) == names:
+            self.packers[cls] = self.make_slots_packer(len(self.classes), tuple(slots), len(names))
+        else:
+            self.packers[cls] = self.make_dataclass_packer(len(self.classes), names)
+        self.classes.append((cls, names))
+        self._header = None
+
+    def register_enum(self, cls: type) -> None:
+        """注册枚举类"""
+        if cls in self.packers:
+            return
+        self.packers[cls] = self.pack_enum
+        for member in cls:
+            self.enum_codes[id(member)] = len(self.enum_members)
+            self.enum_members.append(member)
+        self._header = None
+
+    def encode(self, obj: Any) -> bytes:
+        if self._header is None:
+            self._header = self.header
+        return self._header + marshal.dumps(self.pack(obj))
+
+    def decode(self, data: bytes) -> Any:
+        if self._header is None:
+            self._header = self.header
+        if data[1:5] != self._header[1:5]:
+            raise ValueError("rpc消息的结构校验码不一致，请检查双方的vnpy版本")
+        return self.unpack(marshal.loads(memoryview(data)[5:]))
+
+    def pack(self, value: Any) -> Any:
+        """对象 => marshal支持的基础类型"""
+        t = type(value)
+        if t in PRIMITIVE_TYPES:
+            return value
+        packer = self.packers.get(t)
+        if packer:
+            return packer(value)
+        return TAG_PICKLE, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def unpack(self, value: Any) -> Any:
+        """基础类型 => 对象"""
+        t = type(value)
+        if t is tuple:
+            if value and type(value[0]) is bytes:
+                return self.unpackers[value[0]](value)
+            return tuple(self.unpack_list(value))
+        if t is list:
+            return self.unpack_list(value)
+        if t is dict:
+            return self.unpack_dict(value)
+        return value
+
+    def pack_list(self, value: list) -> list:
+        pack = self.pack
+        return [v if type(v) in PRIMITIVE_TYPES else pack(v) for v in value]
+
+    def unpack_list(self, value: Iterable) -> list:
+        unpack = self.unpack
+        return [v if type(v) in PRIMITIVE_TYPES else unpack(v) for v in value]
+
+    def pack_dict(self, value: dict) -> dict:
+        pack = self.pack
+        return {
+            k if type(k) in PRIMITIVE_TYPES else pack(k): v if type(v) in PRIMITIVE_TYPES else pack(v)
+            for k, v in value.items()
+        }
+
+    def unpack_dict(self, value: dict) -> dict:
+        unpack = self.unpack
+        return {
+            k if type(k) in PRIMITIVE_TYPES else unpack(k): v if type(v) in PRIMITIVE_TYPES else unpack(v)
+            for k, v in value.items()
+        }
+
+    def pack_tuple(self, value: tuple) -> tuple:
+        if value and type(value[0]) is bytes:
+            return TAG_TUPLE, self.pack_list(value)
+        return tuple(self.pack_list(value))
+
+    def pack_set(self, value: Union[set, frozenset]) -> tuple:
+        return TAG_SET if type(value) is set else TAG_FROZENSET, self.pack_list(value)
+
+    def pack_enum(self, value: Enum) -> tuple:
+        return TAG_ENUM, self.enum_codes[id(value)]
+
+    @staticmethod
+    def pack_datetime(value: datetime) -> tuple:
+        # 按年月日时分秒微秒发送，比换算为时间戳的编码/解码快
+        tz = value.tzinfo
+        if tz is None:
+            return (TAG_DATETIME, value.year, value.month, value.day,
+                    value.hour, value.minute, value.second, value.microsecond)
+        if type(tz) is timezone:
+            # 固定时差的时区: 本地时间 + 时差秒数
+            return (TAG_DATETIME, value.year, value.month, value.day,
+                    value.hour, value.minute, value.second, value.microsecond,
+                    int(tz.utcoffset(value).total_seconds()))
+        return TAG_PICKLE, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def unpack_datetime(item: tuple) -> datetime:
+        if len(item) == 8:
+            return datetime(*item[1:])
+        return datetime(*item[1:8], tzinfo=timezone(timedelta(seconds=item[8])))
+
+    @staticmethod
+    def pack_date(value: date) -> tuple:
+        return TAG_DATE, value.toordinal()
+
+    def pack_event(self, event: Event) -> tuple:
+        data = event.data
+        return TAG_EVENT, event.type, data if type(data) in PRIMITIVE_TYPES else self.pack(data)
+
+    def unpack_event(self, item: tuple) -> Event:
+        data = item[2]
+        return Event(item[1], data if type(data) in PRIMITIVE_TYPES else self.unpack(data))
+
+    def make_dataclass_packer(self, class_id: int, names: tuple):
+        """
+        数据类: (标签, 类编号, [字段值 + 其他属性值], (其他属性名) 或 None)
+        其他属性为 __post_init__ 等设置的属性(如 vt_symbol)
+        """
+        getter = attrgetter(*names) if len(names) > 1 else lambda obj: (getattr(obj, names[0]),)
+        name_set = frozenset(names)
+        size = len(names)
+        pack = self.pack
+
+        def pack_dataclass(value: Any) -> tuple:
+            d = value.__dict__
+            keys = tuple(d)
+            if keys[:size] == names:
+                # 一般情况：属性按 __init__ 的赋值顺序，字段在前
+                values = d.values()
+                extra_names = keys[size:] or None
+            else:
+                try:
+                    extra_names = tuple(k for k in keys if k not in name_set) or None
+                    values = getter(value) + tuple(d[k] for k in extra_names or ())
+                except AttributeError:
+                    return TAG_PICKLE, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            return TAG_DATACLASS, class_id, [v if type(v) in PRIMITIVE_TYPES else pack(v) for v in values], extra_names
+
+        return pack_dataclass
+
+    def make_slots_packer(self, class_id: int, slots: tuple, size: int):
+        """使用__slots__的数据类: 格式同上，slot一次取出，其他属性来自实例字典"""
+        getter = attrgetter(*slots)
+        slot_extra = slots[size:] or None
+        pack = self.pack
+
+        def pack_slots(value: Any) -> tuple:
+            try:
+                values = getter(value)
+            except AttributeError:
+                return TAG_PICKLE, pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+            extra_names = slot_extra
+            d = get_instance_dict(value)
+            if d:
+                values = values + tuple(d.values())
+                extra_names = slots[size:] + tuple(d)
+            return TAG_DATACLASS, class_id, [v if type(v) in PRIMITIVE_TYPES else pack(v) for v in values], extra_names
+
+        return pack_slots
+
+    def unpack_dataclass(self, item: tuple) -> Any:
+        cls, names = self.classes[item[1]]
+        if item[3]:
+            names = names + item[3]
+        obj = cls.__new__(cls)
+        if "__slots__" in cls.__dict__:
+            for name, value in zip(names, self.unpack_list(item[2])):
+                setattr(obj, name, value)
+        else:
+            obj.__dict__.update(zip(names, self.unpack_list(item[2])))
+        return obj
+
+
+DEFAULT_CODEC = BinaryCodec.name
+
+CODECS: Dict[str, BaseCodec] = {}
+CODEC_IDS: Dict[int, BaseCodec] = {}
+
+
+def register_codec(codec: BaseCodec) -> None:
+    """注册编解码器(同一id后注册的替换先注册的)"""
+    CODECS[codec.name] = codec
+    CODEC_IDS[codec.codec_id] = codec
+
+
+def get_codec(codec: Union[str, BaseCodec, None] = None) -> BaseCodec:
+    """按名称获取编解码器；传入实例时注册并返回该实例"""
+    if isinstance(codec, BaseCodec):
+        register_codec(codec)
+        return codec
+    name = codec or DEFAULT_CODEC
+    if name not in CODECS:
+        raise ValueError(f"不支持的rpc编解码器：{name}，可选：{list(CODECS)}")
+    return CODECS[name]
+
+
+def find_codec(data: bytes) -> BaseCodec:
+    """按消息首字节获取解码器"""
+    codec = CODEC_IDS.get(data[0]) if data else None
+    if codec is None:
+        raise ValueError(f"无法识别的rpc消息编码：{data[:1]}")
+    return codec
+
+
+def decode(data: bytes) -> Any:
+    """解码消息"""
+    return find_codec(data).decode(data)
+
+
+register_codec(PickleCodec())
+register_codec(BinaryCodec())
@@ -0,0 +1,232 @@
+# encoding: UTF-8
+
+# rpc 推送的发布环节
+# RpcServer.publish 只放入队列，由发布线程编码、发送(zmq socket只在发布线程中使用)
+# 1、交易数据(委托、成交、持仓、资金、日志等)：按顺序发送，从不合并；
+#    每个topic带连续的序号，客户端据此发现丢失(超过HWM)并重新查询
+# 2、行情数据(tick、bar)：发布线程处理不过来时，同一topic只发送最新一条；
+#    并按 conflate_interval 发送合并行情(topic为 CONFLATE_PREFIX + 原topic，只包含期间更新过的合约)，
+#    积压的客户端退订完整行情、改为订阅合并行情，不再拖慢其他客户端，也不会挤占交易数据
+# 3、每条消息为 [topic, 消息头, 数据] 三帧，消息头为 类型 + 序号 + 发送时间(纳秒)，客户端据此统计延时
+# 4、XPUB 可获得客户端的订阅，没有客户端订阅的topic不编码、不发送
+
+import struct
+from queue import Empty, SimpleQueue
+from threading import Event as ThreadEvent, Thread
+from time import monotonic, time_ns
+from typing import Any, Dict, List, Set
+
+import zmq
+
+from vnpy.event.monitor import LatencyHistogram
+
+from .codec import BaseCodec
+
+# 消息类型
+KIND_TRADE = 0
+KIND_MARKET = 1
+KIND_CONFLATED = 2
+
+HEADER = struct.Struct("<BQq")  # 类型, 序号, 发送时间(time_ns)
+
+CONFLATE_PREFIX = "~"
+CONFLATE_PREFIX_BYTES = CONFLATE_PREFIX.encode("utf-8")
+
+
+class RpcPublisher:
+    """
+    推送发布线程
+    socket: XPUB socket，可获得客户端的订阅/退订
+    """
+
+    def __init__(self, socket: zmq.Socket, codec: BaseCodec, conflate_interval: float = 0.5):
+        self.socket = socket
+        self.codec = codec
+        self.conflate_interval = conflate_interval
+
+        self.queue: SimpleQueue = SimpleQueue()
+        self.seqs: Dict[bytes, int] = {}  # 交易数据各topic的序号
+
+        self.snapshots: Dict[bytes, bytes] = {}  # 期间更新的行情 topic: 数据
+        self.subscriptions: Set[bytes] = set()  # 客户端的订阅(前缀)
+        self.conflate_subscriptions: Set[bytes] = set()  # 合并行情的订阅(前缀)
+        self.subscribed_topics: Dict[bytes, bool] = {}  # topic是否被订阅的缓存
+        self.conflate_topics: Dict[bytes, bool] = {}  # 行情topic是否被合并行情订阅的缓存
+
+        self.active = False
+        self.thread: Thread = None
+        self.stopped = ThreadEvent()
+
+        self.put_count = 0
+        self.trade_count = 0  # 发送的交易数据
+        self.market_count = 0  # 发送的行情
+        self.conflated_count = 0  # 被合并(未发送)的行情
+        self.snapshot_count = 0  # 发送的合并行情
+        self.skip_count = 0  # 没有订阅、未发送的数据
+        self.max_backlog = 0  # 单次处理的最大积压数量
+        self.queue_latency = LatencyHistogram()  # 放入队列 => 发送
+
+    def start(self) -> None:
+        """启动发布线程"""
+        if self.active:
+            return
+        self.active = True
+        self.stopped.clear()
+        self.thread = Thread(target=self.run, name="RpcPublisher", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """停止发布线程，发送完队列中的数据"""
+        if not self.active:
+            return
+        self.active = False
+        self.queue.put(None)
+        self.stopped.wait()
+        self.thread = None
+
+    def put(self, topic: str, data: Any, market: bool = False) -> None:
+        """放入待发送的数据(任意线程)"""
+        self.queue.put((KIND_MARKET if market else KIND_TRADE, topic, data, time_ns()))
+
+    def run(self) -> None:
+        """发布线程"""
+        next_time = monotonic() + self.conflate_interval
+        try:
+            while True:
+                try:
+                    item = self.queue.get(timeout=max(next_time - monotonic(), 0.001))
+                except Empty:
+                    item = None
+
+                items = [] if item is None else [item]
+                while True:
+                    try:
+                        item = self.queue.get_nowait()
+                    except Empty:
+                        break
+                    if item is not None:
+                        items.append(item)
+
+                self.process_subscriptions()
+                if items:
+                    self.send_items(items)
+
+                if monotonic() >= next_time:
+                    self.send_snapshots()
+                    next_time = monotonic() + self.conflate_interval
+
+                if not self.active and self.queue.empty():
+                    break
+        finally:
+            self.stopped.set()
+
+    def send_items(self, items: List[tuple]) -> None:
+        """交易数据按顺序发送，行情同一topic只发送最新一条"""
+        if len(items) > self.max_backlog:
+            self.max_backlog = len(items)
+        self.put_count += len(items)
+
+        socket = self.socket
+        encode = self.codec.encode
+        now = time_ns()
+        market = {}
+        for kind, topic, data, put_ns in items:
+            if kind == KIND_MARKET:
+                if topic in market:
+                    self.conflated_count += 1
+                market[topic] = (data, put_ns)
+                continue
+
+            topic = topic.encode("utf-8")
+            seq = self.seqs.get(topic, 0) + 1
+            self.seqs[topic] = seq
+            if not self.is_subscribed(topic):
+                self.skip_count += 1
+                continue
+            socket.send_multipart([topic, HEADER.pack(KIND_TRADE, seq, put_ns), encode(data)])
+            self.queue_latency.record(now - put_ns)
+            self.trade_count += 1
+
+        for topic, (data, put_ns) in market.items():
+            topic = topic.encode("utf-8")
+            subscribed = self.is_subscribed(topic)
+            conflate = self.is_conflate_topic(topic)
+            if not subscribed and not conflate:
+                self.skip_count += 1
+                continue
+
+            payload = encode(data)
+            if subscribed:
+                socket.send_multipart([topic, HEADER.pack(KIND_MARKET, 0, put_ns), payload])
+                self.queue_latency.record(now - put_ns)
+                self.market_count += 1
+            if conflate:
+                self.snapshots[topic] = payload
+
+    def send_snapshots(self) -> None:
+        """发送期间更新过的合并行情(数据已编码，直接复用)"""
+        if not self.snapshots:
+            return
+        snapshots, self.snapshots = self.snapshots, {}
+
+        header = HEADER.pack(KIND_CONFLATED, 0, time_ns())
+        for topic, payload in snapshots.items():
+            self.socket.send_multipart([CONFLATE_PREFIX_BYTES + topic, header, payload])
+            self.snapshot_count += 1
+
+    def is_subscribed(self, topic: bytes) -> bool:
+        """topic是否被客户端订阅"""
+        wanted = self.subscribed_topics.get(topic)
+        if wanted is None:
+            wanted = any(topic.startswith(s) for s in self.subscriptions)
+            self.subscribed_topics[topic] = wanted
+        return wanted
+
+    def is_conflate_topic(self, topic: bytes) -> bool:
+        """
+        行情topic是否被合并行情订阅
+        只检查以 CONFLATE_PREFIX 开头的订阅，订阅了""的客户端不会触发合并行情
+        """
+        wanted = self.conflate_topics.get(topic)
+        if wanted is None:
+            conflate_topic = CONFLATE_PREFIX_BYTES + topic
+            wanted = any(conflate_topic.startswith(s) for s in self.conflate_subscriptions)
+            self.conflate_topics[topic] = wanted
+        return wanted
+
+    def process_subscriptions(self) -> None:
+        """
+        XPUB收到的订阅/退订(首字节 1订阅 0退订)
+        同一topic只在第一个客户端订阅、最后一个客户端退订时收到
+        """
+        while True:
+            try:
+                msg = self.socket.recv(zmq.NOBLOCK)
+            except zmq.Again:
+                return
+            topic = msg[1:]
+            subscriptions = [self.subscriptions]
+            if topic.startswith(CONFLATE_PREFIX_BYTES):
+                subscriptions.append(self.conflate_subscriptions)
+            for s in subscriptions:
+                if msg[0] == 1:
+                    s.add(topic)
+                else:
+                    s.discard(topic)
+            self.subscribed_topics.clear()
+            self.conflate_topics.clear()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """统计数据"""
+        return {
+            "put_count": self.put_count,
+            "trade_count": self.trade_count,
+            "market_count": self.market_count,
+            "conflated_count": self.conflated_count,
+            "snapshot_count": self.snapshot_count,
+            "skip_count": self.skip_count,
+            "max_backlog": self.max_backlog,
+            "subscriptions": len(self.subscriptions),
+            "conflate_subscriptions": len(self.conflate_subscriptions),
+            "queue": self.queue_latency.to_dict()
+        }
@@ -112,6 +112,10 @@ class PositionHolding:
         self.exchange: Exchange = contract.exchange
 
         self.active_orders: Dict[str, OrderData] = {}
+        # 活动平仓委托的冻结数量 vt_orderid: ((方向, 开平), 冻结数量)
+        self.order_frozen: Dict[str, tuple] = {}
+        # 按(方向, 开平)汇总的冻结数量，委托更新时只加减变化量
+        self.frozen_sums: Dict[tuple, float] = {}
 
         self.long_pos: float = 0
         self.long_yd: float = 0
@@ -148,8 +152,23 @@ class PositionHolding:
             if order.vt_orderid in self.active_orders:
                 self.active_orders.pop(order.vt_orderid)
 
+        self.update_order_frozen(order)
         self.calculate_frozen()
 
+    def update_order_frozen(self, order: OrderData) -> None:
+        """按委托的变化量更新冻结汇总(开仓委托不冻结持仓)"""
+        old = self.order_frozen.pop(order.vt_orderid, None)
+        if old:
+            key, frozen = old
+            self.frozen_sums[key] = round(self.frozen_sums[key] - frozen, 7)
+
+        if not order.is_active() or order.offset == Offset.OPEN:
+            return
+        key = (order.direction, order.offset)
+        frozen = round(order.volume - order.traded, 7)
+        self.order_frozen[order.vt_orderid] = (key, frozen)
+        self.frozen_sums[key] = round(self.frozen_sums.get(key, 0) + frozen, 7)
+
     def update_order_request(self, req: OrderRequest, vt_orderid: str) -> None:
         """"""
         gateway_name, orderid = vt_orderid.split(".")
@@ -201,49 +220,34 @@ class PositionHolding:
         self.short_pos = round(self.short_td + self.short_yd, 7)
 
     def calculate_frozen(self) -> None:
-        """"""
-        self.long_pos_frozen = 0
-        self.long_yd_frozen = 0
-        self.long_td_frozen = 0
-
-        self.short_pos_frozen = 0
-        self.short_yd_frozen = 0
-        self.short_td_frozen = 0
-
-        for order in self.active_orders.values():
-            # Ignore position open orders
-            if order.offset == Offset.OPEN:
-                continue
-
-            frozen = round(order.volume - order.traded, 7)
-
-            if order.direction == Direction.LONG:
-                if order.offset == Offset.CLOSETODAY:
-                    self.short_td_frozen += frozen
-                elif order.offset == Offset.CLOSEYESTERDAY:
-                    self.short_yd_frozen += frozen
-                elif order.offset == Offset.CLOSE:
-                    self.short_td_frozen += frozen
-
-                    if self.short_td_frozen > self.short_td:
-                        self.short_yd_frozen += (self.short_td_frozen
-                                                 - self.short_td)
-                        self.short_td_frozen = self.short_td
-            elif order.direction == Direction.SHORT:
-                if order.offset == Offset.CLOSETODAY:
-                    self.long_td_frozen += frozen
-                elif order.offset == Offset.CLOSEYESTERDAY:
-                    self.long_yd_frozen += frozen
-                elif order.offset == Offset.CLOSE:
-                    self.long_td_frozen += frozen
-
-                    if self.long_td_frozen > self.long_td:
-                        self.long_yd_frozen += (self.long_td_frozen
-                                                - self.long_td)
-                        self.long_td_frozen = self.long_td
-
-            self.long_pos_frozen = round(self.long_td_frozen + self.long_yd_frozen, 7)
-            self.short_pos_frozen = round(self.short_td_frozen + self.short_yd_frozen, 7)
+        """
+        由冻结汇总计算各仓位的冻结数量，与活动委托的数量无关
+        平仓(CLOSE)先冻结今仓，超出今仓的部分冻结昨仓
+        """
+        sums = self.frozen_sums
+
+        # 买入平仓，冻结空头持仓
+        self.short_td_frozen = sums.get((Direction.LONG, Offset.CLOSETODAY), 0)
+        self.short_yd_frozen = sums.get((Direction.LONG, Offset.CLOSEYESTERDAY), 0)
+        close_frozen = sums.get((Direction.LONG, Offset.CLOSE), 0)
+        if close_frozen:
+            self.short_td_frozen += close_frozen
+            if self.short_td_frozen > self.short_td:
+                self.short_yd_frozen += self.short_td_frozen - self.short_td
+                self.short_td_frozen = self.short_td
+
+        # 卖出平仓，冻结多头持仓
+        self.long_td_frozen = sums.get((Direction.SHORT, Offset.CLOSETODAY), 0)
+        self.long_yd_frozen = sums.get((Direction.SHORT, Offset.CLOSEYESTERDAY), 0)
+        close_frozen = sums.get((Direction.SHORT, Offset.CLOSE), 0)
+        if close_frozen:
+            self.long_td_frozen += close_frozen
+            if self.long_td_frozen > self.long_td:
+                self.long_yd_frozen += self.long_td_frozen - self.long_td
+                self.long_td_frozen = self.long_td
+
+        self.long_pos_frozen = round(self.long_td_frozen + self.long_yd_frozen, 7)
+        self.short_pos_frozen = round(self.short_td_frozen + self.short_yd_frozen, 7)
 
     def convert_order_request_shfe(self, req: OrderRequest) -> List[OrderRequest]:
         """上期所，委托单拆分"""
@@ -6,6 +6,7 @@ from logging import Logger
 import smtplib
 import os
 from abc import ABC
+from collections import defaultdict
 from datetime import datetime
 from email.message import EmailMessage
 from queue import Empty, Queue
@@ -215,15 +216,17 @@ class MainEngine:
         """
         # 自定义套利合约，交给算法引擎处理
         if self.algo_engine and req.exchange == Exchange.SPD:
-            return self.algo_engine.send_spd_order(
+            vt_orderid = self.algo_engine.send_spd_order(
                 req=req,
                 gateway_name=gateway_name)
-
-        gateway = self.get_gateway(gateway_name)
-        if gateway:
-            return gateway.send_order(req)
         else:
-            return ""
+            gateway = self.get_gateway(gateway_name)
+            vt_orderid = gateway.send_order(req) if gateway else ""
+
+        # 记录委托所属的策略，用于按策略查询活动委托
+        if vt_orderid and req.strategy_name:
+            self.set_order_strategy(vt_orderid, req.strategy_name)
+        return vt_orderid
 
     def cancel_order(self, req: CancelRequest, gateway_name: str) -> bool:
         """
@@ -244,11 +247,15 @@ class MainEngine:
         批量发单
         """
         gateway = self.get_gateway(gateway_name)
-        if gateway:
-            return gateway.send_orders(reqs)
-        else:
+        if not gateway:
             return ["" for req in reqs]
 
+        vt_orderids = gateway.send_orders(reqs)
+        for req, vt_orderid in zip(reqs, vt_orderids):
+            if vt_orderid and req.strategy_name:
+                self.set_order_strategy(vt_orderid, req.strategy_name)
+        return vt_orderids
+
     def cancel_orders(self, reqs: Sequence[CancelRequest], gateway_name: str) -> None:
         """
         """
@@ -437,6 +444,11 @@ class OmsEngine(BaseEngine):
         self.prices = {}
 
         self.active_orders: Dict[str, OrderData] = {}
+        # 活动委托的索引，按合约/接口/策略查询时只访问结果本身
+        self.symbol_active_orders: Dict[str, Dict[str, OrderData]] = defaultdict(dict)
+        self.gateway_active_orders: Dict[str, Dict[str, OrderData]] = defaultdict(dict)
+        self.strategy_active_orders: Dict[str, Dict[str, OrderData]] = defaultdict(dict)
+        self.order_strategies: Dict[str, str] = {}  # vt_orderid: 策略名
 
         self.add_function()
         self.register_event()
@@ -509,6 +521,7 @@ class OmsEngine(BaseEngine):
         self.main_engine.get_all_accounts = self.get_all_accounts
         self.main_engine.get_all_contracts = self.get_all_contracts
         self.main_engine.get_all_active_orders = self.get_all_active_orders
+        self.main_engine.set_order_strategy = self.set_order_strategy
         self.main_engine.get_all_custom_contracts = self.get_all_custom_contracts
         self.main_engine.get_mapping_spd = self.get_mapping_spd
         self.main_engine.save_contracts = self.save_contracts
@@ -537,10 +550,58 @@ class OmsEngine(BaseEngine):
 
         # If order is active, then update data in dict.
         if order.is_active():
-            self.active_orders[order.vt_orderid] = order
+            self.add_active_order(order)
         # Otherwise, pop inactive order from in dict
         elif order.vt_orderid in self.active_orders:
-            self.active_orders.pop(order.vt_orderid)
+            self.remove_active_order(order)
+        # 首个回报即为完成状态的委托，不再保留策略名
+        elif self.order_strategies:
+            self.order_strategies.pop(order.vt_orderid, None)
+
+    def get_order_indexes(self, order: OrderData) -> List[Dict[str, OrderData]]:
+        """委托所在的各个索引"""
+        indexes = [
+            self.symbol_active_orders[order.vt_symbol],
+            self.gateway_active_orders[order.gateway_name]
+        ]
+        strategy_name = self.order_strategies.get(order.vt_orderid)
+        if strategy_name:
+            indexes.append(self.strategy_active_orders[strategy_name])
+        return indexes
+
+    def add_active_order(self, order: OrderData) -> None:
+        """加入/更新活动委托"""
+        self.active_orders[order.vt_orderid] = order
+        for index in self.get_order_indexes(order):
+            index[order.vt_orderid] = order
+
+    def remove_active_order(self, order: OrderData) -> None:
+        """移除完成的委托及其策略名，索引为空时一并删除"""
+        vt_orderid = order.vt_orderid
+        self.active_orders.pop(vt_orderid, None)
+        for key, indexes in [
+            (order.vt_symbol, self.symbol_active_orders),
+            (order.gateway_name, self.gateway_active_orders),
+            (self.order_strategies.pop(vt_orderid, None), self.strategy_active_orders)
+        ]:
+            index = indexes.get(key)
+            if index is None:
+                continue
+            index.pop(vt_orderid, None)
+            if not index:
+                indexes.pop(key)
+
+    def set_order_strategy(self, vt_orderid: str, strategy_name: str) -> None:
+        """
+        记录委托所属的策略
+        委托回报可能先于发单返回，已在活动委托中的，同时加入策略索引；已完成的委托不再记录
+        """
+        order = self.active_orders.get(vt_orderid)
+        if order:
+            self.strategy_active_orders[strategy_name][vt_orderid] = order
+        elif vt_orderid in self.orders:
+            return
+        self.order_strategies[vt_orderid] = strategy_name
 
     def process_trade_event(self, event: Event) -> None:
         """"""
@@ -715,21 +776,34 @@ class OmsEngine(BaseEngine):
         """
         return list(self.contracts.values())
 
-    def get_all_active_orders(self, vt_symbol: str = "") -> List[OrderData]:
+    def get_all_active_orders(
+        self,
+        vt_symbol: str = "",
+        gateway_name: str = "",
+        strategy_name: str = ""
+    ) -> List[OrderData]:
         """
         Get all active orders by vt_symbol.
 
         If vt_symbol is empty, return all active orders.
-        """
-        if not vt_symbol:
+        可同时按接口、策略过滤，从索引中取结果，不遍历全部活动委托
+        """
+        filters = [
+            (vt_symbol, self.symbol_active_orders),
+            (gateway_name, self.gateway_active_orders),
+            (strategy_name, self.strategy_active_orders)
+        ]
+        filters = [f for f in filters if f[0]]
+        if not filters:
             return list(self.active_orders.values())
-        else:
-            active_orders = [
-                order
-                for order in self.active_orders.values()
-                if order.vt_symbol == vt_symbol
-            ]
-            return active_orders
+
+        # 从最小的索引开始，其他条件逐个检查
+        indexes = [indexes.get(key, {}) for key, indexes in filters]
+        orders = min(indexes, key=len)
+        return [
+            order for order in orders.values()
+            if all(order.vt_orderid in index for index in indexes if index is not orders)
+        ]
 
     def get_all_custom_contracts(self, rtn_setting=False):
         """
@@ -2,9 +2,11 @@
 Basic data structure used for general trading function in VN Trader.
 """
 
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from datetime import datetime
 from logging import INFO
+from operator import attrgetter
+from typing import Dict
 
 from .constant import (
     Color, Direction,
@@ -26,6 +28,110 @@ class BaseData:
     gateway_name: str
 
 
+# 实例自身的属性字典(动态添加的属性)，不经过子类覆盖的 __dict__
+get_instance_dict = BaseData.__dict__["__dict__"].__get__
+
+# symbol => (exchange, vt_symbol)，同一合约的tick/bar共用一个vt_symbol字符串
+VT_SYMBOLS: Dict[str, tuple] = {}
+
+
+def get_vt_symbol(symbol: str, exchange: Exchange) -> str:
+    """合约代码.交易所(缓存)"""
+    cached = VT_SYMBOLS.get(symbol)
+    if cached is None or cached[0] is not exchange:
+        cached = VT_SYMBOLS[symbol] = (exchange, f"{symbol}.{exchange.value}")
+    return cached[1]
+
+
+class SlotsDict(dict):
+    """
+    使用__slots__的数据类的 obj.__dict__：各属性值的字典
+    写入时同步到对象，兼容原来读写 tick.__dict__ 的代码；复制、序列化后为普通dict
+    """
+
+    __slots__ = ("obj",)
+
+    def __init__(self, obj, *args):
+        super().__init__(*args)
+        self.obj = obj
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        setattr(self.obj, key, value)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        delattr(self.obj, key)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def pop(self, key, *args):
+        if key not in self:
+            return dict.pop(self, key, *args)
+        value = dict.__getitem__(self, key)
+        del self[key]
+        return value
+
+    def copy(self) -> dict:
+        return dict(self)
+
+    __copy__ = copy
+
+    def __reduce__(self):
+        return dict, (dict(self),)
+
+
+def add_slots(cls: type, extra: tuple = ("vt_symbol",)) -> type:
+    """
+    数据类的字段改为__slots__保存(同python3.10的 dataclass(slots=True)，兼容3.7)
+    extra: __post_init__中设置的其他属性
+    每个实例不再有45个键的属性字典，内存约为原来的1/4；
+    父类BaseData没有__slots__，仍可动态添加其他属性(首次添加时才创建实例字典)
+    """
+    names = tuple(f.name for f in fields(cls)) + tuple(extra)
+    getter = attrgetter(*names)
+
+    cls_dict = dict(cls.__dict__)
+    for name in names:
+        cls_dict.pop(name, None)
+    cls_dict.pop("__weakref__", None)
+    cls_dict["__slots__"] = names
+
+    def get_dict(self) -> SlotsDict:
+        """全部属性的字典(兼容原来的 obj.__dict__)"""
+        try:
+            d = SlotsDict(self, zip(names, getter(self)))
+        except AttributeError:
+            # 未赋值的属性(如 cls.__new__ 创建的对象)
+            d = SlotsDict(self)
+            for name in names:
+                if hasattr(self, name):
+                    dict.__setitem__(d, name, getattr(self, name))
+        extra_dict = get_instance_dict(self)
+        if extra_dict:
+            dict.update(d, extra_dict)
+        return d
+
+    def __getstate__(self) -> dict:
+        return dict(get_dict(self))
+
+    def __setstate__(self, state: dict) -> None:
+        for key, value in state.items():
+            setattr(self, key, value)
+
+    cls_dict["__dict__"] = property(get_dict)
+    cls_dict["__getstate__"] = __getstate__
+    cls_dict["__setstate__"] = __setstate__
+    return type(cls)(cls.__name__, cls.__bases__, cls_dict)
+
+
 @dataclass
 class TickData(BaseData):
     """
@@ -81,7 +187,10 @@ class TickData(BaseData):
 
     def __post_init__(self):
         """"""
-        self.vt_symbol = f"{self.symbol}.{self.exchange.value}"
+        self.vt_symbol = get_vt_symbol(self.symbol, self.exchange)
+
+
+TickData = add_slots(TickData)
 
 
 @dataclass
@@ -106,7 +215,10 @@ class BarData(BaseData):
 
     def __post_init__(self):
         """"""
-        self.vt_symbol = f"{self.symbol}.{self.exchange.value}"
+        self.vt_symbol = get_vt_symbol(self.symbol, self.exchange)
+
+
+BarData = add_slots(BarData)
 
 
 @dataclass
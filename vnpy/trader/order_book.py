@@ -0,0 +1,141 @@
+# encoding: UTF-8
+
+# 回测/本地委托簿
+# 按 合约 + 方向 对委托价格排序索引，行情到来时只取出价格被穿越的委托，
+# 替代每个bar/tick都遍历全部委托、逐个比较vt_symbol的方式
+# 各方向的委托均按价格升序排列：
+#   本地停止单：买入 停止单价格 <= 穿越价格 触发(前段)，卖出 停止单价格 >= 穿越价格 触发(后段)
+#   限价单：买入 委托价格 >= 穿越价格 成交(后段)，卖出 委托价格 <= 穿越价格 成交(前段)
+
+from bisect import bisect_left, bisect_right, insort
+
+from vnpy.trader.constant import Direction
+
+
+class OrderBook(dict):
+    """
+    委托簿
+    本身是 {orderid: order} 的字典，可直接替代原来的委托字典，
+    增删委托时同步维护按合约、方向、价格排序的索引
+    order需要有 vt_symbol、direction、price 属性
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+        # orderid: (vt_symbol, direction, 索引键(price, 序号, orderid))
+        self.order_keys = {}
+        # vt_symbol: {Direction: [索引键]}
+        self.books = {}
+
+    def __setitem__(self, orderid, order):
+        if orderid in self:
+            self._remove_key(orderid)
+        super().__setitem__(orderid, order)
+
+        if order.direction not in [Direction.LONG, Direction.SHORT]:
+            return
+        self.count += 1
+        key = (order.price, self.count, orderid)
+        self.order_keys[orderid] = (order.vt_symbol, order.direction, key)
+        book = self.books.setdefault(order.vt_symbol, {Direction.LONG: [], Direction.SHORT: []})
+        insort(book[order.direction], key)
+
+    def __delitem__(self, orderid):
+        super().__delitem__(orderid)
+        self._remove_key(orderid)
+
+    def _remove_key(self, orderid):
+        """从索引中移除"""
+        item = self.order_keys.pop(orderid, None)
+        if item is None:
+            return
+        vt_symbol, direction, key = item
+        keys = self.books[vt_symbol][direction]
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            del keys[i]
+
+    def pop(self, orderid, *args):
+        if orderid in self:
+            self._remove_key(orderid)
+        return super().pop(orderid, *args)
+
+    def popitem(self):
+        orderid, order = super().popitem()
+        self._remove_key(orderid)
+        return orderid, order
+
+    def setdefault(self, orderid, order=None):
+        if orderid not in self:
+            self[orderid] = order
+        return self[orderid]
+
+    def update(self, *args, **kwargs):
+        for orderid, order in dict(*args, **kwargs).items():
+            self[orderid] = order
+
+    def clear(self):
+        super().clear()
+        self.order_keys.clear()
+        self.books.clear()
+
+    @staticmethod
+    def _below(keys: list, price: float) -> list:
+        """价格 <= price 的索引键"""
+        # 价格相同的委托都要取出，用(价格, 无穷大)作为边界
+        return keys[:bisect_right(keys, (price, float('inf')))]
+
+    @staticmethod
+    def _above(keys: list, price: float) -> list:
+        """价格 >= price 的索引键"""
+        return keys[bisect_left(keys, (price,)):]
+
+    def _to_orders(self, keys: list) -> list:
+        """索引键 => 委托，按加入委托簿的顺序"""
+        if len(keys) > 1:
+            keys.sort(key=lambda k: k[1])
+        return [self[k[2]] for k in keys]
+
+    def get_orders(self, vt_symbol: str) -> list:
+        """获取合约的所有委托"""
+        book = self.books.get(vt_symbol)
+        if not book:
+            return []
+        return self._to_orders(book[Direction.LONG] + book[Direction.SHORT])
+
+
+class StopOrderBook(OrderBook):
+    """本地停止单簿"""
+
+    def get_triggered(self, vt_symbol: str, long_cross_price: float, short_cross_price: float) -> list:
+        """
+        获取被触发的停止单，按创建顺序返回，不从停止单簿中移除
+        :param vt_symbol: 合约
+        :param long_cross_price: 买入停止单价格 <= 该价格时触发
+        :param short_cross_price: 卖出停止单价格 >= 该价格时触发
+        :return: [stop_order]
+        """
+        book = self.books.get(vt_symbol)
+        if not book:
+            return []
+        return self._to_orders(self._below(book[Direction.LONG], long_cross_price)
+                               + self._above(book[Direction.SHORT], short_cross_price))
+
+
+class LimitOrderBook(OrderBook):
+    """限价单簿"""
+
+    def get_crossed(self, vt_symbol: str, buy_cross_price: float, sell_cross_price: float) -> list:
+        """
+        获取会成交的限价单，按委托顺序返回，不从委托簿中移除
+        :param vt_symbol: 合约
+        :param buy_cross_price: 买入委托价格 >= 该价格时成交
+        :param sell_cross_price: 卖出委托价格 <= 该价格时成交
+        :return: [order]
+        """
+        book = self.books.get(vt_symbol)
+        if not book:
+            return []
+        return self._to_orders(self._above(book[Direction.LONG], buy_cross_price)
+                               + self._below(book[Direction.SHORT], sell_cross_price))
@@ -0,0 +1,114 @@
+# encoding: UTF-8
+
+# 回测的开仓成交台账
+# 替代回测引擎中的 long_position_list / short_position_list：
+# 1、按 合约 + 策略 维护开仓成交的队列(deque)，平仓时取队首，先开先平，O(1)
+#    原来每次平仓都要遍历整个持仓列表查找同合约同策略的开仓单，再从列表中间pop
+# 2、所有开仓成交按加入顺序保存在字典中，迭代顺序与原来的列表一致(部分平仓的剩余仓位重新加入到末尾)
+# 3、按 合约 + 策略 累计持仓数量、持仓成本，每日结算、计算仓位比例时直接读取汇总，无需遍历每一笔开仓
+
+from collections import deque
+
+
+class PositionSummary(object):
+    """合约 + 策略 的持仓汇总"""
+
+    __slots__ = ('vt_symbol', 'symbol', 'strategy_name', 'volume', 'cost')
+
+    def __init__(self, vt_symbol: str, symbol: str, strategy_name: str):
+        self.vt_symbol = vt_symbol
+        self.symbol = symbol
+        self.strategy_name = strategy_name
+        self.volume = 0  # 持仓数量
+        self.cost = 0  # 持仓成本, sum(开仓价格 * 数量)
+
+    @property
+    def price(self):
+        """持仓均价"""
+        return self.cost / self.volume if self.volume else 0
+
+
+class PositionLedger(object):
+    """
+    开仓成交台账
+    迭代返回未平仓的开仓成交(TradeData)，与原持仓列表的顺序一致
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.trades = {}  # 序号: 开仓成交
+        self.queues = {}  # (vt_symbol, strategy_name): deque[序号]
+        self.summaries = {}  # (vt_symbol, strategy_name): PositionSummary
+        self.cost = 0  # 全部持仓的成本, sum(开仓价格 * 数量)
+
+    def __len__(self):
+        return len(self.trades)
+
+    def __iter__(self):
+        return iter(self.trades.values())
+
+    def append(self, trade):
+        """加入开仓成交(或部分平仓后的剩余仓位)"""
+        self.count += 1
+        self.trades[self.count] = trade
+
+        key = (trade.vt_symbol, trade.strategy_name)
+        queue = self.queues.get(key)
+        if queue is None:
+            queue = self.queues[key] = deque()
+        queue.append(self.count)
+
+        summary = self.summaries.get(key)
+        if summary is None:
+            summary = self.summaries[key] = PositionSummary(trade.vt_symbol, trade.symbol, trade.strategy_name)
+        summary.volume = round(summary.volume + trade.volume, 7)
+        summary.cost += trade.price * trade.volume
+        self.cost += trade.price * trade.volume
+
+    def pop_first(self, vt_symbol: str, strategy_name: str):
+        """
+        取出该合约、该策略最早的开仓成交
+        :return: TradeData, 没有时返回None
+        """
+        key = (vt_symbol, strategy_name)
+        queue = self.queues.get(key)
+        if not queue:
+            return None
+
+        trade = self.trades.pop(queue.popleft())
+        if not queue:
+            del self.queues[key]
+
+        summary = self.summaries[key]
+        summary.volume = round(summary.volume - trade.volume, 7)
+        summary.cost -= trade.price * trade.volume
+        if not self.queues.get(key):
+            del self.summaries[key]
+
+        # 清仓后归零，避免累计误差
+        self.cost = self.cost - trade.price * trade.volume if self.trades else 0
+
+        return trade
+
+    def get_trades(self, vt_symbol: str, strategy_name: str) -> list:
+        """该合约、该策略未平仓的开仓成交，先开在前"""
+        queue = self.queues.get((vt_symbol, strategy_name), ())
+        return [self.trades[i] for i in queue]
+
+    def get_volume(self, vt_symbol: str, strategy_name: str = None):
+        """持仓数量，不指定策略时为该合约所有策略的持仓数量"""
+        if strategy_name is not None:
+            summary = self.summaries.get((vt_symbol, strategy_name))
+            return summary.volume if summary else 0
+
+        return round(sum(s.volume for s in self.summaries.values() if s.vt_symbol == vt_symbol), 7)
+
+    def get_positions(self) -> list:
+        """按 合约 + 策略 汇总的持仓 [PositionSummary]"""
+        return list(self.summaries.values())
+
+    def clear(self):
+        self.trades.clear()
+        self.queues.clear()
+        self.summaries.clear()
+        self.cost = 0
@@ -0,0 +1,80 @@
+# encoding: UTF-8
+
+# 回测数据回放
+# 多个合约的DataFrame(datetime索引)合并为按时间排序的数据流，
+# 替代 pd.concat(...).swaplevel(0, 1).sort_index() + iterrows() 的回放方式：
+# 1、合并时只对时间戳 + 合约序号做一次稳定排序(各合约数据已按时间排序，相当于k路归并)，
+#    相同时间的数据按合约名称排序，与原来MultiIndex的排序一致
+# 2、各列转换为numpy数组后按排序结果重排，回放时分块 tolist()，
+#    逐条返回已转换为python类型的tuple，没有pandas逐行构造Series的开销
+
+import numpy as np
+import pandas as pd
+
+
+class ReplayStream(object):
+    """
+    多合约按时间合并的回放数据流
+    迭代返回 (datetime, key, 列1, 列2, ...)
+    """
+
+    def __init__(self, frames: dict, columns: list, defaults: dict = None, chunk_size: int = 100000):
+        """
+        :param frames: {key: DataFrame}, DataFrame以datetime为索引
+        :param columns: 输出的列，元素为列名，或列名的tuple(使用DataFrame中第一个存在的列)
+        :param defaults: {列名: 缺省值}，DataFrame中不存在该列时使用，没有缺省值时为None
+        :param chunk_size: 回放时每次转换的数据条数
+        """
+        defaults = defaults or {}
+        self.keys = sorted(frames.keys())
+        self.columns = [c[0] if isinstance(c, tuple) else c for c in columns]
+        self.chunk_size = chunk_size
+
+        times = []
+        key_ids = []
+        values = [[] for _ in columns]
+        for key_id, key in enumerate(self.keys):
+            df = frames[key]
+            # pandas 1.x 没有 as_unit，统一转换为纳秒
+            times.append(pd.DatetimeIndex(df.index).values.astype('datetime64[ns]').view('i8'))
+            key_ids.append(np.full(len(df), key_id, dtype=np.int32))
+            for i, column in enumerate(columns):
+                names = column if isinstance(column, tuple) else (column,)
+                name = next((n for n in names if n in df.columns), None)
+                if name is None:
+                    values[i].append(np.full(len(df), defaults.get(names[0]), dtype=object))
+                else:
+                    values[i].append(df[name].to_numpy())
+
+        if len(times) == 0:
+            self.times = np.empty(0, dtype='datetime64[ns]')
+            self.key_ids = np.empty(0, dtype=np.int32)
+            self.values = [np.empty(0) for _ in columns]
+            return
+
+        times = np.concatenate(times)
+        key_ids = np.concatenate(key_ids)
+        # 按 时间、合约 排序
+        order = np.lexsort((key_ids, times))
+        self.times = times[order].view('datetime64[ns]')
+        self.key_ids = key_ids[order]
+        self.values = [self._concat(v)[order] for v in values]
+
+    @staticmethod
+    def _concat(arrays: list) -> np.ndarray:
+        """合并各合约的列，dtype不一致时使用object"""
+        if len(set(a.dtype for a in arrays)) > 1:
+            arrays = [a.astype(object) for a in arrays]
+        return np.concatenate(arrays)
+
+    def __len__(self):
+        return len(self.times)
+
+    def __iter__(self):
+        keys = self.keys
+        for start in range(0, len(self.times), self.chunk_size):
+            end = start + self.chunk_size
+            dts = self.times[start:end].astype('datetime64[us]').tolist()
+            chunk_keys = [keys[i] for i in self.key_ids[start:end].tolist()]
+            chunk_values = [v[start:end].tolist() for v in self.values]
+            yield from zip(dts, chunk_keys, *chunk_values)
@@ -0,0 +1,731 @@
+# encoding: UTF-8
+
+# tick数据的列式二进制缓存
+# 替代按合约/按日保存的 bz2 + pickle(list[dict]) 缓存文件(.pkb2/.pkz2)
+# 文件结构：
+#   MAGIC(8字节) + 头部长度(uint32) + 头部(json) + 按64字节对齐的各列数据块
+#   头部：版本、行数、压缩方式、各列(名称、dtype、偏移、长度)、常量列
+# 每一列为固定dtype的numpy数组，不压缩时直接memmap映射，加载无需解压、反序列化和拷贝；
+# 可选 lz4 / zstd / zlib 压缩，压缩后按列解压
+# 缓存写入时已经按datetime去重，加载后无需再 drop_duplicates
+# 追加写入(tick记录)时，每次追加一个独立的数据段，加载时依次合并
+
+import os
+import sys
+import bz2
+import json
+import pickle
+import struct
+import time
+import zlib
+from dataclasses import fields
+from datetime import datetime
+from enum import Enum
+from operator import attrgetter, itemgetter
+from queue import Queue
+from threading import Thread
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from vnpy.trader.constant import Exchange
+from vnpy.trader.object import TickData, get_vt_symbol
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+TICK_CACHE_SUFFIX = '.tkc'
+TICK_CACHE_VERSION = 1
+
+MAGIC = b'VNTKC\x00\x00\x01'
+ALIGN = 64
+
+
+def compress_block(codec: str, data: bytes) -> bytes:
+    """按压缩方式压缩数据块"""
+    if codec == 'lz4':
+        return lz4_frame.compress(data)
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor().compress(data)
+    return zlib.compress(data, 1)
+
+
+def decompress_block(codec: str, data: bytes) -> bytes:
+    """按压缩方式解压数据块"""
+    if codec == 'lz4':
+        return lz4_frame.decompress(data)
+    if codec == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def get_fast_codec() -> str:
+    """可用的最快压缩方式"""
+    return 'lz4' if lz4_frame is not None else 'zlib'
+
+
+def check_codec(codec: str):
+    """检查压缩方式是否可用"""
+    if codec is None:
+        return
+    if codec == 'lz4' and lz4_frame is None:
+        raise ValueError('压缩方式lz4需要安装lz4: pip install lz4')
+    if codec == 'zstd' and zstandard is None:
+        raise ValueError('压缩方式zstd需要安装zstandard: pip install zstandard')
+    if codec not in ['lz4', 'zstd', 'zlib']:
+        raise ValueError(f'不支持的压缩方式:{codec}')
+
+
+def get_tick_cache_file(cache_folder: str, cache_symbol: str, cache_date: str) -> str:
+    """
+    缓存文件路径，与bz2缓存的目录结构一致
+    cache_folder/YYYYMM/{symbol}_{YYYYMMDD}.tkc
+    """
+    return os.path.join(cache_folder, cache_date[:6], f'{cache_symbol}_{cache_date}{TICK_CACHE_SUFFIX}')
+
+
+def _to_column(series: pd.Series):
+    """pandas列 => (numpy数组, None) 或 (None, 常量值)"""
+    if series.dtype.kind in 'biufcM':
+        if series.dtype.kind == 'M' and getattr(series.dt, 'tz', None) is not None:
+            series = series.dt.tz_localize(None)
+        return np.ascontiguousarray(series.to_numpy()), None
+
+    # 非数值列：整列相同的(symbol、exchange、trading_day等)作为常量保存在头部
+    values = series.tolist()
+    first = values[0] if len(values) > 0 else None
+    if all(v == first for v in values) and (first is None or isinstance(first, (str, int, float, bool))):
+        return None, first
+
+    return np.asarray([str(v) for v in values], dtype=str), None
+
+
+def pack_tick_cache(data, codec: str = None, unique: bool = True, meta: dict = None):
+    """
+    tick数据 => 列式缓存的字节内容(各列偏移相对于内容开头，长度按64字节补齐)
+    :return: (字节内容, 行数)
+    """
+    check_codec(codec)
+
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data)
+    if unique and 'datetime' in df.columns:
+        df = df.drop_duplicates(subset=['datetime'], keep='first')
+
+    columns = []
+    consts = {}
+    blocks = []
+    for name in df.columns:
+        values, const = _to_column(df[name])
+        if values is None:
+            consts[str(name)] = const
+            continue
+        raw = values.tobytes()
+        if codec:
+            raw = compress_block(codec, raw)
+        columns.append({'name': str(name), 'dtype': values.dtype.str, 'size': len(raw)})
+        blocks.append(raw)
+
+    header = {
+        'version': TICK_CACHE_VERSION,
+        'rows': len(df),
+        'codec': codec,
+        'columns': columns,
+        'consts': consts
+    }
+    if meta:
+        header['meta'] = meta
+
+    # 先以0偏移计算头部长度，再回填各列偏移(偏移位数固定留足)
+    for col in columns:
+        col['offset'] = 10 ** 15
+    head_len = len(MAGIC) + 4 + len(json.dumps(header).encode('utf-8'))
+    offset = _align(head_len)
+    for col in columns:
+        col['offset'] = offset
+        offset = _align(offset + col['size'])
+    header_bytes = json.dumps(header).encode('utf-8')
+
+    content = bytearray(_align(_segment_end(head_len, columns)))
+    content[:len(MAGIC)] = MAGIC
+    content[len(MAGIC):len(MAGIC) + 4] = struct.pack('<I', len(header_bytes))
+    content[len(MAGIC) + 4:len(MAGIC) + 4 + len(header_bytes)] = header_bytes
+    for col, raw in zip(columns, blocks):
+        content[col['offset']:col['offset'] + col['size']] = raw
+
+    return bytes(content), len(df)
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _segment_end(head_len: int, columns: list) -> int:
+    """数据段的结束位置(相对于数据段开头)"""
+    return max([head_len] + [col['offset'] + col['size'] for col in columns])
+
+
+def save_tick_cache(data, file_name: str, codec: str = None, unique: bool = True, meta: dict = None) -> int:
+    """
+    保存tick数据为列式缓存文件
+    :param data: list[dict] 或 DataFrame, 需包含datetime字段
+    :param file_name: 文件名
+    :param codec: 压缩方式 None/'lz4'/'zstd'/'zlib'，None时可memmap加载
+    :param unique: 是否按datetime去重
+    :param meta: 附加信息(可json序列化)，保存在头部，通过read_tick_cache_header读取
+    :return: 保存的行数
+    """
+    content, rows = pack_tick_cache(data, codec=codec, unique=unique, meta=meta)
+
+    os.makedirs(os.path.dirname(os.path.abspath(file_name)), exist_ok=True)
+    # 临时文件带进程号，多个进程同时写同一个缓存时互不影响
+    tmp_file = f'{file_name}.{os.getpid()}.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_file, file_name)
+
+    return rows
+
+
+def _read_segments(f) -> list:
+    """
+    读取文件中各数据段的(开始位置, 对齐后的结束位置, 头部)
+    追加写入的文件由多个数据段依次组成，末尾不完整的数据段(写入中断)忽略
+    """
+    f.seek(0, os.SEEK_END)
+    file_size = f.tell()
+    segments = []
+    pos = 0
+    while pos + len(MAGIC) + 4 <= file_size:
+        f.seek(pos)
+        if f.read(len(MAGIC)) != MAGIC:
+            break
+        header_len, = struct.unpack('<I', f.read(4))
+        header_bytes = f.read(header_len)
+        if len(header_bytes) < header_len:
+            break
+        header = json.loads(header_bytes.decode('utf-8'))
+        end = pos + _segment_end(len(MAGIC) + 4 + header_len, header['columns'])
+        if end > file_size:
+            break
+        segments.append((pos, _align(end), header))
+        pos = _align(end)
+    return segments
+
+
+def append_tick_cache(data, file_name: str, codec: str = None) -> int:
+    """
+    追加tick数据到列式缓存文件(不去重)，文件不存在时创建
+    每次追加为一个独立的数据段，按64字节对齐，加载时依次合并
+    :return: 追加的行数
+    """
+    content, rows = pack_tick_cache(data, codec=codec, unique=False)
+    if rows == 0:
+        return 0
+
+    os.makedirs(os.path.dirname(os.path.abspath(file_name)), exist_ok=True)
+    with open(file_name, 'ab+') as f:
+        segments = _read_segments(f)
+        end = segments[-1][1] if segments else 0
+        # 截掉上次中断写入的不完整数据段
+        f.seek(0, os.SEEK_END)
+        if f.tell() != end:
+            f.truncate(end)
+        f.write(content)
+
+    return rows
+
+
+def read_tick_cache_header(file_name: str) -> dict:
+    """读取缓存文件的头部(第一个数据段)"""
+    with open(file_name, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{file_name}不是tick列式缓存文件')
+        header_len, = struct.unpack('<I', f.read(4))
+        return json.loads(f.read(header_len).decode('utf-8'))
+
+
+def _load_segment(f, buf, pos: int, header: dict, columns: list = None) -> pd.DataFrame:
+    """加载一个数据段"""
+    rows = header['rows']
+    codec = header['codec']
+    if codec:
+        check_codec(codec)
+
+    data = {}
+    for col in header['columns']:
+        if columns is not None and col['name'] not in columns:
+            continue
+        if rows == 0:
+            data[col['name']] = np.empty(0, dtype=col['dtype'])
+        elif codec is None:
+            offset = pos + col['offset']
+            data[col['name']] = buf[offset:offset + col['size']].view(np.dtype(col['dtype']))
+        else:
+            f.seek(pos + col['offset'])
+            raw = decompress_block(codec, f.read(col['size']))
+            data[col['name']] = np.frombuffer(raw, dtype=np.dtype(col['dtype']))
+
+    df = pd.DataFrame(data, copy=False)
+    for name, value in header['consts'].items():
+        if columns is None or name in columns:
+            df[name] = value
+
+    return df
+
+
+def load_tick_cache(file_name: str, columns: list = None) -> pd.DataFrame:
+    """
+    加载列式缓存文件
+    未压缩的数值列为memmap只读视图(零拷贝)，追加写入的多个数据段合并后返回
+    :param file_name: 文件名
+    :param columns: 只加载指定的列，None时加载全部
+    :return: DataFrame, 文件不存在时返回None
+    """
+    if not os.path.isfile(file_name):
+        return None
+
+    with open(file_name, 'rb') as f:
+        segments = _read_segments(f)
+        if not segments:
+            raise ValueError(f'{file_name}不是tick列式缓存文件')
+        buf = None
+        if os.path.getsize(file_name) > 0 and any(h['codec'] is None and h['rows'] > 0 for _, _, h in segments):
+            buf = np.memmap(file_name, dtype=np.uint8, mode='r')
+        dfs = [_load_segment(f, buf, pos, header, columns) for pos, _, header in segments]
+
+    if len(dfs) == 1:
+        return dfs[0]
+    return pd.concat(dfs, ignore_index=True)
+
+
+def load_day_tick_cache(cache_folder: str, cache_symbol: str, cache_date: str,
+                        on_error: Callable = None) -> pd.DataFrame:
+    """
+    加载某合约某一天的列式缓存(回测引擎使用)
+    :param on_error: 加载异常时的回调，传入异常信息，缺省输出到stderr
+    :return: DataFrame, 文件不存在或加载异常时返回None
+    """
+    cache_file = get_tick_cache_file(cache_folder, cache_symbol, cache_date)
+    try:
+        return load_tick_cache(cache_file)
+    except Exception as ex:
+        msg = '加载缓存文件:{}异常:{}'.format(cache_file, str(ex))
+        if on_error:
+            on_error(msg)
+        else:
+            print(msg, file=sys.stderr)
+        return None
+
+
+def export_tick_csv(file_name: str, csv_file: str = None) -> str:
+    """
+    列式缓存文件 => csv
+    datetime为第一列，其他列按名称排序，与原tick记录的csv一致
+    :return: csv文件名
+    """
+    df = load_tick_cache(file_name)
+    if csv_file is None:
+        csv_file = os.path.splitext(file_name)[0] + '.csv'
+
+    df = df[['datetime'] + sorted(c for c in df.columns if c != 'datetime')].copy()
+    df['datetime'] = df['datetime'].dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+    df.to_csv(csv_file, index=False, encoding='utf8')
+    return csv_file
+
+
+class TickColumnBuffer(object):
+    """
+    单个合约、单个交易日的tick缓冲
+    按第一个tick的字段类型分组：数值字段、其他字段(时间、合约、交易所等)各用一次itemgetter取出为元组，
+    接收tick时只追加元组，不做格式转换，也不修改tick；
+    to_frame()在写线程中一次性转换为按列的numpy数组(数值字段为float64/int64，时间为datetime64)
+    """
+
+    def __init__(self, file_name: str):
+        self.file_name = file_name
+        self.size = 0
+        self.start_time = time.monotonic()
+
+        self.num_names = None  # 数值字段
+        self.int_names = None  # 第一个tick中为整数的字段
+        self.obj_names = None  # 其他字段
+        self.num_getter = None
+        self.obj_getter = None
+        self.num_rows = []  # 数值字段，每行一个元组
+        self.obj_rows = []  # 其他字段，每行一个元组
+
+    @staticmethod
+    def _getter(names: list, attr: bool = False):
+        """一次取出多个字段的值，返回元组(attr: 按属性取值，用于TickData)"""
+        if len(names) > 1:
+            return attrgetter(*names) if attr else itemgetter(*names)
+        if attr:
+            return lambda obj: tuple(getattr(obj, name) for name in names)
+        return lambda d: tuple(d[name] for name in names)
+
+    def _init_fields(self, d: dict, attr: bool = False):
+        self.num_names = []
+        self.int_names = set()
+        self.obj_names = []
+        for name, value in d.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.num_names.append(name)
+                if isinstance(value, int):
+                    self.int_names.add(name)
+            else:
+                self.obj_names.append(name)
+        self.num_getter = self._getter(self.num_names, attr)
+        self.obj_getter = self._getter(self.obj_names, attr)
+
+    def append(self, tick):
+        """加入tick(TickData 或 dict)"""
+        if self.num_names is None:
+            is_dict = isinstance(tick, dict)
+            self._init_fields(tick if is_dict else tick.__dict__, attr=not is_dict)
+
+        try:
+            self.num_rows.append(self.num_getter(tick))
+            self.obj_rows.append(self.obj_getter(tick))
+        except (KeyError, AttributeError, TypeError):
+            d = tick if isinstance(tick, dict) else tick.__dict__
+            del self.num_rows[self.size:]
+            self.num_rows.append(tuple(d.get(name) for name in self.num_names))
+            self.obj_rows.append(tuple(d.get(name) for name in self.obj_names))
+        self.size += 1
+
+    def to_frame(self) -> pd.DataFrame:
+        """缓冲 => DataFrame"""
+        data = {}
+        if self.num_names:
+            try:
+                matrix = np.array(self.num_rows, dtype=np.float64).reshape(self.size, len(self.num_names))
+            except (TypeError, ValueError):
+                # 数值字段中有非数值时，记为nan
+                matrix = np.array([[v if isinstance(v, (int, float)) else np.nan for v in row]
+                                   for row in self.num_rows], dtype=np.float64)
+            for i, name in enumerate(self.num_names):
+                column = matrix[:, i]
+                if name in self.int_names and np.array_equal(column, np.round(column)):
+                    column = column.astype(np.int64)
+                data[name] = column
+        if self.obj_names:
+            for name, values in zip(self.obj_names, zip(*self.obj_rows)):
+                if isinstance(values[0], Enum):
+                    values = [v.value if isinstance(v, Enum) else v for v in values]
+                data[name] = list(values)
+
+        return pd.DataFrame(data)
+
+
+class TickCacheWriter(object):
+    """
+    tick列式文件的批量异步写入
+    1、每个合约、交易日的tick缓存在列缓冲中，满 flush_size 条，或缓存超过 flush_seconds 秒后，
+       放入写队列，由后台写线程追加到 {tick_folder}/YYYY/MM/DD/{vt_symbol}_{trading_day}.tkc
+    2、写队列有长度上限，写盘跟不上时 add_tick 阻塞等待，避免内存无限增长
+    3、接收线程与写线程之间只通过队列交换整块的列缓冲，无需加锁
+    """
+
+    def __init__(self, tick_folder: str, flush_size: int = 1000, flush_seconds: float = 60,
+                 queue_size: int = 100, codec: str = None):
+        check_codec(codec)
+        self.tick_folder = tick_folder
+        self.flush_size = flush_size
+        self.flush_seconds = flush_seconds
+        self.codec = codec
+
+        self.buffers = {}  # (vt_symbol, trading_day): TickColumnBuffer
+        self.files = set()  # 已写入的文件
+        self.rows = 0  # 已写入的tick数量
+        self.last_check = time.monotonic()
+
+        self.queue = Queue(maxsize=queue_size)
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def get_file_name(self, vt_symbol: str, trading_day: str) -> str:
+        """文件名，与原csv文件的目录结构一致"""
+        return os.path.abspath(os.path.join(self.tick_folder, trading_day.replace('-', '/'),
+                                            f'{vt_symbol}_{trading_day}{TICK_CACHE_SUFFIX}'))
+
+    def add_tick(self, tick):
+        """加入tick(TickData 或 dict，需包含vt_symbol、datetime)"""
+        if isinstance(tick, dict):
+            key = (tick['vt_symbol'], tick.get('trading_day') or tick['datetime'].strftime('%Y-%m-%d'))
+        else:
+            key = (tick.vt_symbol, tick.trading_day or tick.datetime.strftime('%Y-%m-%d'))
+        buffer = self.buffers.get(key)
+        if buffer is None:
+            buffer = self.buffers[key] = TickColumnBuffer(self.get_file_name(*key))
+        buffer.append(tick)
+
+        if buffer.size >= self.flush_size:
+            self.flush_buffer(key)
+        self.flush_expired()
+
+    def flush_buffer(self, key: tuple):
+        """列缓冲放入写队列"""
+        buffer = self.buffers.pop(key, None)
+        if buffer and buffer.size > 0:
+            self.queue.put(buffer)
+
+    def flush_expired(self):
+        """缓存超时的列缓冲放入写队列(每秒最多检查一次)"""
+        now = time.monotonic()
+        if now - self.last_check < 1:
+            return
+        self.last_check = now
+        for key in [key for key, buffer in self.buffers.items() if now - buffer.start_time >= self.flush_seconds]:
+            self.flush_buffer(key)
+
+    def flush(self, wait: bool = True):
+        """全部列缓冲放入写队列，wait=True时等待写入完成"""
+        for key in list(self.buffers.keys()):
+            self.flush_buffer(key)
+        if wait:
+            self.queue.join()
+
+    def close(self):
+        """写入全部数据，停止写线程"""
+        self.flush(wait=False)
+        self.queue.put(None)
+        self.thread.join()
+
+    def run(self):
+        """写线程"""
+        while True:
+            buffer = self.queue.get()
+            try:
+                if buffer is None:
+                    break
+                self.rows += append_tick_cache(buffer.to_frame(), buffer.file_name, codec=self.codec)
+                self.files.add(buffer.file_name)
+            except Exception as ex:
+                print(f'写入{buffer.file_name}异常:{str(ex)}', file=sys.stderr)
+            finally:
+                self.queue.task_done()
+
+
+class TickDayColumns(object):
+    """
+    单个合约、单个交易日的tick，按列保存
+    数值字段(价格、成交量、盘口等)为float64列，时间为datetime64[us]列，
+    合约、交易所、交易日等整日相同的只保存一份；一个tick约占 8 * (数值字段数 + 1) 字节，
+    远小于一个TickData对象。按下标取出时才构造TickData
+    """
+
+    NUM_FIELDS = [f.name for f in fields(TickData) if isinstance(f.default, (int, float))]
+    FLUSH_SIZE = 1024
+
+    def __init__(self, symbol: str, exchange: Exchange, trading_day: str = '',
+                 gateway_name: str = '', name: str = '', capacity: int = 1024):
+        self.symbol = symbol
+        self.exchange = exchange
+        self.trading_day = trading_day
+        self.gateway_name = gateway_name
+        self.name = name
+        self.vt_symbol = get_vt_symbol(symbol, exchange)
+
+        self.size = 0  # 已写入数组的数量
+        self.values = np.zeros((len(self.NUM_FIELDS), max(capacity, 1)), dtype=np.float64)
+        self.datetimes = np.zeros(max(capacity, 1), dtype='datetime64[us]')
+        self.getter = attrgetter(*self.NUM_FIELDS)
+        # 逐个加入的tick先缓存为元组，满一批或读取时再批量写入数组
+        self.pending_values = []
+        self.pending_datetimes = []
+
+    def __len__(self) -> int:
+        return self.size + len(self.pending_datetimes)
+
+    def _reserve(self, size: int):
+        """容量不足时按倍数扩大"""
+        capacity = self.datetimes.shape[0]
+        if size <= capacity:
+            return
+        capacity = max(size, capacity * 2)
+        values = np.zeros((len(self.NUM_FIELDS), capacity), dtype=np.float64)
+        values[:, :self.size] = self.values[:, :self.size]
+        datetimes = np.zeros(capacity, dtype='datetime64[us]')
+        datetimes[:self.size] = self.datetimes[:self.size]
+        self.values = values
+        self.datetimes = datetimes
+
+    def _flush(self):
+        """缓存的tick写入数组"""
+        if not self.pending_datetimes:
+            return
+        n = len(self.pending_datetimes)
+        self._reserve(self.size + n)
+        self.values[:, self.size:self.size + n] = np.array(self.pending_values, dtype=np.float64).T
+        index = pd.DatetimeIndex(self.pending_datetimes)
+        if index.tz is not None:
+            index = index.tz_localize(None)
+        self.datetimes[self.size:self.size + n] = index.to_numpy().astype('datetime64[us]')
+        self.size += n
+        self.pending_values = []
+        self.pending_datetimes = []
+
+    def append(self, tick: TickData):
+        """加入一个tick"""
+        self.pending_values.append(self.getter(tick))
+        self.pending_datetimes.append(tick.datetime)
+        if len(self.pending_datetimes) >= self.FLUSH_SIZE:
+            self._flush()
+
+    def extend(self, ticks: list):
+        """批量加入tick"""
+        getter = self.getter
+        self.pending_values.extend([getter(t) for t in ticks])
+        self.pending_datetimes.extend([t.datetime for t in ticks])
+        self._flush()
+
+    @classmethod
+    def from_ticks(cls, ticks: list):
+        """TickData列表 => 按列保存"""
+        first = ticks[0]
+        columns = cls(symbol=first.symbol, exchange=first.exchange,
+                      trading_day=first.trading_day or first.datetime.strftime('%Y-%m-%d'),
+                      gateway_name=first.gateway_name, name=first.name, capacity=len(ticks))
+        columns.extend(ticks)
+        return columns
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, symbol: str = '', exchange: Exchange = None, gateway_name: str = ''):
+        """DataFrame(如load_tick_cache的结果) => 按列保存，缺少的数值字段为0"""
+        first = df.iloc[0] if len(df) > 0 else {}
+        symbol = symbol or first.get('symbol', '')
+        if exchange is None:
+            exchange = Exchange(first.get('exchange'))
+        trading_day = first.get('trading_day') or ''
+        if not trading_day and len(df) > 0:
+            trading_day = pd.Timestamp(first['datetime']).strftime('%Y-%m-%d')
+
+        columns = cls(symbol=symbol, exchange=exchange, trading_day=trading_day,
+                      gateway_name=gateway_name or first.get('gateway_name', ''),
+                      name=first.get('name', '') or '', capacity=len(df))
+        for i, name in enumerate(cls.NUM_FIELDS):
+            if name in df.columns:
+                columns.values[i, :len(df)] = pd.to_numeric(df[name], errors='coerce').fillna(0).to_numpy()
+        datetimes = df['datetime']
+        if getattr(datetimes.dt, 'tz', None) is not None:
+            datetimes = datetimes.dt.tz_localize(None)
+        columns.datetimes[:len(df)] = datetimes.to_numpy(dtype='datetime64[us]')
+        columns.size = len(df)
+        return columns
+
+    @classmethod
+    def load(cls, file_name: str, symbol: str = '', exchange: Exchange = None, gateway_name: str = ''):
+        """加载列式缓存文件，文件不存在时返回None"""
+        df = load_tick_cache(file_name)
+        if df is None:
+            return None
+        return cls.from_frame(df, symbol=symbol, exchange=exchange, gateway_name=gateway_name)
+
+    def column(self, name: str) -> np.ndarray:
+        """一列数据(视图)，如 column('last_price')、column('datetime')"""
+        self._flush()
+        if name == 'datetime':
+            return self.datetimes[:self.size]
+        return self.values[self.NUM_FIELDS.index(name), :self.size]
+
+    def to_frame(self) -> pd.DataFrame:
+        self._flush()
+        data = {'datetime': self.datetimes[:self.size]}
+        for i, name in enumerate(self.NUM_FIELDS):
+            data[name] = self.values[i, :self.size]
+        df = pd.DataFrame(data)
+        df['symbol'] = self.symbol
+        df['exchange'] = self.exchange.value
+        df['trading_day'] = self.trading_day
+        df['gateway_name'] = self.gateway_name
+        df['name'] = self.name
+        return df
+
+    def save(self, file_name: str, codec: str = None) -> int:
+        """保存为列式缓存文件"""
+        return save_tick_cache(self.to_frame(), file_name, codec=codec, unique=False)
+
+    def _make_tick(self, dt: datetime, values) -> TickData:
+        tick = TickData(gateway_name=self.gateway_name, symbol=self.symbol, exchange=self.exchange,
+                        datetime=dt, date=dt.strftime('%Y-%m-%d'), time=dt.strftime('%H:%M:%S.%f'),
+                        trading_day=self.trading_day, name=self.name)
+        for name, value in zip(self.NUM_FIELDS, values):
+            setattr(tick, name, value)
+        return tick
+
+    def __getitem__(self, index: int) -> TickData:
+        self._flush()
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        return self._make_tick(self.datetimes[index].item(), self.values[:, index].tolist())
+
+    def __iter__(self):
+        self._flush()
+        datetimes = self.datetimes[:self.size].tolist()
+        rows = self.values[:, :self.size].T.tolist()
+        for dt, values in zip(datetimes, rows):
+            yield self._make_tick(dt, values)
+
+    @property
+    def nbytes(self) -> int:
+        """数据占用的字节数(不含预留容量)"""
+        return len(self) * (len(self.NUM_FIELDS) * 8 + 8)
+
+
+def convert_bz2_cache(cache_folder: str, dest_folder: str = None, codec: str = None,
+                      overwrite: bool = False, log_func=print) -> int:
+    """
+    把bz2缓存目录(cache_folder/YYYYMM/{symbol}_{YYYYMMDD}.pkb2/.pkz2)转换为列式缓存
+    :param cache_folder: bz2缓存目录
+    :param dest_folder: 输出目录，缺省与bz2缓存同目录
+    :param codec: 压缩方式
+    :param overwrite: 是否覆盖已存在的列式缓存
+    :return: 转换的文件数量
+    """
+    check_codec(codec)
+    dest_folder = dest_folder or cache_folder
+    count = 0
+    for year_month in sorted(os.listdir(cache_folder)):
+        month_folder = os.path.join(cache_folder, year_month)
+        if not os.path.isdir(month_folder):
+            continue
+        for file in sorted(os.listdir(month_folder)):
+            name, ext = os.path.splitext(file)
+            if ext not in ['.pkb2', '.pkz2']:
+                continue
+            dest_file = os.path.join(dest_folder, year_month, name + TICK_CACHE_SUFFIX)
+            if not overwrite and os.path.isfile(dest_file):
+                continue
+            try:
+                with bz2.BZ2File(os.path.join(month_folder, file), 'rb') as f:
+                    data = pickle.load(f)
+                if not data:
+                    continue
+                rows = save_tick_cache(data, dest_file, codec=codec)
+                count += 1
+                if log_func:
+                    log_func(f'{datetime.now()} {file} => {dest_file}, {rows}条')
+            except Exception as ex:
+                print(f'{file}转换异常:{str(ex)}', file=sys.stderr)
+
+    return count
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print('用法: python tick_cache.py bz2缓存目录 [输出目录] [lz4/zstd/zlib]')
+        sys.exit(1)
+
+    convert_bz2_cache(cache_folder=sys.argv[1],
+                      dest_folder=sys.argv[2] if len(sys.argv) > 2 else None,
+                      codec=sys.argv[3] if len(sys.argv) > 3 else None)
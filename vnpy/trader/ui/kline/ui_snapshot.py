@@ -12,6 +12,7 @@ import pickle
 import zlib
 import pandas as pd
 
+from vnpy.component.cta_kline_store import unpack_klines_snapshot
 from vnpy.trader.ui.kline.crosshair import Crosshair
 from vnpy.trader.ui.kline.kline import *
 
@@ -32,25 +33,32 @@ class UiSnapshot(object):
                  d = pickle.load(f)
 
         use_zlib = d.get('zlib', False)
+        use_columnar = d.get('columnar', False)
         klines = d.pop('klines', None)
 
+        # 列式容器，按列恢复DataFrame
+        if use_columnar and klines:
+            klines = unpack_klines_snapshot(klines)
+
         # 如果使用压缩，则解压
-        if use_zlib and klines:
+        elif use_zlib and klines:
             print('use zlib decompress klines')
             klines = pickle.loads(zlib.decompress(klines))
 
         kline_settings = {}
         for k, v in klines.items():
             # 获取bar各种数据/指标列表
-            data_list = v.pop('data_list', None)
-            if data_list is None:
-                continue
+            df = v.pop('data_frame', None)
+            if df is None:
+                data_list = v.pop('data_list', None)
+                if data_list is None:
+                    continue
+                df = pd.DataFrame(data_list)
 
             # 主图指标 / 附图指标清单
             main_indicators = v.get('main_indicators', [])
             sub_indicators = v.get('sub_indicators', [])
 
-            df = pd.DataFrame(data_list)
             df = df.set_index(pd.DatetimeIndex(df['datetime']))
 
             kline_settings.update(